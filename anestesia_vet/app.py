@@ -1,12 +1,31 @@
+import time
+INICIO_PROCESSO = time.perf_counter()  # base do relatório de inicialização
+
 # Importações de modelos
 from models.protocolo import Protocolo, ProtocoloFarmaco
-from controllers.protocolo_controller import criar_protocolo, listar_protocolos, obter_farmacos_do_protocolo, obter_protocolo, deletar_protocolo, obter_todos_farmacos, adicionar_farmaco_a_protocolo
+from controllers.protocolo_controller import criar_protocolo, listar_protocolos, obter_farmacos_do_protocolo, obter_protocolo, deletar_protocolo, obter_todos_farmacos, adicionar_farmaco_a_protocolo, mover_farmaco_no_protocolo, vizinhos_no_protocolo
 import tkinter as tk
 from models.animal import Animal
 from models.farmaco import Farmaco
 from models.config_infusao import ConfigInfusao, TipoEquipo
 from models.sessao import SessaoAnestesia, SessaoAvulsaAnestesia
 from controllers.config_infusao_controller import calcular_infusao_continua
+from controllers.utils.titulacao import obter_grade, grade_em_cache, invalidar_grade
+from controllers.calculadora_dose import calculadora_dose
+from controllers.cache_referencia import cache_referencia, caminho_instantaneo
+from controllers.utils.formatacao import formatar_duracao
+from controllers.utils.recalculo import criar_calculo_infusao
+from controllers.utils.unidades import UNIDADES_CONCENTRACAO
+from controllers.importacao_controller import importar_catalogo_csv
+from controllers.exportacao_controller import exportar_sessoes
+from controllers.consumo_controller import consumo_mensal, reconstruir_consumo
+from database.busca import LIMITE_PADRAO, buscar_farmacos
+from database.arquivo import arquivar_sessoes, arquivos_existentes, obter_sessao
+from database.backup import BackupPeriodico, diretorio_backup, fazer_backup, girar_backups, restaurar_backup
+from interface.tarefas import ExecutorTarefas
+from interface.arvore import ArvoreVinculada
+from interface.abas import AbasSobDemanda
+from interface.inicializacao import TemposInicializacao, relatorio_ativado
 # No topo do arquivo, adicione estes imports:
 
 
@@ -34,11 +53,18 @@ from controllers.config_infusao_controller import (
 from controllers.sessao_controller import (
     registrar_sessao,
     registrar_sessao_avulsa,
-    gerar_prescricao_txt
+    gerar_prescricao_txt,
+    listar_sessoes_pagina,
+    listar_sessoes_arquivadas_pagina,
+    cursor_da_linha,
+    gravar_sessoes,
+    ORIGEM_NORMAL
 )
+from controllers.diario_sessoes import DiarioSessoes, CAMINHO_PADRAO
 
 # Importações do banco de dados
-from database.engine import engine
+from database.engine import engine, atualizar_esquema, obter_engine_leitura, carregar_config
+from database.migracoes import farmacos_para_revisar
 
 # Importações padrão
 import os
@@ -55,23 +81,16 @@ from tkinter.scrolledtext import ScrolledText
 from sqlmodel import Session, select
 
 
-def formatar_duracao(horas: float) -> str:
-    """Formata um tempo em horas (decimal) para horas e minutos."""
-    horas_inteiras = int(horas)
-    minutos = int((horas - horas_inteiras) * 60)
-    
-    if horas_inteiras > 0 and minutos > 0:
-        return f"{horas_inteiras}h {minutos}min"
-    elif horas_inteiras > 0:
-        return f"{horas_inteiras}h"
-    elif minutos > 0:
-        return f"{minutos}min"
-    else:
-        return "0min"
-
 class VetAnesthesiaApp:
-    def __init__(self, root):
+    # Espera depois da última alteração de um campo da infusão até o recalculo (~1 quadro de 60 Hz)
+    ATRASO_RECALCULO_MS = 16
+    # Tamanho da página da lista de sessões
+    SESSOES_POR_PAGINA = 200
+
+    def __init__(self, root, tempos: TemposInicializacao = None):
         self.root = root
+        self.tempos = tempos or TemposInicializacao()
+        inicio_janela = time.perf_counter()
         self.root.title("Anestesia Veterinária - Cálculos de Infusão")
         self.root.geometry("1200x800")
         self.style = ttk.Style()
@@ -87,33 +106,226 @@ class VetAnesthesiaApp:
             text="Calculadora (F2)", 
             command=self.show_calculator
         ).pack(side='left', padx=5)
-        
+        ttk.Button(global_btn_frame, text="Backup Agora", command=self.backup_now).pack(side='left', padx=5)
+        ttk.Button(global_btn_frame, text="Restaurar Backup", command=self.restore_backup).pack(side='left', padx=5)
+        
+        # Barra de status: tarefas de banco/arquivo em segundo plano
+        status_frame = ttk.Frame(root)
+        status_frame.pack(side='bottom', fill='x', padx=10, pady=(0, 5))
+        self.status_label = ttk.Label(status_frame, text="")
+        self.status_label.pack(side='left')
+        self.status_cancelar = ttk.Button(status_frame, text="Cancelar", command=self.cancel_tasks)
+        self.status_progresso = ttk.Progressbar(status_frame, mode='indeterminate', length=150)
+        self.tarefas = ExecutorTarefas(root, ao_mudar_estado=self.update_busy_indicator,
+                                       ao_erro=self.show_task_error)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # Listas de referência do último uso (sem esperar o banco); conferidas em segundo plano
+        with self.tempos.fase("instantâneo"):
+            cache_referencia.restaurar_instantaneo(caminho_instantaneo(engine))
+        self.tarefas.executar(cache_referencia.conciliar, ao_concluir=self.on_reference_reconciled,
+                              descricao="Conferindo listas com o banco")
+
+        # Diário de plantão: sessões gravadas em lote por uma thread própria
+        self.modo_plantao = tk.BooleanVar(value=False)
+        self.diario = DiarioSessoes(
+            CAMINHO_PADRAO, ao_gravar=lambda n: self.tarefas.na_interface(self.on_journal_written),
+            ao_erro=lambda erro: self.tarefas.na_interface(lambda: self.on_journal_error(erro)))
+
         # Layout principal
         self.main_frame = ttk.Frame(root)
         self.main_frame.pack(expand=True, fill='both', padx=10, pady=10)
         
-        # Notebook (abas)
+        # Notebook (abas): cada aba é montada e carregada quando aberta pela primeira vez
         self.notebook = ttk.Notebook(self.main_frame)
         self.notebook.pack(expand=True, fill='both')
+        self.abas = AbasSobDemanda(self.notebook, ao_criar=self.record_tab_timing)
+        self.abas.adicionar('animais', "🐾 Animais", self.create_animal_tab, self.load_animals_list)
+        self.abas.adicionar('farmacos', "💊 Fármacos", self.create_farmaco_tab, self.load_farmacos_tree)
+        self.abas.adicionar('sessoes', "📋 Sessões", self.create_session_tab,
+                            lambda: (self.load_session_options(), self.load_sessions_list()))
+        self.abas.adicionar('infusao', "💉 Infusão", self.create_infusion_tab, self.load_farmacos_infusao)
+        self.abas.adicionar('protocolos', "📜 Protocolos", self.create_protocolo_tab, self.carregar_protocolos)
+        self.abas.adicionar('consumo', "📊 Consumo", self.create_consumo_tab)
+        self.tempos.registrar("janela", time.perf_counter() - inicio_janela)
+
+        # Só a aba visível é criada agora; o painel de fórmulas depois da primeira pintura
+        self.abas.criar(self.abas.selecionada() or 'animais', ao_carregar=self.on_initial_tab_loaded)
+        self.root.bind("<Map>", self.on_first_map, add="+")
+
+        # Aberto já (o modo plantão pode registrar logo); sessões que não chegaram ao
+        # banco numa queda anterior são regravadas pela thread do diário
+        try:
+            with self.tempos.fase("diário"):
+                recuperadas = self.diario.abrir()
+            if recuperadas:
+                messagebox.showinfo("Diário", f"{recuperadas} sessão(ões) recuperada(s) do diário de plantão.")
+        except Exception as e:
+            messagebox.showerror("Diário", f"Diário de plantão indisponível: {str(e)}")
         
-        # Criar abas
-        self.create_animal_tab()
-        self.create_farmaco_tab()
-        self.create_session_tab()
-        self.create_infusion_tab()
-        self.create_protocolo_tab() 
-        
-        # Painel de fórmulas
-        self.create_formulas_panel()
-        
-        # Carregar dados iniciais
-        self.load_initial_data()
-        
+        # Backup automático (backup_intervalo_min) numa thread própria, sem indicador de ocupado
+        self.backup_automatico = BackupPeriodico(engine)
+        self.backup_automatico.iniciar()
+
         # Atalho de teclado (MODIFICADO)
         self.root.bind("<F2>", lambda e: self.show_calculator())
 
     
     
+    def record_tab_timing(self, nome, fase, segundos):
+        self.tempos.registrar(f"aba {nome}: {fase}", segundos)
+
+    def on_first_map(self, event):
+        """Janela mapeada: a primeira pintura acontece no próximo ciclo ocioso"""
+        if event.widget is not self.root or 'primeira pintura' in self.tempos.marcos:
+            return
+
+        def pintada():
+            self.tempos.marcar('primeira pintura')
+            self.create_formulas_panel()
+            self.check_startup_done()
+
+        self.root.after_idle(pintada)
+
+    def on_initial_tab_loaded(self):
+        self.tempos.marcar('aba inicial carregada')
+        self.check_startup_done()
+
+    def check_startup_done(self):
+        """Interativa = janela desenhada e aba inicial com os dados (relatório com ANESTESIA_TEMPOS=1)"""
+        if {'primeira pintura', 'aba inicial carregada'} <= set(self.tempos.marcos):
+            if self.tempos.marcar('interativa') and relatorio_ativado():
+                print(self.tempos.relatorio())
+
+    def update_busy_indicator(self, ativas):
+        """Mostra a barra de progresso enquanto houver tarefas em segundo plano"""
+        if ativas:
+            self.status_label.config(text=ativas[-1].descricao or "Processando...")
+            if not self.status_progresso.winfo_ismapped():
+                self.status_progresso.pack(side='right')
+                self.status_progresso.start(10)
+            if any(t.cancelavel for t in ativas):
+                self.status_cancelar.pack(side='right', padx=5)
+            else:
+                self.status_cancelar.pack_forget()
+        else:
+            self.status_label.config(text="")
+            self.status_progresso.stop()
+            self.status_progresso.pack_forget()
+            self.status_cancelar.pack_forget()
+        self.root.config(cursor="watch" if ativas else "")
+
+    def cancel_tasks(self):
+        self.tarefas.cancelar_todas()
+
+    def show_task_error(self, tarefa, erro):
+        if tarefa is None:  # retorno agendado na interface
+            messagebox.showerror("Erro", f"Falha ao atualizar a tela: {erro}")
+        else:
+            messagebox.showerror("Erro", f"Falha em '{tarefa.descricao}': {erro}")
+
+    def save_record(self, registro, descricao, ao_concluir, mensagem_erro):
+        """Grava um registro novo numa thread do executor"""
+        def gravar():
+            with Session(engine) as session:
+                session.add(registro)
+                session.commit()
+
+        self.tarefas.executar(
+            gravar, ao_concluir=lambda _: ao_concluir(), descricao=descricao,
+            ao_erro=lambda e: messagebox.showerror("Erro", f"{mensagem_erro}: {str(e)}"))
+
+    def backup_now(self):
+        """Backup online em segundo plano, com o progresso na barra de status"""
+        def progresso(feitas, total):
+            self.tarefas.na_interface(
+                lambda: self.status_label.config(text=f"Backup: {feitas * 100 // max(total, 1)}%"))
+
+        def fazer(cancelado):
+            caminho = fazer_backup(engine, ao_progresso=progresso, cancelado=cancelado)
+            if caminho is not None:
+                girar_backups(engine)
+            return caminho
+
+        self.tarefas.executar(
+            fazer, cancelavel=True, descricao="Fazendo backup do banco",
+            ao_concluir=lambda caminho: messagebox.showinfo("Backup", f"Backup salvo em:\n{caminho}"),
+            ao_erro=lambda e: messagebox.showerror("Erro", f"Falha no backup: {str(e)}"))
+
+    def restore_backup(self):
+        """Restaura um backup verificado (o estado atual vira um backup de segurança)"""
+        pasta = diretorio_backup(engine)
+        filepath = filedialog.askopenfilename(
+            title="Restaurar backup", initialdir=str(pasta) if pasta.is_dir() else None,
+            filetypes=(("Banco SQLite", "*.db"), ("All files", "*.*")))
+        if not filepath:
+            return
+        if not messagebox.askyesno(
+                "Confirmar", "Substituir o banco atual por este backup?\n"
+                             "Alterações feitas depois dele serão perdidas "
+                             "(o estado atual é salvo antes num backup de segurança)."):
+            return
+
+        def concluido(seguranca):
+            cache_referencia.limpar()
+            calculadora_dose.limpar()
+            invalidar_grade()
+            self.load_initial_data()
+            self.load_sessions_list()
+            messagebox.showinfo("Backup", f"Banco restaurado.\nEstado anterior salvo em:\n{seguranca}")
+
+        def restaurar(caminho):
+            # O diário grava no banco por uma thread própria: parado durante a troca
+            self.diario.fechar()
+            try:
+                return restaurar_backup(caminho, engine)
+            finally:
+                self.diario.abrir()
+
+        self.tarefas.executar(
+            restaurar, filepath, ao_concluir=concluido, descricao="Restaurando backup",
+            ao_erro=lambda e: messagebox.showerror("Erro", f"Falha ao restaurar backup: {str(e)}"))
+
+    def on_journal_written(self):
+        """Lote do diário confirmado no banco"""
+        if self.abas.criada('sessoes'):
+            pendentes = self.diario.pendentes
+            self.plantao_label.config(text=f"{pendentes} sessão(ões) aguardando gravação" if pendentes else "")
+        self.load_sessions_list()
+
+    def on_journal_error(self, erro):
+        """Primeira falha seguida do diário: as sessões ficam no arquivo e a gravação é retentada"""
+        if self.abas.criada('sessoes'):
+            self.plantao_label.config(text=f"Gravação do diário falhou ({self.diario.pendentes} pendente(s))")
+        messagebox.showwarning(
+            "Diário", f"Não foi possível gravar as sessões do plantão no banco: {str(erro)}\n"
+                      "Elas continuam no diário e a gravação será tentada de novo.")
+
+    def on_reference_reconciled(self, alteracoes):
+        """O instantâneo estava desatualizado: redesenha as listas das abas abertas"""
+        if not any(alteracoes.values()):
+            return
+        self.load_initial_data()
+        self.load_animals_list()
+        self.carregar_protocolos()
+        self.load_farmacos_infusao()
+
+    def on_close(self):
+        self.backup_automatico.parar()
+        self.tarefas.encerrar()
+        caminho = caminho_instantaneo(engine)
+        if caminho is not None:
+            try:
+                cache_referencia.salvar_instantaneo(caminho)
+            except Exception:
+                pass  # sem instantâneo a próxima abertura só lê o banco
+        try:
+            self.diario.fechar()
+        except Exception as e:
+            # O que não foi gravado continua no arquivo e é recuperado na próxima abertura
+            messagebox.showwarning("Diário", f"Sessões pendentes ficam no diário: {str(e)}")
+        self.root.destroy()
+
     def show_calculator(self, event=None):
         """Calculadora veterinária com conversões práticas"""
         calc_window = tk.Toplevel(self.root)
@@ -265,20 +477,76 @@ class VetAnesthesiaApp:
         if not messagebox.askyesno("Confirmar", f"Tem certeza que deseja excluir o fármaco {farmaco_nome} (ID: {farmaco_id})?"):
             return
         
-        try:
+        def excluir():
             with Session(engine) as session:
                 farmaco = session.get(Farmaco, farmaco_id)
                 if not farmaco:
-                    messagebox.showerror("Erro", "Fármaco não encontrado!")
-                    return
-                
+                    return False
                 session.delete(farmaco)
                 session.commit()
-                messagebox.showinfo("Sucesso", "Fármaco excluído com sucesso!")
-                self.load_farmacos_tree()  # Atualiza a lista
-                
-        except Exception as e:
-            messagebox.showerror("Erro", f"Falha ao excluir fármaco: {str(e)}")
+                return True
+
+        def concluido(excluido):
+            if not excluido:
+                messagebox.showerror("Erro", "Fármaco não encontrado!")
+                return
+            messagebox.showinfo("Sucesso", "Fármaco excluído com sucesso!")
+            self.load_farmacos_tree()  # Atualiza a lista
+
+        self.tarefas.executar(
+            excluir, ao_concluir=concluido, descricao="Excluindo fármaco",
+            ao_erro=lambda e: messagebox.showerror("Erro", f"Falha ao excluir fármaco: {str(e)}"))
+
+    def confirm_concentration_unit(self):
+        """Define a unidade da concentração do fármaco selecionado (cadastros antigos ficam "a confirmar")"""
+        selected_item = self.farmaco_tree.selection()
+        if not selected_item:
+            messagebox.showerror("Erro", "Selecione um fármaco!")
+            return
+        farmaco_id, farmaco_nome = self.farmaco_tree.item(selected_item[0])['values'][:2]
+
+        janela = tk.Toplevel(self.root)
+        janela.title("Unidade da Concentração")
+        ttk.Label(janela, text=f"Concentração de {farmaco_nome} em:").pack(padx=10, pady=5)
+        unidade_conc = tk.StringVar(value=UNIDADES_CONCENTRACAO[0])
+        ttk.Combobox(janela, textvariable=unidade_conc, values=UNIDADES_CONCENTRACAO,
+                     state='readonly', width=8).pack(padx=10)
+
+        def gravar(unidade):
+            with Session(engine) as session:
+                farmaco = session.get(Farmaco, farmaco_id)
+                if not farmaco:
+                    return False
+                farmaco.unidade_concentracao = unidade  # unidades conferidas na gravação
+                session.add(farmaco)
+                session.commit()
+                return True
+
+        def concluido(gravado):
+            if not gravado:
+                messagebox.showerror("Erro", "Fármaco não encontrado!")
+                return
+            janela.destroy()
+            self.load_farmacos_tree()
+
+        def salvar():
+            self.tarefas.executar(
+                gravar, unidade_conc.get(), ao_concluir=concluido, descricao="Gravando unidade",
+                ao_erro=lambda e: messagebox.showerror("Erro", f"Falha ao gravar a unidade: {str(e)}"))
+
+        ttk.Button(janela, text="Salvar", command=salvar).pack(pady=10)
+
+    def warn_unconfirmed_units(self, pendentes):
+        """Avisa na abertura quais fármacos ainda têm a unidade da concentração a confirmar"""
+        nomes = "\n".join(f"- {nome} ({concentracao}, dose em {unidade})"
+                          for _, nome, concentracao, unidade in pendentes[:15])
+        if len(pendentes) > 15:
+            nomes += f"\n... e mais {len(pendentes) - 15}"
+        messagebox.showwarning(
+            "Unidade da concentração",
+            "Estes fármacos foram cadastrados sem a unidade da concentração:\n"
+            f"{nomes}\n\nOs cálculos deles seguem a fórmula antiga até a unidade ser "
+            "conferida (aba Fármacos, botão Confirmar Unidade).")
 
     def configure_styles(self):
         """Configura os estilos visuais da aplicação"""
@@ -291,25 +559,25 @@ class VetAnesthesiaApp:
         self.style.configure('Error.TLabel', foreground='red')
 
     def load_initial_data(self):
-        """Carrega dados iniciais do banco de dados"""
-        with Session(engine) as session:
-            # Carregar animais para combobox
-            animais = session.exec(select(Animal)).all()
-            self.animal_combobox['values'] = [f"{a.id} - {a.nome} ({a.especie})" for a in animais]
-            
-            protocolos = listar_protocolos(session)
-            self.protocolo_combobox['values'] = [f"{p.id} - {p.nome}" for p in protocolos]
-            
-            # Carregar fármacos para combobox
-            farmacos = session.exec(select(Farmaco)).all()
-            self.farmaco_combobox['values'] = [f"{f.id} - {f.nome} ({f.modo_uso})" for f in farmacos]
-            
-            # Carregar lista completa de fármacos (Treeview)
-            self.load_farmacos_tree()  # Agora chamando o método corretamente
-    def create_protocolo_tab(self):
+        """Atualiza as listas das abas já criadas (as outras carregam ao serem abertas)"""
+        self.load_session_options()
+        self.load_farmacos_tree()
+
+    def load_session_options(self):
+        """Comboboxes da aba Sessões"""
+        if not self.abas.criada('sessoes'):
+            return
+        # Listas vêm do cache de referência (o banco só é lido na primeira vez)
+        animais = cache_referencia.listar(Animal)
+        self.animal_combobox['values'] = [f"{a.id} - {a.nome} ({a.especie})" for a in animais]
+
+        protocolos = cache_referencia.listar(Protocolo)
+        self.protocolo_combobox['values'] = [f"{p.id} - {p.nome}" for p in protocolos]
+
+        # Combobox de fármacos: primeiros por nome; o resto aparece buscando
+        self.farmaco_combobox['values'] = self.search_farmaco_options("", self.format_farmaco_option)
+    def create_protocolo_tab(self, frame):
         """Cria a aba de gerenciamento de protocolos"""
-        frame = ttk.Frame(self.notebook)
-        self.notebook.add(frame, text="📜 Protocolos")
         
         # Frame principal
         main_frame = ttk.Frame(frame)
@@ -336,6 +604,19 @@ class VetAnesthesiaApp:
         for col in farmaco_columns:
             self.protocolo_farmaco_tree.heading(col, text=col)
             self.protocolo_farmaco_tree.column(col, width=100)
+
+        # Atualizações aplicam só a diferença (interface/arvore.py)
+        self.protocolo_vinculo = ArvoreVinculada(self.root, self.protocolo_tree, valores=lambda p: (
+            p.id, p.nome, p.descricao or "", p.created_at.strftime('%d/%m/%Y')))
+        self.protocolo_farmaco_vinculo = ArvoreVinculada(
+            self.root, self.protocolo_farmaco_tree, chave=lambda linha: linha[1].id,
+            valores=lambda linha: (
+                linha[0],  # posição na lista; a ordem gravada é esparsa
+                linha[1].nome,
+                f"{linha[1].dose} {linha[1].unidade_dose}",
+                linha[1].texto_concentracao,
+                linha[1].modo_uso
+            ))
         
         # Layout
         self.protocolo_tree.pack(fill='x', pady=5)
@@ -349,9 +630,8 @@ class VetAnesthesiaApp:
         ttk.Button(btn_frame, text="Excluir Protocolo", command=self.deletar_protocolo).pack(side='left', padx=5)
         ttk.Button(btn_frame, text="Adicionar Fármaco", command=self.adicionar_farmaco_protocolo).pack(side='left', padx=5)
         ttk.Button(btn_frame, text="Remover Fármaco", command=self.remover_farmaco_protocolo).pack(side='left', padx=5)
-        
-        # Carregar protocolos
-        self.carregar_protocolos()
+        ttk.Button(btn_frame, text="▲ Subir", command=lambda: self.mover_farmaco_protocolo(-1)).pack(side='left', padx=5)
+        ttk.Button(btn_frame, text="▼ Descer", command=lambda: self.mover_farmaco_protocolo(1)).pack(side='left', padx=5)
         
         # Evento de seleção
         self.protocolo_tree.bind('<<TreeviewSelect>>', self.selecionar_protocolo)
@@ -376,9 +656,8 @@ class VetAnesthesiaApp:
         farmaco_combo.pack(pady=5)
 
         # Carrega os fármacos do banco
-        with Session(engine) as session:
-            farmacos = obter_todos_farmacos(session)
-            farmaco_combo["values"] = [f"{f.id} - {f.nome} ({f.modo_uso})" for f in farmacos]
+        farmacos = cache_referencia.listar(Farmaco)
+        farmaco_combo["values"] = [f"{f.id} - {f.nome} ({f.modo_uso})" for f in farmacos]
 
         def salvar_farmaco():
             farmaco_str = farmaco_var.get()
@@ -387,19 +666,19 @@ class VetAnesthesiaApp:
                 return
             
             farmaco_id = int(farmaco_str.split(' - ')[0])
-            
-            with Session(engine) as session:
-                # Determinar ordem (último + 1)
-                stmt = select(ProtocoloFarmaco).where(ProtocoloFarmaco.protocolo_id == protocolo_id)
-                itens = session.exec(stmt).all()
-                ordem = len(itens) + 1
-                
-                # Adicionar fármaco ao protocolo
-                adicionar_farmaco_a_protocolo(session, protocolo_id, farmaco_id, ordem)
+
+            def gravar():
+                with Session(engine) as session:
+                    # Entra no fim do protocolo
+                    adicionar_farmaco_a_protocolo(session, protocolo_id, farmaco_id)
+
+            def concluido(_):
                 messagebox.showinfo("Sucesso", "Fármaco adicionado ao protocolo!")
                 window.destroy()
                 self.selecionar_protocolo(None)  # Atualizar lista
 
+            self.tarefas.executar(gravar, ao_concluir=concluido, descricao="Adicionando fármaco ao protocolo")
+
         ttk.Button(window, text="Adicionar", command=salvar_farmaco).pack(pady=10)
 
     def criar_novo_protocolo(self):
@@ -424,11 +703,16 @@ class VetAnesthesiaApp:
                 messagebox.showerror("Erro", "O nome do protocolo é obrigatório!")
                 return
                 
-            with Session(engine) as session:
-                criar_protocolo(session, nome, desc)
+            def gravar():
+                with Session(engine) as session:
+                    criar_protocolo(session, nome, desc)
+
+            def concluido(_):
                 messagebox.showinfo("Sucesso", "Protocolo criado com sucesso!")
                 window.destroy()
                 self.carregar_protocolos()
+
+            self.tarefas.executar(gravar, ao_concluir=concluido, descricao="Criando protocolo")
         
         ttk.Button(window, text="Salvar", command=salvar).pack(pady=10)
 
@@ -452,10 +736,15 @@ class VetAnesthesiaApp:
         
         from controllers.protocolo_controller import deletar_protocolo  # Certifique-se que isso existe
 
-        with Session(engine) as session:
-            deletar_protocolo(session, protocolo_id)
+        def excluir():
+            with Session(engine) as session:
+                deletar_protocolo(session, protocolo_id)
+
+        def concluido(_):
             messagebox.showinfo("Sucesso", "Protocolo excluído com sucesso!")
             self.carregar_protocolos()
+
+        self.tarefas.executar(excluir, ao_concluir=concluido, descricao="Excluindo protocolo")
             
     def adicionar_farmaco_protocolo(self):
         """Janela para adicionar um fármaco ao protocolo selecionado"""
@@ -477,14 +766,9 @@ class VetAnesthesiaApp:
         farmaco_combo = ttk.Combobox(window, textvariable=farmaco_var, state="readonly", width=40)
         farmaco_combo.pack(pady=5)
 
-        # Carrega os fármacos do banco CORRETAMENTE
-        with Session(engine) as session:
-            # Busca todos os fármacos usando a declaração SQLModel correta
-            stmt = select(Farmaco)
-            farmacos = session.exec(stmt).all()
-            
-            # Preenche o combobox com os fármacos
-            farmaco_combo["values"] = [f"{f.id} - {f.nome} ({f.modo_uso})" for f in farmacos]
+        # Fármacos do cache de referência
+        farmacos = cache_referencia.listar(Farmaco)
+        farmaco_combo["values"] = [f"{f.id} - {f.nome} ({f.modo_uso})" for f in farmacos]
 
         def salvar_farmaco():
             farmaco_str = farmaco_var.get()
@@ -495,29 +779,48 @@ class VetAnesthesiaApp:
             # Extrai o ID do fármaco da string formatada
             farmaco_id = int(farmaco_str.split(' - ')[0])
             
-            with Session(engine) as session:
-                # Determinar a ordem (última posição + 1)
-                stmt = select(ProtocoloFarmaco).where(ProtocoloFarmaco.protocolo_id == protocolo_id)
-                itens = session.exec(stmt).all()
-                ordem = len(itens) + 1
-                
-                # Adicionar fármaco ao protocolo
-                pf = ProtocoloFarmaco(
-                    protocolo_id=protocolo_id,
-                    farmaco_id=farmaco_id,
-                    ordem=ordem
-                )
-                
-                session.add(pf)
-                session.commit()
+            def gravar():
+                with Session(engine) as session:
+                    # Entra no fim do protocolo
+                    adicionar_farmaco_a_protocolo(session, protocolo_id, farmaco_id)
+
+            def concluido(_):
                 messagebox.showinfo("Sucesso", "Fármaco adicionado ao protocolo!")
                 window.destroy()
-                
+
                 # Atualizar a lista de fármacos do protocolo
                 self.selecionar_protocolo(None)
 
+            self.tarefas.executar(gravar, ao_concluir=concluido, descricao="Adicionando fármaco ao protocolo")
+
         ttk.Button(window, text="Adicionar", command=salvar_farmaco).pack(pady=10)
             
+    def mover_farmaco_protocolo(self, direcao):
+        """Sobe (-1) ou desce (1) o fármaco selecionado; grava só a linha movida"""
+        selected_protocolo = self.protocolo_tree.selection()
+        selected_farmaco = self.protocolo_farmaco_tree.selection()
+        if not selected_protocolo or not selected_farmaco:
+            messagebox.showwarning("Aviso", "Selecione um protocolo e um fármaco dele.")
+            return
+
+        protocolo_id = self.protocolo_tree.item(selected_protocolo[0])["values"][0]
+        farmaco_id = int(selected_farmaco[0])
+
+        def gravar():
+            with Session(engine) as session:
+                anterior, seguinte = vizinhos_no_protocolo(session, protocolo_id, farmaco_id)
+                if direcao < 0 and anterior is not None:
+                    mover_farmaco_no_protocolo(session, protocolo_id, farmaco_id, antes_de=anterior)
+                elif direcao > 0 and seguinte is not None:
+                    depois_do_seguinte = vizinhos_no_protocolo(session, protocolo_id, seguinte)[1]
+                    mover_farmaco_no_protocolo(session, protocolo_id, farmaco_id, antes_de=depois_do_seguinte)
+
+        def concluido(_):
+            self._farmaco_protocolo_movido = str(farmaco_id)  # continua selecionado após recarregar
+            self.selecionar_protocolo(None)
+
+        self.tarefas.executar(gravar, ao_concluir=concluido, descricao="Reordenando protocolo")
+
     def remover_farmaco_protocolo(self):
         """Remove um fármaco do protocolo selecionado"""
         # Verifica se há um protocolo selecionado
@@ -539,30 +842,39 @@ class VetAnesthesiaApp:
         farmaco_combo = ttk.Combobox(window, textvariable=farmaco_var, state="readonly")
         farmaco_combo.pack(pady=10)
 
-        from controllers.protocolo_controller import obter_farmacos_do_protocolo
-        with Session(engine) as session:
-            farmacos_atuais = obter_farmacos_do_protocolo(session, protocolo_id)
-            self._farmacos_e
-            
+        from controllers.protocolo_controller import remover_farmaco_de_protocolo
+
+        def carregado(farmacos_atuais):
+            farmaco_combo["values"] = [f"{f.id} - {f.nome}" for f, _ in farmacos_atuais]
+
+        self.tarefas.executar(calculadora_dose.farmacos_do_protocolo, protocolo_id,
+                              ao_concluir=carregado, descricao="Carregando protocolo")
+
+        def remover():
+            farmaco_str = farmaco_var.get()
+            if not farmaco_str:
+                messagebox.showerror("Erro", "Selecione um fármaco!")
+                return
+            farmaco_id = int(farmaco_str.split(' - ')[0])
+
+            def gravar():
+                with Session(engine) as session:
+                    remover_farmaco_de_protocolo(session, protocolo_id, farmaco_id)
+
+            def concluido(_):
+                window.destroy()
+                self.selecionar_protocolo(None)
+
+            self.tarefas.executar(gravar, ao_concluir=concluido, descricao="Removendo fármaco do protocolo")
+
+        ttk.Button(window, text="Remover", command=remover).pack(pady=10)
+
 
     def carregar_protocolos(self):
         """Carrega todos os protocolos na treeview"""
-        with Session(engine) as session:
-            # Usando a declaração correta para buscar protocolos
-            protocolos = session.exec(select(Protocolo)).all()
-            
-            # Limpar treeview
-            for item in self.protocolo_tree.get_children():
-                self.protocolo_tree.delete(item)
-                
-            # Adicionar protocolos
-            for p in protocolos:
-                self.protocolo_tree.insert('', 'end', values=(
-                    p.id,
-                    p.nome,
-                    p.descricao or "",
-                    p.created_at.strftime('%d/%m/%Y')
-                ))
+        if not self.abas.criada('protocolos'):
+            return
+        self.protocolo_vinculo.atualizar(cache_referencia.listar(Protocolo))
 
     def selecionar_protocolo(self, event):
         """Carrega os fármacos do protocolo selecionado"""
@@ -572,34 +884,96 @@ class VetAnesthesiaApp:
             
         protocolo_id = self.protocolo_tree.item(selected[0])['values'][0]
         
-        with Session(engine) as session:
-            # Busca os fármacos do protocolo usando a declaração correta
-            stmt = (
-                select(Farmaco, ProtocoloFarmaco.ordem)
-                .join(ProtocoloFarmaco, Farmaco.id == ProtocoloFarmaco.farmaco_id)
-                .where(ProtocoloFarmaco.protocolo_id == protocolo_id)
-                .order_by(ProtocoloFarmaco.ordem)
-            )
-            
-            resultados = session.exec(stmt).all()
-            
-            # Limpar treeview de fármacos
-            for item in self.protocolo_farmaco_tree.get_children():
-                self.protocolo_farmaco_tree.delete(item)
-                
-            # Adicionar fármacos
-            for farmaco, ordem in resultados:
-                self.protocolo_farmaco_tree.insert('', 'end', values=(
-                    ordem,
-                    farmaco.nome,
-                    f"{farmaco.dose} {farmaco.unidade_dose}",
-                    f"{farmaco.concentracao} mg/ml",
-                    farmaco.modo_uso
+        def preencher(resultados):
+            self.protocolo_farmaco_vinculo.atualizar(
+                (posicao, farmaco) for posicao, (farmaco, _ordem) in enumerate(resultados, start=1))
+            movido = getattr(self, '_farmaco_protocolo_movido', None)
+            if movido and self.protocolo_farmaco_tree.exists(movido):
+                self.protocolo_farmaco_tree.selection_set(movido)
+            self._farmaco_protocolo_movido = None
+
+        # Composição do protocolo em cache (só consulta o banco após alterações)
+        self.tarefas.executar(calculadora_dose.farmacos_do_protocolo, protocolo_id,
+                              ao_concluir=preencher, descricao="Carregando protocolo")
+    def create_consumo_tab(self, frame):
+        """Aba de relatório de consumo mensal (lê só os totais de ConsumoDiario)"""
+
+        filtro_frame = ttk.Frame(frame, padding=10)
+        filtro_frame.pack(fill='x')
+
+        hoje = datetime.now()
+        ttk.Label(filtro_frame, text="Mês:").pack(side='left')
+        self.consumo_mes = ttk.Spinbox(filtro_frame, from_=1, to=12, width=4)
+        self.consumo_mes.set(hoje.month)
+        self.consumo_mes.pack(side='left', padx=5)
+        ttk.Label(filtro_frame, text="Ano:").pack(side='left')
+        self.consumo_ano = ttk.Spinbox(filtro_frame, from_=2000, to=2100, width=6)
+        self.consumo_ano.set(hoje.year)
+        self.consumo_ano.pack(side='left', padx=5)
+        self.consumo_por_especie = tk.BooleanVar(value=True)
+        ttk.Checkbutton(filtro_frame, text="Separar por espécie",
+                        variable=self.consumo_por_especie).pack(side='left', padx=5)
+        ttk.Button(filtro_frame, text="Gerar Relatório", command=self.load_consumo_report).pack(side='left', padx=5)
+        ttk.Button(filtro_frame, text="Reconstruir Totais", command=self.rebuild_consumo).pack(side='left', padx=5)
+
+        main_frame = ttk.Frame(frame)
+        main_frame.pack(fill='both', expand=True, padx=10, pady=10)
+
+        columns = ("Fármaco", "Espécie", "Sessões", "Total (ml)", "Total (mg)")
+        self.consumo_tree = ttk.Treeview(main_frame, columns=columns, show='headings', height=15)
+        for col in columns:
+            self.consumo_tree.heading(col, text=col)
+            self.consumo_tree.column(col, width=150 if col == "Fármaco" else 100,
+                                     anchor='w' if col == "Fármaco" else 'center')
+
+        scrollbar = ttk.Scrollbar(main_frame, orient='vertical', command=self.consumo_tree.yview)
+        self.consumo_tree.configure(yscrollcommand=scrollbar.set)
+        self.consumo_tree.pack(side='left', fill='both', expand=True)
+        scrollbar.pack(side='right', fill='y')
+
+    def load_consumo_report(self):
+        """Consumo do mês selecionado por fármaco (e espécie)"""
+        try:
+            ano, mes = int(self.consumo_ano.get()), int(self.consumo_mes.get())
+            if not 1 <= mes <= 12:
+                raise ValueError("mês deve estar entre 1 e 12")
+        except ValueError as e:
+            messagebox.showerror("Erro", f"Período inválido: {str(e)}")
+            return
+        por_especie = self.consumo_por_especie.get()
+
+        def consultar():
+            with Session(obter_engine_leitura()) as session:
+                return consumo_mensal(session, ano, mes, por_especie)
+
+        def mostrar(linhas):
+            for item in self.consumo_tree.get_children():
+                self.consumo_tree.delete(item)
+            for linha in linhas:
+                self.consumo_tree.insert('', 'end', values=(
+                    linha.farmaco,
+                    linha.especie or "Todas",
+                    linha.sessoes,
+                    f"{linha.total_ml:.2f}",
+                    f"{linha.total_mg:.2f}" if linha.total_mg is not None else "-"
                 ))
-    def create_animal_tab(self):
+
+        self.tarefas.executar(consultar, ao_concluir=mostrar, descricao="Calculando consumo do mês")
+
+    def rebuild_consumo(self):
+        """Refaz os totais a partir de todas as sessões (após edições fora do programa)"""
+        if not messagebox.askyesno("Confirmar", "Recalcular os totais de consumo a partir de todo o histórico?"):
+            return
+
+        def concluido(linhas):
+            messagebox.showinfo("Consumo", f"Totais reconstruídos ({linhas} linhas).")
+            self.load_consumo_report()
+
+        self.tarefas.executar(reconstruir_consumo, ao_concluir=concluido,
+                              descricao="Reconstruindo totais de consumo")
+
+    def create_animal_tab(self, frame):
         """Cria a aba de cadastro de animais"""
-        frame = ttk.Frame(self.notebook)
-        self.notebook.add(frame, text="🐾 Animais")
         
         # Formulário de cadastro
         form_frame = ttk.LabelFrame(frame, text="Cadastrar Novo Animal", padding=10)
@@ -641,12 +1015,9 @@ class VetAnesthesiaApp:
             self.animal_tree.column(col, width=100, anchor='center')
         
         self.animal_tree.pack(expand=True, fill='both')
-        self.load_animals_list()
 
-    def create_farmaco_tab(self):
+    def create_farmaco_tab(self, frame):
         """Cria a aba de gerenciamento de fármacos com todas as funcionalidades"""
-        frame = ttk.Frame(self.notebook)
-        self.notebook.add(frame, text="💊 Fármacos")
         
         # Frame principal com scrollbar
         main_frame = ttk.Frame(frame)
@@ -660,7 +1031,7 @@ class VetAnesthesiaApp:
         self.farmaco_tree.heading("ID", text="ID")
         self.farmaco_tree.heading("Nome", text="Nome")
         self.farmaco_tree.heading("Dose", text="Dose")
-        self.farmaco_tree.heading("Concentração", text="Conc. (mg/ml)")
+        self.farmaco_tree.heading("Concentração", text="Concentração")
         self.farmaco_tree.heading("Unidade", text="Unidade")
         self.farmaco_tree.heading("Modo Uso", text="Modo de Uso")
         self.farmaco_tree.heading("Volume Seringa", text="Vol. Seringa (ml)")
@@ -675,6 +1046,16 @@ class VetAnesthesiaApp:
         self.farmaco_tree.column("Modo Uso", width=100, anchor='center')
         self.farmaco_tree.column("Volume Seringa", width=100, anchor='center')
         self.farmaco_tree.column("Comentário", width=200)
+        self.farmaco_vinculo = ArvoreVinculada(self.root, self.farmaco_tree, valores=lambda f: (
+            f.id,
+            f.nome,
+            f.dose,
+            f.texto_concentracao,
+            f.unidade_dose,
+            f.modo_uso,
+            f.volume_seringa if f.volume_seringa else "N/A",
+            f.comentario if f.comentario else "Nenhum"
+        ))
         
         # Scrollbar
         scrollbar = ttk.Scrollbar(main_frame, orient='vertical', command=self.farmaco_tree.yview)
@@ -693,9 +1074,8 @@ class VetAnesthesiaApp:
         ttk.Button(btn_frame, text="Importar CSV", command=self.import_farmacos_csv).pack(side='left', padx=5)
         ttk.Button(btn_frame, text="Exportar CSV", command=self.export_farmacos_csv).pack(side='left', padx=5)
         ttk.Button(btn_frame, text="Excluir Selecionado", command=self.delete_farmaco).pack(side='left', padx=5)
+        ttk.Button(btn_frame, text="Confirmar Unidade", command=self.confirm_concentration_unit).pack(side='left', padx=5)
         
-        # Carregar dados inicialmente
-        self.load_farmacos_tree()
 
     def register_farmaco(self):
         """Janela para cadastrar novo fármaco"""
@@ -707,6 +1087,7 @@ class VetAnesthesiaApp:
         nome = tk.StringVar()
         dose = tk.DoubleVar()
         concentracao = tk.DoubleVar()
+        unidade_conc = tk.StringVar(value=UNIDADES_CONCENTRACAO[0])
         unidade = tk.StringVar()
         modo = tk.StringVar()
         volume = tk.DoubleVar()
@@ -719,8 +1100,10 @@ class VetAnesthesiaApp:
         ttk.Label(cadastro_window, text="Dose:").pack()
         ttk.Entry(cadastro_window, textvariable=dose).pack()
         
-        ttk.Label(cadastro_window, text="Concentração (mg/ml):").pack()
+        ttk.Label(cadastro_window, text="Concentração:").pack()
         ttk.Entry(cadastro_window, textvariable=concentracao).pack()
+        ttk.Combobox(cadastro_window, textvariable=unidade_conc, values=UNIDADES_CONCENTRACAO,
+                     state='readonly', width=8).pack()
         
         ttk.Label(cadastro_window, text="Unidade de dose:").pack()
         ttk.Combobox(cadastro_window, textvariable=unidade, values=["mg/kg", "µg/kg", "mg/kg/min", "µg/kg/min"]).pack()
@@ -741,21 +1124,22 @@ class VetAnesthesiaApp:
                     nome=nome.get(),
                     dose=dose.get(),
                     concentracao=concentracao.get(),
+                    unidade_concentracao=unidade_conc.get(),
                     unidade_dose=unidade.get(),
                     modo_uso=modo.get(),
                     volume_seringa=volume.get() if volume.get() != 0 else None,
                     comentario=comentario.get() or None
                 )
-                
-                with Session(engine) as session:
-                    session.add(farmaco)
-                    session.commit()
-                    messagebox.showinfo("Sucesso", "Fármaco cadastrado com sucesso!")
-                    cadastro_window.destroy()
-                    self.load_farmacos_tree()  # Atualiza a lista
-                
             except Exception as e:
                 messagebox.showerror("Erro", f"Falha ao cadastrar: {str(e)}")
+                return
+
+            def concluido():
+                messagebox.showinfo("Sucesso", "Fármaco cadastrado com sucesso!")
+                cadastro_window.destroy()
+                self.load_farmacos_tree()  # Atualiza a lista
+
+            self.save_record(farmaco, "Cadastrando fármaco", concluido, "Falha ao cadastrar")
         
         ttk.Button(cadastro_window, text="Salvar", command=salvar_farmaco).pack(pady=10)
 
@@ -769,41 +1153,38 @@ class VetAnesthesiaApp:
         if not filepath:
             return
             
-        try:
-            with open(filepath, newline='', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                farmacos = []
-                
-                for row in reader:
-                    try:
-                        farmaco = Farmaco(
-                            nome=row['nome'].strip(),
-                            dose=float(row['dose'].replace(',', '.')),
-                            concentracao=float(row['concentracao'].replace(',', '.')),
-                            unidade_dose=row['unidade_dose'].strip(),
-                            modo_uso=row['modo_uso'].strip().lower(),
-                            volume_seringa=float(row['volume_seringa'].replace(',', '.')) if row.get('volume_seringa') else None,
-                            comentario=row.get('comentario', '').strip() or None
-                        )
-                        farmacos.append(farmaco)
-                    except Exception as e:
-                        print(f"Erro na linha: {row}. Erro: {str(e)}")
-                        continue
-                
-                if not farmacos:
-                    messagebox.showwarning("Aviso", "Nenhum fármaco válido encontrado no arquivo.")
-                    return
-                
-                if messagebox.askyesno("Confirmar", f"Importar {len(farmacos)} fármacos?"):
-                    with Session(engine) as session:
-                        session.add_all(farmacos)
-                        session.commit()
-                        messagebox.showinfo("Sucesso", f"{len(farmacos)} fármacos importados!")
-                        self.load_farmacos_tree()
-                        
-        except Exception as e:
+        self.run_catalog_import(filepath, self.load_farmacos_tree)
+
+    def run_catalog_import(self, filepath, atualizar_telas):
+        """Valida e importa o CSV em segundo plano (a confirmação fica na thread do Tk)"""
+        def erro(e):
             messagebox.showerror("Erro", f"Falha ao importar: {str(e)}")
 
+        def progresso(resultado):
+            self.tarefas.na_interface(
+                self.status_label.config, {'text': f"Importando fármacos... {resultado.resumo()}"})
+
+        def importado(resultado):
+            titulo = "Cancelado" if resultado.cancelado else "Sucesso"
+            messagebox.showinfo(titulo, f"Importação {'interrompida' if resultado.cancelado else 'concluída'}:"
+                                        f"\n{resultado.resumo()}")
+            atualizar_telas()
+
+        def validado(previa):
+            if not previa.validos:
+                messagebox.showwarning("Aviso", "Nenhum fármaco válido encontrado no arquivo.")
+                return
+
+            aviso = f"\n({previa.invalidos} linhas inválidas serão ignoradas)" if previa.invalidos else ""
+            if messagebox.askyesno("Confirmar", f"Importar {previa.validos} fármacos?{aviso}\n"
+                                   "Fármacos já cadastrados (mesmo nome, unidade e modo) serão atualizados."):
+                self.tarefas.executar(importar_catalogo_csv, filepath, ao_progresso=progresso,
+                                      ao_concluir=importado, ao_erro=erro,
+                                      descricao="Importando fármacos", cancelavel=True)
+
+        self.tarefas.executar(importar_catalogo_csv, filepath, simular=True, ao_concluir=validado,
+                              ao_erro=erro, descricao="Validando CSV", cancelavel=True)
+
     def export_farmacos_csv(self):
         """Exporta fármacos para arquivo CSV"""
         filepath = filedialog.asksaveasfilename(
@@ -814,84 +1195,56 @@ class VetAnesthesiaApp:
         if not filepath:
             return
             
-        try:
-            with Session(engine) as session:
-                farmacos = session.exec(select(Farmaco)).all()
-                
-                if not farmacos:
-                    messagebox.showwarning("Aviso", "Nenhum fármaco cadastrado para exportar.")
-                    return
-                
-                with open(filepath, mode='w', newline='', encoding='utf-8') as csvfile:
-                    writer = csv.DictWriter(csvfile, fieldnames=[
-                        'nome', 'dose', 'concentracao', 'unidade_dose', 
-                        'modo_uso', 'volume_seringa', 'comentario'
-                    ])
-                    writer.writeheader()
-                    
-                    for f in farmacos:
-                        writer.writerow({
-                            'nome': f.nome,
-                            'dose': f.dose,
-                            'concentracao': f.concentracao,
-                            'unidade_dose': f.unidade_dose,
-                            'modo_uso': f.modo_uso,
-                            'volume_seringa': f.volume_seringa or '',
-                            'comentario': f.comentario or ''
-                        })
-                
-                messagebox.showinfo("Sucesso", f"{len(farmacos)} fármacos exportados para:\n{filepath}")
-                
-        except Exception as e:
-            messagebox.showerror("Erro", f"Falha ao exportar: {str(e)}")
+        self.run_farmacos_export(filepath)
+
+    def run_farmacos_export(self, filepath):
+        """Grava o catálogo em CSV numa thread do executor"""
+        def exportar():
+            farmacos = cache_referencia.listar(Farmaco)
+            if not farmacos:
+                return 0
+            with open(filepath, mode='w', newline='', encoding='utf-8') as csvfile:
+                writer = csv.DictWriter(csvfile, fieldnames=[
+                    'nome', 'dose', 'concentracao', 'unidade_dose',
+                    'unidade_concentracao', 'modo_uso', 'volume_seringa', 'comentario'
+                ])
+                writer.writeheader()
+
+                for f in farmacos:
+                    writer.writerow({
+                        'nome': f.nome,
+                        'dose': f.dose,
+                        'concentracao': f.concentracao,
+                        'unidade_dose': f.unidade_dose,
+                        'unidade_concentracao': f.unidade_concentracao,
+                        'modo_uso': f.modo_uso,
+                        'volume_seringa': f.volume_seringa or '',
+                        'comentario': f.comentario or ''
+                    })
+            return len(farmacos)
+
+        def concluido(total):
+            if not total:
+                messagebox.showwarning("Aviso", "Nenhum fármaco cadastrado para exportar.")
+                return
+            messagebox.showinfo("Sucesso", f"{total} fármacos exportados para:\n{filepath}")
+
+        self.tarefas.executar(
+            exportar, ao_concluir=concluido, descricao="Exportando fármacos",
+            ao_erro=lambda e: messagebox.showerror("Erro", f"Falha ao exportar: {str(e)}"))
+
     def load_farmacos_tree(self):
-        """Carrega os fármacos no Treeview"""
-        with Session(engine) as session:
-            farmacos = session.exec(select(Farmaco).order_by(Farmaco.nome)).all()
-            
-            # Limpar treeview
-            for item in self.farmaco_tree.get_children():
-                self.farmaco_tree.delete(item)
-                
-            # Adicionar novos itens
-            for f in farmacos:
-                self.farmaco_tree.insert('', 'end', values=(
-                    f.id,
-                    f.nome,
-                    f.dose,
-                    f.concentracao,
-                    f.unidade_dose,
-                    f.modo_uso,
-                    f.volume_seringa if f.volume_seringa else "N/A",
-                    f.comentario if f.comentario else "Nenhum"
-                ))
+        """Carrega os fármacos no Treeview (só as linhas que mudaram são tocadas)"""
+        if not self.abas.criada('farmacos'):
+            return
+        self.farmaco_vinculo.atualizar(cache_referencia.listar(Farmaco))
 
     def load_farmacos_list(self):
         """Carrega a lista completa de fármacos no TreeView"""
-        with Session(engine) as session:
-            farmacos = session.exec(select(Farmaco).order_by(Farmaco.nome)).all()
-            
-            # Limpar treeview
-            for item in self.farmaco_tree.get_children():
-                self.farmaco_tree.delete(item)
-                
-            # Adicionar novos itens
-            for farmaco in farmacos:
-                self.farmaco_tree.insert('', 'end', values=(
-                    farmaco.id,
-                    farmaco.nome,
-                    farmaco.dose,
-                    farmaco.concentracao,
-                    farmaco.unidade_dose,
-                    farmaco.modo_uso,
-                    farmaco.volume_seringa if farmaco.volume_seringa else "N/A",
-                    farmaco.comentario if farmaco.comentario else "Nenhum"
-            ))
+        self.load_farmacos_tree()
 
-    def create_session_tab(self):
+    def create_session_tab(self, frame):
         """Cria a aba de registro de sessões anestésicas"""
-        frame = ttk.Frame(self.notebook)
-        self.notebook.add(frame, text="📋 Sessões")
         
         # Formulário de nova sessão
         form_frame = ttk.LabelFrame(frame, text="Nova Sessão Anestésica", padding=10)
@@ -932,9 +1285,10 @@ class VetAnesthesiaApp:
 
         # Seleção de fármaco
         ttk.Label(form_frame, text="Fármaco:").grid(row=2, column=0, sticky='e', padx=5, pady=2)
-        self.farmaco_combobox = ttk.Combobox(form_frame, state='readonly', width=40)
+        self.farmaco_combobox = ttk.Combobox(form_frame, width=40)
         self.farmaco_combobox.grid(row=2, column=1, sticky='w', padx=5, pady=2)
         self.farmaco_combobox.bind('<<ComboboxSelected>>', self.update_farmaco_info)
+        self.bind_farmaco_search(self.farmaco_combobox, self.format_farmaco_option)
         
          # Adicionar evento para atualizar peso quando animal for selecionado
         self.animal_combobox.bind('<<ComboboxSelected>>', self.atualizar_peso_animal)
@@ -965,6 +1319,10 @@ class VetAnesthesiaApp:
         
         ttk.Button(btn_frame, text="Calcular Dose", command=self.calculate_dose).pack(side='left', padx=5)
         ttk.Button(btn_frame, text="Registrar Sessão", command=self.register_session).pack(side='left', padx=5)
+        ttk.Checkbutton(btn_frame, text="Modo plantão (gravação em lote)",
+                        variable=self.modo_plantao).pack(side='left', padx=5)
+        self.plantao_label = ttk.Label(btn_frame, text="")
+        self.plantao_label.pack(side='left', padx=5)
         
         # Adicione este botão
         ttk.Button(btn_frame, text="Registrar Sessão Protocolo", command=self.generate_protocol_prescription).pack(side='left', padx=5)
@@ -978,6 +1336,8 @@ class VetAnesthesiaApp:
         presc_btn_frame.pack(side='left', padx=5)
         ttk.Button(presc_btn_frame, text="Gerar Prescrição", command=self.generate_prescription).pack(side='left')
         ttk.Button(presc_btn_frame, text="Gerar Prescrição Protocolo", command=self.generate_protocol_prescription).pack(side='left', padx=(5,0))
+        ttk.Button(presc_btn_frame, text="Exportar Histórico", command=self.export_sessions_history).pack(side='left', padx=(5,0))
+        ttk.Button(presc_btn_frame, text="Arquivar Antigas", command=self.archive_old_sessions).pack(side='left', padx=(5,0))
         # Lista de sessões
         list_frame = ttk.LabelFrame(frame, text="Sessões Registradas", padding=10)
         list_frame.pack(expand=True, fill='both', pady=5)
@@ -988,19 +1348,32 @@ class VetAnesthesiaApp:
         for col in columns:
             self.session_tree.heading(col, text=col)
             self.session_tree.column(col, width=120, anchor='center')
+        self.session_vinculo = ArvoreVinculada(
+            self.root, self.session_tree,
+            chave=lambda linha: f"{'n' if linha[0] == ORIGEM_NORMAL else 'a'}{linha[1]}",
+            valores=lambda linha: (
+                linha[1],
+                linha[2] or "N/A",
+                linha[3] or "N/A",
+                f"{linha[4]:.2f} ml",
+                linha[5].strftime('%d/%m/%Y %H:%M') if linha[5] else "N/A"
+            ))
         
+        # Barra de rolagem: ao chegar perto do fim carrega a próxima página
+        session_scroll = ttk.Scrollbar(list_frame, orient='vertical', command=self.session_tree.yview)
+        self.session_tree.configure(yscrollcommand=lambda primeiro, ultimo: self.on_sessions_scroll(
+            session_scroll, primeiro, ultimo))
+        session_scroll.pack(side='right', fill='y')
         self.session_tree.pack(expand=True, fill='both')
-        self.load_sessions_list()
         
     def atualizar_peso_animal(self, event=None):
         animal_str = self.animal_combobox.get()
         if animal_str:
             try:
                 animal_id = int(animal_str.split(' - ')[0])
-                with Session(engine) as session:
-                    animal = session.get(Animal, animal_id)
-                    if animal:
-                        self.session_peso.config(text=f"{animal.peso_kg} kg")
+                animal = cache_referencia.obter(Animal, animal_id)
+                if animal:
+                    self.session_peso.config(text=f"{animal.peso_kg} kg")
             except:
                 pass    
         
@@ -1012,43 +1385,42 @@ class VetAnesthesiaApp:
             
         protocolo_id = int(protocolo_nome.split(' - ')[0])
         
-        with Session(engine) as session:
-            protocolo = session.get(Protocolo, protocolo_id)
-            if not protocolo:
-                return
-                
-            farmacos = obter_farmacos_do_protocolo(session, protocolo_id)
-            
+        protocolo = cache_referencia.obter(Protocolo, protocolo_id)
+        if not protocolo:
+            return
+
+        def preencher(farmacos):
             # Limpar treeview
             for item in self.protocolo_farmacos_tree.get_children():
                 self.protocolo_farmacos_tree.delete(item)
-                
+
             # Calcular doses para cada fármaco
             animal_str = self.animal_combobox.get()
             if not animal_str:
                 messagebox.showinfo("Info", "Selecione um animal primeiro")
                 return
-                
+
             animal_id = int(animal_str.split(' - ')[0])
-            animal = session.get(Animal, animal_id)
-            
-        for farmaco, ordem in farmacos:
-        # Cálculo da dose
-            if farmaco.modo_uso == "bolus":
-                dose_ml = (animal.peso_kg * farmaco.dose) / farmaco.concentracao
-                dose_text = f"{dose_ml:.2f} ml"
-            else:  # infusão contínua
-                multiplicador = 60 if "min" in farmaco.unidade_dose else 1
-                taxa_ml_h = (animal.peso_kg * farmaco.dose * multiplicador) / farmaco.concentracao
-                dose_ml = taxa_ml_h  # Para cálculo de volume se necessário
-                dose_text = f"Taxa: {taxa_ml_h:.2f} ml/h"
-            
-            self.protocolo_farmacos_tree.insert('', 'end', values=(
-                farmaco.nome,
-                f"{farmaco.dose} {farmaco.unidade_dose}",
-                farmaco.modo_uso,
-                dose_text
-            ))  
+            animal = cache_referencia.obter(Animal, animal_id)
+
+            for farmaco, ordem in farmacos:
+                # Cálculo da dose (bolus em ml, infusão contínua em ml/h)
+                dose_ml = calculadora_dose.calcular(farmaco.id, animal.peso_kg)
+                if farmaco.modo_uso == "bolus":
+                    dose_text = f"{dose_ml:.2f} ml"
+                else:
+                    dose_text = f"Taxa: {dose_ml:.2f} ml/h"
+
+                self.protocolo_farmacos_tree.insert('', 'end', values=(
+                    farmaco.nome,
+                    f"{farmaco.dose} {farmaco.unidade_dose}",
+                    farmaco.modo_uso,
+                    dose_text
+                ))
+
+        # Composição do protocolo em cache; a primeira leitura roda no executor
+        self.tarefas.executar(calculadora_dose.farmacos_do_protocolo, protocolo_id,
+                              ao_concluir=preencher, descricao="Carregando protocolo")
 
     def generate_protocol_prescription(self):
         """Gera prescrição para o protocolo selecionado"""
@@ -1066,47 +1438,51 @@ class VetAnesthesiaApp:
                 messagebox.showerror("Erro", "Selecione um protocolo!")
                 return
             protocolo_id = int(protocolo_str.split(' - ')[0])
-            
-            with Session(engine) as session:
-                animal = session.get(Animal, animal_id)
-                protocolo = session.get(Protocolo, protocolo_id)
-                farmacos = obter_farmacos_do_protocolo(session, protocolo_id)
-                
-                if not animal or not protocolo or not farmacos:
-                    messagebox.showerror("Erro", "Dados incompletos para gerar prescrição!")
-                    return
-                
-                # Gerar conteúdo da prescrição
-                conteudo = f"PRESCRIÇÃO ANESTÉSICA - Protocolo: {protocolo.nome}\n"
-                conteudo += "="*50 + "\n"
-                conteudo += f"Animal: {animal.nome} ({animal.especie})\n"
-                conteudo += f"Peso: {animal.peso_kg} kg\n"
-                conteudo += f"Data: {datetime.now().strftime('%d/%m/%Y %H:%M')}\n\n"
-                conteudo += "MEDICAÇÕES:\n"
-                
-                for farmaco, ordem in farmacos:
-                    if farmaco.modo_uso == "bolus":
-                        dose_ml = (animal.peso_kg * farmaco.dose) / farmaco.concentracao
-                    else:
-                        multiplicador = 60 if "min" in farmaco.unidade_dose else 1
-                        dose_ml = (animal.peso_kg * farmaco.dose * multiplicador) / farmaco.concentracao
-                    
-                    conteudo += f"\n- {farmaco.nome}:\n"
-                    conteudo += f"  Dose: {farmaco.dose} {farmaco.unidade_dose}\n"
-                    conteudo += f"  Volume a administrar: {dose_ml:.2f} ml\n"
-                    conteudo += f"  Modo de uso: {farmaco.modo_uso}\n"
-                
-                # Salvar arquivo
-                os.makedirs("prescricoes", exist_ok=True)
-                nome_arquivo = f"prescricoes/protocolo_{protocolo_id}_{animal_id}.txt"
-                
-                with open(nome_arquivo, "w", encoding="utf-8") as f:
-                    f.write(conteudo)
-                
-                messagebox.showinfo("Sucesso", f"Prescrição gerada em:\n{nome_arquivo}")
-                
         except Exception as e:
             messagebox.showerror("Erro", f"Falha ao gerar prescrição: {str(e)}")
+            return
+
+        def gerar():
+            animal = cache_referencia.obter(Animal, animal_id)
+            protocolo = cache_referencia.obter(Protocolo, protocolo_id)
+            farmacos = calculadora_dose.farmacos_do_protocolo(protocolo_id)
+
+            if not animal or not protocolo or not farmacos:
+                return None
+
+            # Gerar conteúdo da prescrição
+            conteudo = f"PRESCRIÇÃO ANESTÉSICA - Protocolo: {protocolo.nome}\n"
+            conteudo += "="*50 + "\n"
+            conteudo += f"Animal: {animal.nome} ({animal.especie})\n"
+            conteudo += f"Peso: {animal.peso_kg} kg\n"
+            conteudo += f"Data: {datetime.now().strftime('%d/%m/%Y %H:%M')}\n\n"
+            conteudo += "MEDICAÇÕES:\n"
+
+            for farmaco, ordem in farmacos:
+                dose_ml = calculadora_dose.calcular(farmaco.id, animal.peso_kg)
+
+                conteudo += f"\n- {farmaco.nome}:\n"
+                conteudo += f"  Dose: {farmaco.dose} {farmaco.unidade_dose}\n"
+                conteudo += f"  Volume a administrar: {dose_ml:.2f} ml\n"
+                conteudo += f"  Modo de uso: {farmaco.modo_uso}\n"
+
+            # Salvar arquivo
+            os.makedirs("prescricoes", exist_ok=True)
+            nome_arquivo = f"prescricoes/protocolo_{protocolo_id}_{animal_id}.txt"
+
+            with open(nome_arquivo, "w", encoding="utf-8") as f:
+                f.write(conteudo)
+            return nome_arquivo
+
+        def concluido(nome_arquivo):
+            if nome_arquivo is None:
+                messagebox.showerror("Erro", "Dados incompletos para gerar prescrição!")
+                return
+            messagebox.showinfo("Sucesso", f"Prescrição gerada em:\n{nome_arquivo}")
+
+        self.tarefas.executar(
+            gerar, ao_concluir=concluido, descricao="Gerando prescrição",
+            ao_erro=lambda e: messagebox.showerror("Erro", f"Falha ao gerar prescrição: {str(e)}"))
 
     def toggle_infusion_fields(self, event):
         modo = self.infusion_modo.get()
@@ -1118,43 +1494,47 @@ class VetAnesthesiaApp:
             self.infusion_volume.grid_remove()
             
 
-    def create_infusion_tab(self):
+    def create_infusion_tab(self, frame):
         """Cria a aba de configuração de infusão contínua"""
-        frame = ttk.Frame(self.notebook)
-        self.notebook.add(frame, text="💉 Infusão")
         
         form_frame = ttk.LabelFrame(frame, text="Configuração de Infusão Contínua", padding=10)
         form_frame.pack(fill='x', pady=5)
         
         # Linha 0: Peso do paciente
         ttk.Label(form_frame, text="Peso (kg):").grid(row=0, column=0, sticky='e', padx=5, pady=2)
-        self.infusion_peso = ttk.Entry(form_frame, width=10)
+        # Cada campo alimenta o grafo de cálculo (recalculo ao vivo, ver on_infusion_input)
+        self._vars_infusao = {nome: tk.StringVar() for nome in
+                              ("texto_peso", "texto_volume", "texto_taxa", "texto_equipo", "texto_dose")}
+        self.infusion_peso = ttk.Entry(form_frame, width=10, textvariable=self._vars_infusao["texto_peso"])
         self.infusion_peso.grid(row=0, column=1, sticky='w', padx=5, pady=2)
         self.infusion_peso.bind("<FocusOut>", self.validate_peso_field)
 
         # Linha 1: Volume da bolsa
         ttk.Label(form_frame, text="Volume da bolsa (ml):").grid(row=1, column=0, sticky='e', padx=5, pady=2)
-        self.infusion_volume = ttk.Combobox(form_frame, values=[10, 20, 50, 100, 250, 500, 1000], width=10)
+        self.infusion_volume = ttk.Combobox(form_frame, values=[10, 20, 50, 100, 250, 500, 1000], width=10,
+                                            textvariable=self._vars_infusao["texto_volume"])
         self.infusion_volume.grid(row=1, column=1, sticky='w', padx=5, pady=2)
         self.infusion_volume.current(1)  # 20 ml como padrão
 
         # Linha 2: Taxa de infusão
         ttk.Label(form_frame, text="Taxa de infusão (ml/kg/h):").grid(row=2, column=0, sticky='e', padx=5, pady=2)
-        self.infusion_taxa = ttk.Entry(form_frame, width=10)
+        self.infusion_taxa = ttk.Entry(form_frame, width=10, textvariable=self._vars_infusao["texto_taxa"])
         self.infusion_taxa.grid(row=2, column=1, sticky='w', padx=5, pady=2)
         self.infusion_taxa.insert(0, "10")  # Valor padrão
 
         # Linha 3: Tipo de equipo
         ttk.Label(form_frame, text="Tipo de equipo:").grid(row=3, column=0, sticky='e', padx=5, pady=2)
-        self.infusion_equipo = ttk.Combobox(form_frame, values=["Macrogotas (20 gts/ml)", "Microgotas (60 gts/ml)"], width=20)
+        self.infusion_equipo = ttk.Combobox(form_frame, values=["Macrogotas (20 gts/ml)", "Microgotas (60 gts/ml)"], width=20,
+                                            textvariable=self._vars_infusao["texto_equipo"])
         self.infusion_equipo.grid(row=3, column=1, sticky='w', padx=5, pady=2)
         self.infusion_equipo.current(0)
 
         # Linha 4: Seleção de fármaco
         ttk.Label(form_frame, text="Fármaco:").grid(row=4, column=0, sticky='e', padx=5, pady=2)
-        self.farmaco_combobox_infusao = ttk.Combobox(form_frame, state='readonly', width=40)
+        self.farmaco_combobox_infusao = ttk.Combobox(form_frame, width=40)
         self.farmaco_combobox_infusao.grid(row=4, column=1, sticky='w', padx=5, pady=2)
         self.farmaco_combobox_infusao.bind('<<ComboboxSelected>>', self.on_farmaco_selected_infusao)
+        self.bind_farmaco_search(self.farmaco_combobox_infusao, lambda f: f"{f.id} - {f.nome}")
 
         # Linha 5: Dose padrão
         ttk.Label(form_frame, text="Dose padrão:").grid(row=5, column=0, sticky='e', padx=5, pady=2)
@@ -1163,9 +1543,11 @@ class VetAnesthesiaApp:
 
         # Linha 6: Dose a usar
         ttk.Label(form_frame, text="Dose a usar:").grid(row=6, column=0, sticky='e', padx=5, pady=2)
-        self.dose_combobox = ttk.Combobox(form_frame, state='readonly', width=10)
+        self.dose_combobox = ttk.Combobox(form_frame, state='readonly', width=10,
+                                          textvariable=self._vars_infusao["texto_dose"])
         self.dose_combobox.grid(row=6, column=1, sticky='w', padx=5, pady=2)
         self.dose_combobox.grid_remove()  # Inicialmente oculto
+        self.dose_combobox.bind('<<ComboboxSelected>>', self.on_dose_titulacao_selected)
 
         # Linha 7: Botão de cálculo
         btn_frame = ttk.Frame(form_frame)
@@ -1200,8 +1582,33 @@ class VetAnesthesiaApp:
             self.result_labels[label] = ttk.Label(farmaco_frame, text="", width=15)
             self.result_labels[label].grid(row=i, column=1, sticky='w', padx=5, pady=2)
 
-        # Carregar fármacos
-        self.load_farmacos_infusao()
+        # Linha 10: Grade de titulação (fármacos com doses variáveis)
+        titulacao_frame = ttk.LabelFrame(form_frame, text="Titulação", padding=10)
+        titulacao_frame.grid(row=10, column=0, columnspan=2, sticky='ew', pady=5)
+        titulacao_cols = ("Dose", "ml/h", "Gotas/min", "Vol. fármaco (ml)", "Duração")
+        self.titulacao_tree = ttk.Treeview(titulacao_frame, columns=titulacao_cols, show='headings', height=5)
+        for col in titulacao_cols:
+            self.titulacao_tree.heading(col, text=col)
+            self.titulacao_tree.column(col, width=100, anchor='center')
+        self.titulacao_tree.pack(fill='x')
+        self._farmaco_infusao = None
+
+        # Recalculo ao vivo: só os resultados cujas entradas mudaram
+        self.calculo_infusao = criar_calculo_infusao()
+        self._recalculo_agendado = None
+        self._rotulos_infusao = {
+            "texto_vazao": self.result_vazao,
+            "texto_gotas": self.result_gotas,
+            "texto_duracao": self.result_duracao,
+            "texto_farmaco": self.result_labels["Fármaco"],
+            "texto_dose_farmaco": self.result_labels["Dose"],
+            "texto_dose_total": self.result_labels["Dose Total"],
+            "texto_concentracao": self.result_labels["Concentração"],
+            "texto_volume_farmaco": self.result_labels["Volume"],
+        }
+        for nome, var in self._vars_infusao.items():
+            self.calculo_infusao.definir(nome, var.get())
+            var.trace_add('write', lambda *_, nome=nome, var=var: self.on_infusion_input(nome, var.get()))
 
     def validate_peso_field(self, event):
         if self.infusion_modo.get().lower() == "peso":
@@ -1242,43 +1649,46 @@ class VetAnesthesiaApp:
                 idade=float(self.animal_idade.get()) if self.animal_idade.get() else None,
                 peso_kg=float(self.animal_peso.get())
             )
-            
-            with Session(engine) as session:
-                session.add(animal)
-                session.commit()
-                messagebox.showinfo("Sucesso", f"Animal {animal.nome} cadastrado com sucesso!")
-                self.load_animals_list()
-                self.load_initial_data()  # Atualiza comboboxes
-                
-                # Limpar campos
-                self.animal_nome.delete(0, tk.END)
-                self.animal_especie.set('')
-                self.animal_raca.delete(0, tk.END)
-                self.animal_idade.delete(0, tk.END)
-                self.animal_peso.delete(0, tk.END)
-                
         except Exception as e:
             messagebox.showerror("Erro", f"Falha ao cadastrar animal: {str(e)}")
+            return
+
+        nome = animal.nome
+
+        def concluido():
+            messagebox.showinfo("Sucesso", f"Animal {nome} cadastrado com sucesso!")
+            self.load_animals_list()
+            self.load_initial_data()  # Atualiza comboboxes
+
+            # Limpar campos
+            self.animal_nome.delete(0, tk.END)
+            self.animal_especie.set('')
+            self.animal_raca.delete(0, tk.END)
+            self.animal_idade.delete(0, tk.END)
+            self.animal_peso.delete(0, tk.END)
+
+        self.save_record(animal, "Cadastrando animal", concluido, "Falha ao cadastrar animal")
 
     def load_animals_list(self):
         """Carrega a lista de animais no TreeView"""
-        with Session(engine) as session:
-            animais = session.exec(select(Animal)).all()
-            
-            # Limpar treeview
-            for item in self.animal_tree.get_children():
-                self.animal_tree.delete(item)
-                
-            # Adicionar novos itens
-            for animal in animais:
-                self.animal_tree.insert('', 'end', values=(
-                    animal.id,
-                    animal.nome,
-                    animal.especie,
-                    animal.raca,
-                    animal.idade if animal.idade else 'N/A',
-                    f"{animal.peso_kg} kg"
-                ))
+        if not self.abas.criada('animais'):
+            return
+        animais = cache_referencia.listar(Animal)
+
+        # Limpar treeview
+        for item in self.animal_tree.get_children():
+            self.animal_tree.delete(item)
+
+        # Adicionar novos itens
+        for animal in animais:
+            self.animal_tree.insert('', 'end', values=(
+                animal.id,
+                animal.nome,
+                animal.especie,
+                animal.raca,
+                animal.idade if animal.idade else 'N/A',
+                f"{animal.peso_kg} kg"
+            ))
 
     def register_farmaco(self):
         """Janela para cadastrar novo fármaco com doses variáveis"""
@@ -1295,6 +1705,7 @@ class VetAnesthesiaApp:
         nome_var = tk.StringVar()
         dose_var = tk.StringVar()
         conc_var = tk.StringVar()
+        unidade_conc_var = tk.StringVar(value=UNIDADES_CONCENTRACAO[0])
         unidade_var = tk.StringVar()
         modo_var = tk.StringVar()
         volume_var = tk.StringVar()
@@ -1309,9 +1720,13 @@ class VetAnesthesiaApp:
         dose_entry = ttk.Entry(main_frame, textvariable=dose_var)
         dose_entry.grid(row=1, column=1, sticky='we', pady=2)
         
-        ttk.Label(main_frame, text="Concentração (mg/ml):").grid(row=2, column=0, sticky='w', pady=2)
-        conc_entry = ttk.Entry(main_frame, textvariable=conc_var)
-        conc_entry.grid(row=2, column=1, sticky='we', pady=2)
+        ttk.Label(main_frame, text="Concentração:").grid(row=2, column=0, sticky='w', pady=2)
+        conc_frame = ttk.Frame(main_frame)
+        conc_frame.grid(row=2, column=1, sticky='we', pady=2)
+        conc_entry = ttk.Entry(conc_frame, textvariable=conc_var)
+        conc_entry.pack(side='left', fill='x', expand=True)
+        ttk.Combobox(conc_frame, textvariable=unidade_conc_var, values=UNIDADES_CONCENTRACAO,
+                     state='readonly', width=8).pack(side='left', padx=(5, 0))
         
         ttk.Label(main_frame, text="Unidade de dose:").grid(row=3, column=0, sticky='w', pady=2)
         unidade_cb = ttk.Combobox(main_frame, textvariable=unidade_var, 
@@ -1331,7 +1746,7 @@ class VetAnesthesiaApp:
         comentario_entry = tk.Text(main_frame, height=4, width=30)
         comentario_entry.grid(row=6, column=1, sticky='we', pady=2)
 
-        ttk.Label(cadastro_window, text="Doses variáveis (separadas por vírgula):").pack()
+        ttk.Label(cadastro_window, text="Doses variáveis (0.1,0.2 ou 0,1; 0,2):").pack()
         doses_variaveis_entry = ttk.Entry(cadastro_window, width=30)
         doses_variaveis_entry.pack()
         
@@ -1342,24 +1757,26 @@ class VetAnesthesiaApp:
                     nome=nome_var.get(),
                     dose=float(dose_var.get()),
                     concentracao=float(conc_var.get()),
+                    unidade_concentracao=unidade_conc_var.get(),
                     unidade_dose=unidade_var.get(),
                     modo_uso=modo_var.get(),
                     volume_seringa=float(volume_var.get()) if volume_var.get() else None,
                     comentario=comentario_entry.get("1.0", tk.END).strip() or None,
                     doses_variaveis=doses_variaveis_entry.get().strip() or None
                 )
-                
-                with Session(engine) as session:
-                    session.add(farmaco)
-                    session.commit()
-                    messagebox.showinfo("Sucesso", "Fármaco cadastrado com sucesso!")
-                    cadastro_window.destroy()
-                    self.load_farmacos_tree()  # Atualiza a lista de fármacos
-                
             except ValueError:
                 messagebox.showerror("Erro", "Digite valores numéricos válidos para dose e concentração!")
+                return
             except Exception as e:
                 messagebox.showerror("Erro", f"Falha ao cadastrar fármaco: {str(e)}")
+                return
+
+            def concluido():
+                messagebox.showinfo("Sucesso", "Fármaco cadastrado com sucesso!")
+                cadastro_window.destroy()
+                self.load_farmacos_tree()  # Atualiza a lista de fármacos
+
+            self.save_record(farmaco, "Cadastrando fármaco", concluido, "Falha ao cadastrar fármaco")
         
         # Frame de botões
         btn_frame = ttk.Frame(main_frame)
@@ -1374,9 +1791,9 @@ class VetAnesthesiaApp:
 
     def load_farmacos_infusao(self):
         """Carrega fármacos na combobox de infusão"""
-        with Session(engine) as session:
-            farmacos = session.exec(select(Farmaco)).all()
-            self.farmaco_combobox_infusao['values'] = [f"{f.id} - {f.nome}" for f in farmacos]
+        if not self.abas.criada('infusao'):
+            return
+        self.farmaco_combobox_infusao['values'] = self.search_farmaco_options("", lambda f: f"{f.id} - {f.nome}")
     
     def on_farmaco_selected_infusao(self, event):
         farmaco_str = self.farmaco_combobox_infusao.get()
@@ -1385,33 +1802,97 @@ class VetAnesthesiaApp:
             
         farmaco_id = int(farmaco_str.split(' - ')[0])
         
-        with Session(engine) as session:
-            farmaco = session.get(Farmaco, farmaco_id)
+        farmaco = cache_referencia.obter(Farmaco, farmaco_id)
+        if farmaco:
+            # Fica em memória (e no grafo) até a grade dele ser invalidada por uma edição
+            self._farmaco_infusao = farmaco
+            self.calculo_infusao.definir('farmaco', farmaco)
+            # Atualizar label com dose padrão
+            self.farmaco_dose_label.config(text=f"{farmaco.dose} {farmaco.unidade_dose}")
+
+            # Atualizar combobox de doses variáveis (doses já convertidas na grade memorizada)
+            try:
+                grade = obter_grade(farmaco)
+            except ValueError as e:  # ex: dose em UI com concentração em massa
+                messagebox.showerror("Erro", str(e))
+                return
+            if farmaco.doses_variaveis:
+                self.dose_combobox['values'] = [f"{d:g}" for d in grade.doses]
+                self.dose_combobox.current(0)
+                self.dose_combobox.grid()
+            else:
+                self.dose_combobox.grid_remove()
+            self.update_infusion_results()
+
+    @staticmethod
+    def warm_titration_grid(farmaco):
+        """Deixa a grade do fármaco em cache; unidades que não combinam ficam com os resultados em branco"""
+        try:
+            obter_grade(farmaco)
+        except ValueError:
+            pass
+
+    def on_dose_titulacao_selected(self, event=None):
+        """Troca de passo de titulação: recalcula sem consultar o banco"""
+        self.update_infusion_results()
+
+    def on_infusion_input(self, nome, valor):
+        """Campo da infusão alterado: marca no grafo e reagenda o recalculo"""
+        if not self.calculo_infusao.definir(nome, valor):
+            return
+        # Cada tecla adia o recalculo: digitação rápida (ou colar) vira um recalculo só
+        if self._recalculo_agendado is not None:
+            self.root.after_cancel(self._recalculo_agendado)
+        self._recalculo_agendado = self.root.after(self.ATRASO_RECALCULO_MS, self.update_infusion_results)
+
+    def update_infusion_results(self):
+        """Recalcula o que mudou e atualiza só os rótulos afetados"""
+        if self._recalculo_agendado is not None:
+            self.root.after_cancel(self._recalculo_agendado)
+            self._recalculo_agendado = None
+
+        # Fármaco editado em outra tela ou outro processo: a grade dele foi invalidada, relê do cache
+        cache_referencia.conferir_banco()
+        farmaco = self._farmaco_infusao
+        if farmaco is not None and grade_em_cache(farmaco.id) is None:
+            farmaco = cache_referencia.obter(Farmaco, farmaco.id)
             if farmaco:
-                # Atualizar label com dose padrão
-                self.farmaco_dose_label.config(text=f"{farmaco.dose} {farmaco.unidade_dose}")
-                
-                # Atualizar combobox de doses variáveis
-                if farmaco.doses_variaveis:
-                    doses = [d.strip() for d in farmaco.doses_variaveis.split(',')]
-                    self.dose_combobox['values'] = doses
-                    self.dose_combobox.current(0)
-                    self.dose_combobox.grid()
-                else:
-                    self.dose_combobox.grid_remove()
-                
-                # Limpar resultados anteriores
-                for label in self.result_labels.values():
-                    label.config(text="")
+                self.warm_titration_grid(farmaco)
+            self._farmaco_infusao = farmaco
+            self.calculo_infusao.definir('farmaco', farmaco)
+
+        alterados = self.calculo_infusao.recalcular()
+        for nome, valor in alterados.items():
+            rotulo = self._rotulos_infusao.get(nome)
+            if rotulo is not None:
+                rotulo.config(text=valor or "")
+        if 'titulacao' in alterados or 'dose' in alterados:
+            self.atualizar_titulacao()
+
+    def atualizar_titulacao(self):
+        """Preenche a tabela de titulação com as linhas já calculadas no grafo"""
+        for item in self.titulacao_tree.get_children():
+            self.titulacao_tree.delete(item)
+
+        farmaco = self.calculo_infusao.valor('farmaco')
+        linhas = self.calculo_infusao.valor('titulacao')
+        if not farmaco or not linhas:
+            return
+        dose_atual = self.dose_combobox.get()
+        for linha in linhas:
+            item = self.titulacao_tree.insert('', 'end', values=(
+                f"{linha['dose']:g} {farmaco.unidade_dose}",
+                f"{linha['taxa_ml_h']:.2f}",
+                f"{linha['gotas_min']:.2f}",
+                f"{linha['volume_farmaco_ml']:.2f}",
+                formatar_duracao(linha['duracao_h'])
+            ))
+            if dose_atual and f"{linha['dose']:g}" == dose_atual:
+                self.titulacao_tree.selection_set(item)
 
     def load_farmacos_list(self):
-        """Carrega a lista de fármacos no ListBox"""
-        with Session(engine) as session:
-            farmacos = session.exec(select(Farmaco)).all()
-            
-            self.load_farmacos_tree.delete(0, tk.END)
-            for farmaco in farmacos:
-                self.load_farmacos_tree.insert(tk.END, f"{farmaco.id} - {farmaco.nome} ({farmaco.modo_uso})")
+        """Carrega a lista de fármacos (mesma árvore da aba Fármacos)"""
+        self.load_farmacos_tree()
 
     def import_farmacos_csv(self):
         """Importa fármacos de um arquivo CSV"""
@@ -1423,49 +1904,11 @@ class VetAnesthesiaApp:
         if not filepath:
             return
             
-        try:
-            with open(filepath, newline='', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                farmacos = []
-                
-                for row in reader:
-                    try:
-                        # Converter modo de uso para padrão
-                        modo = row['modo_uso'].strip().lower()
-                        if 'infus' in modo or 'contin' in modo:
-                            modo = 'infusão contínua'
-                        else:
-                            modo = 'bolus'
-                            
-                        farmaco = Farmaco(
-                            nome=row['nome'].strip(),
-                            concentracao=float(row['concentracao'].replace(',', '.')),
-                            dose=float(row['dose'].replace(',', '.')),
-                            unidade_dose=row['unidade_dose'].strip(),
-                            modo_uso=modo,
-                            volume_seringa=float(row['volume_seringa'].replace(',', '.')) if row.get('volume_seringa') else None,
-                            comentario=row.get('comentario', '').strip() or None
-                        )
-                        farmacos.append(farmaco)
-                    except Exception as e:
-                        print(f"Erro na linha: {row}. Erro: {str(e)}")
-                        continue
-                
-                if not farmacos:
-                    messagebox.showwarning("Aviso", "Nenhum fármaco válido encontrado no arquivo.")
-                    return
-                
-                # Confirmar importação
-                if messagebox.askyesno("Confirmar", f"Importar {len(farmacos)} fármacos?"):
-                    with Session(engine) as session:
-                        session.add_all(farmacos)
-                        session.commit()
-                        messagebox.showinfo("Sucesso", f"{len(farmacos)} fármacos importados com sucesso!")
-                        self.load_farmacos_list()
-                        self.load_initial_data()
-                        
-        except Exception as e:
-            messagebox.showerror("Erro", f"Falha ao importar arquivo: {str(e)}")
+        def atualizar_telas():
+            self.load_farmacos_list()
+            self.load_initial_data()
+
+        self.run_catalog_import(filepath, atualizar_telas)
 
     def export_farmacos_csv(self):
         """Exporta fármacos para um arquivo CSV"""
@@ -1478,36 +1921,7 @@ class VetAnesthesiaApp:
         if not filepath:
             return
             
-        try:
-            with Session(engine) as session:
-                farmacos = session.exec(select(Farmaco)).all()
-                
-                if not farmacos:
-                    messagebox.showwarning("Aviso", "Nenhum fármaco cadastrado para exportar.")
-                    return
-                
-                with open(filepath, mode='w', newline='', encoding='utf-8') as csvfile:
-                    writer = csv.DictWriter(csvfile, fieldnames=[
-                        'nome', 'dose', 'concentracao', 'unidade_dose', 
-                        'modo_uso', 'volume_seringa', 'comentario'
-                    ])
-                    writer.writeheader()
-                    
-                    for f in farmacos:
-                        writer.writerow({
-                            'nome': f.nome,
-                            'dose': f.dose,
-                            'concentracao': f.concentracao,
-                            'unidade_dose': f.unidade_dose,
-                            'modo_uso': f.modo_uso,
-                            'volume_seringa': f.volume_seringa or '',
-                            'comentario': f.comentario or ''
-                        })
-                
-                messagebox.showinfo("Sucesso", f"{len(farmacos)} fármacos exportados para:\n{filepath}")
-                
-        except Exception as e:
-            messagebox.showerror("Erro", f"Falha ao exportar: {str(e)}")
+        self.run_farmacos_export(filepath)
 
     def open_avulsa_session(self):
         """Abre a janela de sessão avulsa com cálculo de dose"""
@@ -1527,7 +1941,7 @@ class VetAnesthesiaApp:
         especie_var = tk.StringVar(value="Cão")
         nome_entry = ttk.Entry(main_frame)
         peso_entry = ttk.Entry(main_frame)
-        farmaco_combobox = ttk.Combobox(main_frame, state='readonly')
+        farmaco_combobox = ttk.Combobox(main_frame)
         dose_entry = ttk.Entry(main_frame)
         obs_text = tk.Text(main_frame, height=4, width=30)
         
@@ -1539,8 +1953,9 @@ class VetAnesthesiaApp:
                     messagebox.showerror("Erro", "Selecione um fármaco!")
                     return
                     
-                dose_valor = (peso * farmaco_selecionado.dose) / farmaco_selecionado.concentracao
-                dose_calculada.set(f"{dose_valor:.2f} ml")
+                dose_valor = calculadora_dose.calcular_farmaco(farmaco_selecionado, peso)
+                unidade = "ml" if farmaco_selecionado.modo_uso == "bolus" else "ml/h"
+                dose_calculada.set(f"{dose_valor:.2f} {unidade}")
                 dose_entry.delete(0, tk.END)
                 dose_entry.insert(0, f"{dose_valor:.2f}")
                 
@@ -1555,8 +1970,7 @@ class VetAnesthesiaApp:
             farmaco_str = farmaco_combobox.get()
             if farmaco_str:
                 farmaco_id = int(farmaco_str.split(' - ')[0])
-                with Session(engine) as session:
-                    farmaco_selecionado = session.get(Farmaco, farmaco_id)
+                farmaco_selecionado = cache_referencia.obter(Farmaco, farmaco_id)
 
         # Layout do formulário
         ttk.Label(main_frame, text="Espécie:").grid(row=0, column=0, padx=5, pady=5, sticky='e')
@@ -1573,10 +1987,9 @@ class VetAnesthesiaApp:
         farmaco_combobox.grid(row=3, column=1, columnspan=2, sticky='we', padx=5)
         farmaco_combobox.bind('<<ComboboxSelected>>', on_farmaco_select)
         
-        # Carregar fármacos
-        with Session(engine) as session:
-            farmacos = session.exec(select(Farmaco)).all()
-            farmaco_combobox['values'] = [f"{f.id} - {f.nome} ({f.modo_uso})" for f in farmacos]
+        # Carregar fármacos (busca enquanto digita)
+        farmaco_combobox['values'] = self.search_farmaco_options("", self.format_farmaco_option)
+        self.bind_farmaco_search(farmaco_combobox, self.format_farmaco_option)
         
         ttk.Label(main_frame, text="Dose sugerida:").grid(row=4, column=0, padx=5, pady=5, sticky='e')
         ttk.Label(main_frame, textvariable=dose_calculada).grid(row=4, column=1, sticky='w')
@@ -1611,18 +2024,17 @@ class VetAnesthesiaApp:
                     observacoes=obs_text.get("1.0", tk.END).strip() or None,
                     data=datetime.now()
                 )
-                
-                with Session(engine) as session:
-                    session.add(sessao)
-                    session.commit()
-                    messagebox.showinfo("Sucesso", "Sessão avulsa registrada com sucesso!")
-                    avulsa_window.destroy()
-                    self.load_sessions_list()
-                    
             except ValueError:
                 messagebox.showerror("Erro", "Digite valores numéricos válidos!")
-            except Exception as e:
-                messagebox.showerror("Erro", f"Falha ao registrar sessão avulsa: {str(e)}")
+                return
+
+            def concluido():
+                messagebox.showinfo("Sucesso", "Sessão avulsa registrada com sucesso!")
+                avulsa_window.destroy()
+                self.load_sessions_list()
+
+            self.save_record(sessao, "Registrando sessão avulsa", concluido,
+                             "Falha ao registrar sessão avulsa")
 
         # Botões
         ttk.Button(btn_frame, text="Calcular Dose", command=calcular_dose).pack(side='left', padx=5)
@@ -1631,6 +2043,40 @@ class VetAnesthesiaApp:
     
         main_frame.columnconfigure(1, weight=1)
 
+    @staticmethod
+    def format_farmaco_option(farmaco):
+        return f"{farmaco.id} - {farmaco.nome} ({farmaco.modo_uso})"
+
+    def search_farmaco_options(self, termo, formatar):
+        """Opções da combobox para o termo (índice de busca + cache de fármacos)"""
+        if not termo.strip():
+            # Primeiros por nome direto do cache (disponível já pelo instantâneo)
+            return [formatar(f) for f in cache_referencia.listar(Farmaco)[:LIMITE_PADRAO]]
+        farmacos = (cache_referencia.obter(Farmaco, i) for i in buscar_farmacos(termo))
+        return [formatar(f) for f in farmacos if f is not None]
+
+    def bind_farmaco_search(self, combobox, formatar):
+        """Busca enquanto digita: refaz as opções da combobox com os melhores resultados"""
+        agendado = None
+
+        def buscar():
+            nonlocal agendado
+            agendado = None
+            termo = combobox.get()
+            if termo.split(' - ')[0].strip().isdigit():
+                return  # já é uma opção escolhida
+            combobox['values'] = self.search_farmaco_options(termo, formatar)
+
+        def ao_digitar(event):
+            nonlocal agendado
+            if event.keysym in ('Up', 'Down', 'Return', 'Escape', 'Tab'):
+                return
+            if agendado is not None:
+                self.root.after_cancel(agendado)
+            agendado = self.root.after(120, buscar)
+
+        combobox.bind('<KeyRelease>', ao_digitar, add='+')
+
     def update_farmaco_info(self, event=None):
         """Atualiza as informações do fármaco selecionado"""
         farmaco_str = self.farmaco_combobox.get()
@@ -1639,15 +2085,14 @@ class VetAnesthesiaApp:
             
         farmaco_id = int(farmaco_str.split(' - ')[0])
         
-        with Session(engine) as session:
-            farmaco = session.get(Farmaco, farmaco_id)
-            if farmaco:
-                self.farmaco_dose.config(text=f"{farmaco.dose} {farmaco.unidade_dose}")
-                self.farmaco_modo.config(text=farmaco.modo_uso)
-                
-                # Se for infusão contínua, mostra a aba de infusão
-                if farmaco.modo_uso == "infusão contínua":
-                    self.notebook.select(3)  # Seleciona a aba de infusão
+        farmaco = cache_referencia.obter(Farmaco, farmaco_id)
+        if farmaco:
+            self.farmaco_dose.config(text=f"{farmaco.dose} {farmaco.unidade_dose}")
+            self.farmaco_modo.config(text=farmaco.modo_uso)
+
+            # Se for infusão contínua, mostra a aba de infusão
+            if farmaco.modo_uso == "infusão contínua":
+                self.notebook.select(3)  # Seleciona a aba de infusão
 
     def calculate_dose(self):
         """Calcula a dose do fármaco baseada no peso do animal"""
@@ -1668,23 +2113,23 @@ class VetAnesthesiaApp:
                 
             farmaco_id = int(farmaco_str.split(' - ')[0])
             
-            with Session(engine) as session:
-                animal = session.get(Animal, animal_id)
-                farmaco = session.get(Farmaco, farmaco_id)
-                
-                if not animal or not farmaco:
-                    messagebox.showerror("Erro", "Animal ou fármaco não encontrado!")
-                    return
-                
-                # Calcular dose
-                if farmaco.modo_uso == "bolus":
-                    dose_ml = (animal.peso_kg * farmaco.dose) / farmaco.concentracao
-                    self.dose_calculada.config(text=f"{dose_ml:.2f} ml")
-                else:
-                    # Para infusão contínua, mostramos na aba específica
-                    self.infusion_peso.delete(0, tk.END)
-                    self.infusion_peso.insert(0, str(animal.peso_kg))
-                    messagebox.showinfo("Info", "Configure a infusão na aba 'Infusão'")
+            animal = cache_referencia.obter(Animal, animal_id)
+            farmaco = cache_referencia.obter(Farmaco, farmaco_id)
+
+            if not animal or not farmaco:
+                messagebox.showerror("Erro", "Animal ou fármaco não encontrado!")
+                return
+
+            # Calcular dose
+            if farmaco.modo_uso == "bolus":
+                dose_ml = calculadora_dose.calcular_farmaco(farmaco, animal.peso_kg)
+                self.dose_calculada.config(text=f"{dose_ml:.2f} ml")
+            else:
+                # Para infusão contínua, mostramos na aba específica
+                self.abas.criar('infusao')
+                self.infusion_peso.delete(0, tk.END)
+                self.infusion_peso.insert(0, str(animal.peso_kg))
+                messagebox.showinfo("Info", "Configure a infusão na aba 'Infusão'")
                 
         except Exception as e:
             messagebox.showerror("Erro", f"Falha ao calcular dose: {str(e)}")
@@ -1699,80 +2144,41 @@ class VetAnesthesiaApp:
             
     
     def calculate_infusion(self):
+        """Botão "Calcular Infusão": valida os campos com mensagens e atualiza na hora"""
         try:
-            # Obter valores dos campos
+            peso = float(self.infusion_peso.get())
+            taxa = float(self.infusion_taxa.get())
+            volume_bolsa = float(self.infusion_volume.get())
+            if peso <= 0 or volume_bolsa <= 0 or taxa <= 0:
+                raise ValueError("Valores devem ser positivos")
+        except ValueError:
+            messagebox.showerror("Erro", "Digite valores válidos para peso, taxa e volume")
+            return
+
+        farmaco_str = self.farmaco_combobox_infusao.get()
+        farmaco = None
+        if farmaco_str:
             try:
-                peso = float(self.infusion_peso.get())
-                taxa = float(self.infusion_taxa.get())
-                volume_bolsa = float(self.infusion_volume.get())  # Novo campo
-                equipo = self.infusion_equipo.get()
-                
-                if peso <= 0 or volume_bolsa <= 0 or taxa <= 0:
-                    raise ValueError("Valores devem ser positivos")
-            except:
-                messagebox.showerror("Erro", "Digite valores válidos para peso, taxa e volume")
+                farmaco_id = int(farmaco_str.split(' - ')[0])
+            except ValueError:
+                messagebox.showerror("Erro", "Selecione um fármaco da lista!")
                 return
-            
-            # Calcular valores gerais
-            vazao_ml_h = peso * taxa
-            duracao_h = volume_bolsa / vazao_ml_h if vazao_ml_h > 0 else 0
-            fator = 20 if "Macro" in equipo else 60
-            gotas_min = (vazao_ml_h * fator) / 60
-            
-            # Exibir resultados gerais
-            self.result_vazao.config(text=f"{vazao_ml_h:.2f} ml/h")
-            self.result_gotas.config(text=f"{gotas_min:.2f} gts/min")
-            self.result_duracao.config(text=formatar_duracao(duracao_h))
-            
-            # Obter o fármaco selecionado
-            farmaco_str = self.farmaco_combobox_infusao.get()
-            if not farmaco_str:
-                # Limpar resultados do fármaco se nenhum selecionado
-                for label in self.result_labels.values():
-                    label.config(text="")
+            # Reaproveita o fármaco já carregado enquanto a grade dele não for invalidada
+            cache_referencia.conferir_banco()
+            farmaco = self._farmaco_infusao
+            if farmaco is None or farmaco.id != farmaco_id or grade_em_cache(farmaco_id) is None:
+                farmaco = cache_referencia.obter(Farmaco, farmaco_id)
+                if farmaco:
+                    self.warm_titration_grid(farmaco)
+            if not farmaco:
+                messagebox.showerror("Erro", "Fármaco não encontrado!")
                 return
-                
-            farmaco_id = int(farmaco_str.split(' - ')[0])
-            
-            with Session(engine) as session:
-                farmaco = session.get(Farmaco, farmaco_id)
-                if not farmaco:
-                    messagebox.showerror("Erro", "Fármaco não encontrado!")
-                    return
-                
-                # Usar dose variável se disponível e selecionada
-                dose_usar = farmaco.dose
-                if farmaco.doses_variaveis and self.dose_combobox.get():
-                    try:
-                        dose_usar = float(self.dose_combobox.get())
-                    except ValueError:
-                        pass  # Mantém a dose padrão se conversão falhar
-                
-                # Calcular valores específicos para o fármaco
-                # Converter unidades para mcg/kg/h
-                if "mg" in farmaco.unidade_dose:
-                    dose_mcg = dose_usar * 1000
-                else:
-                    dose_mcg = dose_usar
-                    
-                if "/min" in farmaco.unidade_dose:
-                    dose_mcg_h = dose_mcg * 60
-                else:
-                    dose_mcg_h = dose_mcg
-                    
-                # Cálculos específicos
-                dose_total_mcg = dose_mcg_h * peso * duracao_h
-                volume_farmaco = dose_total_mcg / (farmaco.concentracao * 1000)  # converter mg/ml para mcg/ml
-                
-                # Exibir resultados do fármaco
-                self.result_labels["Fármaco"].config(text=farmaco.nome)
-                self.result_labels["Dose"].config(text=f"{dose_usar} {farmaco.unidade_dose}")
-                self.result_labels["Dose Total"].config(text=f"{dose_total_mcg:.2f} mcg")
-                self.result_labels["Concentração"].config(text=f"{farmaco.concentracao} mg/ml")
-                self.result_labels["Volume"].config(text=f"{volume_farmaco:.4f} ml")
-                    
-        except Exception as e:
-            messagebox.showerror("Erro", f"Falha ao calcular infusão: {str(e)}")
+
+        # Sem fármaco os resultados dele ficam em branco
+        self._farmaco_infusao = farmaco
+        self.calculo_infusao.definir('farmaco', farmaco)
+        self.update_infusion_results()
+
     def calcular_infusao_especifica(
         peso_kg: float, 
         dose_mcg_kg_h: float, 
@@ -1853,49 +2259,51 @@ class VetAnesthesiaApp:
             # Obter observações
             observacoes = self.session_obs.get("1.0", tk.END).strip() or None
             
-            with Session(engine) as session:
-                # Verificar se é infusão contínua
-                farmaco = session.get(Farmaco, farmaco_id)
-                config = None
-                
-                if farmaco.modo_uso == "infusão contínua":
-                    # Criar configuração de infusão
-                    peso = float(self.infusion_peso.get())
-                    volume = int(self.infusion_volume.get())
-                    equipo = "microgotas" if "Micro" in self.infusion_equipo.get() else "macrogotas"
-                    
-                    config = ConfigInfusao(
-                        peso_kg=peso,
-                        volume_bolsa_ml=volume,
-                        equipo_tipo=equipo,
-                        taxa_ml_kg_h=float(self.infusion_taxa.get())
-                    )
-                    session.add(config)
-                    session.commit()
-                    session.refresh(config)
-                
-                # Criar sessão
-                sessao = SessaoAnestesia(
-                    id_animal=animal_id,
-                    id_farmaco=farmaco_id,
-                    dose_utilizada_ml=dose_utilizada,
-                    observacoes=observacoes,
-                    config_infusao_id=config.id if config else None,
-                    data=datetime.now()
+            # Campos da infusão lidos aqui (widgets só na thread do Tk)
+            farmaco = cache_referencia.obter(Farmaco, farmaco_id)
+            config = None
+            if farmaco and farmaco.modo_uso == "infusão contínua":
+                self.abas.criar('infusao')
+                config = ConfigInfusao(
+                    peso_kg=float(self.infusion_peso.get()),
+                    volume_bolsa_ml=int(self.infusion_volume.get()),
+                    equipo_tipo="microgotas" if "Micro" in self.infusion_equipo.get() else "macrogotas",
+                    taxa_ml_kg_h=float(self.infusion_taxa.get())
                 )
-                
-                session.add(sessao)
-                session.commit()
-                
-                messagebox.showinfo("Sucesso", f"Sessão registrada com sucesso!\nID: {sessao.id}")
-                self.load_sessions_list()
-                
-                # Limpar campos
-                self.session_obs.delete("1.0", tk.END)
-                self.dose_calculada.config(text="")
-                
         except Exception as e:
             messagebox.showerror("Erro", f"Falha ao registrar sessão: {str(e)}")
+            return
+
+        sessao = SessaoAnestesia(
+            id_animal=animal_id,
+            id_farmaco=farmaco_id,
+            dose_utilizada_ml=dose_utilizada,
+            observacoes=observacoes,
+            data=datetime.now()
+        )
+        em_lote = self.modo_plantao.get()
+
+        def gravar():
+            if em_lote:
+                return self.diario.registrar(sessao, config)
+            # Sessão e configuração de infusão numa única transação
+            with Session(engine) as session:
+                return gravar_sessoes(session, [(sessao, config)])[0]
+
+        def concluido(numero):
+            if em_lote:
+                self.plantao_label.config(text=f"Sessão nº {numero} no diário")
+            else:
+                messagebox.showinfo("Sucesso", f"Sessão registrada com sucesso!\nID: {numero}")
+                self.load_sessions_list()
+
+            # Limpar campos
+            self.session_obs.delete("1.0", tk.END)
+            self.dose_calculada.config(text="")
+
+        self.tarefas.executar(
+            gravar, ao_concluir=concluido, descricao="Registrando sessão",
+            ao_erro=lambda e: messagebox.showerror("Erro", f"Falha ao registrar sessão: {str(e)}"))
 
     def generate_prescription(self):
         """Gera um arquivo TXT com a prescrição da sessão selecionada"""
@@ -1904,62 +2312,47 @@ class VetAnesthesiaApp:
             if not selected_item:
                 messagebox.showerror("Erro", "Selecione uma sessão na lista!")
                 return
-            if hasattr(sessao, 'id_protocolo') and sessao.id_protocolo:
-                protocolo = session.get(Protocolo, sessao.id_protocolo)
-                conteudo += f"\n📋 PROTOCOLO UTILIZADO: {protocolo.nome}\n"
-                farmacos_protocolo = obter_farmacos_do_protocolo(session, protocolo.id)
-                
-                for farmaco, ordem in farmacos_protocolo:
-                    # Cálculo da dose para o animal
-                    if animal:
-                        if farmaco.modo_uso == "bolus":
-                            dose_ml = (animal.peso_kg * farmaco.dose) / farmaco.concentracao
-                        else:
-                            mult = 60 if "min" in farmaco.unidade_dose else 1
-                            dose_ml = (animal.peso_kg * farmaco.dose * mult) / farmaco.concentracao
-                        
-                        conteudo += (
-                            f"\n - {farmaco.nome}: {dose_ml:.2f}ml "
-                            f"({farmaco.dose} {farmaco.unidade_dose})"
-                        )    
             session_id = self.session_tree.item(selected_item[0])['values'][0]
-            
+        except Exception as e:
+            messagebox.showerror("Erro", f"Falha ao gerar prescrição: {str(e)}")
+            return
+
+        def gerar():
             with Session(engine) as session:
                 # Primeiro tenta buscar como sessão normal
-                sessao = session.get(SessaoAnestesia, session_id)
-                
+                sessao = obter_sessao(session, SessaoAnestesia, session_id)
+
                 if not sessao:
                     # Se não encontrar, busca como sessão avulsa
-                    sessao_avulsa = session.get(SessaoAvulsaAnestesia, session_id)
+                    sessao_avulsa = obter_sessao(session, SessaoAvulsaAnestesia, session_id)
                     if not sessao_avulsa:
-                        messagebox.showerror("Erro", "Sessão não encontrada!")
-                        return
-                    
+                        return None
+
                     # Cria conteúdo para sessão avulsa
                     farmaco = session.get(Farmaco, sessao_avulsa.id_farmaco)
-                    
+
                     conteudo = f"PRESCRIÇÃO ANESTÉSICA - Sessão Avulsa #{session_id}\n"
                     conteudo += "="*50 + "\n"
                     conteudo += "\n🐾 DADOS DO PACIENTE:\n"
                     conteudo += f"Nome: {sessao_avulsa.nome_animal}\n"
                     conteudo += f"Espécie: {sessao_avulsa.especie}\n"
                     conteudo += f"Peso: {sessao_avulsa.peso_kg} kg\n"
-                    
+
                     conteudo += "\n💊 DADOS FARMACOLÓGICOS:\n"
                     conteudo += f"Medicação: {farmaco.nome}\n"
                     conteudo += f"Dose: {farmaco.dose} {farmaco.unidade_dose}\n"
-                    conteudo += f"Concentração: {farmaco.concentracao} mg/ml\n"
+                    conteudo += f"Concentração: {farmaco.texto_concentracao}\n"
                     conteudo += f"Volume administrado: {sessao_avulsa.dose_utilizada_ml:.2f} ml\n"
-                    
+
                 else:
                     # Sessão normal com animal cadastrado
                     farmaco = session.get(Farmaco, sessao.id_farmaco)
                     animal = session.get(Animal, sessao.id_animal) if sessao.id_animal else None
-                    config = session.get(ConfigInfusao, sessao.config_infusao_id) if sessao.config_infusao_id else None
+                    config = obter_sessao(session, ConfigInfusao, sessao.config_infusao_id) if sessao.config_infusao_id else None
 
                     conteudo = f"PRESCRIÇÃO ANESTÉSICA - Sessão #{session_id}\n"
                     conteudo += "="*50 + "\n"
-                    
+
                     # Dados do Animal
                     conteudo += "\n🐾 DADOS DO PACIENTE:\n"
                     if animal:
@@ -1971,11 +2364,23 @@ class VetAnesthesiaApp:
                     if farmaco:
                         conteudo += f"Medicação: {farmaco.nome}\n"
                         conteudo += f"Dose: {farmaco.dose} {farmaco.unidade_dose}\n"
-                        conteudo += f"Concentração: {farmaco.concentracao} mg/ml\n"
+                        conteudo += f"Concentração: {farmaco.texto_concentracao}\n"
                         conteudo += f"Volume administrado: {sessao.dose_utilizada_ml:.2f} ml\n"
                     else:
                         conteudo += "Dados do fármaco não disponíveis\n"
 
+                    # Protocolo (se a sessão tiver um)
+                    if getattr(sessao, 'id_protocolo', None):
+                        protocolo = session.get(Protocolo, sessao.id_protocolo)
+                        conteudo += f"\n📋 PROTOCOLO UTILIZADO: {protocolo.nome}\n"
+                        if animal:
+                            for farmaco_p, ordem, dose_ml in calculadora_dose.calcular_protocolo(
+                                    protocolo.id, animal.peso_kg, session):
+                                conteudo += (
+                                    f"\n - {farmaco_p.nome}: {dose_ml:.2f}ml "
+                                    f"({farmaco_p.dose} {farmaco_p.unidade_dose})"
+                                )
+
                     # Configuração de Infusão (se aplicável)
                     if config:
                         calculos = calcular_taxas(config)
@@ -1989,59 +2394,139 @@ class VetAnesthesiaApp:
                     if sessao.observacoes:
                         conteudo += "\n📝 OBSERVAÇÕES:\n"
                         conteudo += f"{sessao.observacoes}\n"
-                                    
-                
+
                 # Salvar arquivo
                 os.makedirs("prescricoes", exist_ok=True)
                 nome_arquivo = f"prescricoes/prescricao_{session_id}.txt"
-                
+
                 with open(nome_arquivo, "w", encoding="utf-8") as f:
                     f.write(conteudo)
+                return nome_arquivo
 
-                messagebox.showinfo("Sucesso", f"Prescrição salva em:\n{nome_arquivo}")
-                
-        except Exception as e:
-            messagebox.showerror("Erro", f"Falha ao gerar prescrição: {str(e)}")
-    def load_sessions_list(self):
-        """Carrega a lista de sessões no TreeView"""
-        with Session(engine) as session:
-            # Buscar sessões normais
-            sessoes = session.exec(select(SessaoAnestesia)).all()
-            
-            # Buscar sessões avulsas
-            sessoes_avulsas = session.exec(select(SessaoAvulsaAnestesia)).all()
-            
-            # Limpar treeview
-            for item in self.session_tree.get_children():
-                self.session_tree.delete(item)
-                
-            # Adicionar sessões normais
-            for sessao in sessoes:
-                animal = session.get(Animal, sessao.id_animal)
-                farmaco = session.get(Farmaco, sessao.id_farmaco)
-                
-                self.session_tree.insert('', 'end', values=(
-                    sessao.id,
-                    animal.nome if animal else "N/A",
-                    farmaco.nome if farmaco else "N/A",
-                    f"{sessao.dose_utilizada_ml:.2f} ml",
-                    sessao.data.strftime('%d/%m/%Y %H:%M') if sessao.data else "N/A"
-                ))
+        def concluido(nome_arquivo):
+            if nome_arquivo is None:
+                messagebox.showerror("Erro", "Sessão não encontrada!")
+                return
+            messagebox.showinfo("Sucesso", f"Prescrição salva em:\n{nome_arquivo}")
+
+        self.tarefas.executar(
+            gerar, ao_concluir=concluido, descricao="Gerando prescrição",
+            ao_erro=lambda e: messagebox.showerror("Erro", f"Falha ao gerar prescrição: {str(e)}"))
+
+    def export_sessions_history(self):
+        """Exporta todo o histórico de sessões (CSV, JSON Lines ou colunar)"""
+        filepath = filedialog.asksaveasfilename(
+            title="Exportar histórico de sessões",
+            defaultextension=".csv",
+            filetypes=(("CSV", "*.csv"), ("JSON Lines", "*.jsonl"),
+                       ("Colunar NumPy", "*.npcol"), ("All files", "*.*")))
+        
+        if not filepath:
+            return
             
-            # Adicionar sessões avulsas
-            for sessao in sessoes_avulsas:
-                farmaco = session.get(Farmaco, sessao.id_farmaco)
-                
-                self.session_tree.insert('', 'end', values=(
-                    sessao.id,
-                    f"{sessao.nome_animal} (Avulso)",
-                    farmaco.nome if farmaco else "N/A",
-                    f"{sessao.dose_utilizada_ml:.2f} ml",
-                    sessao.data.strftime('%d/%m/%Y %H:%M') if sessao.data else "N/A"
-                ))
+        self.tarefas.executar(
+            exportar_sessoes, filepath, descricao="Exportando histórico de sessões",
+            ao_concluir=lambda total: messagebox.showinfo(
+                "Sucesso", f"{total} sessões exportadas para:\n{filepath}"),
+            ao_erro=lambda e: messagebox.showerror("Erro", f"Falha ao exportar histórico: {str(e)}"))
+
+    def archive_old_sessions(self):
+        """Move sessões antigas para os arquivos anuais (database/arquivo.py)"""
+        dias = carregar_config()['arquivar_apos_dias']
+        if not messagebox.askyesno(
+                "Confirmar", f"Arquivar as sessões com mais de {dias} dias?\n"
+                             "Elas continuam disponíveis na lista, nas prescrições e nas exportações."):
+            return
+
+        def concluido(arquivadas):
+            if arquivadas:
+                resumo = "\n".join(f"{ano}: {total} sessões" for ano, total in arquivadas.items())
+                messagebox.showinfo("Arquivamento", f"Sessões arquivadas:\n{resumo}")
+            else:
+                messagebox.showinfo("Arquivamento", "Nenhuma sessão para arquivar.")
+            self.load_sessions_list()
+
+        self.tarefas.executar(
+            arquivar_sessoes, ao_concluir=concluido, descricao="Arquivando sessões antigas",
+            ao_erro=lambda e: messagebox.showerror("Erro", f"Falha ao arquivar sessões: {str(e)}"))
+
+    def load_sessions_list(self):
+        """Recarrega a lista de sessões a partir da primeira página"""
+        if not self.abas.criada('sessoes'):
+            return
+        # Páginas de uma listagem anterior ainda em andamento são descartadas
+        self._geracao_sessoes = getattr(self, '_geracao_sessoes', 0) + 1
+        self._cursor_sessoes = None
+        self._sessoes_arquivadas = False  # True depois que as recentes acabam
+        self._carregando_sessoes = False
+        self._fim_sessoes = False
+        self.load_more_sessions()
+
+    def load_more_sessions(self):
+        """Busca a próxima página (cursor por data/id) e acrescenta ao TreeView"""
+        if self._fim_sessoes:
+            self._carregando_sessoes = False
+            return
+        self._carregando_sessoes = True
+        geracao = self._geracao_sessoes
+        arquivadas = self._sessoes_arquivadas
+        primeira = self._cursor_sessoes is None and not arquivadas
+
+        def buscar(cursor):
+            if arquivadas:
+                return listar_sessoes_arquivadas_pagina(cursor, self.SESSOES_POR_PAGINA), False
+            with Session(engine) as session:
+                pagina = listar_sessoes_pagina(session, cursor, self.SESSOES_POR_PAGINA)
+            return pagina, bool(arquivos_existentes(engine))
+
+        def inserir(resultado):
+            if geracao != self._geracao_sessoes:
+                return
+            (linhas, proximo), tem_arquivos = resultado
+            if proximo is None and tem_arquivos:
+                # Fim das sessões recentes: as próximas páginas vêm dos arquivos anuais
+                self._sessoes_arquivadas = True
+                proximo = cursor_da_linha(linhas[-1]) if linhas else self._cursor_sessoes
+                self._fim_sessoes = False
+            else:
+                self._fim_sessoes = proximo is None
+            self._cursor_sessoes = proximo
+            self._carregando_sessoes = False
+
+            # Primeira página: diferença contra a lista atual (as linhas das páginas
+            # seguintes saem); as demais só acrescentam no fim
+            if primeira:
+                self.session_vinculo.atualizar(linhas)
+            else:
+                self.session_vinculo.acrescentar(linhas)
+
+        def falhou(erro):
+            self._carregando_sessoes = False
+            messagebox.showerror("Erro", f"Falha ao carregar sessões: {str(erro)}")
+
+        self.tarefas.executar(buscar, self._cursor_sessoes, ao_concluir=inserir, ao_erro=falhou,
+                              descricao="Carregando sessões")
+
+    def on_sessions_scroll(self, scrollbar, primeiro, ultimo):
+        """Atualiza a barra e carrega mais sessões quando a rolagem passa de 90%"""
+        scrollbar.set(primeiro, ultimo)
+        if float(ultimo) >= 0.9 and not self._fim_sessoes and not self._carregando_sessoes:
+            # after_idle: não inserir itens dentro do próprio callback de rolagem
+            self._carregando_sessoes = True
+            self.root.after_idle(self.load_more_sessions)
+
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = VetAnesthesiaApp(root)
+    tempos = TemposInicializacao(INICIO_PROCESSO)
+    tempos.registrar("importações", time.perf_counter() - INICIO_PROCESSO)
+    with tempos.fase("migrações"):
+        atualizar_esquema()  # Aplica as migrações pendentes (colunas novas, índices)
+    with tempos.fase("Tk"):
+        root = tk.Tk()
+    app = VetAnesthesiaApp(root, tempos)
+    with engine.connect() as conn:
+        pendentes = farmacos_para_revisar(conn)
+    if pendentes:
+        root.after_idle(app.warn_unconfirmed_units, pendentes)
     
     # Centralizar a janela
     window_width = 1200
@@ -0,0 +1,326 @@
+"""
+Cálculo de doses em lote, sem GUI nem perguntas (ex: a lista de cirurgias do dia
+seguinte, preparada durante a noite).
+
+Entrada: CSV (com cabeçalho) ou JSONL, uma linha por paciente com
+    animal      id ou nome do animal cadastrado (peso e espécie vêm do cadastro)
+    peso_kg     peso (obrigatório sem animal; com animal, substitui o do cadastro)
+    especie     espécie (informativa; com animal, substitui a do cadastro)
+    protocolo   id ou nome do protocolo, ou
+    farmaco     id ou nome de um fármaco
+    dose        dose no lugar da padrão (com farmaco)
+    doses       doses no lugar das padrão, por fármaco do protocolo:
+                "Propofol=2;Fentanil=5" no CSV, {"Propofol": 2, "Fentanil": 5} no JSONL
+    equipo      macrogotas (padrão) ou microgotas, para as gotas/min das infusões
+    duracao_h   duração prevista; dá o volume total das infusões contínuas
+
+Saída: um registro por fármaco (CSV ou JSONL, colunas em COLUNAS_SAIDA) com o
+volume em ml (bolus), a taxa em ml/h e as gotas/min (infusão contínua); `linha` é o
+número do registro na entrada (sem o cabeçalho e as linhas em branco). Linhas que não
+puderem ser calculadas geram um registro só com `linha` e `erro`.
+
+Entrada e saída são lidas e gravadas aos poucos (memória constante para qualquer
+tamanho de arquivo); com --processos N os lotes de linhas são calculados em N
+processos, com no máximo 2 lotes por processo em andamento, e a saída mantém a
+ordem da entrada. O banco é aberto só para leitura.
+
+Uso (a partir da raiz do repositório ou de anestesia_vet/):
+    python -m anestesia_vet.batch cirurgias.csv -o doses.csv
+    python -m anestesia_vet.batch cirurgias.jsonl --processos 4 > doses.jsonl
+    python -m batch - --formato-entrada jsonl < cirurgias.jsonl
+"""
+import argparse
+import csv
+import json
+import sys
+from collections import deque
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO
+
+# python -m anestesia_vet.batch: os módulos do app são importados sem o pacote
+sys.path.insert(0, str(Path(__file__).parent))
+
+from database.engine import CONFIG_PADRAO, carregar_config, criar_engine  # noqa: E402
+from database.migracoes import MIGRACOES, versao_atual  # noqa: E402
+from controllers.cache_referencia import CacheReferencia  # noqa: E402
+from controllers.calculadora_dose import CalculadoraDose  # noqa: E402
+from models.animal import Animal  # noqa: E402
+from models.farmaco import Farmaco  # noqa: E402
+from models.protocolo import Protocolo  # noqa: E402
+
+COLUNAS_SAIDA = ("linha", "animal", "especie", "peso_kg", "protocolo", "farmaco", "ordem", "modo_uso",
+                 "dose", "unidade_dose", "volume_ml", "taxa_ml_h", "gotas_min", "erro")
+TAMANHO_LOTE = 256  # linhas de entrada por tarefa enviada aos processos
+
+
+def _texto(valor) -> str:
+    return "" if valor is None else str(valor).strip()
+
+
+def _numero(valor, campo: str) -> Optional[float]:
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return float(valor)
+    texto = _texto(valor)
+    if not texto:
+        return None
+    try:
+        return float(texto.replace(",", "."))
+    except ValueError:
+        raise ValueError(f"{campo} inválido: {texto!r}") from None
+
+
+def _doses(valor) -> Dict[str, float]:
+    """Doses por fármaco (chave: id ou nome sem diferenciar maiúsculas)"""
+    if isinstance(valor, dict):
+        itens = valor.items()
+    else:
+        itens = []
+        for parte in _texto(valor).split(";"):
+            if parte.strip():
+                chave, separador, dose = parte.partition("=")
+                if not separador:
+                    raise ValueError(f"doses inválidas: {parte.strip()!r} (use Nome=dose)")
+                itens.append((chave, dose))
+    return {_texto(chave).casefold(): _numero(dose, f"dose de {_texto(chave)}") for chave, dose in itens}
+
+
+def fator_equipo(texto: str) -> int:
+    return 60 if "micro" in _texto(texto).lower() else 20
+
+
+class CalculoLote:
+    """
+    Cálculo de uma linha da entrada com os serviços do app (CacheReferencia e
+    CalculadoraDose) sobre um engine próprio; cada processo tem a sua instância.
+    """
+
+    def __init__(self, engine):
+        self.referencias = CacheReferencia(engine)
+        self.calculadora = CalculadoraDose(engine)
+
+    def _buscar(self, modelo, valor, rotulo: str):
+        texto = _texto(valor)
+        if texto.isdigit():
+            objeto = self.referencias.obter(modelo, int(texto))
+            if objeto is None:
+                raise ValueError(f"{rotulo} {texto} não encontrado")
+            return objeto
+        encontrados = self.referencias.por_nome(modelo, texto)
+        if not encontrados:
+            raise ValueError(f"{rotulo} {texto!r} não encontrado")
+        if len(encontrados) > 1:
+            ids = ", ".join(str(o.id) for o in encontrados)
+            raise ValueError(f"{rotulo} {texto!r} é ambíguo (ids {ids}); use o id")
+        return encontrados[0]
+
+    def calcular(self, numero: int, linha: dict) -> List[dict]:
+        """Registros de saída da linha `numero` (ValueError se a linha é inválida)"""
+        if "_erro" in linha:
+            raise ValueError(linha["_erro"])
+        animal = self._buscar(Animal, linha["animal"], "animal") if _texto(linha.get("animal")) else None
+        peso = _numero(linha.get("peso_kg"), "peso_kg")
+        if peso is None and animal is not None:
+            peso = animal.peso_kg
+        if peso is None or peso <= 0:
+            raise ValueError("peso_kg deve ser positivo")
+        especie = _texto(linha.get("especie")) or (animal.especie if animal else "")
+
+        tem_protocolo, tem_farmaco = _texto(linha.get("protocolo")), _texto(linha.get("farmaco"))
+        if bool(tem_protocolo) == bool(tem_farmaco):
+            raise ValueError("informe protocolo ou farmaco (um dos dois)")
+        if tem_protocolo:
+            protocolo = self._buscar(Protocolo, linha["protocolo"], "protocolo")
+            itens = self.calculadora.farmacos_do_protocolo(protocolo.id)
+            if not itens:
+                raise ValueError(f"protocolo {protocolo.nome!r} não tem fármacos")
+            doses = _doses(linha.get("doses"))
+        else:
+            protocolo = None
+            farmaco = self._buscar(Farmaco, linha["farmaco"], "fármaco")
+            itens = [(farmaco, None)]
+            dose = _numero(linha.get("dose"), "dose")
+            doses = {} if dose is None else {str(farmaco.id): dose}
+        fator = fator_equipo(linha.get("equipo"))
+        duracao_h = _numero(linha.get("duracao_h"), "duracao_h")
+
+        sobras = set(doses) - {str(f.id) for f, _ in itens} - {f.nome.casefold() for f, _ in itens}
+        if sobras:
+            raise ValueError(f"doses para fármacos fora do protocolo: {', '.join(sorted(sobras))}")
+
+        registros = []
+        for farmaco, ordem in itens:
+            dose = doses.get(str(farmaco.id), doses.get(farmaco.nome.casefold()))
+            resultado = self.calculadora.calcular(farmaco.id, peso, dose)
+            registro = {
+                "linha": numero, "animal": animal.nome if animal else "", "especie": especie,
+                "peso_kg": peso, "protocolo": protocolo.nome if protocolo else "",
+                "farmaco": farmaco.nome, "ordem": "" if ordem is None else ordem,
+                "modo_uso": farmaco.modo_uso, "dose": farmaco.dose if dose is None else dose,
+                "unidade_dose": farmaco.unidade_dose,
+                "volume_ml": "", "taxa_ml_h": "", "gotas_min": "", "erro": "",
+            }
+            if farmaco.modo_uso == "bolus":
+                registro["volume_ml"] = round(resultado, 4)
+            else:
+                registro["taxa_ml_h"] = round(resultado, 2)
+                registro["gotas_min"] = round(resultado * fator / 60, 2)
+                if duracao_h is not None:
+                    registro["volume_ml"] = round(resultado * duracao_h, 4)
+            registros.append(registro)
+        return registros
+
+    def calcular_lote(self, linhas: List[tuple]) -> List[dict]:
+        """Registros de (numero, linha) em ordem; erros viram registros com `erro`"""
+        registros = []
+        for numero, linha in linhas:
+            try:
+                registros.extend(self.calcular(numero, linha))
+            except (ValueError, ArithmeticError) as erro:
+                registros.append({"linha": numero, "erro": str(erro)})
+        return registros
+
+
+# --- Processos ---
+_calculo_do_processo: Optional[CalculoLote] = None
+
+
+def _iniciar_processo(url: str) -> None:
+    # Engine criado no próprio processo (conexões SQLite não passam entre processos)
+    global _calculo_do_processo
+    _calculo_do_processo = CalculoLote(criar_engine(url, somente_leitura=True))
+
+
+def _calcular_no_processo(linhas: List[tuple]) -> List[dict]:
+    return _calculo_do_processo.calcular_lote(linhas)
+
+
+def _lotes(linhas: Iterable[dict], tamanho: int) -> Iterator[List[tuple]]:
+    numeradas = enumerate(linhas, start=1)
+    while True:
+        lote = list(islice(numeradas, tamanho))
+        if not lote:
+            return
+        yield lote
+
+
+def verificar_esquema(engine) -> None:
+    """O lote só lê o banco: com migrações pendentes ele é recusado, não migrado"""
+    with engine.connect() as conn:
+        versao = versao_atual(conn)
+    if versao < MIGRACOES[-1][0]:
+        raise ValueError(f"Banco na versão {versao} do esquema (atual: {MIGRACOES[-1][0]}); "
+                         "abra o app ou rode as migrações antes do cálculo em lote")
+
+
+def calcular_registros(linhas: Iterable[dict], url: str, processos: int = 1,
+                       tamanho_lote: int = TAMANHO_LOTE) -> Iterator[dict]:
+    """
+    Registros de saída na ordem da entrada, consumindo `linhas` aos poucos.
+    O esquema do banco é conferido já na chamada (ValueError se desatualizado).
+    """
+    engine = criar_engine(url, somente_leitura=True)
+    verificar_esquema(engine)
+    if processos <= 1:
+        return _calcular_aqui(_lotes(linhas, tamanho_lote), CalculoLote(engine))
+    engine.dispose()
+    return _calcular_em_processos(_lotes(linhas, tamanho_lote), url, processos)
+
+
+def _calcular_aqui(lotes: Iterator[List[tuple]], calculo: CalculoLote) -> Iterator[dict]:
+    for lote in lotes:
+        yield from calculo.calcular_lote(lote)
+
+
+def _calcular_em_processos(lotes: Iterator[List[tuple]], url: str, processos: int) -> Iterator[dict]:
+    import multiprocessing
+    # Pool.imap lê a entrada inteira adiantado; aqui a fila é limitada a 2 lotes por processo
+    with multiprocessing.Pool(processos, _iniciar_processo, (url,)) as pool:
+        pendentes = deque()
+        for lote in lotes:
+            pendentes.append(pool.apply_async(_calcular_no_processo, (lote,)))
+            if len(pendentes) >= 2 * processos:
+                yield from pendentes.popleft().get()
+        while pendentes:
+            yield from pendentes.popleft().get()
+
+
+# --- Arquivos ---
+def formato_do_arquivo(caminho: str, padrao: str = "csv") -> str:
+    return "jsonl" if Path(caminho).suffix.lower() in (".jsonl", ".json", ".ndjson") else padrao
+
+
+def ler_linhas(arquivo: TextIO, formato: str) -> Iterator[dict]:
+    if formato == "csv":
+        for linha in csv.DictReader(arquivo):
+            yield {(chave or "").strip().lower(): valor for chave, valor in linha.items()}
+        return
+    for numero, texto in enumerate(arquivo, start=1):
+        if texto.strip():
+            # Uma linha inválida sai como registro de erro, sem mudar a numeração das seguintes
+            try:
+                linha = json.loads(texto)
+            except json.JSONDecodeError as erro:
+                linha = {"_erro": f"JSON inválido na linha {numero}: {erro.msg}"}
+            yield linha if isinstance(linha, dict) else {"_erro": f"linha {numero} não é um objeto JSON"}
+
+
+def gravar_registros(registros: Iterable[dict], arquivo: TextIO, formato: str) -> Dict[str, int]:
+    """Grava os registros um a um; devolve {'registros': n, 'erros': n}"""
+    contagem = {"registros": 0, "erros": 0}
+    if formato == "csv":
+        escritor = csv.DictWriter(arquivo, fieldnames=COLUNAS_SAIDA, restval="")
+        escritor.writeheader()
+        escrever = escritor.writerow
+    else:
+        def escrever(registro):
+            arquivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+    for registro in registros:
+        escrever(registro)
+        contagem["registros"] += 1
+        contagem["erros"] += bool(registro.get("erro"))
+    return contagem
+
+
+def url_do_banco(banco: str = None) -> str:
+    """sqlite:///<banco>; sem banco, o da configuração (o padrão relativo é o de anestesia_vet/)"""
+    if banco:
+        return f"sqlite:///{Path(banco).resolve()}"
+    url = carregar_config()['url']
+    if url == CONFIG_PADRAO['url']:
+        return f"sqlite:///{Path(__file__).parent / 'database.db'}"
+    return url
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cálculo de doses em lote (CSV ou JSONL)")
+    parser.add_argument("entrada", help="arquivo de entrada ('-' para a entrada padrão)")
+    parser.add_argument("-o", "--saida", default="-", help="arquivo de saída (padrão: saída padrão)")
+    parser.add_argument("--formato-entrada", choices=("csv", "jsonl"),
+                        help="padrão: pela extensão do arquivo (.jsonl/.json = jsonl, senão csv)")
+    parser.add_argument("--formato-saida", choices=("csv", "jsonl"),
+                        help="padrão: pela extensão do arquivo de saída, senão o da entrada")
+    parser.add_argument("--processos", type=int, default=1, help="processos de cálculo (padrão: 1)")
+    parser.add_argument("--lote", type=int, default=TAMANHO_LOTE, help="linhas por tarefa de cada processo")
+    parser.add_argument("--banco", help="arquivo do banco (padrão: o da configuração)")
+    args = parser.parse_args()
+
+    formato_entrada = args.formato_entrada or formato_do_arquivo(args.entrada)
+    formato_saida = args.formato_saida or (
+        formato_do_arquivo(args.saida, formato_entrada) if args.saida != "-" else formato_entrada)
+    entrada = sys.stdin if args.entrada == "-" else open(args.entrada, newline="", encoding="utf-8-sig")
+    try:
+        registros = calcular_registros(ler_linhas(entrada, formato_entrada), url_do_banco(args.banco),
+                                       max(1, args.processos), max(1, args.lote))
+    except ValueError as erro:
+        raise SystemExit(str(erro))
+    saida = sys.stdout if args.saida == "-" else open(args.saida, "w", newline="", encoding="utf-8")
+    try:
+        contagem = gravar_registros(registros, saida, formato_saida)
+    finally:
+        if entrada is not sys.stdin:
+            entrada.close()
+        if saida is not sys.stdout:
+            saida.close()
+    print(f"{contagem['registros']} registros, {contagem['erros']} linhas com erro", file=sys.stderr)
+    raise SystemExit(1 if contagem['erros'] else 0)
@@ -0,0 +1,345 @@
+import json
+import os
+from pathlib import Path
+from threading import RLock
+from typing import Dict, List, Optional, Set, Tuple, Type
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session as SessionORM, object_session
+from sqlmodel import Session, SQLModel, func, select
+
+from database.engine import carregar_config, engine
+from database.versao_dados import monitor_do_engine
+from models.animal import Animal
+from models.farmaco import Farmaco
+from models.protocolo import Protocolo
+from controllers.utils.titulacao import invalidar_grade
+
+# Tabelas de referência mantidas em memória (pequenas e lidas a cada clique)
+MODELOS = (Farmaco, Animal, Protocolo)
+
+# Versão do formato do arquivo de instantâneo (ver salvar_instantaneo)
+FORMATO_INSTANTANEO = 1
+# Acima disso a conciliação relê a tabela inteira em vez de um IN com os ids alterados
+LIMITE_RELEITURA = 2000
+
+
+class _Tabela:
+    """Cópias desvinculadas de uma tabela, indexadas por id e por nome"""
+
+    def __init__(self):
+        self.carregada = False
+        self.por_id: Dict[int, SQLModel] = {}
+        self.por_nome: Dict[str, List[int]] = {}
+        self.ordenados: Optional[List[SQLModel]] = None  # por (nome, id); refeito após alterações
+        self.pendentes: Set[int] = set()  # ids a reler do banco
+        # Marcas do banco quando a tabela foi lida inteira (ou conciliada): última seq do
+        # registro de alterações (None = sem registro) e maior id; usadas pelo instantâneo
+        self.seq: Optional[int] = None
+        self.max_id: Optional[int] = None
+        self.conciliar = False  # veio do instantâneo e ainda não foi conferida com o banco
+
+    def guardar(self, objeto: SQLModel) -> None:
+        self.remover(objeto.id)
+        self.por_id[objeto.id] = objeto
+        self.por_nome.setdefault(_chave_nome(objeto.nome), []).append(objeto.id)
+        self.ordenados = None
+
+    def remover(self, objeto_id: int) -> None:
+        antigo = self.por_id.pop(objeto_id, None)
+        if antigo is None:
+            return
+        chave = _chave_nome(antigo.nome)
+        ids = self.por_nome.get(chave, [])
+        if objeto_id in ids:
+            ids.remove(objeto_id)
+        if not ids:
+            self.por_nome.pop(chave, None)
+        self.ordenados = None
+
+
+def _chave_nome(nome: Optional[str]) -> str:
+    return (nome or "").strip().casefold()
+
+
+def _seq_alteracoes(conn: Connection) -> Optional[int]:
+    """Última seq do registro de alterações (database/sincronizacao.py); None sem registro"""
+    from database.sincronizacao import instalada
+    if not instalada(conn):
+        return None
+    return conn.exec_driver_sql("SELECT coalesce(max(seq), 0) FROM sinc_alteracao").scalar()
+
+
+def _marcas(session: Session, modelo: Type[SQLModel]) -> Tuple[Optional[int], int]:
+    # Lidas antes das linhas: o que mudar entre as duas leituras é relido na conciliação
+    seq = _seq_alteracoes(session.connection())
+    return seq, session.exec(select(func.max(modelo.id))).one() or 0
+
+
+def caminho_instantaneo(engine=engine) -> Optional[Path]:
+    """Arquivo do instantâneo (None para banco em memória)"""
+    configurado = carregar_config().get('arquivo_cache_referencia')
+    if configurado:
+        return Path(configurado)
+    banco = engine.url.database
+    if not banco or banco == ":memory:" or "mode=memory" in str(engine.url):
+        return None
+    return Path(banco).resolve().parent / "cache_referencia.json"
+
+
+class CacheReferencia:
+    """
+    Cache de leitura (read-through) de fármacos, animais e protocolos.
+
+    - Cada tabela é lida inteira no primeiro acesso; depois só os registros
+      alterados são relidos (um SELECT ... WHERE id IN para todos os pendentes).
+    - Eventos after_insert/after_update/after_delete marcam o registro como
+      pendente; o commit/rollback da sessão marca de novo, então uma leitura feita
+      entre o flush e o commit não deixa valor antigo no cache.
+    - Os objetos devolvidos são cópias compartilhadas: só leitura. Para editar,
+      carregue o registro numa Session.
+    - Abertura rápida da GUI: salvar_instantaneo() grava as tabelas carregadas num
+      arquivo JSON com as marcas do banco; restaurar_instantaneo() as devolve sem ler
+      o banco e conciliar() (em segundo plano) relê só o que mudou desde as marcas.
+    - Gravações de outros processos (ou de SQL direto) não geram eventos: antes de
+      responder, PRAGMA data_version é conferido (database/versao_dados.py) e, se
+      outra conexão gravou, todas as tabelas e as grades de titulação são descartadas.
+    """
+
+    def __init__(self, engine=engine):
+        self.engine = engine
+        self._lock = RLock()
+        self._tabelas: Dict[type, _Tabela] = {modelo: _Tabela() for modelo in MODELOS}
+        self._guardar_marcas = False  # ligado por restaurar_instantaneo()
+        self._geracao: Optional[int] = None  # geração do banco vista na última conferência
+
+    def conferir_banco(self) -> bool:
+        """Descarta tudo se outra conexão gravou no banco desde a última conferência"""
+        geracao = monitor_do_engine(self.engine).geracao()
+        with self._lock:
+            alterado = self._geracao is not None and geracao != self._geracao
+            self._geracao = geracao
+            if alterado:
+                for modelo in MODELOS:
+                    self._tabelas[modelo] = _Tabela()
+        if alterado:
+            invalidar_grade()
+        return alterado
+
+    def _tabela(self, modelo: Type[SQLModel]) -> _Tabela:
+        """Tabela do modelo já sincronizada com o banco"""
+        self.conferir_banco()
+        with self._lock:
+            tabela = self._tabelas[modelo]
+            if tabela.carregada and not tabela.pendentes:
+                return tabela
+
+            with Session(self.engine) as session:
+                if not tabela.carregada:
+                    if self._guardar_marcas:
+                        tabela.seq, tabela.max_id = _marcas(session, modelo)
+                    objetos = session.exec(select(modelo)).all()
+                    tabela.por_id.clear()
+                    tabela.por_nome.clear()
+                    tabela.carregada = True
+                else:
+                    ids = list(tabela.pendentes)
+                    objetos = session.exec(select(modelo).where(modelo.id.in_(ids))).all()
+                    for objeto_id in ids:  # excluídos não voltam na consulta
+                        tabela.remover(objeto_id)
+                tabela.pendentes.clear()
+                for objeto in objetos:
+                    tabela.guardar(modelo(**objeto.model_dump()))
+            return tabela
+
+    def obter(self, modelo: Type[SQLModel], objeto_id: int) -> Optional[SQLModel]:
+        return self._tabela(modelo).por_id.get(objeto_id)
+
+    def listar(self, modelo: Type[SQLModel]) -> List[SQLModel]:
+        """Todos os registros ordenados por nome (e id, entre nomes iguais)"""
+        with self._lock:
+            tabela = self._tabela(modelo)
+            if tabela.ordenados is None:
+                tabela.ordenados = sorted(tabela.por_id.values(),
+                                          key=lambda o: (_chave_nome(o.nome), o.id))
+            return tabela.ordenados
+
+    def por_nome(self, modelo: Type[SQLModel], nome: str) -> List[SQLModel]:
+        """Registros com o nome (sem diferenciar maiúsculas); nomes podem se repetir"""
+        with self._lock:
+            tabela = self._tabela(modelo)
+            return [tabela.por_id[i] for i in tabela.por_nome.get(_chave_nome(nome), [])]
+
+    # --- Invalidação ---
+    def marcar(self, modelo: Type[SQLModel], objeto_id: int) -> None:
+        """Registro alterado: será relido no próximo acesso à tabela"""
+        with self._lock:
+            tabela = self._tabelas[modelo]
+            if tabela.carregada and objeto_id is not None:
+                tabela.pendentes.add(objeto_id)
+
+    def limpar(self, modelo: Type[SQLModel] = None) -> None:
+        """Descarta a tabela (ou todas); usado após gravações por SQL direto"""
+        with self._lock:
+            for m in ([modelo] if modelo else MODELOS):
+                self._tabelas[m] = _Tabela()
+
+    # --- Instantâneo (abertura rápida) ---
+    def salvar_instantaneo(self, caminho: Path) -> int:
+        """
+        Grava as tabelas carregadas com as marcas do banco (esquema, última seq do
+        registro de alterações e maior id); devolve quantas foram gravadas.
+        """
+        from database.migracoes import versao_atual
+        tabelas = {}
+        with self._lock:
+            for modelo in MODELOS:
+                if not self._tabelas[modelo].carregada:
+                    continue
+                tabela = self._tabela(modelo)  # relê os pendentes
+                if tabela.max_id is None:
+                    continue  # carregada antes de ligar as marcas
+                colunas = [coluna.name for coluna in modelo.__table__.columns]
+                linhas = []
+                for objeto in tabela.por_id.values():
+                    dados = objeto.model_dump(mode="json")
+                    linhas.append([dados[coluna] for coluna in colunas])
+                tabelas[modelo.__tablename__] = {'seq': tabela.seq, 'max_id': tabela.max_id,
+                                                 'colunas': colunas, 'linhas': linhas}
+        with self.engine.connect() as conn:
+            esquema = versao_atual(conn)
+
+        caminho = Path(caminho)
+        temporario = caminho.with_suffix(".tmp")
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump({'formato': FORMATO_INSTANTANEO, 'banco': str(caminho_instantaneo(self.engine)),
+                       'esquema': esquema, 'tabelas': tabelas},
+                      arquivo, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temporario, caminho)
+        return len(tabelas)
+
+    def restaurar_instantaneo(self, caminho: Optional[Path]) -> List[str]:
+        """
+        Preenche as tabelas ainda não carregadas com o instantâneo, sem ler o banco;
+        devolve os nomes restaurados ([] se o arquivo falta, é de outro banco ou de
+        outra versão do esquema). Daqui em diante as cargas guardam as marcas usadas
+        por salvar_instantaneo(). Chame conciliar() em seguida.
+        """
+        from database.migracoes import MIGRACOES
+        self._guardar_marcas = True
+        if caminho is None:
+            return []
+        try:
+            with open(caminho, encoding="utf-8") as arquivo:
+                conteudo = json.load(arquivo)
+        except (OSError, ValueError):
+            return []
+        if (conteudo.get('formato') != FORMATO_INSTANTANEO
+                or conteudo.get('banco') != str(caminho_instantaneo(self.engine))
+                or conteudo.get('esquema') != MIGRACOES[-1][0]):
+            return []
+
+        restauradas = []
+        with self._lock:
+            for modelo in MODELOS:
+                salvo = conteudo['tabelas'].get(modelo.__tablename__)
+                if salvo is None or self._tabelas[modelo].carregada:
+                    continue
+                tabela = _Tabela()
+                for linha in salvo['linhas']:
+                    tabela.guardar(modelo.model_validate(dict(zip(salvo['colunas'], linha))))
+                tabela.seq, tabela.max_id = salvo['seq'], salvo['max_id']
+                tabela.carregada = tabela.conciliar = True
+                self._tabelas[modelo] = tabela
+                restauradas.append(modelo.__tablename__)
+        return restauradas
+
+    def conciliar(self) -> Dict[str, int]:
+        """
+        Confere as tabelas restauradas com o banco (feito para rodar fora da thread do
+        Tk); devolve {tabela: registros incluídos, alterados ou removidos}.
+
+        Alterados desde o instantâneo vêm do registro de alterações (seq maior que a
+        marca), inclusões dos ids acima do maior id salvo e exclusões da lista de ids.
+        Sem registro de alterações, com o registro reiniciado (ex: backup restaurado)
+        ou com alterações demais, a tabela é relida inteira.
+        """
+        from database.migracoes import MIGRACOES, versao_atual
+        resultado = {}
+        for modelo in MODELOS:
+            with self._lock:
+                tabela = self._tabelas[modelo]
+                if not tabela.conciliar:
+                    continue
+                ids_atuais = set(tabela.por_id)
+
+            with Session(self.engine) as session:
+                conn = session.connection()
+                seq, max_id = _marcas(session, modelo)
+                completa = (seq is None or tabela.seq is None or seq < tabela.seq
+                            or versao_atual(conn) != MIGRACOES[-1][0])
+                if not completa:
+                    alterados = {linha[0] for linha in conn.exec_driver_sql(
+                        "SELECT DISTINCT CASE WHEN a.chave LIKE '0:%' THEN CAST(substr(a.chave, 3) AS INTEGER) "
+                        "ELSE c.id_local END FROM sinc_alteracao AS a "
+                        "LEFT JOIN sinc_chave AS c ON c.tabela = a.tabela AND c.chave = a.chave "
+                        "WHERE a.seq > ? AND a.tabela = ?", (tabela.seq, modelo.__tablename__))
+                        if linha[0] is not None}
+                    alterados |= set(session.exec(select(modelo.id).where(modelo.id > tabela.max_id)).all())
+                    completa = len(alterados) > LIMITE_RELEITURA
+                if completa:
+                    objetos = session.exec(select(modelo)).all()
+                    removidos = ids_atuais - {objeto.id for objeto in objetos}
+                else:
+                    existentes = set(session.exec(select(modelo.id)).all())
+                    removidos = ids_atuais - existentes
+                    ids = sorted(alterados & existentes)
+                    objetos = []
+                    for inicio in range(0, len(ids), 500):
+                        objetos += session.exec(select(modelo).where(modelo.id.in_(ids[inicio:inicio + 500]))).all()
+
+            with self._lock:
+                if self._tabelas[modelo] is not tabela:
+                    continue  # descartada (limpar) durante a leitura: recarrega sozinha
+                trocados = set(removidos)
+                for objeto_id in removidos:
+                    tabela.remover(objeto_id)
+                for objeto in objetos:
+                    novo = modelo(**objeto.model_dump())
+                    antigo = tabela.por_id.get(novo.id)
+                    if antigo is None or antigo.model_dump() != novo.model_dump():
+                        tabela.guardar(novo)
+                        trocados.add(novo.id)
+                tabela.seq, tabela.max_id, tabela.conciliar = seq, max_id, False
+                resultado[modelo.__tablename__] = len(trocados)
+            if modelo is Farmaco:
+                # Grades de titulação montadas com a versão do instantâneo
+                for farmaco_id in trocados:
+                    invalidar_grade(farmaco_id)
+        return resultado
+
+
+# Instância compartilhada pelo app e controllers
+cache_referencia = CacheReferencia()
+
+_ALTERADOS = "cache_referencia_alterados"
+
+
+def _registro_alterado(mapper, connection, objeto: SQLModel) -> None:
+    cache_referencia.marcar(type(objeto), objeto.id)
+    session = object_session(objeto)
+    if session is not None:
+        session.info.setdefault(_ALTERADOS, set()).add((type(objeto), objeto.id))
+
+
+for _modelo in MODELOS:
+    for _evento in ("after_insert", "after_update", "after_delete"):
+        event.listen(_modelo, _evento, _registro_alterado)
+
+
+@event.listens_for(SessionORM, "after_commit")
+@event.listens_for(SessionORM, "after_soft_rollback")
+def _fim_transacao(session, *args) -> None:
+    for modelo, objeto_id in session.info.pop(_ALTERADOS, ()):
+        cache_referencia.marcar(modelo, objeto_id)
@@ -0,0 +1,248 @@
+from collections import OrderedDict
+from threading import RLock
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session as SessionORM, object_session
+from sqlmodel import Session
+
+from database.engine import engine
+from database.versao_dados import monitor_do_engine
+from models.farmaco import Farmaco
+from models.protocolo import Protocolo, ProtocoloFarmaco
+from controllers.utils.unidades import conferir_massas
+
+
+def compilar_formula(farmaco: Farmaco) -> Callable[[float, Optional[float]], float]:
+    """
+    Gera a função de dose do fármaco, com todos os fatores já resolvidos:
+      bolus:            Volume (ml)  = Peso × Dose / Concentração
+      infusão contínua: Taxa (ml/h)  = Peso × Dose × Fator tempo / Concentração
+    Quando dose e concentração usam massas diferentes (ex: µg/kg e mg/ml) o fator
+    de massa entra na mesma multiplicação. Sem unidade de concentração confirmada
+    (cadastro antigo) vale a fórmula de antes da unidade existir: concentração na
+    mesma massa da dose. Dose em UI com concentração em massa é recusada (ValueError).
+    """
+    unidade = farmaco.unidade
+    unidade_conc = farmaco.unidade_conc
+    if unidade_conc is None:
+        fator_massa = 1.0
+    else:
+        conferir_massas(farmaco.unidade_dose, farmaco.unidade_concentracao)
+        fator_massa = unidade.fator_massa_ug / unidade_conc.fator_massa_ug
+    fator = fator_massa if farmaco.modo_uso == "bolus" else fator_massa * unidade.fator_tempo_h
+    fator_por_concentracao = fator / farmaco.concentracao
+    dose_padrao = farmaco.dose
+
+    def calcular(peso_kg: float, dose: Optional[float] = None) -> float:
+        return peso_kg * (dose_padrao if dose is None else dose) * fator_por_concentracao
+
+    return calcular
+
+
+class CalculadoraDose:
+    """
+    Serviço único de cálculo de dose (GUI, CLI e prescrições).
+
+    - Cada fármaco é lido do banco uma vez e sua fórmula é compilada em uma closure.
+    - Resultados ficam em cache LRU com chave (farmaco_id, versão, peso, dose).
+    - A composição dos protocolos também fica em cache.
+    - Eventos do SQLAlchemy invalidam fármaco/protocolo no flush e de novo no fim da
+      transação (commit ou rollback): uma leitura feita entre os dois, que ainda vê
+      o valor antigo, não fica no cache.
+    - Versões só crescem (limpar() troca a época): uma leitura que começou antes de
+      uma invalidação guarda o resultado numa versão que não é mais consultada.
+    - Gravações de outros processos são vistas por PRAGMA data_version
+      (database/versao_dados.py): o cache inteiro é descartado antes de responder.
+    """
+
+    def __init__(self, engine=engine, tamanho_cache: int = 4096):
+        self.engine = engine
+        self.tamanho_cache = tamanho_cache
+        self._lock = RLock()
+        self._epoca = 0
+        self._versoes: Dict[int, int] = {}
+        self._versoes_protocolo: Dict[int, int] = {}
+        self._farmacos: Dict[int, Tuple[tuple, Farmaco, Callable]] = {}
+        self._protocolos: Dict[int, Tuple[tuple, List[Tuple[Farmaco, int]]]] = {}
+        self._resultados: "OrderedDict[tuple, float]" = OrderedDict()
+        self._geracao: Optional[int] = None
+
+    def _conferir_banco(self) -> None:
+        geracao = monitor_do_engine(self.engine).geracao()
+        with self._lock:
+            alterado = self._geracao is not None and geracao != self._geracao
+            self._geracao = geracao
+        if alterado:
+            self.limpar()
+
+    # --- Fármacos ---
+    def _versao(self, farmaco_id: int) -> tuple:
+        return self._epoca, self._versoes.get(farmaco_id, 0)
+
+    def obter_farmaco(self, farmaco_id: int, session: Session = None) -> Optional[Farmaco]:
+        """Fármaco em cache (só consulta o banco na primeira vez ou após edição)"""
+        item = self._carregar(farmaco_id, session)
+        return item[0] if item else None
+
+    def _carregar(self, farmaco_id: int, session: Session = None) -> Optional[Tuple[Farmaco, Callable]]:
+        self._conferir_banco()
+        with self._lock:
+            versao = self._versao(farmaco_id)
+            item = self._farmacos.get(farmaco_id)
+            if item and item[0] == versao:
+                return item[1], item[2]
+
+        if session is not None:
+            farmaco = session.get(Farmaco, farmaco_id)
+        else:
+            with Session(self.engine) as nova_sessao:
+                farmaco = nova_sessao.get(Farmaco, farmaco_id)
+        if farmaco is None:
+            return None
+        # Guardado com a versão de antes da leitura: se mudou no meio, já nasce vencido
+        return self._registrar(farmaco, versao)
+
+    def registrar_farmaco(self, farmaco: Farmaco) -> Farmaco:
+        """
+        Compila e guarda a fórmula de um fármaco já carregado.
+        Guarda uma cópia desvinculada da sessão (o objeto original pode expirar no commit).
+        """
+        return self._registrar(farmaco)[0]
+
+    def _registrar(self, farmaco: Farmaco, versao: tuple = None) -> Tuple[Farmaco, Callable]:
+        with self._lock:
+            item = self._farmacos.get(farmaco.id)
+            if versao is None:
+                versao = self._versao(farmaco.id)
+            if item and item[0] == versao:
+                return item[1], item[2]
+            copia = Farmaco(**farmaco.model_dump())
+            formula = compilar_formula(copia)
+            self._farmacos[farmaco.id] = (versao, copia, formula)
+            return copia, formula
+
+    def calcular(self, farmaco_id: int, peso_kg: float, dose: float = None,
+                 session: Session = None) -> Optional[float]:
+        """Dose em ml (bolus) ou taxa em ml/h (infusão contínua)"""
+        self._conferir_banco()
+        with self._lock:
+            chave = (farmaco_id, self._versao(farmaco_id), float(peso_kg), dose)
+            if chave in self._resultados:
+                self._resultados.move_to_end(chave)
+                return self._resultados[chave]
+
+        item = self._carregar(farmaco_id, session)
+        if item is None:
+            return None
+        resultado = item[1](peso_kg, dose)
+
+        with self._lock:
+            self._resultados[chave] = resultado
+            if len(self._resultados) > self.tamanho_cache:
+                self._resultados.popitem(last=False)
+        return resultado
+
+    def calcular_farmaco(self, farmaco: Farmaco, peso_kg: float, dose: float = None) -> float:
+        """Igual a calcular(), para quando o fármaco já está em mãos"""
+        if farmaco.id is None:
+            return compilar_formula(farmaco)(peso_kg, dose)
+        self.registrar_farmaco(farmaco)
+        return self.calcular(farmaco.id, peso_kg, dose)
+
+    # --- Protocolos ---
+    def farmacos_do_protocolo(self, protocolo_id: int, session: Session = None) -> List[Tuple[Farmaco, int]]:
+        """(fármaco, ordem) do protocolo, em cache até o protocolo ser alterado"""
+        self._conferir_banco()
+        with self._lock:
+            versao = self._epoca, self._versoes_protocolo.get(protocolo_id, 0)
+            item = self._protocolos.get(protocolo_id)
+            if item and item[0] == versao:
+                return item[1]
+
+        from controllers.protocolo_controller import obter_farmacos_do_protocolo
+        if session is not None:
+            itens = list(obter_farmacos_do_protocolo(session, protocolo_id))
+        else:
+            with Session(self.engine) as nova_sessao:
+                itens = list(obter_farmacos_do_protocolo(nova_sessao, protocolo_id))
+
+        itens = [(self.registrar_farmaco(farmaco), ordem) for farmaco, ordem in itens]
+        with self._lock:
+            self._protocolos[protocolo_id] = (versao, itens)
+        return itens
+
+    def calcular_protocolo(self, protocolo_id: int, peso_kg: float,
+                           session: Session = None) -> List[Tuple[Farmaco, int, float]]:
+        """(fármaco, ordem, dose_ml) para cada fármaco do protocolo"""
+        return [
+            (farmaco, ordem, self.calcular(farmaco.id, peso_kg))
+            for farmaco, ordem in self.farmacos_do_protocolo(protocolo_id, session)
+        ]
+
+    # --- Invalidação ---
+    def invalidar_farmaco(self, farmaco_id: int) -> None:
+        with self._lock:
+            self._versoes[farmaco_id] = self._versoes.get(farmaco_id, 0) + 1
+            self._farmacos.pop(farmaco_id, None)
+            for chave in [c for c in self._resultados if c[0] == farmaco_id]:
+                del self._resultados[chave]
+            # Protocolos guardam o objeto do fármaco; descarta os que o contêm
+            for protocolo_id in [p for p, (_, itens) in self._protocolos.items()
+                                 if any(f.id == farmaco_id for f, _ in itens)]:
+                self.invalidar_protocolo(protocolo_id)
+
+    def invalidar_protocolo(self, protocolo_id: int) -> None:
+        with self._lock:
+            self._versoes_protocolo[protocolo_id] = self._versoes_protocolo.get(protocolo_id, 0) + 1
+            self._protocolos.pop(protocolo_id, None)
+
+    def limpar(self) -> None:
+        """Descarta tudo; a nova época invalida também as leituras em andamento"""
+        with self._lock:
+            self._epoca += 1
+            self._versoes.clear()
+            self._versoes_protocolo.clear()
+            self._farmacos.clear()
+            self._protocolos.clear()
+            self._resultados.clear()
+
+
+# Instância compartilhada pelo app, controllers e prescrições
+calculadora_dose = CalculadoraDose()
+
+
+_ALTERADOS = "calculadora_dose_alterados"
+
+
+def _alterado(objeto, invalidar: Callable[[int], None], objeto_id: int) -> None:
+    """Invalida já (flush) e guarda para invalidar de novo no fim da transação"""
+    invalidar(objeto_id)
+    session = object_session(objeto)
+    if session is not None:
+        session.info.setdefault(_ALTERADOS, set()).add((invalidar, objeto_id))
+
+
+@event.listens_for(Farmaco, "after_update")
+@event.listens_for(Farmaco, "after_delete")
+def _farmaco_alterado(mapper, connection, farmaco: Farmaco) -> None:
+    _alterado(farmaco, calculadora_dose.invalidar_farmaco, farmaco.id)
+
+
+@event.listens_for(ProtocoloFarmaco, "after_insert")
+@event.listens_for(ProtocoloFarmaco, "after_update")
+@event.listens_for(ProtocoloFarmaco, "after_delete")
+def _protocolo_farmaco_alterado(mapper, connection, pf: ProtocoloFarmaco) -> None:
+    _alterado(pf, calculadora_dose.invalidar_protocolo, pf.protocolo_id)
+
+
+@event.listens_for(Protocolo, "after_delete")
+def _protocolo_excluido(mapper, connection, protocolo: Protocolo) -> None:
+    _alterado(protocolo, calculadora_dose.invalidar_protocolo, protocolo.id)
+
+
+@event.listens_for(SessionORM, "after_commit")
+@event.listens_for(SessionORM, "after_soft_rollback")
+def _fim_transacao(session, *args) -> None:
+    for invalidar, objeto_id in session.info.pop(_ALTERADOS, ()):
+        invalidar(objeto_id)
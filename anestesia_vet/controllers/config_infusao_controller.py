@@ -2,12 +2,17 @@ from sqlmodel import Session
 from sqlmodel import select
 from models.config_infusao import ConfigInfusao, TipoEquipo
 from typing import Dict, Optional
+from controllers.utils.unidades import conferir_massas, fator_dose_ug_kg_h, fator_concentracao_ug_ml
 import math
 
 def criar_config_infusao(session: Session, peso_kg: float, 
                         volume_bolsa_ml: float = 20.0,
                         equipo_tipo: str = "macrogotas",
                         modo_calculo: str = "peso") -> ConfigInfusao:
+    """
+    Adiciona a configuração à sessão e faz flush (config.id já disponível).
+    O commit fica com quem chama, junto com a sessão anestésica: uma transação só.
+    """
     config = ConfigInfusao(
         peso_kg=peso_kg,
         volume_bolsa_ml=volume_bolsa_ml,
@@ -15,8 +20,7 @@ def criar_config_infusao(session: Session, peso_kg: float,
         modo_calculo=modo_calculo
     )
     session.add(config)
-    session.commit()
-    session.refresh(config)
+    session.flush()
     return config
 
 def calcular_infusao_continua(
@@ -26,20 +30,17 @@ def calcular_infusao_continua(
     concentracao: float,
     volume_bolsa_ml: float = None,
     equipo_tipo: str = "macrogotas",
-    modo: str = "taxa"
+    modo: str = "taxa",
+    unidade_concentracao: str = "mg/ml"
 ) -> dict:
-    # Converter unidades para padrão (mcg/kg/h)
-    if "mg" in unidade_dose:
-        dose_conv = dose * 1000  # mg para mcg
-    else:
-        dose_conv = dose
-    
-    # Se unidade for por minuto, converter para por hora
-    if "/min" in unidade_dose:
-        dose_conv *= 60
+    # UI só com UI (ValueError se dose e concentração não combinam)
+    conferir_massas(unidade_dose, unidade_concentracao)
+
+    # Converter unidades para padrão (mcg/kg/h) com o fator em cache da unidade
+    dose_conv = dose * fator_dose_ug_kg_h(unidade_dose)
     
     # Converter concentração para mcg/ml
-    concentracao_conv = concentracao * 1000  # mg/ml para mcg/ml
+    concentracao_conv = concentracao * fator_concentracao_ug_ml(unidade_concentracao)
     
     if modo == "taxa":
         # Cálculo direto da taxa (ml/h) = (Dose * Peso) / Concentração
@@ -155,7 +156,8 @@ def calcular_infusao_planilha(
     equipo_tipo: str,
     dose_farmaco: float,
     unidade_dose: str,
-    concentracao: float
+    concentracao: float,
+    unidade_concentracao: str = "mg/ml"
 ) -> dict:
     # Calcular vazão (ml/h)
     vazao_ml_h = peso_kg * taxa_ml_kg_h
@@ -167,20 +169,15 @@ def calcular_infusao_planilha(
     # Calcular duração (h)
     duracao_h = volume_bolsa_ml / vazao_ml_h if vazao_ml_h > 0 else 0
     
-    # Converter unidade de dose para µg/kg/h
-    if "mg" in unidade_dose:
-        dose_conv = dose_farmaco * 1000  # mg para µg
-    else:
-        dose_conv = dose_farmaco
-    
-    if "/min" in unidade_dose:
-        dose_conv *= 60  # converter min para hora
+    # Converter unidade de dose para µg/kg/h (UI só com UI)
+    conferir_massas(unidade_dose, unidade_concentracao)
+    dose_conv = dose_farmaco * fator_dose_ug_kg_h(unidade_dose)
     
     # Calcular dose total (µg)
     dose_total_ug = dose_conv * peso_kg * duracao_h
     
     # Calcular volume do fármaco (ml)
-    volume_farmaco_ml = dose_total_ug / (concentracao * 1000)  # concentração em mg/ml
+    volume_farmaco_ml = dose_total_ug / (concentracao * fator_concentracao_ug_ml(unidade_concentracao))
     
     # Formatar duração
     horas = int(duracao_h)
@@ -210,20 +207,13 @@ def calcular_gotas_min(vazao_ml_h: float, equipo_tipo: str) -> float:
 
 def calcular_dose_total(dose: float, unidade: str, peso_kg: float, duracao_h: float) -> float:
     """Calcula a dose total em mcg"""
-    # Converter para mcg/kg/h se necessário
-    if "mg" in unidade:
-        dose_mcg = dose * 1000
-    else:
-        dose_mcg = dose
-    
-    if "/min" in unidade:
-        dose_mcg_h = dose_mcg * 60
-    else:
-        dose_mcg_h = dose_mcg
+    # Converter para mcg/kg/h
+    dose_mcg_h = dose * fator_dose_ug_kg_h(unidade)
     
     return dose_mcg_h * peso_kg * duracao_h
 
-def calcular_volume_farmaco(dose_total_mcg: float, concentracao_mg_ml: float) -> float:
+def calcular_volume_farmaco(dose_total_mcg: float, concentracao_mg_ml: float,
+                            unidade_concentracao: str = "mg/ml") -> float:
     """Calcula o volume do fármaco em ml"""
-    concentracao_mcg_ml = concentracao_mg_ml * 1000
+    concentracao_mcg_ml = concentracao_mg_ml * fator_concentracao_ug_ml(unidade_concentracao)
     return dose_total_mcg / concentracao_mcg_ml if concentracao_mcg_ml > 0 else 0
\ No newline at end of file
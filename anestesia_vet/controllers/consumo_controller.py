@@ -0,0 +1,312 @@
+"""
+Consumo de fármacos por dia, fármaco e espécie (tabela ConsumoDiario).
+
+Os totais são mantidos de forma incremental por eventos do ORM em SessaoAnestesia e
+SessaoAvulsaAnestesia, ligados por registrar_eventos() ao importar este módulo (que
+database/engine.py importa): cada inserção, edição ou exclusão soma/subtrai a sua parte
+na mesma transação da sessão. Mudar a concentração ou a unidade de um fármaco pelo ORM
+recalcula os mg dele. Relatórios leem só a tabela de totais (no máximo uma linha
+por dia × fármaco × espécie), então não ficam mais lentos com o crescimento do histórico.
+Fármacos sem unidade de concentração confirmada (ou em UI) ficam sem total em mg.
+
+Gravações que não passam pelo ORM (SQL direto, delete() em massa) e mudanças de
+espécie do animal não atualizam os totais: rode
+reconstruir_consumo() depois delas. O arquivamento de sessões (database/arquivo.py)
+não mexe nos totais, e reconstruir_consumo() também lê os arquivos.
+
+Uso (a partir de anestesia_vet/):
+    python -m controllers.consumo_controller --reconstruir
+    python -m controllers.consumo_controller --mes 2024-05
+"""
+import argparse
+import calendar
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, event, func, inspect, select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import object_session
+from sqlalchemy.orm.util import identity_key
+from sqlmodel import Session
+
+from database.engine import engine, obter_engine_leitura
+from models.animal import Animal
+from models.consumo import ConsumoDiario
+from models.farmaco import Farmaco
+from models.sessao import SessaoAnestesia, SessaoAvulsaAnestesia
+from controllers.utils.unidades import interpretar_unidade
+
+ESPECIE_NAO_INFORMADA = "não informada"
+
+# (dia, id_farmaco, especie)
+Chave = Tuple[date, int, str]
+
+
+@dataclass
+class LinhaConsumo:
+    farmaco: str
+    especie: Optional[str]  # None quando o relatório não separa por espécie
+    sessoes: int
+    total_ml: float
+    total_mg: Optional[float]  # None para fármacos em UI
+
+
+def _especie(texto: Optional[str]) -> str:
+    return (texto or "").strip() or ESPECIE_NAO_INFORMADA
+
+
+def _carregado(origem, modelo, id_, *campos):
+    """
+    Objeto já presente na sessão ORM de origem com os campos carregados, ou None
+    (campos expirados pelo commit fariam o ORM consultar o banco de novo).
+    """
+    session = object_session(origem) if origem is not None else None
+    if session is None or id_ is None:
+        return None
+    objeto = session.identity_map.get(identity_key(modelo, id_))
+    if objeto is None or inspect(objeto).unloaded.intersection(campos):
+        return None
+    return objeto
+
+
+def _fator_mg(conn: Connection, id_farmaco: int, origem=None) -> Optional[float]:
+    """
+    mg por ml do fármaco (None se a concentração não for em massa ou se a unidade
+    ainda não foi confirmada). origem: objeto
+    de uma sessão ORM; se o fármaco já estiver carregado nela, não consulta o banco.
+    """
+    linha = _carregado(origem, Farmaco, id_farmaco, 'concentracao', 'unidade_concentracao')
+    if linha is None:
+        linha = conn.execute(
+            select(Farmaco.concentracao, Farmaco.unidade_concentracao).where(Farmaco.id == id_farmaco)
+        ).first()
+    if linha is None or linha.unidade_concentracao is None:
+        return None
+    try:
+        unidade = interpretar_unidade(linha.unidade_concentracao)
+    except ValueError:
+        return None
+    if unidade.massa == "ui":
+        return None
+    return linha.concentracao * unidade.fator_mg
+
+
+def _somar(conn: Connection, chave: Chave, ml: float, sessoes: int, origem=None) -> None:
+    """Soma (ou subtrai, com sessoes < 0) a parte de uma ou mais sessões no total do dia"""
+    dia, id_farmaco, especie = chave
+    fator = _fator_mg(conn, id_farmaco, origem)
+    mg = ml * fator if fator is not None else 0.0
+    stmt = insert(ConsumoDiario).values(
+        dia=dia, id_farmaco=id_farmaco, especie=especie, total_ml=ml, total_mg=mg, sessoes=sessoes)
+    tabela = ConsumoDiario.__table__
+    conn.execute(stmt.on_conflict_do_update(
+        index_elements=["dia", "id_farmaco", "especie"],
+        set_={
+            "total_ml": tabela.c.total_ml + stmt.excluded.total_ml,
+            "total_mg": tabela.c.total_mg + stmt.excluded.total_mg,
+            "sessoes": tabela.c.sessoes + stmt.excluded.sessoes,
+        }))
+    if sessoes < 0:
+        conn.execute(delete(ConsumoDiario).where(
+            ConsumoDiario.dia == dia, ConsumoDiario.id_farmaco == id_farmaco,
+            ConsumoDiario.especie == especie, ConsumoDiario.sessoes <= 0))
+
+
+def _parte_do_objeto(conn: Connection, sessao) -> Tuple[Chave, float]:
+    """Chave e ml de uma sessão a partir dos valores do objeto (novos)"""
+    if isinstance(sessao, SessaoAvulsaAnestesia):
+        especie = sessao.especie
+    elif sessao.id_animal is not None:
+        animal = _carregado(sessao, Animal, sessao.id_animal, 'especie')
+        if animal is not None:
+            especie = animal.especie
+        else:
+            especie = conn.execute(select(Animal.especie).where(Animal.id == sessao.id_animal)).scalar()
+    else:
+        especie = None
+    data = sessao.data or datetime.now()
+    return (data.date(), sessao.id_farmaco, _especie(especie)), sessao.dose_utilizada_ml
+
+
+def parte_gravada(conn: Connection, modelo, sessao_id: int) -> Optional[Tuple[Chave, float]]:
+    """Chave e ml de uma sessão como está gravada (valores anteriores à edição)"""
+    if modelo is SessaoAvulsaAnestesia:
+        stmt = select(modelo.data, modelo.id_farmaco, modelo.dose_utilizada_ml, modelo.especie)
+    else:
+        stmt = (select(modelo.data, modelo.id_farmaco, modelo.dose_utilizada_ml, Animal.especie)
+                .outerjoin(Animal, Animal.id == modelo.id_animal))
+    linha = conn.execute(stmt.where(modelo.id == sessao_id)).first()
+    if linha is None:
+        return None
+    data, id_farmaco, ml, especie = linha
+    return (data.date(), id_farmaco, _especie(especie)), ml
+
+
+def _ao_inserir(_mapper, conn, sessao) -> None:
+    chave, ml = _parte_do_objeto(conn, sessao)
+    _somar(conn, chave, ml, 1, sessao)
+
+
+def _ao_atualizar(_mapper, conn, sessao) -> None:
+    # before_update: a linha no banco ainda tem os valores antigos
+    ajustar_consumo(conn, parte_gravada(conn, type(sessao), sessao.id), _parte_do_objeto(conn, sessao), sessao)
+
+
+def _ao_excluir(_mapper, conn, sessao) -> None:
+    ajustar_consumo(conn, parte_gravada(conn, type(sessao), sessao.id), None, sessao)
+
+
+def ajustar_consumo(conn: Connection, antiga: Optional[Tuple[Chave, float]],
+                    nova: Optional[Tuple[Chave, float]], origem=None) -> None:
+    """
+    Troca a parte antiga de uma sessão pela nova (None = sessão inexistente). Também
+    usada por quem grava sessões por SQL direto (ex: database/sincronizacao.py).
+    """
+    if antiga == nova:
+        return
+    if antiga is not None:
+        _somar(conn, antiga[0], -antiga[1], -1, origem)
+    if nova is not None:
+        _somar(conn, nova[0], nova[1], 1, origem)
+
+
+def _ao_mudar_farmaco(_mapper, conn, farmaco) -> None:
+    # after_update: o histórico dos atributos ainda mostra o que mudou neste flush
+    estado = inspect(farmaco)
+    if not any(estado.attrs[campo].history.has_changes() for campo in ('concentracao', 'unidade_concentracao')):
+        return
+    fator = _fator_mg(conn, farmaco.id, farmaco)
+    conn.execute(update(ConsumoDiario).where(ConsumoDiario.id_farmaco == farmaco.id).values(
+        total_mg=ConsumoDiario.total_ml * fator if fator is not None else 0.0))
+
+
+_EVENTOS = (
+    (SessaoAnestesia, "after_insert", _ao_inserir),
+    (SessaoAnestesia, "before_update", _ao_atualizar),
+    (SessaoAnestesia, "before_delete", _ao_excluir),
+    (SessaoAvulsaAnestesia, "after_insert", _ao_inserir),
+    (SessaoAvulsaAnestesia, "before_update", _ao_atualizar),
+    (SessaoAvulsaAnestesia, "before_delete", _ao_excluir),
+    (Farmaco, "after_update", _ao_mudar_farmaco),
+)
+
+
+def registrar_eventos() -> None:
+    """
+    Liga a manutenção dos totais às gravações pelo ORM. Roda ao importar o módulo;
+    chamar de novo não duplica os eventos.
+    """
+    for modelo, nome, funcao in _EVENTOS:
+        if not event.contains(modelo, nome, funcao):
+            event.listen(modelo, nome, funcao)
+
+
+registrar_eventos()
+
+
+def reconstruir(conn: Connection, modelos: Tuple = (SessaoAnestesia, SessaoAvulsaAnestesia)) -> int:
+    """
+    Refaz ConsumoDiario a partir de todas as sessões; devolve o número de linhas.
+    modelos: as duas tabelas de sessões (ou as do histórico, ver database/arquivo.py).
+    """
+    normal, avulsa = modelos
+    totais: Dict[Chave, List] = defaultdict(lambda: [0.0, 0])
+    normais = (
+        select(func.date(normal.data), normal.id_farmaco, Animal.especie,
+               func.sum(normal.dose_utilizada_ml), func.count())
+        .outerjoin(Animal, Animal.id == normal.id_animal)
+        .group_by(func.date(normal.data), normal.id_farmaco, Animal.especie)
+    )
+    avulsas = (
+        select(func.date(avulsa.data), avulsa.id_farmaco, avulsa.especie,
+               func.sum(avulsa.dose_utilizada_ml), func.count())
+        .group_by(func.date(avulsa.data), avulsa.id_farmaco, avulsa.especie)
+    )
+    for stmt in (normais, avulsas):
+        for dia, id_farmaco, especie, ml, quantidade in conn.execute(stmt):
+            total = totais[(date.fromisoformat(dia), id_farmaco, _especie(especie))]
+            total[0] += ml
+            total[1] += quantidade
+
+    fatores: Dict[int, Optional[float]] = {}
+    linhas = []
+    for (dia, id_farmaco, especie), (ml, quantidade) in totais.items():
+        if id_farmaco not in fatores:
+            fatores[id_farmaco] = _fator_mg(conn, id_farmaco)
+        fator = fatores[id_farmaco]
+        linhas.append({'dia': dia, 'id_farmaco': id_farmaco, 'especie': especie, 'total_ml': ml,
+                       'total_mg': ml * fator if fator is not None else 0.0, 'sessoes': quantidade})
+
+    conn.execute(delete(ConsumoDiario))
+    if linhas:
+        conn.execute(insert(ConsumoDiario), linhas)
+    return len(linhas)
+
+
+def reconstruir_consumo(engine: Engine = engine) -> int:
+    """reconstruir() numa transação própria, incluindo as sessões já arquivadas"""
+    from database.arquivo import conexao_historico, modelos_historico  # arquivo importa database.engine, que importa este módulo
+    with conexao_historico(engine) as conn:
+        with conn.begin():
+            return reconstruir(conn, modelos_historico(conn)[:2])
+
+
+def consumo_periodo(session: Session, inicio: date, fim: date,
+                    por_especie: bool = True) -> List[LinhaConsumo]:
+    """Totais por fármaco (e espécie) de inicio a fim, inclusive, lidos só de ConsumoDiario"""
+    colunas = [ConsumoDiario.id_farmaco] + ([ConsumoDiario.especie] if por_especie else [])
+    totais = (
+        select(*colunas,
+               func.sum(ConsumoDiario.sessoes).label("sessoes"),
+               func.sum(ConsumoDiario.total_ml).label("total_ml"),
+               func.sum(ConsumoDiario.total_mg).label("total_mg"))
+        .where(ConsumoDiario.dia >= inicio, ConsumoDiario.dia <= fim)
+        .group_by(*colunas)
+        .subquery()
+    )
+    stmt = (
+        select(Farmaco.nome, Farmaco.unidade_concentracao, totais)
+        .select_from(totais)
+        .outerjoin(Farmaco, Farmaco.id == totais.c.id_farmaco)
+        .order_by(Farmaco.nome, *([totais.c.especie] if por_especie else []))
+    )
+    resultado = []
+    for linha in session.execute(stmt):
+        try:
+            em_massa = (linha.unidade_concentracao is not None
+                        and interpretar_unidade(linha.unidade_concentracao).massa != "ui")
+        except ValueError:
+            em_massa = False
+        resultado.append(LinhaConsumo(
+            farmaco=linha.nome or f"Fármaco {linha.id_farmaco}",
+            especie=linha.especie if por_especie else None,
+            sessoes=linha.sessoes,
+            total_ml=linha.total_ml,
+            total_mg=linha.total_mg if em_massa else None,
+        ))
+    return resultado
+
+
+def consumo_mensal(session: Session, ano: int, mes: int, por_especie: bool = True) -> List[LinhaConsumo]:
+    ultimo_dia = calendar.monthrange(ano, mes)[1]
+    return consumo_periodo(session, date(ano, mes, 1), date(ano, mes, ultimo_dia), por_especie)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consumo de fármacos por dia, fármaco e espécie")
+    parser.add_argument("--reconstruir", action="store_true", help="refaz os totais a partir das sessões")
+    parser.add_argument("--mes", help="mostra o consumo do mês (AAAA-MM)")
+    args = parser.parse_args()
+
+    if args.reconstruir:
+        print(f"{reconstruir_consumo(engine)} linhas de consumo reconstruídas.")
+    if args.mes:
+        ano, mes = (int(parte) for parte in args.mes.split("-"))
+        with Session(obter_engine_leitura()) as session:
+            for linha in consumo_mensal(session, ano, mes):
+                mg = f"{linha.total_mg:.2f} mg" if linha.total_mg is not None else "-"
+                print(f"{linha.farmaco:<30} {linha.especie:<15} {linha.sessoes:>5} sessões "
+                      f"{linha.total_ml:>10.2f} ml {mg:>14}")
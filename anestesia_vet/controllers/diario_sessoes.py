@@ -0,0 +1,220 @@
+"""
+Diário de sessões (write-behind) para plantões com muitos registros.
+
+Cada registro é acrescentado a um arquivo JSON Lines local (com fsync) e volta
+imediatamente; uma thread grava os registros pendentes no SQLite em lotes, numa
+única transação por lote (group commit). A mesma transação guarda em DiarioSessao
+o último número de sequência gravado, então:
+
+- ao abrir, registros do arquivo com seq maior que o confirmado são regravados
+  (recuperação após queda do programa ou do computador);
+- um registro nunca é gravado duas vezes, mesmo se a queda ocorrer logo após o commit.
+
+Quando todos os registros estão confirmados o arquivo é truncado. Se o banco
+recusar um lote, os registros continuam no arquivo, a thread tenta de novo a cada
+`intervalo_s` e ao_erro avisa a primeira falha de cada sequência.
+"""
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from database.engine import engine
+from models.config_infusao import ConfigInfusao, TipoEquipo
+from models.diario import DiarioSessao
+from models.sessao import SessaoAnestesia
+from controllers.sessao_controller import gravar_sessoes
+
+CAMINHO_PADRAO = "diario_sessoes.jsonl"
+
+
+def _sessao_para_dict(sessao: SessaoAnestesia) -> dict:
+    dados = sessao.model_dump(exclude={"id", "config_infusao_id"})
+    dados["data"] = sessao.data.isoformat() if sessao.data else None
+    return dados
+
+
+def _config_para_dict(config: ConfigInfusao) -> dict:
+    dados = config.model_dump(exclude={"id"})
+    dados["equipo_tipo"] = TipoEquipo(config.equipo_tipo).value
+    return dados
+
+
+def _montar_registro(entrada: dict) -> Tuple[SessaoAnestesia, Optional[ConfigInfusao]]:
+    dados = dict(entrada["sessao"])
+    if dados.get("data"):
+        dados["data"] = datetime.fromisoformat(dados["data"])
+    config = None
+    if entrada.get("config"):
+        config = ConfigInfusao(**{**entrada["config"],
+                                  "equipo_tipo": TipoEquipo(entrada["config"]["equipo_tipo"])})
+    return SessaoAnestesia(**dados), config
+
+
+def ler_diario(caminho: str) -> List[dict]:
+    """Entradas do arquivo; linhas incompletas (queda durante a escrita) são puladas"""
+    if not os.path.exists(caminho):
+        return []
+    entradas = []
+    with open(caminho, encoding="utf-8") as arquivo:
+        for linha in arquivo:
+            try:
+                entrada = json.loads(linha)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(entrada, dict) and "seq" in entrada and "sessao" in entrada:
+                entradas.append(entrada)
+    return entradas
+
+
+class DiarioSessoes:
+    def __init__(self, caminho: str = CAMINHO_PADRAO, engine: Engine = engine,
+                 tamanho_lote: int = 50, intervalo_s: float = 2.0, sincronizar: bool = True,
+                 ao_gravar: Callable[[int], None] = None, nome: str = None,
+                 ao_erro: Callable[[BaseException], None] = None):
+        """
+        tamanho_lote: grava assim que houver esse número de registros pendentes.
+        intervalo_s: prazo máximo de um registro no diário antes de ir ao banco
+            (e espera entre tentativas depois de uma falha).
+        sincronizar: fsync do arquivo a cada registro (desligar só em testes).
+        ao_gravar(n): chamado pela thread de gravação após cada lote confirmado.
+        ao_erro(erro): chamado pela thread de gravação na primeira falha depois de
+            um lote gravado (falhas seguidas não repetem o aviso).
+        """
+        self.caminho = str(caminho)
+        self.nome = nome or Path(self.caminho).name
+        self.engine = engine
+        self.tamanho_lote = tamanho_lote
+        self.intervalo_s = intervalo_s
+        self.sincronizar = sincronizar
+        self.ao_gravar = ao_gravar
+        self.ao_erro = ao_erro
+        self.ultimo_erro: Optional[BaseException] = None
+
+        self._lock = threading.Lock()          # arquivo, seq e pendentes
+        self._gravando = threading.Lock()      # um lote por vez
+        self._condicao = threading.Condition(self._lock)
+        self._pendentes: List[dict] = []
+        self._seq = 0
+        self._arquivo = None
+        self._thread: Optional[threading.Thread] = None
+        self._parar = False
+
+    @property
+    def pendentes(self) -> int:
+        with self._lock:
+            return len(self._pendentes)
+
+    def _seq_confirmado(self, session: Session) -> int:
+        controle = session.get(DiarioSessao, self.nome)
+        return controle.seq_confirmado if controle else 0
+
+    def abrir(self, iniciar_thread: bool = True) -> int:
+        """
+        Recupera o que não foi confirmado e começa a aceitar registros; retorna quantos
+        recuperou. Só lê o controle e o arquivo (rápido o bastante para a abertura da
+        GUI): com a thread, os recuperados são gravados por ela; sem, aqui mesmo.
+        """
+        with Session(self.engine) as session:
+            confirmado = self._seq_confirmado(session)
+        entradas = ler_diario(self.caminho)
+        with self._lock:
+            self._pendentes = [e for e in entradas if e["seq"] > confirmado]
+            self._seq = max([confirmado] + [e["seq"] for e in entradas])
+            # Reescreve só o que falta gravar (descarta a linha incompleta, se houver)
+            with open(self.caminho, "w", encoding="utf-8") as arquivo:
+                arquivo.writelines(json.dumps(e, ensure_ascii=False) + "\n" for e in self._pendentes)
+            self._arquivo = open(self.caminho, "a", encoding="utf-8")
+        recuperados = len(self._pendentes)
+        if iniciar_thread:
+            self._parar = False
+            self._thread = threading.Thread(target=self._laco, name="diario-sessoes", daemon=True)
+            self._thread.start()
+        elif recuperados:
+            self.gravar_pendentes()
+        return recuperados
+
+    def registrar(self, sessao: SessaoAnestesia, config: ConfigInfusao = None) -> int:
+        """Acrescenta a sessão ao diário (durável ao retornar); devolve o número de sequência"""
+        if self._arquivo is None:
+            raise RuntimeError("Diário fechado: chame abrir() antes de registrar")
+        with self._lock:
+            self._seq += 1
+            entrada = {
+                "seq": self._seq,
+                "sessao": _sessao_para_dict(sessao),
+                "config": _config_para_dict(config) if config is not None else None,
+            }
+            self._arquivo.write(json.dumps(entrada, ensure_ascii=False) + "\n")
+            self._arquivo.flush()
+            if self.sincronizar:
+                os.fsync(self._arquivo.fileno())
+            self._pendentes.append(entrada)
+            if len(self._pendentes) >= self.tamanho_lote:
+                self._condicao.notify()
+            return entrada["seq"]
+
+    def gravar_pendentes(self) -> int:
+        """Group commit: grava os pendentes numa transação e devolve quantos foram gravados"""
+        with self._gravando:
+            with self._lock:
+                lote = list(self._pendentes)
+            if not lote:
+                return 0
+            with Session(self.engine) as session:
+                controle = session.get(DiarioSessao, self.nome) or DiarioSessao(nome=self.nome)
+                controle.seq_confirmado = lote[-1]["seq"]
+                session.add(controle)
+                gravar_sessoes(session, [_montar_registro(e) for e in lote])
+
+            with self._lock:
+                del self._pendentes[:len(lote)]
+                if not self._pendentes:
+                    # Tudo confirmado no banco: o arquivo pode recomeçar vazio
+                    self._arquivo.truncate(0)
+                    self._arquivo.seek(0)
+            if self.ao_gravar:
+                self.ao_gravar(len(lote))
+            return len(lote)
+
+    def _tentar_gravar(self) -> None:
+        try:
+            self.gravar_pendentes()
+            self.ultimo_erro = None
+        except Exception as erro:  # banco ocupado/indisponível: tenta no próximo ciclo
+            primeira = self.ultimo_erro is None
+            self.ultimo_erro = erro
+            if primeira and self.ao_erro:
+                self.ao_erro(erro)
+
+    def _laco(self) -> None:
+        self._tentar_gravar()  # recuperados na abertura
+        while True:
+            with self._lock:
+                # Depois de uma falha espera o intervalo mesmo com o lote cheio
+                if not self._parar and (len(self._pendentes) < self.tamanho_lote or self.ultimo_erro is not None):
+                    self._condicao.wait(self.intervalo_s)
+                if self._parar:
+                    return
+            self._tentar_gravar()
+
+    def fechar(self) -> None:
+        """Para a thread e grava o que faltar (o que não gravar fica no arquivo para a próxima abertura)"""
+        if self._thread is not None:
+            with self._lock:
+                self._parar = True
+                self._condicao.notify()
+            self._thread.join()
+            self._thread = None
+        try:
+            self.gravar_pendentes()
+        finally:
+            with self._lock:
+                if self._arquivo is not None:
+                    self._arquivo.close()
+                    self._arquivo = None
@@ -0,0 +1,273 @@
+import csv
+import json
+import os
+import shutil
+import struct
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+from sqlalchemy import literal, select
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from database.arquivo import conexao_historico, modelos_historico
+from database.engine import obter_engine_leitura
+from models.animal import Animal
+from models.config_infusao import ConfigInfusao
+from models.farmaco import Farmaco
+from models.sessao import SessaoAnestesia, SessaoAvulsaAnestesia
+from controllers.sessao_controller import ORIGEM_AVULSA, ORIGEM_NORMAL
+
+# (coluna, tipo no formato colunar). "texto" = código int32 + dicionário de valores;
+# observacoes (texto livre) só vai para CSV/JSONL
+COLUNAS = [
+    ("origem", "i1"),
+    ("id", "i8"),
+    ("data", "M8[us]"),
+    ("animal", "texto"),
+    ("especie", "texto"),
+    ("peso_kg", "f8"),
+    ("farmaco_id", "i8"),
+    ("farmaco", "texto"),
+    ("dose", "f8"),
+    ("unidade_dose", "texto"),
+    ("concentracao", "f8"),
+    ("unidade_concentracao", "texto"),
+    ("modo_uso", "texto"),
+    ("dose_utilizada_ml", "f8"),
+    ("config_infusao_id", "i8"),
+    ("taxa_ml_kg_h", "f8"),
+    ("equipo_tipo", "texto"),
+    ("volume_bolsa_ml", "f8"),
+    ("observacoes", None),
+]
+NOMES = [nome for nome, _ in COLUNAS]
+
+MAGICO = b"ANVCOL1\0"
+ALINHAMENTO = 64
+
+
+def _consultas(inicio: Optional[datetime], fim: Optional[datetime],
+               modelos=(SessaoAnestesia, SessaoAvulsaAnestesia, ConfigInfusao)):
+    """
+    Uma consulta por tabela, ordenada pela data. modelos: as tabelas do banco principal
+    ou as do histórico com os arquivos anuais (database/arquivo.py).
+    """
+    normal, avulsa, config = modelos
+    normais = (
+        select(
+            literal(ORIGEM_NORMAL), normal.id, normal.data,
+            Animal.nome, Animal.especie, Animal.peso_kg,
+            normal.id_farmaco, Farmaco.nome, Farmaco.dose, Farmaco.unidade_dose,
+            Farmaco.concentracao, Farmaco.unidade_concentracao, Farmaco.modo_uso,
+            normal.dose_utilizada_ml, normal.config_infusao_id,
+            config.taxa_ml_kg_h, config.equipo_tipo, config.volume_bolsa_ml,
+            normal.observacoes,
+        )
+        .outerjoin(Animal, Animal.id == normal.id_animal)
+        .outerjoin(Farmaco, Farmaco.id == normal.id_farmaco)
+        .outerjoin(config, config.id == normal.config_infusao_id)
+        .order_by(normal.data, normal.id)
+    )
+    avulsas = (
+        select(
+            literal(ORIGEM_AVULSA), avulsa.id, avulsa.data,
+            avulsa.nome_animal, avulsa.especie, avulsa.peso_kg,
+            avulsa.id_farmaco, Farmaco.nome, Farmaco.dose, Farmaco.unidade_dose,
+            Farmaco.concentracao, Farmaco.unidade_concentracao, Farmaco.modo_uso,
+            avulsa.dose_utilizada_ml, literal(None), literal(None), literal(None), literal(None),
+            avulsa.observacoes,
+        )
+        .outerjoin(Farmaco, Farmaco.id == avulsa.id_farmaco)
+        .order_by(avulsa.data, avulsa.id)
+    )
+    for stmt, modelo in ((normais, normal), (avulsas, avulsa)):
+        if inicio is not None:
+            stmt = stmt.where(modelo.data >= inicio)
+        if fim is not None:
+            stmt = stmt.where(modelo.data < fim)
+        yield stmt
+
+
+def iterar_lotes(engine: Engine = None, inicio: datetime = None, fim: datetime = None,
+                 tamanho_lote: int = 5000) -> Iterator[List[tuple]]:
+    """
+    Histórico completo (sessões normais e avulsas, inclusive as arquivadas) em lotes de
+    tuplas na ordem de NOMES. Usa yield_per: só um lote fica em memória por vez. fim é exclusivo.
+    """
+    engine = engine or obter_engine_leitura()
+    with conexao_historico(engine) as conn, Session(bind=conn) as session:
+        for stmt in _consultas(inicio, fim, modelos_historico(conn)):
+            resultado = session.execute(stmt.execution_options(yield_per=tamanho_lote))
+            for lote in resultado.partitions():
+                yield [tuple(linha) for linha in lote]
+
+
+def _valor_texto(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat(sep=" ")
+    if hasattr(valor, "value"):  # Enum (equipo_tipo)
+        return valor.value
+    return valor
+
+
+def exportar_csv(caminho: str, lotes: Iterator[List[tuple]]) -> int:
+    total = 0
+    with open(caminho, "w", newline="", encoding="utf-8") as arquivo:
+        escritor = csv.writer(arquivo)
+        escritor.writerow(NOMES)
+        for lote in lotes:
+            escritor.writerows([_valor_texto(v) for v in linha] for linha in lote)
+            total += len(lote)
+    return total
+
+
+def exportar_jsonl(caminho: str, lotes: Iterator[List[tuple]]) -> int:
+    total = 0
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        for lote in lotes:
+            arquivo.writelines(
+                json.dumps(dict(zip(NOMES, map(_valor_texto, linha))), ensure_ascii=False) + "\n"
+                for linha in lote
+            )
+            total += len(lote)
+    return total
+
+
+def _coluna_numerica(valores: list, tipo: str) -> np.ndarray:
+    if tipo == "f8":
+        return np.array([np.nan if v is None else v for v in valores], dtype=np.float64)
+    if tipo == "M8[us]":
+        return np.array([np.datetime64("NaT") if v is None else v for v in valores], dtype="M8[us]")
+    return np.array([-1 if v is None else v for v in valores], dtype=tipo)
+
+
+def exportar_colunar(caminho: str, lotes: Iterator[List[tuple]]) -> int:
+    """
+    Formato colunar próprio, lido de volta com carregar_colunar() via np.memmap (sem cópia):
+
+        MAGICO (8 bytes) | tamanho do cabeçalho (uint64) | cabeçalho JSON | colunas
+
+    Cada coluna é um bloco contíguo alinhado em 64 bytes. Textos viram códigos int32
+    com o dicionário no cabeçalho (-1 = vazio). Durante a exportação cada coluna é
+    gravada num arquivo temporário, então a memória não depende do número de sessões.
+    """
+    colunas = [(nome, tipo, NOMES.index(nome)) for nome, tipo in COLUNAS if tipo]
+    dicionarios: Dict[str, Dict[str, int]] = {nome: {} for nome, tipo, _ in colunas if tipo == "texto"}
+    total = 0
+
+    with tempfile.TemporaryDirectory() as pasta:
+        temporarios = {nome: open(os.path.join(pasta, nome), "wb") for nome, _, _ in colunas}
+        try:
+            for lote in lotes:
+                for nome, tipo, indice in colunas:
+                    valores = [linha[indice] for linha in lote]
+                    if tipo == "texto":
+                        codigos = dicionarios[nome]
+                        valores = [-1 if v is None else codigos.setdefault(str(_valor_texto(v)), len(codigos))
+                                   for v in valores]
+                        tipo = "i4"
+                    _coluna_numerica(valores, tipo).tofile(temporarios[nome])
+                total += len(lote)
+        finally:
+            for arquivo in temporarios.values():
+                arquivo.close()
+
+        # Cabeçalho com offsets: calculado antes de copiar as colunas
+        descricao = []
+        for nome, tipo, _ in colunas:
+            descricao.append({
+                'nome': nome,
+                'dtype': "i4" if tipo == "texto" else tipo,
+                'dicionario': list(dicionarios[nome]) if tipo == "texto" else None,
+                'bytes': os.path.getsize(os.path.join(pasta, nome)),
+            })
+        cabecalho = _montar_cabecalho(total, descricao)
+
+        with open(caminho, "wb") as destino:
+            destino.write(cabecalho)
+            for coluna in descricao:
+                destino.write(b"\0" * (coluna['offset'] - destino.tell()))
+                with open(os.path.join(pasta, coluna['nome']), "rb") as origem:
+                    shutil.copyfileobj(origem, destino)
+    return total
+
+
+def _alinhar(n: int) -> int:
+    return (n + ALINHAMENTO - 1) // ALINHAMENTO * ALINHAMENTO
+
+
+def _montar_cabecalho(linhas: int, descricao: list) -> bytes:
+    # Os offsets dependem do tamanho do próprio cabeçalho: recalcula até estabilizar
+    inicio = 0
+    while True:
+        posicao = inicio
+        for coluna in descricao:
+            coluna['offset'] = _alinhar(posicao)
+            posicao = coluna['offset'] + coluna['bytes']
+        corpo = json.dumps({'linhas': linhas, 'colunas': descricao}, ensure_ascii=False).encode("utf-8")
+        tamanho = _alinhar(len(MAGICO) + 8 + len(corpo))
+        if tamanho == inicio:
+            return (MAGICO + struct.pack("<Q", len(corpo)) + corpo).ljust(tamanho, b" ")
+        inicio = tamanho
+
+
+class TabelaColunar:
+    """Colunas de um arquivo exportado: arrays NumPy mapeados do disco (somente leitura)"""
+
+    def __init__(self, caminho: str):
+        with open(caminho, "rb") as arquivo:
+            if arquivo.read(len(MAGICO)) != MAGICO:
+                raise ValueError(f"Arquivo colunar inválido: {caminho}")
+            tamanho = struct.unpack("<Q", arquivo.read(8))[0]
+            cabecalho = json.loads(arquivo.read(tamanho).decode("utf-8"))
+
+        self.linhas = cabecalho['linhas']
+        self.colunas: Dict[str, np.ndarray] = {}
+        self.dicionarios: Dict[str, List[str]] = {}
+        for coluna in cabecalho['colunas']:
+            dtype = np.dtype(coluna['dtype'])
+            if self.linhas:
+                self.colunas[coluna['nome']] = np.memmap(caminho, dtype=dtype, mode="r",
+                                                         offset=coluna['offset'], shape=(self.linhas,))
+            else:
+                self.colunas[coluna['nome']] = np.empty(0, dtype=dtype)
+            if coluna['dicionario'] is not None:
+                self.dicionarios[coluna['nome']] = coluna['dicionario']
+
+    def __getitem__(self, nome: str) -> np.ndarray:
+        return self.colunas[nome]
+
+    def __len__(self) -> int:
+        return self.linhas
+
+    def texto(self, nome: str) -> List[Optional[str]]:
+        """Decodifica uma coluna de texto (cria lista Python: use só quando precisar dos valores)"""
+        valores = self.dicionarios[nome]
+        return [valores[c] if c >= 0 else None for c in self.colunas[nome]]
+
+
+def carregar_colunar(caminho: str) -> TabelaColunar:
+    return TabelaColunar(caminho)
+
+
+FORMATOS = {
+    '.csv': exportar_csv,
+    '.jsonl': exportar_jsonl,
+    '.npcol': exportar_colunar,
+}
+
+
+def exportar_sessoes(caminho: str, engine: Engine = None, inicio: datetime = None,
+                     fim: datetime = None, tamanho_lote: int = 5000) -> int:
+    """
+    Exporta o histórico de sessões; o formato vem da extensão (.csv, .jsonl, .npcol).
+    Retorna o número de sessões exportadas.
+    """
+    extensao = Path(caminho).suffix.lower()
+    if extensao not in FORMATOS:
+        raise ValueError(f"Formato não suportado: {extensao} (use {', '.join(FORMATOS)})")
+    return FORMATOS[extensao](caminho, iterar_lotes(engine, inicio, fim, tamanho_lote))
@@ -1,6 +1,9 @@
 import csv
 from typing import Optional
 from models.farmaco import Farmaco
+from controllers.importacao_controller import importar_catalogo_csv
+from controllers.cache_referencia import cache_referencia
+from controllers.utils.unidades import UNIDADES_CONCENTRACAO, interpretar_unidade
 from database.engine import engine
 from sqlmodel import Session, select
 
@@ -13,10 +16,20 @@ def cadastrar_farmaco():
         nome = input("Nome do fármaco: ").strip()
         while True:
             try:
-                conc = float(input("Concentração (mg/ml ou µg/ml): "))
+                conc = float(input("Concentração: "))
                 break
             except ValueError:
                 print("Digite um valor numérico válido.")
+
+        opcoes = ", ".join(UNIDADES_CONCENTRACAO)
+        while True:
+            unidade_conc = input(f"Unidade da concentração ({opcoes}) [mg/ml]: ").strip() or "mg/ml"
+            try:
+                if interpretar_unidade(unidade_conc).por_ml:
+                    break
+            except ValueError:
+                pass
+            print(f"Unidade inválida. Use uma de: {opcoes}")
         
         while True:
             try:
@@ -49,6 +62,7 @@ def cadastrar_farmaco():
         farmaco = Farmaco(
             nome=nome,
             concentracao=conc,
+            unidade_concentracao=unidade_conc,
             dose=dose,
             unidade_dose=unidade,
             modo_uso=modo,
@@ -70,93 +84,38 @@ def importar_farmacos_csv():
     caminho_arquivo = input("Informe o caminho do arquivo CSV: ").strip()
 
     try:
-        with open(caminho_arquivo, newline='', encoding='utf-8') as csvfile:
-            leitor = csv.DictReader(csvfile)
-            print(f"\nCampos detectados no CSV: {', '.join(leitor.fieldnames)}")
-
-            # Verificação de campos obrigatórios
-            campos_obrigatorios = {'nome', 'dose', 'concentracao', 'unidade_dose', 'modo_uso'}
-            if not campos_obrigatorios.issubset(leitor.fieldnames):
-                faltantes = campos_obrigatorios - set(leitor.fieldnames)
-                print(f"\n🚨 Erro: Faltam campos obrigatórios: {', '.join(faltantes)}")
-                return
-
-            farmacos = []
-            contador_linhas = 0
-            
-            for linha_num, linha in enumerate(leitor, 1):
-                try:
-                    # Pré-processamento
-                    nome = linha["nome"].strip()
-                    dose = float(linha["dose"].replace(',', '.'))
-                    concentracao = float(linha["concentracao"].replace(',', '.'))
-                    unidade = linha["unidade_dose"].strip()
-                    
-                    # Padronização do modo_uso
-                    modo = linha["modo_uso"].strip().lower()
-                    if 'infus' in modo or 'contin' in modo:
-                        modo = 'infusão contínua'
-                    else:
-                        modo = 'bolus'
-
-                    # Tratamento de campos opcionais
-                    volume = float(linha["volume_seringa"].replace(',', '.')) if linha.get("volume_seringa") else None
-                    comentario = linha.get("comentario", "").strip() or None
-
-                    # Criação do objeto
-                    farmaco = Farmaco(
-                        nome=nome,
-                        dose=dose,
-                        concentracao=concentracao,
-                        unidade_dose=unidade,
-                        modo_uso=modo,
-                        volume_seringa=volume,
-                        comentario=comentario
-                    )
-                    farmacos.append(farmaco)
-                    contador_linhas += 1
-                    print(f"✅ Linha {linha_num}: {nome} - {modo}")
-
-                except Exception as e:
-                    print(f"⚠️ Erro na linha {linha_num}: {str(e)}")
-                    continue
-
-            if not farmacos:
-                print("\nNenhum fármaco válido encontrado.")
-                return
+        # 1ª passada: só valida (streaming, sem tocar no banco)
+        previa = importar_catalogo_csv(caminho_arquivo, simular=True)
+        print(f"\n📊 Linhas válidas: {previa.validos} | inválidas: {previa.invalidos}")
+        for erro in previa.erros[:10]:
+            print(f"⚠️ {erro}")
+        if previa.invalidos > 10:
+            print(f"... e mais {previa.invalidos - 10} linhas com problemas")
+
+        if not previa.validos:
+            print("\nNenhum fármaco válido encontrado.")
+            return
 
-            # Resumo detalhado
-            print(f"\n📊 Resumo da Importação:")
-            print(f"Total de linhas processadas: {linha_num}")
-            print(f"Fármacos válidos: {contador_linhas}")
-            print(f"Erros: {linha_num - contador_linhas}")
-            
-            print("\n🔍 Amostra dos primeiros registros:")
-            for f in farmacos[:3]:
-                print(f" - {f.nome}: {f.dose} {f.unidade_dose} ({f.modo_uso})")
-
-            # Confirmação final
-            if input("\nConfirmar importação? (s/n): ").lower() != 's':
-                print("Operação cancelada pelo usuário.")
-                return
+        if input("\nConfirmar importação? (s/n): ").lower() != 's':
+            print("Operação cancelada pelo usuário.")
+            return
 
-            # Persistência com tratamento de erros
-            with Session(engine) as session:
-                try:
-                    session.add_all(farmacos)
-                    session.commit()
-                    print(f"\n🎉 {contador_linhas} fármacos importados com sucesso!")
-                    print(f"⚠️ {linha_num - contador_linhas} linhas com problemas foram ignoradas")
-                except Exception as e:
-                    session.rollback()
-                    print(f"\n❌ Erro ao salvar no banco de dados: {str(e)}")
-                    print("Nenhum dado foi importado devido ao erro.")
+        # 2ª passada: upsert em lotes (fármacos já cadastrados são atualizados, não duplicados)
+        resultado = importar_catalogo_csv(
+            caminho_arquivo,
+            ao_progresso=lambda r: print(f"\r{r.linhas} linhas processadas...", end="", flush=True),
+        )
+        print(f"\n\n🎉 Importação concluída: {resultado.resumo()}")
 
     except FileNotFoundError:
         print("\nErro: Arquivo não encontrado. Verifique o caminho:")
         print(f"- {caminho_arquivo}")
+    except ValueError as e:
+        print(f"\n🚨 Erro: {e}")
     except Exception as e:
         print(f"\n❌ Erro inesperado: {str(e)}")
+        print("Lotes já gravados foram mantidos; reimportar o arquivo não duplica os fármacos.")
+
 def exportar_farmacos_csv():
     """Exporta todos os fármacos para um arquivo CSV"""
     print("\n--- Exportação de Fármacos ---")
@@ -173,7 +132,7 @@ def exportar_farmacos_csv():
             with open(caminho_arquivo, mode='w', newline='', encoding='utf-8') as csvfile:
                 writer = csv.DictWriter(csvfile, fieldnames=[
                     'nome', 'dose', 'concentracao', 
-                    'unidade_dose', 'modo_uso',
+                    'unidade_dose', 'unidade_concentracao', 'modo_uso',
                     'volume_seringa', 'comentario'
                 ])
                 writer.writeheader()
@@ -184,6 +143,7 @@ def exportar_farmacos_csv():
                         'dose': f.dose,
                         'concentracao': f.concentracao,
                         'unidade_dose': f.unidade_dose,
+                        'unidade_concentracao': f.unidade_concentracao,
                         'modo_uso': f.modo_uso,
                         'volume_seringa': f.volume_seringa or '',
                         'comentario': f.comentario or ''
@@ -198,18 +158,17 @@ def listar_farmacos():
     """Lista todos os fármacos cadastrados"""
     print("\n--- Fármacos Cadastrados ---")
     try:
-        with Session(engine) as session:
-            farmacos = session.exec(select(Farmaco)).all()
-            
-            if not farmacos:
-                print("Nenhum fármaco cadastrado.")
-                return
-                
-            for f in farmacos:
-                print(f"ID: {f.id} | {f.nome}")
-                print(f" - Dose: {f.dose} {f.unidade_dose} | Modo: {f.modo_uso}")
-                print(f" - Conc: {f.concentracao}mg/ml | Seringa: {f.volume_seringa or 'N/A'}ml")
-                print(f" - Comentários: {f.comentario or 'Nenhum'}\n")
+        farmacos = cache_referencia.listar(Farmaco)
+
+        if not farmacos:
+            print("Nenhum fármaco cadastrado.")
+            return
+
+        for f in farmacos:
+            print(f"ID: {f.id} | {f.nome}")
+            print(f" - Dose: {f.dose} {f.unidade_dose} | Modo: {f.modo_uso}")
+            print(f" - Conc: {f.texto_concentracao} | Seringa: {f.volume_seringa or 'N/A'}ml")
+            print(f" - Comentários: {f.comentario or 'Nenhum'}\n")
                 
     except Exception as e:
         print(f"Erro ao listar fármacos: {e}")
\ No newline at end of file
@@ -0,0 +1,222 @@
+import csv
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from sqlalchemy.engine import Connection, Engine
+
+from database.engine import engine
+from models.farmaco import Farmaco
+from controllers.utils.formatacao import sem_acentos
+from controllers.utils.unidades import conferir_unidades
+
+# Colunas gravadas pela importação, na ordem das tuplas validadas
+COLUNAS = ("nome", "dose", "concentracao", "unidade_dose", "unidade_concentracao",
+           "modo_uso", "volume_seringa", "comentario", "tipo_infusao", "doses_variaveis",
+           "nome_busca", "comentario_busca")
+# Colunas calculadas pelo app a partir de outra (ver database/busca.py)
+DERIVADAS = {"nome_busca": "nome", "comentario_busca": "comentario"}
+CHAVE = ("nome", "unidade_dose", "modo_uso")
+OBRIGATORIAS = {"nome", "dose", "concentracao", "unidade_dose", "modo_uso"}
+MAX_ERROS = 100  # erros guardados para o relatório (o total é sempre contado)
+
+
+@dataclass
+class ResultadoImportacao:
+    validos: int = 0
+    inseridos: int = 0
+    atualizados: int = 0
+    ignorados: int = 0   # iguais ao cadastro ou repetidos no próprio arquivo
+    invalidos: int = 0
+    erros: List[str] = field(default_factory=list)  # primeiros MAX_ERROS
+    cancelado: bool = False  # interrompido entre lotes (os lotes gravados ficam)
+
+    @property
+    def linhas(self) -> int:
+        return self.validos + self.invalidos
+
+    def resumo(self) -> str:
+        return (f"{self.inseridos} inseridos, {self.atualizados} atualizados, "
+                f"{self.ignorados} ignorados, {self.invalidos} inválidos")
+
+
+def _numero(texto: Optional[str]) -> Optional[float]:
+    texto = (texto or "").strip()
+    return float(texto.replace(",", ".")) if texto else None
+
+
+def normalizar_modo_uso(modo: str) -> str:
+    modo = (modo or "").strip().lower()
+    return "infusão contínua" if "infus" in modo or "contin" in modo else "bolus"
+
+
+def validar_linha(linha: dict) -> tuple:
+    """Converte uma linha do CSV em tupla na ordem de COLUNAS (ValueError se inválida)"""
+    nome = (linha.get("nome") or "").strip()
+    if not nome:
+        raise ValueError("nome vazio")
+    dose = _numero(linha.get("dose"))
+    concentracao = _numero(linha.get("concentracao"))
+    if dose is None or dose < 0:
+        raise ValueError("dose inválida")
+    if concentracao is None or concentracao <= 0:
+        raise ValueError("concentração deve ser positiva")
+
+    comentario = (linha.get("comentario") or "").strip() or None
+    unidade_dose = (linha.get("unidade_dose") or "").strip()
+    # Sem unidade de concentração: fica não confirmada (None), nunca presumida
+    unidade_conc = (linha.get("unidade_concentracao") or "").strip() or None
+    conferir_unidades(unidade_dose, unidade_conc)
+
+    return (
+        nome, dose, concentracao, unidade_dose, unidade_conc,
+        normalizar_modo_uso(linha.get("modo_uso")),
+        _numero(linha.get("volume_seringa")),
+        comentario,
+        (linha.get("tipo_infusao") or "").strip() or "padrao",
+        (linha.get("doses_variaveis") or "").strip(),
+        sem_acentos(nome),
+        sem_acentos(comentario),
+    )
+
+
+def ler_lotes(leitor: csv.DictReader, tamanho_lote: int,
+              resultado: ResultadoImportacao) -> Iterator[List[tuple]]:
+    """Lê o CSV em streaming e gera lotes de tuplas válidas (inválidas só são contadas)"""
+    lote = []
+    for numero, linha in enumerate(leitor, start=2):  # linha 1 = cabeçalho
+        try:
+            lote.append(validar_linha(linha))
+            resultado.validos += 1
+        except (ValueError, TypeError) as e:
+            resultado.invalidos += 1
+            if len(resultado.erros) < MAX_ERROS:
+                resultado.erros.append(f"linha {numero}: {e}")
+            continue
+        if len(lote) >= tamanho_lote:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _chave_igual(a: str, b: str) -> str:
+    return " AND ".join(f"{a}.{c} = {b}.{c}" for c in CHAVE)
+
+
+def _gravar_lote(conn: Connection, lote: List[tuple], colunas: Tuple[str, ...],
+                 resultado: ResultadoImportacao) -> None:
+    """
+    Upsert de um lote via tabela temporária:
+    executemany no staging → UPDATE ... FROM para chaves existentes com valores
+    diferentes → INSERT ... WHERE NOT EXISTS para chaves novas.
+    """
+    cursor = conn.connection.cursor()
+    cursor.execute("DELETE FROM temp._importacao_farmaco")
+    # Chave repetida no mesmo lote: a última linha vence
+    cursor.executemany(
+        f"INSERT OR REPLACE INTO temp._importacao_farmaco ({', '.join(COLUNAS)}) "
+        f"VALUES ({', '.join('?' * len(COLUNAS))})",
+        lote,
+    )
+    unicos = cursor.execute("SELECT COUNT(*) FROM temp._importacao_farmaco").fetchone()[0]
+    resultado.ignorados += len(lote) - unicos
+
+    diferente = " OR ".join(f"f.{c} IS NOT s.{c}" for c in colunas if c not in CHAVE) or "0"
+    novos, alterados = cursor.execute(f"""
+        SELECT
+            SUM(NOT EXISTS (SELECT 1 FROM farmaco f WHERE {_chave_igual('f', 's')})),
+            SUM(EXISTS (SELECT 1 FROM farmaco f WHERE {_chave_igual('f', 's')} AND ({diferente})))
+        FROM temp._importacao_farmaco s
+    """).fetchone()
+    novos, alterados = novos or 0, alterados or 0
+
+    if alterados:
+        atribuicoes = ", ".join(f"{c} = s.{c}" for c in colunas if c not in CHAVE)
+        cursor.execute(f"""
+            UPDATE farmaco AS f SET {atribuicoes}
+            FROM temp._importacao_farmaco AS s
+            WHERE {_chave_igual('f', 's')} AND ({diferente})
+        """)
+    if novos:
+        cursor.execute(f"""
+            INSERT INTO farmaco ({', '.join(COLUNAS)})
+            SELECT {', '.join(COLUNAS)} FROM temp._importacao_farmaco s
+            WHERE NOT EXISTS (SELECT 1 FROM farmaco f WHERE {_chave_igual('f', 's')})
+        """)
+    cursor.close()
+
+    resultado.inseridos += novos
+    resultado.atualizados += alterados
+    resultado.ignorados += unicos - novos - alterados
+
+
+def importar_catalogo_csv(
+    caminho: str,
+    engine: Engine = engine,
+    tamanho_lote: int = 5000,
+    simular: bool = False,
+    ao_progresso: Callable[[ResultadoImportacao], None] = None,
+    cancelado: threading.Event = None,
+) -> ResultadoImportacao:
+    """
+    Importa (ou atualiza) o catálogo de fármacos de um CSV em streaming.
+
+    - Memória limitada ao tamanho do lote, independente do tamanho do arquivo.
+    - Chave natural (nome, unidade_dose, modo_uso): chaves novas são inseridas,
+      existentes com valores diferentes são atualizadas e as iguais são ignoradas.
+    - Colunas opcionais ausentes no CSV não sobrescrevem o cadastro existente.
+    - Cada lote é uma transação; simular=True só valida e conta as linhas.
+    - cancelado (threading.Event) é conferido antes de cada lote.
+    """
+    resultado = ResultadoImportacao()
+    with open(caminho, newline="", encoding="utf-8") as arquivo:
+        leitor = csv.DictReader(arquivo)
+        faltantes = OBRIGATORIAS - set(leitor.fieldnames or ())
+        if faltantes:
+            raise ValueError(f"Faltam campos obrigatórios: {', '.join(sorted(faltantes))}")
+        colunas = tuple(c for c in COLUNAS
+                        if (fonte := DERIVADAS.get(c, c)) in leitor.fieldnames or fonte in OBRIGATORIAS)
+
+        if simular:
+            for _ in ler_lotes(leitor, tamanho_lote, resultado):
+                if cancelado is not None and cancelado.is_set():
+                    resultado.cancelado = True
+                    break
+            return resultado
+
+        with engine.connect() as conn:
+            conn.exec_driver_sql(f"""
+                CREATE TEMP TABLE IF NOT EXISTS _importacao_farmaco (
+                    nome TEXT NOT NULL, dose REAL, concentracao REAL, unidade_dose TEXT NOT NULL,
+                    unidade_concentracao TEXT, modo_uso TEXT NOT NULL, volume_seringa REAL,
+                    comentario TEXT, tipo_infusao TEXT, doses_variaveis TEXT,
+                    nome_busca TEXT, comentario_busca TEXT,
+                    PRIMARY KEY ({', '.join(CHAVE)})
+                )
+            """)
+            conn.commit()
+            for lote in ler_lotes(leitor, tamanho_lote, resultado):
+                if cancelado is not None and cancelado.is_set():
+                    resultado.cancelado = True
+                    break
+                with conn.begin():
+                    _gravar_lote(conn, lote, colunas, resultado)
+                if ao_progresso:
+                    ao_progresso(resultado)
+            conn.exec_driver_sql("DROP TABLE IF EXISTS temp._importacao_farmaco")
+            conn.commit()
+
+    if resultado.inseridos or resultado.atualizados:
+        _invalidar_caches()
+    return resultado
+
+
+def _invalidar_caches() -> None:
+    """A importação grava por SQL direto (sem eventos do ORM): limpa os caches de fármacos"""
+    from controllers.cache_referencia import cache_referencia
+    from controllers.calculadora_dose import calculadora_dose
+    from controllers.utils.titulacao import invalidar_grade
+    cache_referencia.limpar(Farmaco)
+    calculadora_dose.limpar()
+    invalidar_grade()
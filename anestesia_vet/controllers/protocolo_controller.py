@@ -1,23 +1,38 @@
 from sqlmodel import Session, select
+from sqlalchemy import delete, insert, text, update
 from models.protocolo import Protocolo, ProtocoloFarmaco
 from models.farmaco import Farmaco
-from typing import List, Tuple
+from typing import List, Optional, Tuple
+
+# Ordem esparsa: itens novos ficam ESPACO_ORDEM depois do último e inserções/movimentos
+# usam o meio do intervalo entre os vizinhos, então só a linha movida é gravada. Quando
+# não sobra espaço entre dois vizinhos o protocolo é renumerado num único UPDATE.
+ESPACO_ORDEM = 1024
+
+
+def _invalidar(protocolo_id: int) -> None:
+    # Gravações por SQL direto não disparam os eventos do ORM (ver calculadora_dose.py)
+    from controllers.calculadora_dose import calculadora_dose
+    calculadora_dose.invalidar_protocolo(protocolo_id)
+
 
 def criar_protocolo(session: Session, nome: str, descricao: str = None, farmaco_ids: List[int] = None) -> Protocolo:
     protocolo = Protocolo(nome=nome, descricao=descricao)
     session.add(protocolo)
+    session.flush()
+
+    if farmaco_ids:
+        # Uma consulta valida todos os fármacos; ids repetidos ou inexistentes são ignorados
+        existentes = set(session.exec(select(Farmaco.id).where(Farmaco.id.in_(farmaco_ids))).all())
+        ids = [i for i in dict.fromkeys(farmaco_ids) if i in existentes]
+        if ids:
+            session.execute(insert(ProtocoloFarmaco), [
+                {'protocolo_id': protocolo.id, 'farmaco_id': farmaco_id, 'ordem': posicao * ESPACO_ORDEM}
+                for posicao, farmaco_id in enumerate(ids, start=1)
+            ])
     session.commit()
     session.refresh(protocolo)
-    
-    if farmaco_ids:
-        for ordem, farmaco_id in enumerate(farmaco_ids, start=1):
-            # Verificar se o fármaco existe
-            farmaco = session.get(Farmaco, farmaco_id)
-            if farmaco:
-                pf = ProtocoloFarmaco(protocolo_id=protocolo.id, farmaco_id=farmaco_id, ordem=ordem)
-                session.add(pf)
-        session.commit()
-    
+    _invalidar(protocolo.id)
     return protocolo
 
 def listar_protocolos(session: Session) -> List[Protocolo]:
@@ -36,36 +51,106 @@ def obter_farmacos_do_protocolo(session: Session, protocolo_id: int):
     )
     return session.exec(stmt).all()
 
-def adicionar_farmaco_a_protocolo(session: Session, protocolo_id: int, farmaco_id: int, ordem: int = None) -> ProtocoloFarmaco:
-    # Se não for passada a ordem, coloca no final
+
+def _ordem_do_item(session: Session, protocolo_id: int, farmaco_id: int) -> Optional[int]:
+    return session.exec(select(ProtocoloFarmaco.ordem).where(
+        ProtocoloFarmaco.protocolo_id == protocolo_id, ProtocoloFarmaco.farmaco_id == farmaco_id)).first()
+
+
+def _renumerar(session: Session, protocolo_id: int) -> None:
+    """Devolve o espaçamento padrão às ordens do protocolo (mantendo a sequência)"""
+    session.execute(text(
+        "UPDATE protocolofarmaco SET ordem = n.posicao * :espaco "
+        "FROM (SELECT farmaco_id, row_number() OVER (ORDER BY ordem, farmaco_id) AS posicao "
+        "      FROM protocolofarmaco WHERE protocolo_id = :p) AS n "
+        "WHERE protocolofarmaco.protocolo_id = :p AND protocolofarmaco.farmaco_id = n.farmaco_id"
+    ), {'espaco': ESPACO_ORDEM, 'p': protocolo_id})
+
+
+def _ordem_antes_de(session: Session, protocolo_id: int, antes_de: Optional[int], ignorar: int = None) -> int:
+    """
+    Ordem livre logo antes do item `antes_de` (ou no fim, se None). Lê só os vizinhos
+    pela faixa do índice (protocolo_id, ordem); `ignorar` é o item que está sendo movido.
+    """
+    itens = select(ProtocoloFarmaco.ordem).where(ProtocoloFarmaco.protocolo_id == protocolo_id)
+    if ignorar is not None:
+        itens = itens.where(ProtocoloFarmaco.farmaco_id != ignorar)
+    if antes_de is None:
+        ultima = session.exec(itens.order_by(ProtocoloFarmaco.ordem.desc()).limit(1)).first()
+        return (ultima or 0) + ESPACO_ORDEM
+
+    for tentativa in range(2):
+        depois = _ordem_do_item(session, protocolo_id, antes_de)
+        if depois is None:
+            raise ValueError(f"Fármaco {antes_de} não está no protocolo {protocolo_id}")
+        anterior = session.exec(itens.where(ProtocoloFarmaco.ordem < depois)
+                                .order_by(ProtocoloFarmaco.ordem.desc()).limit(1)).first() or 0
+        if depois - anterior >= 2:
+            return (anterior + depois) // 2
+        _renumerar(session, protocolo_id)
+    raise RuntimeError("Não foi possível abrir espaço na ordem do protocolo")
+
+
+def adicionar_farmaco_a_protocolo(session: Session, protocolo_id: int, farmaco_id: int, ordem: int = None,
+                                  antes_de: int = None) -> ProtocoloFarmaco:
+    """Adiciona no fim, antes do fármaco `antes_de` ou numa ordem explícita"""
     if ordem is None:
-        # Conta quantos fármacos já tem no protocolo
-        stmt = select(ProtocoloFarmaco).where(ProtocoloFarmaco.protocolo_id == protocolo_id)
-        itens = session.exec(stmt).all()
-        ordem = len(itens) + 1
-    
+        ordem = _ordem_antes_de(session, protocolo_id, antes_de)
+
     pf = ProtocoloFarmaco(protocolo_id=protocolo_id, farmaco_id=farmaco_id, ordem=ordem)
     session.add(pf)
     session.commit()
     session.refresh(pf)
     return pf
 
+def mover_farmaco_no_protocolo(session: Session, protocolo_id: int, farmaco_id: int,
+                               antes_de: int = None) -> None:
+    """Move o fármaco para antes de `antes_de` (None = fim); normalmente grava só essa linha"""
+    if antes_de == farmaco_id:
+        return
+    ordem = _ordem_antes_de(session, protocolo_id, antes_de, ignorar=farmaco_id)
+    session.execute(update(ProtocoloFarmaco).where(
+        ProtocoloFarmaco.protocolo_id == protocolo_id, ProtocoloFarmaco.farmaco_id == farmaco_id
+    ).values(ordem=ordem))
+    session.commit()
+    _invalidar(protocolo_id)
+
+def reordenar_protocolo(session: Session, protocolo_id: int, farmaco_ids: List[int]) -> None:
+    """Define a ordem completa do protocolo (ex: depois de arrastar vários itens)"""
+    session.execute(update(ProtocoloFarmaco), [
+        {'protocolo_id': protocolo_id, 'farmaco_id': farmaco_id, 'ordem': posicao * ESPACO_ORDEM}
+        for posicao, farmaco_id in enumerate(farmaco_ids, start=1)
+    ])
+    session.commit()
+    _invalidar(protocolo_id)
+
+def vizinhos_no_protocolo(session: Session, protocolo_id: int, farmaco_id: int) -> Tuple[Optional[int], Optional[int]]:
+    """(fármaco anterior, fármaco seguinte) ao item, pela faixa do índice"""
+    ordem = _ordem_do_item(session, protocolo_id, farmaco_id)
+    if ordem is None:
+        return None, None
+    itens = select(ProtocoloFarmaco.farmaco_id).where(ProtocoloFarmaco.protocolo_id == protocolo_id)
+    anterior = session.exec(itens.where(ProtocoloFarmaco.ordem < ordem)
+                            .order_by(ProtocoloFarmaco.ordem.desc()).limit(1)).first()
+    seguinte = session.exec(itens.where(ProtocoloFarmaco.ordem > ordem)
+                            .order_by(ProtocoloFarmaco.ordem).limit(1)).first()
+    return anterior, seguinte
+
 def remover_farmaco_de_protocolo(session: Session, protocolo_id: int, farmaco_id: int) -> None:
-    pf = session.get(ProtocoloFarmaco, (protocolo_id, farmaco_id))
-    if pf:
-        session.delete(pf)
-        session.commit()
+    session.execute(delete(ProtocoloFarmaco).where(
+        ProtocoloFarmaco.protocolo_id == protocolo_id, ProtocoloFarmaco.farmaco_id == farmaco_id))
+    session.commit()
+    _invalidar(protocolo_id)
 
 def deletar_protocolo(session: Session, protocolo_id: int) -> None:
     protocolo = session.get(Protocolo, protocolo_id)
     if protocolo:
-        # Primeiro remove os ProtocoloFarmaco associados
-        stmt = select(ProtocoloFarmaco).where(ProtocoloFarmaco.protocolo_id == protocolo_id)
-        for pf in session.exec(stmt):
-            session.delete(pf)
+        # Itens em cascata num único DELETE (faixa do índice por protocolo_id)
+        session.execute(delete(ProtocoloFarmaco).where(ProtocoloFarmaco.protocolo_id == protocolo_id))
         session.delete(protocolo)
         session.commit()
-        
+        _invalidar(protocolo_id)
+
 # Adicionar esta função para obter todos os fármacos
 def obter_todos_farmacos(session: Session) -> List[Farmaco]:
-    return session.exec(select(Farmaco)).all()        
\ No newline at end of file
+    return session.exec(select(Farmaco)).all()
@@ -5,16 +5,22 @@ from models.sessao import SessaoAnestesia, SessaoAvulsaAnestesia
 from models.animal import Animal
 from models.farmaco import Farmaco
 from database.engine import engine
+from database.arquivo import conexao_historico, modelos_arquivo, obter_sessao
 from sqlmodel import Session, select
 from datetime import datetime, timezone
-from typing import Optional
+from typing import List, Optional, Tuple
+from sqlalchemy import literal, tuple_, union_all
 from controllers.config_infusao_controller import (
     criar_config_infusao, 
     calcular_taxas,
     calcular_infusao_continua,
     calcular_infusao_especifica
 )
-from controllers.protocolo_controller import obter_farmacos_do_protocolo
+from controllers.utils.simulador import totais_taxa_constante
+from controllers.calculadora_dose import calculadora_dose
+from controllers.cache_referencia import cache_referencia
+from controllers.utils.unidades import fator_dose_ug_kg_h
+import numpy as np
 
 def registrar_sessao():
     """Registra uma nova sessão anestésica, com cálculo automático de dose"""
@@ -83,10 +89,7 @@ def registrar_sessao():
 
             # Cálculo da dose
             try:
-                if farmaco.modo_uso == "bolus":
-                    dose_sugerida = (peso * farmaco.dose) / farmaco.concentracao
-                else:
-                    dose_sugerida = calcular_dose_infusao(peso, farmaco)
+                dose_sugerida = calcular_dose_infusao(peso, farmaco)
                 
                 print(f"\nDose sugerida: {dose_sugerida:.2f}ml ({farmaco.unidade_dose})")
 
@@ -127,7 +130,7 @@ def gerar_prescricao_protocolo_txt():
         id_sessao = int(input("ID da sessão para prescrição de protocolo: "))    
         
         with Session(engine) as session:
-            sessao = session.get(SessaoAnestesia, id_sessao)
+            sessao = obter_sessao(session, SessaoAnestesia, id_sessao)
             if not sessao:
                 print("Sessão não encontrada.")
                 return    
@@ -150,22 +153,14 @@ PROTOCOLO: {protocolo.nome}
 """
 
             # Obter e calcular doses para cada fármaco do protocolo
-            from controllers.protocolo_controller import obter_farmacos_do_protocolo
-            farmacos_protocolo = obter_farmacos_do_protocolo(session, sessao.protocolo_id)
+            farmacos_protocolo = calculadora_dose.calcular_protocolo(sessao.protocolo_id, animal.peso_kg, session)
             
             if farmacos_protocolo:
                 conteudo += "\nFÁRMACOS DO PROTOCOLO:"
-                for farmaco, ordem in farmacos_protocolo:
-                    # Calcular a dose para o animal
-                    if farmaco.modo_uso == "bolus":
-                        dose_ml = (animal.peso_kg * farmaco.dose) / farmaco.concentracao
-                    else:
-                        mult = 60 if "min" in farmaco.unidade_dose else 1
-                        dose_ml = (animal.peso_kg * farmaco.dose * mult) / farmaco.concentracao
-                    
+                for farmaco, ordem, dose_ml in farmacos_protocolo:
                     conteudo += f"\n\n- {farmaco.nome}: {dose_ml:.2f} ml"
                     conteudo += f"\n  Dose: {farmaco.dose} {farmaco.unidade_dose}"
-                    conteudo += f"\n  Concentração: {farmaco.concentracao} mg/ml"
+                    conteudo += f"\n  Concentração: {farmaco.texto_concentracao}"
                     conteudo += f"\n  Modo de uso: {farmaco.modo_uso.capitalize()}"
 
             # Fechar o conteúdo
@@ -191,12 +186,12 @@ def gerar_prescricao_txt():
         
         with Session(engine) as session:
             # Tenta buscar como sessão normal primeiro
-            sessao = session.get(SessaoAnestesia, id_sessao)
+            sessao = obter_sessao(session, SessaoAnestesia, id_sessao)
             is_avulsa = False
             
             if not sessao:
                 # Se não encontrou, tenta como sessão avulsa
-                sessao_avulsa = session.get(SessaoAvulsaAnestesia, id_sessao)
+                sessao_avulsa = obter_sessao(session, SessaoAvulsaAnestesia, id_sessao)
                 if sessao_avulsa:
                     sessao = sessao_avulsa
                     is_avulsa = True
@@ -220,11 +215,7 @@ def gerar_prescricao_txt():
             dose_sugerida = "N/A"
             if animal and farmaco:
                 try:
-                    if farmaco.modo_uso == "bolus":
-                        dose_sugerida = (animal.peso_kg * farmaco.dose) / farmaco.concentracao
-                    else:  # infusão contínua
-                        multiplicador = 60 if "min" in farmaco.unidade_dose else 1
-                        dose_sugerida = (animal.peso_kg * farmaco.dose * multiplicador) / farmaco.concentracao
+                    dose_sugerida = calcular_dose_infusao(animal.peso_kg, farmaco)
                 except Exception as e:
                     print(f"Erro no cálculo da dose sugerida: {e}")
                     dose_sugerida = "Erro no cálculo"
@@ -238,7 +229,7 @@ Peso: {animal.peso_kg} kg
 
 FÁRMACO PRINCIPAL:
 Nome: {farmaco.nome}
-Concentração: {farmaco.concentracao} mg/ml
+Concentração: {farmaco.texto_concentracao}
 Dose: {farmaco.dose} {farmaco.unidade_dose}
 Modo de uso: {farmaco.modo_uso.capitalize()}
 
@@ -250,17 +241,8 @@ Utilizada: {sessao.dose_utilizada_ml:.2f} ml"""
             if hasattr(sessao, 'id_protocolo') and sessao.id_protocolo:
                 protocolo = session.get(Protocolo, sessao.id_protocolo)
                 conteudo += f"\n📋 PROTOCOLO UTILIZADO: {protocolo.nome}\n"
-                farmacos_protocolo = obter_farmacos_do_protocolo(session, protocolo.id)
-                
-                for farmaco, ordem in farmacos_protocolo:
-                    # Cálculo da dose para o animal
-                    if animal:
-                        if farmaco.modo_uso == "bolus":
-                            dose_ml = (animal.peso_kg * farmaco.dose) / farmaco.concentracao
-                        else:
-                            mult = 60 if "min" in farmaco.unidade_dose else 1
-                            dose_ml = (animal.peso_kg * farmaco.dose * mult) / farmaco.concentracao
-                        
+                if animal:
+                    for farmaco, ordem, dose_ml in calculadora_dose.calcular_protocolo(protocolo.id, animal.peso_kg, session):
                         conteudo += (
                             f"\n - {farmaco.nome}: {dose_ml:.2f}ml "
                             f"({farmaco.dose} {farmaco.unidade_dose})"
@@ -310,7 +292,7 @@ def registrar_sessao_avulsa():
 
         # Seleção de fármaco
         with Session(engine) as session:
-            farmacos = session.exec(select(Farmaco)).all()
+            farmacos = cache_referencia.listar(Farmaco)
             if not farmacos:
                 print("Nenhum fármaco cadastrado! Cadastre fármacos primeiro.")
                 return
@@ -354,13 +336,159 @@ def registrar_sessao_avulsa():
     except Exception as e:
         print(f"\nErro ao registrar sessão: {e}")
 
+def gravar_sessoes(session: Session,
+                   registros: List[Tuple[SessaoAnestesia, Optional[ConfigInfusao]]]) -> List[int]:
+    """
+    Unidade de trabalho: grava sessões e suas configurações de infusão num único
+    flush/commit (um fsync para o lote inteiro). Retorna os ids das sessões.
+    """
+    sessoes = []
+    for sessao, config in registros:
+        if config is not None:
+            sessao.config_infusao = config  # o flush insere a config antes e preenche a FK
+        session.add(sessao)
+        sessoes.append(sessao)
+    session.flush()
+    ids = [sessao.id for sessao in sessoes]
+    session.commit()
+    return ids
+
 def calcular_dose_infusao(peso_kg: float, farmaco: Farmaco) -> float:
-    """Calcula dose para infusão contínua com tratamento de unidades"""
-    if farmaco.modo_uso == "bolus":
-        return (peso_kg * farmaco.dose) / farmaco.concentracao
-    
-    # Converter unidades para padrão mcg/kg/min
-    dose_mcg = farmaco.dose * 1000 if "mg" in farmaco.unidade_dose else farmaco.dose
-    dose_por_min = dose_mcg / 60 if "/h" in farmaco.unidade_dose else dose_mcg
-    
-    return (peso_kg * dose_por_min * 60) / farmaco.concentracao        
\ No newline at end of file
+    """Dose em ml (bolus) ou taxa em ml/h (infusão contínua), via calculadora compartilhada"""
+    return calculadora_dose.calcular_farmaco(farmaco, peso_kg)        
+
+def auditar_sessoes_infusao(session: Session, tamanho_lote: int = 1000):
+    """
+    Totais de todas as sessões com infusão contínua do histórico, em lotes vetorizados
+    (taxa constante: forma fechada, sem simular passo a passo).
+    Lê as sessões em streaming (yield_per), então a memória não cresce com o histórico.
+    Gera um dicionário por sessão com dose acumulada, volume infundido e duração.
+    """
+    stmt = (
+        select(SessaoAnestesia.id, ConfigInfusao.peso_kg, ConfigInfusao.taxa_ml_kg_h,
+               ConfigInfusao.volume_bolsa_ml, Farmaco.dose, Farmaco.unidade_dose)
+        .join(ConfigInfusao, SessaoAnestesia.config_infusao_id == ConfigInfusao.id)
+        .join(Farmaco, SessaoAnestesia.id_farmaco == Farmaco.id)
+        .order_by(SessaoAnestesia.id)
+        .execution_options(yield_per=tamanho_lote)
+    )
+    linhas = session.exec(stmt)
+    while True:
+        lote = linhas.fetchmany(tamanho_lote)
+        if not lote:
+            return
+        yield from _auditar_lote(lote)
+
+
+def _auditar_lote(lote):
+    ids = [l[0] for l in lote]
+    peso = np.array([l[1] for l in lote], dtype=np.float64)
+    vazao = peso * np.array([l[2] for l in lote], dtype=np.float64)
+    volume = np.array([l[3] for l in lote], dtype=np.float64)
+    dose_ug_kg_h = np.array([l[4] * fator_dose_ug_kg_h(l[5]) for l in lote], dtype=np.float64)
+
+    # Mesma diluição da planilha: a bolsa contém a dose para todo o tempo de infusão,
+    # então a concentração final é Dose (µg/kg/h) × Peso / Vazão
+    concentracao = np.divide(dose_ug_kg_h * peso, vazao, out=np.zeros_like(peso), where=vazao > 0)
+
+    # Cada sessão corre até esvaziar a própria bolsa
+    final = totais_taxa_constante(peso, concentracao, volume, vazao)
+    duracao_h = final['duracao_min'] / 60
+    for i, sessao_id in enumerate(ids):
+        yield {
+            'sessao_id': sessao_id,
+            'dose_acumulada_ug_kg': float(final['dose_acumulada_ug_kg'][i]),
+            'volume_infundido_ml': float(final['volume_infundido_ml'][i]),
+            'volume_restante_ml': float(final['volume_restante_ml'][i]),
+            'duracao_h': float(duracao_h[i]),
+        }
+
+
+# Origem da linha na lista unificada de sessões (faz parte da chave do cursor)
+ORIGEM_AVULSA = 0
+ORIGEM_NORMAL = 1
+
+
+def _filtro_cursor(modelo, origem: int, cursor: Tuple):
+    """
+    Condição (data, origem, id) < cursor para um dos ramos, escrita só com colunas do
+    próprio modelo para o SQLite usar o índice de data.
+    """
+    data, origem_cursor, id_cursor = cursor
+    if origem < origem_cursor:
+        return modelo.data <= data
+    if origem > origem_cursor:
+        return modelo.data < data
+    return tuple_(modelo.data, modelo.id) < tuple_(data, id_cursor)
+
+
+def listar_sessoes_pagina(session: Session, cursor: Tuple = None, limite: int = 200,
+                          modelos: Tuple = (SessaoAnestesia, SessaoAvulsaAnestesia)
+                          ) -> Tuple[List[tuple], Optional[Tuple]]:
+    """
+    Uma página da lista de sessões (normais e avulsas), mais recentes primeiro.
+
+    Uma única consulta com join em animal/fármaco, sem carregar objetos do ORM.
+    Retorna (linhas, próximo_cursor); cada linha é (origem, id, animal, fármaco,
+    dose_ml, data) e próximo_cursor é None quando não há mais páginas.
+    modelos: as duas tabelas de sessões (ou as do histórico, ver listar_sessoes_arquivadas_pagina).
+    """
+    normal, avulsa = modelos
+    normais = (
+        select(literal(ORIGEM_NORMAL).label("origem"), normal.id,
+               Animal.nome.label("animal"), Farmaco.nome.label("farmaco"),
+               normal.dose_utilizada_ml, normal.data)
+        .outerjoin(Animal, Animal.id == normal.id_animal)
+        .outerjoin(Farmaco, Farmaco.id == normal.id_farmaco)
+    )
+    avulsas = (
+        select(literal(ORIGEM_AVULSA).label("origem"), avulsa.id,
+               (avulsa.nome_animal + " (Avulso)").label("animal"),
+               Farmaco.nome.label("farmaco"),
+               avulsa.dose_utilizada_ml, avulsa.data)
+        .outerjoin(Farmaco, Farmaco.id == avulsa.id_farmaco)
+    )
+    if cursor is not None:
+        normais = normais.where(_filtro_cursor(normal, ORIGEM_NORMAL, cursor))
+        avulsas = avulsas.where(_filtro_cursor(avulsa, ORIGEM_AVULSA, cursor))
+
+    # Cada ramo já vem ordenado e limitado pelo índice; o UNION só junta 2 × limite linhas
+    normais = normais.order_by(normal.data.desc(), normal.id.desc()).limit(limite).subquery()
+    avulsas = avulsas.order_by(avulsa.data.desc(), avulsa.id.desc()).limit(limite).subquery()
+    uniao = union_all(select(normais), select(avulsas)).subquery()
+    stmt = (
+        select(uniao)
+        .order_by(uniao.c.data.desc(), uniao.c.origem.desc(), uniao.c.id.desc())
+        .limit(limite)
+    )
+
+    linhas = [tuple(linha) for linha in session.execute(stmt).all()]
+    proximo = None
+    if len(linhas) == limite:
+        proximo = cursor_da_linha(linhas[-1])
+    return linhas, proximo
+
+
+def cursor_da_linha(linha: tuple) -> Tuple:
+    """Cursor que continua a lista logo depois desta linha"""
+    origem, sessao_id, _animal, _farmaco, _dose, data = linha
+    return data, origem, sessao_id
+
+
+def listar_sessoes_arquivadas_pagina(cursor: Tuple = None, limite: int = 200,
+                                     engine=engine) -> Tuple[List[tuple], Optional[Tuple]]:
+    """
+    Continua a lista nos arquivos anuais (database/arquivo.py), do ano mais recente
+    para o mais antigo; cada arquivo é lido pelo próprio índice de data.
+    """
+    linhas: List[tuple] = []
+    with conexao_historico(engine) as conn, Session(bind=conn) as session:
+        for esquema in reversed(conn.info['esquemas_arquivo']):
+            normal, avulsa, _ = modelos_arquivo(conn, esquema)
+            pagina, _ = listar_sessoes_pagina(session, cursor, limite - len(linhas), (normal, avulsa))
+            linhas += pagina
+            if pagina:
+                cursor = cursor_da_linha(pagina[-1])
+            if len(linhas) == limite:
+                return linhas, cursor
+    return linhas, None
@@ -0,0 +1,179 @@
+import numpy as np
+
+from controllers.utils.unidades import fator_dose_ug_kg_h, fator_concentracao_ug_ml
+
+# Resultado estruturado dos cálculos em lote.
+# Campos que a versão escalar não calcula para um modo ficam como NaN.
+DTYPE_RESULTADO_INFUSAO = np.dtype([
+    ('taxa_ml_h', 'f8'),
+    ('gotas_min', 'f8'),
+    ('volume_farmaco_ml', 'f8'),
+    ('volume_dilente_ml', 'f8'),
+    ('duracao_h', 'f8'),
+    ('dose_total_ug', 'f8'),
+])
+
+
+def _como_array(valor, n: int = None) -> np.ndarray:
+    """Converte escalar/lista em array float64 (broadcast para n linhas)"""
+    arr = np.asarray(valor, dtype=np.float64)
+    if n is not None and arr.ndim == 0:
+        arr = np.full(n, float(arr))
+    return arr
+
+
+def _tamanho(*valores) -> int:
+    """Número de linhas do lote (maior dimensão entre as entradas)"""
+    return int(np.broadcast(*[np.asarray(v) for v in valores]).size)
+
+
+def fator_equipo_lote(equipo_tipo, n: int) -> np.ndarray:
+    """
+    Fator de gotas por ml para cada linha.
+    Aceita string, array de strings ("macrogotas"/"microgotas") ou array numérico
+    já com o fator (20/60).
+    """
+    arr = np.asarray(equipo_tipo)
+    if arr.dtype.kind in 'iuf':
+        return np.broadcast_to(arr.astype(np.float64), (n,))
+    if arr.ndim == 0:
+        return np.full(n, 20.0 if str(arr) == "macrogotas" else 60.0)
+    return np.where(arr == "macrogotas", 20.0, 60.0)
+
+
+def converter_dose_lote(dose, unidade_dose, n: int) -> np.ndarray:
+    """
+    Converte a dose para µg/kg/h usando o fator em cache de cada unidade
+    (controllers/utils/unidades.py). Cada unidade distinta é analisada uma única vez.
+    """
+    arr = np.asarray(unidade_dose)
+    if arr.ndim == 0:
+        return _como_array(dose, n) * fator_dose_ug_kg_h(str(arr))
+    unicas, inverso = np.unique(arr, return_inverse=True)
+    fatores = np.array([fator_dose_ug_kg_h(str(u)) for u in unicas], dtype=np.float64)
+    return _como_array(dose, n) * fatores[inverso.reshape(-1)]
+
+
+def _duracao(volume_bolsa_ml: np.ndarray, taxa_ml_h: np.ndarray) -> np.ndarray:
+    """Duração em horas; 0 quando a taxa não é positiva (igual à versão escalar)"""
+    duracao = np.zeros_like(taxa_ml_h)
+    np.divide(volume_bolsa_ml, taxa_ml_h, out=duracao, where=taxa_ml_h > 0)
+    return duracao
+
+
+def _resultado_vazio(n: int) -> np.ndarray:
+    resultado = np.empty(n, dtype=DTYPE_RESULTADO_INFUSAO)
+    for campo in DTYPE_RESULTADO_INFUSAO.names:
+        resultado[campo] = np.nan
+    return resultado
+
+
+def calcular_infusao_continua_lote(
+    peso_kg,
+    dose,
+    unidade_dose,
+    concentracao,
+    volume_bolsa_ml=None,
+    equipo_tipo="macrogotas",
+    modo: str = "taxa",
+    unidade_concentracao: str = "mg/ml"
+) -> np.ndarray:
+    """
+    Versão vetorizada de calcular_infusao_continua.
+    Todos os parâmetros aceitam escalares ou arrays do mesmo tamanho.
+    Os valores não são arredondados (a versão escalar arredonda para 2 casas).
+    """
+    n = _tamanho(peso_kg, dose, concentracao, unidade_dose,
+                 0.0 if volume_bolsa_ml is None else volume_bolsa_ml, equipo_tipo)
+    peso = _como_array(peso_kg, n)
+    dose_conv = converter_dose_lote(dose, unidade_dose, n)
+    concentracao_conv = _como_array(concentracao, n) * fator_concentracao_ug_ml(unidade_concentracao)
+    fator = fator_equipo_lote(equipo_tipo, n)
+
+    resultado = _resultado_vazio(n)
+    taxa_ml_h = (dose_conv * peso) / concentracao_conv
+    resultado['taxa_ml_h'] = taxa_ml_h
+    resultado['gotas_min'] = (taxa_ml_h * fator) / 60
+
+    if modo == "taxa":
+        return resultado
+
+    if volume_bolsa_ml is None:
+        raise ValueError("Volume da bolsa é obrigatório para o modo solução")
+
+    volume_bolsa = _como_array(volume_bolsa_ml, n)
+    volume_farmaco_ml = np.minimum((dose_conv * volume_bolsa) / concentracao_conv, volume_bolsa)
+    resultado['volume_farmaco_ml'] = volume_farmaco_ml
+    resultado['volume_dilente_ml'] = volume_bolsa - volume_farmaco_ml
+    resultado['duracao_h'] = _duracao(volume_bolsa, taxa_ml_h)
+    return resultado
+
+
+def calcular_infusao_especifica_lote(
+    peso_kg,
+    dose_mg_kg_min,
+    concentracao_mg_ml,
+    volume_bolsa_ml=20.0,
+    equipo_tipo="macrogotas",
+    modo: str = "peso"
+) -> np.ndarray:
+    """Versão vetorizada de calcular_infusao_especifica (valores sem arredondamento)"""
+    n = _tamanho(peso_kg, dose_mg_kg_min, concentracao_mg_ml, volume_bolsa_ml, equipo_tipo)
+    peso = _como_array(peso_kg, n)
+    dose = _como_array(dose_mg_kg_min, n)
+    concentracao = _como_array(concentracao_mg_ml, n)
+    volume_bolsa = _como_array(volume_bolsa_ml, n)
+    fator = fator_equipo_lote(equipo_tipo, n)
+
+    if modo == "peso":
+        taxa_ml_h = (dose * 1000 * peso * 60) / (concentracao * 1000)
+        volume_farmaco_ml = (dose * peso * volume_bolsa) / concentracao
+    else:
+        taxa_ml_h = (dose * peso * 60 * volume_bolsa) / (concentracao * 1000)
+        volume_farmaco_ml = volume_bolsa.copy()
+
+    # Garantir que não excede o volume da seringa
+    volume_farmaco_ml = np.minimum(volume_farmaco_ml, volume_bolsa)
+
+    resultado = _resultado_vazio(n)
+    resultado['taxa_ml_h'] = taxa_ml_h
+    resultado['gotas_min'] = (taxa_ml_h * fator) / 60
+    resultado['volume_farmaco_ml'] = volume_farmaco_ml
+    resultado['volume_dilente_ml'] = volume_bolsa - volume_farmaco_ml
+    resultado['duracao_h'] = _duracao(volume_bolsa, taxa_ml_h)
+    return resultado
+
+
+def calcular_infusao_planilha_lote(
+    peso_kg,
+    taxa_ml_kg_h,
+    volume_bolsa_ml,
+    equipo_tipo,
+    dose_farmaco,
+    unidade_dose,
+    concentracao,
+    unidade_concentracao: str = "mg/ml"
+) -> np.ndarray:
+    """
+    Versão vetorizada de calcular_infusao_planilha.
+    'taxa_ml_h' corresponde à 'vazao_ml_h' da versão escalar.
+    """
+    n = _tamanho(peso_kg, taxa_ml_kg_h, volume_bolsa_ml, equipo_tipo,
+                 dose_farmaco, unidade_dose, concentracao)
+    peso = _como_array(peso_kg, n)
+    volume_bolsa = _como_array(volume_bolsa_ml, n)
+    vazao_ml_h = peso * _como_array(taxa_ml_kg_h, n)
+    fator = fator_equipo_lote(equipo_tipo, n)
+    duracao_h = _duracao(volume_bolsa, vazao_ml_h)
+
+    dose_conv = converter_dose_lote(dose_farmaco, unidade_dose, n)
+    dose_total_ug = dose_conv * peso * duracao_h
+
+    resultado = _resultado_vazio(n)
+    resultado['taxa_ml_h'] = vazao_ml_h
+    resultado['gotas_min'] = (vazao_ml_h * fator) / 60
+    resultado['duracao_h'] = duracao_h
+    resultado['dose_total_ug'] = dose_total_ug
+    resultado['volume_farmaco_ml'] = dose_total_ug / (
+        _como_array(concentracao, n) * fator_concentracao_ug_ml(unidade_concentracao))
+    return resultado
@@ -0,0 +1,24 @@
+import unicodedata
+
+
+def formatar_duracao(horas: float) -> str:
+    """Formata um tempo em horas (decimal) para horas e minutos."""
+    horas_inteiras = int(horas)
+    minutos = int((horas - horas_inteiras) * 60)
+    
+    if horas_inteiras > 0 and minutos > 0:
+        return f"{horas_inteiras}h {minutos}min"
+    elif horas_inteiras > 0:
+        return f"{horas_inteiras}h"
+    elif minutos > 0:
+        return f"{minutos}min"
+    else:
+        return "0min"
+
+
+def sem_acentos(texto: str) -> str:
+    """Texto em minúsculas e sem acentos, para busca (ex: "Lidocaína" → "lidocaina")."""
+    if not texto:
+        return ""
+    decomposto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).casefold()
@@ -0,0 +1,152 @@
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from controllers.utils.formatacao import formatar_duracao
+from controllers.utils.titulacao import obter_grade
+from controllers.utils.unidades import conferir_massas
+
+_SIMPLES = (int, float, str, bool, tuple, list, type(None))
+
+
+def _igual(a: Any, b: Any) -> bool:
+    # Objetos (ex: o Farmaco do cache) mudam por substituição: compara a identidade
+    if a is b:
+        return True
+    return isinstance(a, _SIMPLES) and isinstance(b, _SIMPLES) and a == b
+
+
+class GrafoCalculo:
+    """
+    Cálculo incremental: entradas e nós derivados com dependências explícitas.
+
+    definir() troca o valor de uma entrada e marca só os nós que dependem dela;
+    recalcular() refaz apenas os nós marcados (em ordem de definição) e, quando o
+    valor de um nó não muda, não propaga para os seguintes. Se alguma dependência
+    vale None (entrada inválida ou ausente), ou o cálculo falha, o nó vale None.
+    """
+
+    def __init__(self):
+        self._nos: Dict[str, Tuple[Sequence[str], Optional[Callable]]] = {}
+        self._dependentes: Dict[str, List[str]] = {}
+        self._valores: Dict[str, Any] = {}
+        self._sujos: set = set()
+        self.execucoes: Counter = Counter()  # vezes que cada nó foi calculado
+
+    def entrada(self, nome: str, valor: Any = None) -> None:
+        self._nos[nome] = ((), None)
+        self._dependentes[nome] = []
+        self._valores[nome] = valor
+
+    def no(self, nome: str, dependencias: Sequence[str], funcao: Callable) -> None:
+        """Nó calculado por funcao(*valores das dependências); dependências antes do nó"""
+        for dependencia in dependencias:
+            self._dependentes[dependencia].append(nome)
+        self._nos[nome] = (tuple(dependencias), funcao)
+        self._dependentes[nome] = []
+        self._valores[nome] = None
+        self._sujos.add(nome)
+
+    def definir(self, nome: str, valor: Any) -> bool:
+        """Troca uma entrada; devolve False se o valor é o mesmo"""
+        if _igual(self._valores[nome], valor):
+            return False
+        self._valores[nome] = valor
+        self._sujos.update(self._dependentes[nome])
+        return True
+
+    def valor(self, nome: str) -> Any:
+        return self._valores[nome]
+
+    def recalcular(self) -> Dict[str, Any]:
+        """Refaz os nós marcados; devolve {nó: valor novo} dos que mudaram"""
+        alterados = {}
+        if not self._sujos:
+            return alterados
+        for nome, (dependencias, funcao) in self._nos.items():
+            if nome not in self._sujos or funcao is None:
+                continue
+            valores = [self._valores[d] for d in dependencias]
+            novo = None
+            if all(v is not None for v in valores):
+                self.execucoes[nome] += 1
+                try:
+                    novo = funcao(*valores)
+                except (ArithmeticError, ValueError):
+                    novo = None
+            if not _igual(self._valores[nome], novo):
+                self._valores[nome] = novo
+                self._sujos.update(self._dependentes[nome])
+                alterados[nome] = novo
+        self._sujos.clear()
+        return alterados
+
+
+def _positivo(texto: str) -> Optional[float]:
+    try:
+        valor = float(texto.strip().replace(",", "."))
+    except ValueError:
+        return None
+    return valor if valor > 0 else None
+
+
+def _dose(farmaco, texto_dose: str) -> float:
+    """Passo de titulação escolhido (fármacos com doses variáveis) ou a dose padrão"""
+    if farmaco.doses_variaveis and texto_dose:
+        try:
+            return float(texto_dose)
+        except ValueError:
+            pass
+    return farmaco.dose
+
+
+def _volume_farmaco(dose_total_ug: float, farmaco) -> float:
+    conferir_massas(farmaco.unidade_dose, farmaco.unidade_concentracao)
+    return dose_total_ug / farmaco.concentracao_ug_ml
+
+
+def _titulacao(farmaco, peso: float, volume_bolsa: float, equipo: str) -> list:
+    if not farmaco.doses_variaveis:
+        return []
+    return obter_grade(farmaco).consultar(peso, volume_bolsa, equipo)
+
+
+def criar_calculo_infusao() -> GrafoCalculo:
+    """
+    Grafo da aba Infusão. Entradas: texto_peso, texto_taxa (ml/kg/h), texto_volume
+    (bolsa, ml), texto_equipo, farmaco (objeto do cache) e texto_dose (passo de
+    titulação). Saídas texto_*: o que cada rótulo mostra ("" sem dados válidos);
+    titulacao: linhas da grade do fármaco.
+    """
+    grafo = GrafoCalculo()
+    for nome, valor in (("texto_peso", ""), ("texto_taxa", ""), ("texto_volume", ""),
+                        ("texto_equipo", ""), ("farmaco", None), ("texto_dose", "")):
+        grafo.entrada(nome, valor)
+
+    grafo.no("peso", ["texto_peso"], _positivo)
+    grafo.no("taxa", ["texto_taxa"], _positivo)
+    grafo.no("volume_bolsa", ["texto_volume"], _positivo)
+    grafo.no("equipo", ["texto_equipo"], lambda texto: "macrogotas" if "Macro" in texto else "microgotas")
+    grafo.no("fator_equipo", ["equipo"], lambda equipo: 20 if equipo == "macrogotas" else 60)
+    grafo.no("dose", ["farmaco", "texto_dose"], _dose)
+
+    # Gerais: mesmas fórmulas do botão "Calcular Infusão"
+    grafo.no("vazao_ml_h", ["peso", "taxa"], lambda peso, taxa: peso * taxa)
+    grafo.no("duracao_h", ["volume_bolsa", "vazao_ml_h"], lambda volume, vazao: volume / vazao)
+    grafo.no("gotas_min", ["vazao_ml_h", "fator_equipo"], lambda vazao, fator: vazao * fator / 60)
+
+    # Fármaco (µg/kg/h pelo fator em cache da unidade)
+    grafo.no("dose_total_ug", ["dose", "farmaco", "peso", "duracao_h"],
+             lambda dose, farmaco, peso, duracao: dose * farmaco.unidade.fator_ug_kg_h * peso * duracao)
+    grafo.no("volume_farmaco_ml", ["dose_total_ug", "farmaco"], _volume_farmaco)
+    grafo.no("titulacao", ["farmaco", "peso", "volume_bolsa", "equipo"], _titulacao)
+
+    # Textos dos rótulos
+    grafo.no("texto_vazao", ["vazao_ml_h"], lambda v: f"{v:.2f} ml/h")
+    grafo.no("texto_gotas", ["gotas_min"], lambda g: f"{g:.2f} gts/min")
+    grafo.no("texto_duracao", ["duracao_h"], formatar_duracao)
+    grafo.no("texto_farmaco", ["farmaco"], lambda f: f.nome)
+    grafo.no("texto_dose_farmaco", ["dose", "farmaco"], lambda dose, f: f"{dose} {f.unidade_dose}")
+    grafo.no("texto_dose_total", ["dose_total_ug"], lambda total: f"{total:.2f} mcg")
+    grafo.no("texto_concentracao", ["farmaco"], lambda f: f.texto_concentracao)
+    grafo.no("texto_volume_farmaco", ["volume_farmaco_ml"], lambda v: f"{v:.4f} ml")
+    return grafo
@@ -0,0 +1,231 @@
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional, Sequence
+
+import numpy as np
+
+# Tipos de evento aceitos pelo simulador
+EVENTO_TAXA = "taxa"              # nova taxa da bomba (ml/h)
+EVENTO_TROCA_BOLSA = "troca_bolsa"  # bolsa nova (ml); volume restante passa a ser o valor
+EVENTO_BOLUS = "bolus"            # volume (ml) administrado de uma vez a partir da bolsa
+_CODIGOS_EVENTO = {EVENTO_TAXA: 0, EVENTO_TROCA_BOLSA: 1, EVENTO_BOLUS: 2}
+
+
+@dataclass(frozen=True)
+class EventoInfusao:
+    tempo_min: float
+    tipo: str
+    valor: float
+
+
+@dataclass(frozen=True)
+class EstadoInfusao:
+    """Estado da infusão em um instante da simulação"""
+    tempo_min: float
+    taxa_ml_h: float
+    volume_infundido_ml: float
+    volume_restante_ml: float
+    dose_acumulada_ug_kg: float
+    tempo_ate_esvaziar_min: float  # inf quando a bomba está parada
+
+
+def concentracao_solucao_ug_ml(concentracao_farmaco_ug_ml: float, volume_farmaco_ml: float,
+                               volume_bolsa_ml: float) -> float:
+    """Concentração final na bolsa após diluir volume_farmaco_ml do fármaco"""
+    return concentracao_farmaco_ug_ml * volume_farmaco_ml / volume_bolsa_ml if volume_bolsa_ml > 0 else 0.0
+
+
+def _tempo_ate_esvaziar(volume_restante_ml, taxa_ml_h):
+    return volume_restante_ml / taxa_ml_h * 60 if taxa_ml_h > 0 else float("inf")
+
+
+def simular_sessao(
+    peso_kg: float,
+    concentracao_ug_ml: float,
+    volume_bolsa_ml: float,
+    taxa_ml_h: float,
+    eventos: Iterable[EventoInfusao] = (),
+    duracao_min: Optional[float] = None,
+    passo_s: float = 60.0,
+) -> Iterator[EstadoInfusao]:
+    """
+    Reproduz uma sessão passo a passo (gerador, memória constante).
+
+    Dentro de cada passo a taxa é constante; eventos são aplicados no início do passo
+    em que caem. Sem duracao_min, a simulação termina quando não há mais eventos
+    pendentes e a bolsa está vazia ou a bomba parada (taxa ≤ 0).
+    """
+    if peso_kg <= 0:
+        raise ValueError("Peso deve ser positivo")
+
+    pendentes = sorted(eventos, key=lambda e: e.tempo_min)
+    passo_min = passo_s / 60.0
+    tempo = 0.0
+    restante = float(volume_bolsa_ml)
+    infundido = 0.0
+    dose_ug_kg = 0.0
+    taxa = float(taxa_ml_h)
+    i = 0
+
+    yield EstadoInfusao(tempo, taxa, infundido, restante, dose_ug_kg, _tempo_ate_esvaziar(restante, taxa))
+
+    while True:
+        if duracao_min is not None and tempo >= duracao_min - 1e-9:
+            return
+        if duracao_min is None and i >= len(pendentes) and (restante <= 0 or taxa <= 0):
+            return
+
+        # Eventos que ocorrem até o fim deste passo
+        while i < len(pendentes) and pendentes[i].tempo_min < tempo + passo_min - 1e-9:
+            evento = pendentes[i]
+            if evento.tipo == EVENTO_TAXA:
+                taxa = float(evento.valor)
+            elif evento.tipo == EVENTO_TROCA_BOLSA:
+                restante = float(evento.valor)
+            elif evento.tipo == EVENTO_BOLUS:
+                volume = min(float(evento.valor), restante)
+                restante -= volume
+                infundido += volume
+                dose_ug_kg += volume * concentracao_ug_ml / peso_kg
+            else:
+                raise ValueError(f"Tipo de evento desconhecido: {evento.tipo}")
+            i += 1
+
+        dt_min = passo_min if duracao_min is None else min(passo_min, duracao_min - tempo)
+        volume = min(taxa * dt_min / 60, restante)
+        restante -= volume
+        if restante < 1e-9:  # resíduo de ponto flutuante
+            restante = 0.0
+        infundido += volume
+        dose_ug_kg += volume * concentracao_ug_ml / peso_kg
+        tempo += dt_min
+
+        yield EstadoInfusao(tempo, taxa, infundido, restante, dose_ug_kg,
+                            _tempo_ate_esvaziar(restante, taxa))
+
+
+@dataclass
+class LoteEventos:
+    """Eventos de várias sessões em arrays paralelos (índice da sessão, tempo, tipo, valor)"""
+    sessao: np.ndarray
+    tempo_min: np.ndarray
+    tipo: np.ndarray
+    valor: np.ndarray
+
+    @classmethod
+    def de_listas(cls, eventos_por_sessao: Sequence[Iterable[EventoInfusao]]) -> "LoteEventos":
+        linhas = [(s, e.tempo_min, _CODIGOS_EVENTO[e.tipo], e.valor)
+                  for s, eventos in enumerate(eventos_por_sessao) for e in eventos]
+        if not linhas:
+            return cls.vazio()
+        arr = np.array(linhas, dtype=np.float64)
+        ordem = np.argsort(arr[:, 1], kind="stable")
+        arr = arr[ordem]
+        return cls(arr[:, 0].astype(np.int64), arr[:, 1], arr[:, 2].astype(np.int8), arr[:, 3])
+
+    @classmethod
+    def vazio(cls) -> "LoteEventos":
+        return cls(np.empty(0, np.int64), np.empty(0), np.empty(0, np.int8), np.empty(0))
+
+
+def simular_lote(
+    pesos_kg,
+    concentracoes_ug_ml,
+    volumes_bolsa_ml,
+    taxas_ml_h,
+    duracao_min: float,
+    eventos: Optional[LoteEventos] = None,
+    passo_s: float = 60.0,
+) -> Iterator[dict]:
+    """
+    Versão vetorizada de simular_sessao: avança milhares de sessões ao mesmo tempo.
+    Gera, a cada passo, um dicionário de arrays (uma posição por sessão); a memória
+    depende só do número de sessões, não da duração simulada.
+    """
+    peso = np.asarray(pesos_kg, dtype=np.float64)
+    conc = np.broadcast_to(np.asarray(concentracoes_ug_ml, dtype=np.float64), peso.shape)
+    restante = np.array(np.broadcast_to(np.asarray(volumes_bolsa_ml, dtype=np.float64), peso.shape))
+    taxa = np.array(np.broadcast_to(np.asarray(taxas_ml_h, dtype=np.float64), peso.shape))
+    infundido = np.zeros_like(peso)
+    dose_ug_kg = np.zeros_like(peso)
+    eventos = eventos or LoteEventos.vazio()
+
+    passo_min = passo_s / 60.0
+    tempo = 0.0
+    i = 0
+
+    def estado():
+        with np.errstate(divide="ignore"):
+            ate_esvaziar = np.where(taxa > 0, restante / np.where(taxa > 0, taxa, 1) * 60, np.inf)
+        return {
+            'tempo_min': tempo,
+            'taxa_ml_h': taxa.copy(),
+            'volume_infundido_ml': infundido.copy(),
+            'volume_restante_ml': restante.copy(),
+            'dose_acumulada_ug_kg': dose_ug_kg.copy(),
+            'tempo_ate_esvaziar_min': ate_esvaziar,
+        }
+
+    yield estado()
+
+    while tempo < duracao_min - 1e-9:
+        # Aplica todos os eventos deste passo (já ordenados por tempo)
+        fim = int(np.searchsorted(eventos.tempo_min, tempo + passo_min - 1e-9, side="left"))
+        for j in range(i, fim):
+            s, tipo, valor = eventos.sessao[j], eventos.tipo[j], eventos.valor[j]
+            if tipo == 0:
+                taxa[s] = valor
+            elif tipo == 1:
+                restante[s] = valor
+            else:
+                volume = min(valor, restante[s])
+                restante[s] -= volume
+                infundido[s] += volume
+                dose_ug_kg[s] += volume * conc[s] / peso[s]
+        i = fim
+
+        dt_min = min(passo_min, duracao_min - tempo)
+        volume = np.minimum(taxa * dt_min / 60, restante)
+        restante -= volume
+        restante[restante < 1e-9] = 0.0  # resíduo de ponto flutuante
+        infundido += volume
+        dose_ug_kg += volume * conc / peso
+        tempo += dt_min
+        yield estado()
+
+
+def totais_taxa_constante(pesos_kg, concentracoes_ug_ml, volumes_bolsa_ml, taxas_ml_h,
+                          duracao_min=None) -> dict:
+    """
+    Estado final de sessões sem eventos (taxa constante do início ao fim), em forma
+    fechada: o mesmo que resumo_lote sem passos. Sem duracao_min, cada sessão vai até
+    esvaziar a bolsa (bomba parada: nada é infundido).
+    """
+    peso = np.asarray(pesos_kg, dtype=np.float64)
+    conc = np.broadcast_to(np.asarray(concentracoes_ug_ml, dtype=np.float64), peso.shape)
+    volume = np.broadcast_to(np.asarray(volumes_bolsa_ml, dtype=np.float64), peso.shape)
+    taxa = np.broadcast_to(np.asarray(taxas_ml_h, dtype=np.float64), peso.shape)
+    ligada = taxa > 0
+    taxa_segura = np.where(ligada, taxa, 1)
+
+    if duracao_min is None:
+        infundido = np.where(ligada, volume, 0.0)
+    else:
+        infundido = np.minimum(np.where(ligada, taxa, 0.0) * np.asarray(duracao_min, dtype=np.float64) / 60,
+                               volume)
+    restante = volume - infundido
+    return {
+        'taxa_ml_h': np.array(taxa),
+        'volume_infundido_ml': infundido,
+        'volume_restante_ml': restante,
+        'dose_acumulada_ug_kg': infundido * conc / peso,
+        'duracao_min': np.where(ligada, infundido / taxa_segura * 60, 0.0),
+        'tempo_ate_esvaziar_min': np.where(ligada, restante / taxa_segura * 60, np.inf),
+    }
+
+
+def resumo_lote(*args, **kwargs) -> dict:
+    """Executa simular_lote e devolve apenas o último estado"""
+    ultimo = None
+    for ultimo in simular_lote(*args, **kwargs):
+        pass
+    return ultimo
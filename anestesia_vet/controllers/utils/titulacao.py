@@ -0,0 +1,180 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import event
+
+from models.farmaco import Farmaco
+from controllers.utils.unidades import conferir_massas
+
+# Faixas padrão da grade (peso em kg, volumes de bolsa/seringa em ml)
+PESOS_PADRAO = np.round(np.arange(0.5, 80.01, 0.5), 1)
+VOLUMES_PADRAO = np.array([10, 20, 50, 100, 250, 500, 1000], dtype=np.float64)
+
+
+def doses_variaveis_lista(doses_variaveis: Optional[str]) -> List[float]:
+    """
+    Converte o campo texto em lista de floats (ignora itens inválidos). Com ";" a
+    vírgula é decimal ("0,1; 0,25"); sem ";" vale o formato antigo "0.1,0.25".
+    """
+    texto = doses_variaveis or ""
+    if ";" in texto:
+        itens = [item.replace(",", ".") for item in re.split(r"[;\s]+", texto)]
+    else:
+        itens = re.split(r"[,\s]+", texto)
+    doses = []
+    for item in itens:
+        if not item:
+            continue
+        try:
+            doses.append(float(item))
+        except ValueError:
+            continue
+    return doses
+
+
+@dataclass
+class GradeTitulacao:
+    """
+    Tabela pré-calculada de titulação para um fármaco:
+    doses × peso × volume da bolsa → ml/h, gotas/min, volume do fármaco e duração.
+    Mesmas fórmulas de calcular_infusao_continua (modo "solucao").
+    """
+    farmaco_id: int
+    assinatura: Tuple
+    unidade_dose: str
+    doses: np.ndarray            # (D,)
+    pesos: np.ndarray            # (P,)
+    volumes: np.ndarray          # (V,)
+    taxa_ml_h: np.ndarray        # (D, P)
+    volume_farmaco_ml: np.ndarray  # (D, V)
+    duracao_h: np.ndarray        # (D, P, V)
+    taxa_por_kg: np.ndarray      # (D,) ml/h por kg, para pesos fora da grade
+
+    def gotas_min(self, equipo_tipo: str = "macrogotas") -> np.ndarray:
+        """Gotas/min (D, P) para o tipo de equipo"""
+        return self.taxa_ml_h * _fator_equipo(equipo_tipo) / 60
+
+    def consultar(self, peso_kg: float, volume_bolsa_ml: float,
+                  equipo_tipo: str = "macrogotas") -> List[dict]:
+        """
+        Linha da grade para um paciente: uma entrada por dose de titulação.
+        Pesos/volumes fora da grade são calculados na hora (as fórmulas são lineares).
+        """
+        i_peso = _indice(self.pesos, peso_kg)
+        i_vol = _indice(self.volumes, volume_bolsa_ml)
+
+        if i_peso is not None:
+            taxa = self.taxa_ml_h[:, i_peso]
+        else:
+            taxa = self.taxa_por_kg * peso_kg
+
+        if i_vol is not None:
+            volume_farmaco = self.volume_farmaco_ml[:, i_vol]
+        else:
+            volume_farmaco = np.minimum(self.taxa_por_kg * volume_bolsa_ml, volume_bolsa_ml)
+
+        if i_peso is not None and i_vol is not None:
+            duracao = self.duracao_h[:, i_peso, i_vol]
+        else:
+            duracao = np.divide(volume_bolsa_ml, taxa, out=np.zeros_like(taxa), where=taxa > 0)
+
+        gotas = taxa * _fator_equipo(equipo_tipo) / 60
+        return [
+            {
+                'dose': float(self.doses[d]),
+                'taxa_ml_h': round(float(taxa[d]), 2),
+                'gotas_min': round(float(gotas[d]), 2),
+                'volume_farmaco_ml': round(float(volume_farmaco[d]), 2),
+                'volume_dilente_ml': round(float(volume_bolsa_ml - volume_farmaco[d]), 2),
+                'duracao_h': float(duracao[d]),
+            }
+            for d in range(len(self.doses))
+        ]
+
+
+def _fator_equipo(equipo_tipo: str) -> float:
+    return 20.0 if "macro" in equipo_tipo.lower() else 60.0
+
+
+def _indice(valores: np.ndarray, valor: float) -> Optional[int]:
+    """Índice do valor na grade (ordenada) ou None se não estiver nela"""
+    i = int(np.searchsorted(valores, valor))
+    if i < len(valores) and np.isclose(valores[i], valor):
+        return i
+    return None
+
+
+def _assinatura(farmaco: Farmaco) -> Tuple:
+    """Campos que alteram a grade; se mudarem a grade é recalculada"""
+    return (farmaco.dose, farmaco.concentracao, farmaco.unidade_dose,
+            farmaco.unidade_concentracao, farmaco.doses_variaveis)
+
+
+def calcular_grade(farmaco: Farmaco,
+                   pesos: np.ndarray = PESOS_PADRAO,
+                   volumes: np.ndarray = VOLUMES_PADRAO) -> GradeTitulacao:
+    """Calcula a grade completa com broadcasting (sem loops Python); ValueError se dose e concentração não combinam"""
+    conferir_massas(farmaco.unidade_dose, farmaco.unidade_concentracao)
+    doses = np.array(doses_variaveis_lista(farmaco.doses_variaveis) or [farmaco.dose], dtype=np.float64)
+    pesos = np.asarray(pesos, dtype=np.float64)
+    volumes = np.asarray(volumes, dtype=np.float64)
+
+    dose_conv = doses * farmaco.unidade.fator_ug_kg_h          # (D,)
+    concentracao_conv = farmaco.concentracao_ug_ml
+
+    taxa_por_kg = dose_conv / concentracao_conv                # (D,)
+    taxa_ml_h = (dose_conv[:, None] * pesos[None, :]) / concentracao_conv  # (D, P)
+    volume_farmaco_ml = np.minimum((dose_conv[:, None] * volumes[None, :]) / concentracao_conv,
+                                   volumes[None, :])          # (D, V)
+    taxa_3d = taxa_ml_h[:, :, None]
+    duracao_h = np.divide(volumes[None, None, :], taxa_3d,
+                          out=np.zeros(taxa_ml_h.shape + volumes.shape),
+                          where=taxa_3d > 0)                   # (D, P, V)
+
+    return GradeTitulacao(
+        farmaco_id=farmaco.id,
+        assinatura=_assinatura(farmaco),
+        unidade_dose=farmaco.unidade_dose,
+        doses=doses,
+        pesos=pesos,
+        volumes=volumes,
+        taxa_ml_h=taxa_ml_h,
+        volume_farmaco_ml=volume_farmaco_ml,
+        duracao_h=duracao_h,
+        taxa_por_kg=taxa_por_kg,
+    )
+
+
+# Cache por fármaco (id → grade)
+_grades: Dict[int, GradeTitulacao] = {}
+
+
+def obter_grade(farmaco: Farmaco) -> GradeTitulacao:
+    """Retorna a grade memorizada do fármaco, recalculando se o cadastro mudou"""
+    grade = _grades.get(farmaco.id)
+    if grade is None or grade.assinatura != _assinatura(farmaco):
+        grade = calcular_grade(farmaco)
+        if farmaco.id is not None:
+            _grades[farmaco.id] = grade
+    return grade
+
+
+def grade_em_cache(farmaco_id: int) -> Optional[GradeTitulacao]:
+    """Grade memorizada do fármaco ou None se foi invalidada (cadastro alterado/excluído)"""
+    return _grades.get(farmaco_id)
+
+
+def invalidar_grade(farmaco_id: int = None) -> None:
+    """Descarta a grade de um fármaco (ou todas, se farmaco_id for None)"""
+    if farmaco_id is None:
+        _grades.clear()
+    else:
+        _grades.pop(farmaco_id, None)
+
+
+@event.listens_for(Farmaco, "after_update")
+@event.listens_for(Farmaco, "after_delete")
+def _invalidar_ao_alterar(mapper, connection, farmaco: Farmaco) -> None:
+    invalidar_grade(farmaco.id)
@@ -0,0 +1,161 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional
+
+# Fatores de massa para µg
+# (UI - unidades internacionais - não tem conversão para massa: o fator 1 só serve
+# para dose e concentração ambas em UI se cancelarem; misturas são recusadas por
+# conferir_massas)
+MASSA_PARA_UG = {
+    "g": 1_000_000.0,
+    "mg": 1000.0,
+    "µg": 1.0,
+    "ng": 0.001,
+    "ui": 1.0,
+}
+
+# Fatores de tempo para "por hora"
+TEMPO_PARA_H = {
+    "min": 60.0,
+    "h": 1.0,
+}
+
+# Unidades de concentração oferecidas nos cadastros
+UNIDADES_CONCENTRACAO = ("mg/ml", "µg/ml", "UI/ml")
+
+# Grafias equivalentes aceitas nos cadastros e CSVs
+_SINONIMOS = {
+    "mcg": "µg",
+    "ug": "µg",
+    "μg": "µg",  # letra grega mu
+    "iu": "ui",
+    "u": "ui",
+    "hr": "h",
+    "hora": "h",
+}
+
+
+@dataclass(frozen=True)
+class Unidade:
+    """
+    Unidade de dose (ex: "mg/kg/min") ou de concentração (ex: "µg/ml") já interpretada.
+    As instâncias são únicas por forma canônica, então podem ser comparadas com `is`.
+    """
+    canonica: str
+    massa: str
+    fator_massa_ug: float
+    por_kg: bool
+    tempo: str = None
+    fator_tempo_h: float = 1.0
+    por_ml: bool = False
+
+    @property
+    def fator_ug_kg_h(self) -> float:
+        """Multiplicador que leva a dose para µg/kg/h (ou µg/kg no bolus)"""
+        return self.fator_massa_ug * self.fator_tempo_h
+
+    @property
+    def fator_ug_ml(self) -> float:
+        """Multiplicador que leva a concentração para µg/ml"""
+        return self.fator_massa_ug
+
+    @property
+    def fator_mg(self) -> float:
+        """Multiplicador que leva a massa para mg"""
+        return self.fator_massa_ug / 1000.0
+
+    @property
+    def continua(self) -> bool:
+        return self.tempo is not None
+
+    def __str__(self) -> str:
+        return self.canonica
+
+
+_INTERNADAS: Dict[str, Unidade] = {}
+
+
+@lru_cache(maxsize=None)
+def interpretar_unidade(texto: str) -> Unidade:
+    """
+    Interpreta uma string de unidade uma única vez.
+    Ex: "mg/kg/min", "mcg/kg/h", "µg/kg", "mg/ml", "µg/ml".
+    """
+    if not texto or not texto.strip():
+        raise ValueError("Unidade vazia")
+
+    partes = [p.strip().lower() for p in texto.replace(" ", "").split("/")]
+    partes = [_SINONIMOS.get(p, p) for p in partes]
+
+    massa = partes[0]
+    if massa not in MASSA_PARA_UG:
+        raise ValueError(f"Unidade de massa desconhecida: {texto}")
+
+    por_kg = False
+    por_ml = False
+    tempo = None
+    for parte in partes[1:]:
+        if parte == "kg":
+            por_kg = True
+        elif parte == "ml":
+            por_ml = True
+        elif parte in TEMPO_PARA_H:
+            tempo = parte
+        else:
+            raise ValueError(f"Unidade desconhecida: {texto}")
+
+    canonica = "/".join([massa] + (["kg"] if por_kg else []) + (["ml"] if por_ml else []) + ([tempo] if tempo else []))
+    unidade = _INTERNADAS.get(canonica)
+    if unidade is None:
+        unidade = Unidade(
+            canonica=canonica,
+            massa=massa,
+            fator_massa_ug=MASSA_PARA_UG[massa],
+            por_kg=por_kg,
+            tempo=tempo,
+            fator_tempo_h=TEMPO_PARA_H[tempo] if tempo else 1.0,
+            por_ml=por_ml,
+        )
+        _INTERNADAS[canonica] = unidade
+    return unidade
+
+
+def fator_dose_ug_kg_h(unidade_dose: str) -> float:
+    """Fator em cache para converter uma dose para µg/kg/h"""
+    return interpretar_unidade(unidade_dose).fator_ug_kg_h
+
+
+def fator_concentracao_ug_ml(unidade_concentracao: Optional[str] = "mg/ml") -> float:
+    """
+    Fator em cache para converter uma concentração para µg/ml. None (unidade não
+    confirmada, cadastro antigo) vale mg/ml, como o cálculo de infusão sempre fez.
+    """
+    return interpretar_unidade(unidade_concentracao or "mg/ml").fator_ug_ml
+
+
+@lru_cache(maxsize=None)
+def conferir_massas(unidade_dose: str, unidade_concentracao: Optional[str]) -> None:
+    """
+    Recusa (ValueError) dose em UI com concentração em massa, ou o contrário: UI não
+    tem conversão para µg. None na concentração vale mg/ml, como em fator_concentracao_ug_ml.
+    """
+    dose = interpretar_unidade(unidade_dose)
+    concentracao = interpretar_unidade(unidade_concentracao or "mg/ml")
+    if (dose.massa == "ui") != (concentracao.massa == "ui"):
+        raise ValueError(f"Dose em {dose} não combina com concentração em {concentracao} "
+                         "(UI não se converte em massa)")
+
+
+def conferir_unidades(unidade_dose: str, unidade_concentracao: Optional[str]) -> None:
+    """
+    Validação das unidades de um fármaco na gravação (ValueError se inválidas):
+    unidades conhecidas, concentração por ml e massas compatíveis. None na
+    concentração (unidade ainda não confirmada) é aceito.
+    """
+    interpretar_unidade(unidade_dose)
+    if unidade_concentracao is None:
+        return
+    concentracao = interpretar_unidade(unidade_concentracao)
+    if not concentracao.por_ml or concentracao.por_kg or concentracao.continua:
+        raise ValueError(f"Unidade de concentração inválida: {unidade_concentracao}")
+    conferir_massas(unidade_dose, unidade_concentracao)
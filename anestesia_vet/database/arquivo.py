@@ -0,0 +1,259 @@
+"""
+Arquivamento de sessões antigas (armazenamento quente/frio).
+
+arquivar_sessoes() move as sessões mais antigas que `arquivar_apos_dias` (ver
+CONFIG_PADRAO em database/engine.py) para um SQLite por ano,
+<pasta do banco>/arquivo/sessoes_<ano>.db, junto com as configurações de infusão
+delas, e depois compacta o banco principal (VACUUM). A GUI continua lendo só as
+tabelas do banco principal; consultas históricas usam conexao_historico(), que anexa
+(ATTACH) os arquivos, e modelos_historico(), que mapeia SessaoAnestesia,
+SessaoAvulsaAnestesia e ConfigInfusao sobre a UNION ALL do banco principal com os
+arquivos (filtros por id/data chegam ao índice de cada parte).
+
+Cada ano é copiado numa transação e só depois apagado do banco principal em outra:
+uma queda no meio deixa no máximo cópias repetidas, e a próxima execução termina o
+trabalho. A linha de maior id de cada tabela nunca sai do banco principal, para que
+os ids novos continuem maiores que os arquivados.
+
+Uso (a partir de anestesia_vet/):
+    python -m database.arquivo                # usa arquivar_apos_dias da configuração
+    python -m database.arquivo --dias 365 --sem-vacuum
+"""
+import argparse
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Column, DateTime, MetaData, Table, bindparam, literal, select, text, union_all
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import aliased
+from sqlmodel import Session
+
+from database.engine import carregar_config, engine
+from models.config_infusao import ConfigInfusao
+from models.sessao import SessaoAnestesia, SessaoAvulsaAnestesia
+
+MODELOS = (SessaoAnestesia, SessaoAvulsaAnestesia, ConfigInfusao)
+_SESSOES = (SessaoAnestesia.__table__.name, SessaoAvulsaAnestesia.__table__.name)
+_CONFIG = ConfigInfusao.__table__.name
+_PADRAO_ARQUIVO = re.compile(r"sessoes_(\d{4})\.db$")
+
+
+def diretorio_arquivo(engine: Engine = engine) -> Optional[Path]:
+    """Pasta dos arquivos anuais (None para bancos em memória)"""
+    banco = engine.url.database
+    if not banco or banco == ":memory:" or "mode=memory" in str(engine.url):
+        return None
+    configurado = carregar_config().get('diretorio_arquivo')
+    return Path(configurado) if configurado else Path(banco).resolve().parent / "arquivo"
+
+
+def arquivos_existentes(engine: Engine = engine) -> Dict[int, Path]:
+    """{ano: caminho} dos arquivos já criados, em ordem de ano"""
+    pasta = diretorio_arquivo(engine)
+    if pasta is None or not pasta.is_dir():
+        return {}
+    encontrados = {}
+    for caminho in pasta.iterdir():
+        combina = _PADRAO_ARQUIVO.search(caminho.name)
+        if combina:
+            encontrados[int(combina.group(1))] = caminho
+    return dict(sorted(encontrados.items()))
+
+
+def _colunas(conn: Connection, esquema: str, tabela: str) -> List[str]:
+    return [linha[1] for linha in conn.exec_driver_sql(f'PRAGMA {esquema}.table_info("{tabela}")')]
+
+
+@contextmanager
+def conexao_historico(engine: Engine = engine) -> Iterator[Connection]:
+    """Conexão com todos os arquivos anexados (esquemas arquivo_<ano>); desanexa ao sair"""
+    arquivos = arquivos_existentes(engine)
+    with engine.connect() as conn:
+        limite = conn.connection.driver_connection.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        if len(arquivos) > limite:
+            raise RuntimeError(f"{len(arquivos)} arquivos anuais, mas o SQLite anexa no máximo {limite}")
+        esquemas = []
+        try:
+            for ano, caminho in arquivos.items():
+                esquema = f"arquivo_{ano}"
+                conn.exec_driver_sql(f"ATTACH DATABASE ? AS {esquema}", (str(caminho),))
+                esquemas.append(esquema)
+            conn.commit()
+            conn.info['esquemas_arquivo'] = esquemas
+            yield conn
+        finally:
+            conn.rollback()
+            conn.info.pop('esquemas_arquivo', None)
+            for esquema in esquemas:
+                conn.exec_driver_sql(f"DETACH DATABASE {esquema}")
+            conn.commit()
+
+
+def _no_esquema(conn: Connection, modelo, esquema: str):
+    """Tabela do modelo num arquivo anexado; colunas que ainda não existiam nele vêm como NULL"""
+    tabela = modelo.__table__
+    existentes = set(_colunas(conn, esquema, tabela.name))
+    copia = Table(tabela.name, MetaData(),
+                  *[Column(c.name, c.type) for c in tabela.columns if c.name in existentes],
+                  schema=esquema)
+    if all(c.name in existentes for c in tabela.columns):
+        return copia
+    return select(*[
+        copia.c[c.name] if c.name in existentes else literal(None, c.type).label(c.name)
+        for c in tabela.columns
+    ]).subquery(f"{esquema}_{tabela.name}")
+
+
+def modelos_arquivo(conn: Connection, esquema: str) -> Tuple:
+    """(SessaoAnestesia, SessaoAvulsaAnestesia, ConfigInfusao) mapeados sobre um único arquivo"""
+    return tuple(aliased(modelo, _no_esquema(conn, modelo, esquema), adapt_on_names=True)
+                 for modelo in MODELOS)
+
+
+def modelos_historico(conn: Connection) -> Tuple:
+    """
+    (SessaoAnestesia, SessaoAvulsaAnestesia, ConfigInfusao) mapeados sobre
+    banco principal UNION ALL arquivos, para uso com uma conexão de conexao_historico().
+    """
+    esquemas = conn.info.get('esquemas_arquivo', [])
+    resultado = []
+    for modelo in MODELOS:
+        tabela = modelo.__table__
+        if esquemas:
+            partes = [select(tabela)]
+            for esquema in esquemas:
+                parte = _no_esquema(conn, modelo, esquema)
+                # Linhas que também estão no banco principal (cópias) aparecem uma vez só
+                partes.append(select(parte).where(parte.c.id.not_in(select(tabela.c.id))))
+            tabela = union_all(*partes).subquery(f"historico_{tabela.name}")
+        resultado.append(aliased(modelo, tabela, adapt_on_names=True))
+    return tuple(resultado)
+
+
+def obter_sessao(session: Session, modelo, registro_id: int):
+    """
+    session.get() que também procura nos arquivos (SessaoAnestesia, SessaoAvulsaAnestesia
+    ou ConfigInfusao). O registro arquivado volta desvinculado, só para leitura.
+    """
+    registro = session.get(modelo, registro_id)
+    engine = session.get_bind()
+    if registro is not None or not arquivos_existentes(engine):
+        return registro
+    with conexao_historico(engine) as conn:
+        historico = modelos_historico(conn)[MODELOS.index(modelo)]
+        with Session(bind=conn) as leitura:
+            registro = leitura.scalars(select(historico).where(historico.id == registro_id)).first()
+            if registro is not None:
+                leitura.expunge(registro)
+    return registro
+
+
+def _criar_tabelas(conn: Connection, esquema: str) -> None:
+    """Tabelas e índices do arquivo copiados do esquema atual do banco principal"""
+    for tabela in _SESSOES + (_CONFIG,):
+        sql = conn.exec_driver_sql(
+            "SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (tabela,)).scalar()
+        conn.exec_driver_sql(re.sub(r'^CREATE TABLE\s+"?\w+"?',
+                                    f'CREATE TABLE IF NOT EXISTS {esquema}."{tabela}"', sql))
+        indices = conn.exec_driver_sql(
+            "SELECT sql FROM main.sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (tabela,)).scalars().all()
+        for sql in indices:
+            conn.exec_driver_sql(re.sub(r'^CREATE (UNIQUE )?INDEX\s+"?(\w+)"?',
+                                        lambda m: f'CREATE {m.group(1) or ""}INDEX IF NOT EXISTS {esquema}."{m.group(2)}"',
+                                        sql))
+
+
+def _colunas_comuns(conn: Connection, esquema: str, tabela: str) -> str:
+    no_arquivo = set(_colunas(conn, esquema, tabela))
+    return ", ".join(c for c in _colunas(conn, "main", tabela) if c in no_arquivo)
+
+
+def _copiar_ano(conn: Connection, esquema: str, ano: int, corte: datetime) -> None:
+    for tabela in _SESSOES:
+        colunas = _colunas_comuns(conn, esquema, tabela)
+        conn.execute(text(
+            f"INSERT OR REPLACE INTO {esquema}.{tabela} ({colunas}) "
+            f"SELECT {colunas} FROM main.{tabela} "
+            f"WHERE data < :corte AND CAST(strftime('%Y', data) AS INTEGER) = :ano "
+            f"AND id < (SELECT max(id) FROM main.{tabela})"
+        ).bindparams(bindparam("corte", type_=DateTime)), {'corte': corte, 'ano': ano})
+    colunas = _colunas_comuns(conn, esquema, _CONFIG)
+    conn.exec_driver_sql(
+        f"INSERT OR REPLACE INTO {esquema}.{_CONFIG} ({colunas}) "
+        f"SELECT {colunas} FROM main.{_CONFIG} WHERE id IN "
+        f"(SELECT config_infusao_id FROM {esquema}.{SessaoAnestesia.__table__.name})")
+
+
+def _apagar_copiados(conn: Connection, esquema: str) -> int:
+    apagadas = 0
+    for tabela in _SESSOES:
+        apagadas += conn.exec_driver_sql(
+            f"DELETE FROM main.{tabela} WHERE id IN (SELECT id FROM {esquema}.{tabela})").rowcount
+    # Configurações ainda usadas por sessões do banco principal ficam (cópia no arquivo)
+    conn.exec_driver_sql(
+        f"DELETE FROM main.{_CONFIG} WHERE id IN (SELECT id FROM {esquema}.{_CONFIG}) "
+        f"AND id NOT IN (SELECT config_infusao_id FROM main.{SessaoAnestesia.__table__.name} "
+        f"WHERE config_infusao_id IS NOT NULL) "
+        f"AND id < (SELECT max(id) FROM main.{_CONFIG})")
+    return apagadas
+
+
+def arquivar_sessoes(engine: Engine = engine, idade_dias: int = None, vacuum: bool = True,
+                     agora: datetime = None) -> Dict[int, int]:
+    """Move sessões mais antigas que idade_dias para os arquivos anuais; devolve {ano: sessões}"""
+    from database.sincronizacao import sem_registro
+    pasta = diretorio_arquivo(engine)
+    if pasta is None:
+        raise ValueError("O arquivamento exige um banco em arquivo")
+    if idade_dias is None:
+        idade_dias = int(carregar_config()['arquivar_apos_dias'])
+    corte = (agora or datetime.now()) - timedelta(days=idade_dias)
+
+    consulta_anos = " UNION ".join(
+        f"SELECT DISTINCT CAST(strftime('%Y', data) AS INTEGER) FROM {tabela} "
+        f"WHERE data < :corte AND id < (SELECT max(id) FROM {tabela})"
+        for tabela in _SESSOES)
+    arquivadas: Dict[int, int] = {}
+    with engine.connect() as conn:
+        anos = conn.execute(text(consulta_anos).bindparams(bindparam("corte", type_=DateTime)),
+                            {'corte': corte}).scalars().all()
+        conn.commit()
+        if anos:
+            pasta.mkdir(parents=True, exist_ok=True)
+        for ano in sorted(anos):
+            esquema = f"arquivo_{ano}"
+            conn.exec_driver_sql(f"ATTACH DATABASE ? AS {esquema}", (str(pasta / f"sessoes_{ano}.db"),))
+            conn.commit()
+            try:
+                with conn.begin():
+                    _criar_tabelas(conn, esquema)
+                    _copiar_ano(conn, esquema, ano, corte)
+                with conn.begin(), sem_registro(conn):
+                    # Arquivar não é excluir: nada vai para as outras estações
+                    arquivadas[ano] = _apagar_copiados(conn, esquema)
+            finally:
+                conn.rollback()
+                conn.exec_driver_sql(f"DETACH DATABASE {esquema}")
+                conn.commit()
+        if arquivadas and vacuum:
+            conn.exec_driver_sql("VACUUM")
+            conn.commit()
+    return arquivadas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Arquiva sessões antigas em bancos anuais")
+    parser.add_argument("--dias", type=int, help="idade mínima das sessões arquivadas (dias)")
+    parser.add_argument("--sem-vacuum", action="store_true", help="não compacta o banco principal")
+    args = parser.parse_args()
+
+    resultado = arquivar_sessoes(engine, args.dias, vacuum=not args.sem_vacuum)
+    for ano, total in resultado.items():
+        print(f"{ano}: {total} sessões arquivadas")
+    if not resultado:
+        print("Nenhuma sessão para arquivar.")
@@ -0,0 +1,284 @@
+"""
+Cópias de segurança com a API de backup online do SQLite.
+
+fazer_backup() copia o banco em passos de `backup_paginas_por_passo` páginas, com
+uma pausa de `backup_pausa_ms` entre eles (ver CONFIG_PADRAO em database/engine.py):
+cada passo só segura o banco por alguns milissegundos, então a GUI e as outras
+conexões continuam gravando durante o backup. A cópia é escrita num arquivo
+.parcial e só ganha o nome final quando termina; um backup interrompido nunca
+aparece na lista.
+
+- girar_backups() mantém o mais recente de cada um dos últimos
+  `backup_manter_diarios` dias e de cada um dos últimos `backup_manter_mensais` meses.
+  As cópias de segurança feitas antes de uma restauração ficam fora da rotação.
+- verificar_backup() roda PRAGMA integrity_check na cópia.
+- restaurar_backup() verifica a cópia, faz um backup do banco atual e grava a cópia
+  sobre ele também pela API de backup (com os bloqueios do SQLite, sem trocar o
+  arquivo por baixo de conexões abertas); depois aplica as migrações pendentes e dá
+  um novo identificador à estação, porque o registro de alterações da sincronização
+  voltou a seqs que as outras estações já receberam.
+- BackupPeriodico roda backup + rotação numa thread própria (backup automático da GUI).
+
+Uso (a partir de anestesia_vet/):
+    python -m database.backup                  # backup + rotação
+    python -m database.backup --listar
+    python -m database.backup --verificar backup/backup_20240501_120000.db
+    python -m database.backup --restaurar backup/backup_20240501_120000.db
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from sqlalchemy.engine import Engine
+
+from database.engine import carregar_config, engine
+from controllers.utils.formatacao import sem_acentos
+
+PREFIXO = "backup_"
+SUFIXO_SEGURANCA = "_antes_restauracao"
+FORMATO_DATA = "%Y%m%d_%H%M%S"
+
+
+class BackupCancelado(Exception):
+    pass
+
+
+def _caminho_banco(engine: Engine) -> Path:
+    banco = engine.url.database
+    if not banco or banco == ":memory:" or "mode=memory" in str(engine.url):
+        raise ValueError("O backup exige um banco em arquivo")
+    return Path(banco).resolve()
+
+
+def diretorio_backup(engine: Engine = engine) -> Path:
+    configurado = carregar_config().get('diretorio_backup')
+    return Path(configurado) if configurado else _caminho_banco(engine).parent / "backup"
+
+
+def listar_backups(engine: Engine = engine) -> List[Path]:
+    """Backups concluídos, do mais antigo ao mais recente"""
+    pasta = diretorio_backup(engine)
+    if not pasta.is_dir():
+        return []
+    return sorted(pasta.glob(f"{PREFIXO}*.db"))
+
+
+def _data_do_backup(caminho: Path) -> Optional[datetime]:
+    try:
+        return datetime.strptime(caminho.stem[len(PREFIXO):len(PREFIXO) + 15], FORMATO_DATA)
+    except ValueError:
+        return None
+
+
+def _copiar(origem: sqlite3.Connection, destino: sqlite3.Connection, paginas: int, pausa_ms: int,
+            ao_progresso: Callable[[int, int], None], cancelado: threading.Event) -> None:
+    def progresso(_status, restantes, total):
+        if ao_progresso:
+            ao_progresso(total - restantes, total)
+        if cancelado is not None and cancelado.is_set():
+            raise BackupCancelado()
+        if restantes and pausa_ms:
+            time.sleep(pausa_ms / 1000)
+
+    # Uma transação de leitura aberta na origem fixa o instantâneo (WAL) durante todos
+    # os passos: gravações de outras conexões seguem normalmente e não reiniciam a cópia.
+    origem.execute("BEGIN")
+    origem.execute("SELECT count(*) FROM sqlite_master").fetchall()
+    try:
+        origem.backup(destino, pages=paginas, progress=progresso)
+    finally:
+        origem.rollback()
+
+
+def fazer_backup(engine: Engine = engine, destino: str = None, paginas: int = None, pausa_ms: int = None,
+                 ao_progresso: Callable[[int, int], None] = None, cancelado: threading.Event = None,
+                 agora: datetime = None, sufixo: str = "") -> Optional[Path]:
+    """
+    Backup online do banco; devolve o caminho da cópia (None se cancelado).
+    Sem destino, grava em <pasta de backups>/backup_<data>_<hora><sufixo>.db.
+    ao_progresso(paginas_copiadas, total) é chamado após cada passo, na thread do backup.
+    """
+    config = carregar_config()
+    paginas = paginas or int(config['backup_paginas_por_passo'])
+    pausa_ms = int(config['backup_pausa_ms']) if pausa_ms is None else pausa_ms
+    if destino is None:
+        pasta = diretorio_backup(engine)
+        pasta.mkdir(parents=True, exist_ok=True)
+        destino = pasta / f"{PREFIXO}{(agora or datetime.now()).strftime(FORMATO_DATA)}{sufixo}.db"
+    destino = Path(destino)
+    parcial = destino.with_suffix(".parcial")
+
+    origem = sqlite3.connect(_caminho_banco(engine), timeout=int(config['busy_timeout']) / 1000)
+    copia = sqlite3.connect(parcial)
+    try:
+        _copiar(origem, copia, paginas, pausa_ms, ao_progresso, cancelado)
+        # A cópia fica num arquivo só (sem -wal/-shm ao ser aberta)
+        copia.execute("PRAGMA journal_mode=DELETE")
+    except BackupCancelado:
+        copia.close()
+        parcial.unlink(missing_ok=True)
+        return None
+    except BaseException:
+        copia.close()
+        parcial.unlink(missing_ok=True)
+        raise
+    finally:
+        origem.close()
+    copia.close()
+    os.replace(parcial, destino)
+    return destino
+
+
+def verificar_backup(caminho: str) -> List[str]:
+    """Problemas encontrados pelo PRAGMA integrity_check (lista vazia = cópia íntegra)"""
+    caminho = Path(caminho)
+    if not caminho.is_file():
+        return [f"Arquivo não encontrado: {caminho}"]
+    try:
+        with closing(sqlite3.connect(f"file:{caminho}?mode=ro", uri=True)) as conn:
+            # Usada pelo índice de expressão da busca em backups anteriores à migração 10
+            conn.create_function("sem_acentos", 1, sem_acentos, deterministic=True)
+            resultado = [linha[0] for linha in conn.execute("PRAGMA integrity_check")]
+    except sqlite3.DatabaseError as erro:
+        return [str(erro)]
+    return [] if resultado == ["ok"] else resultado
+
+
+def restaurar_backup(caminho: str, engine: Engine = engine) -> Path:
+    """
+    Substitui o conteúdo do banco pelo backup; devolve o backup de segurança do estado
+    anterior. Caches em memória de quem já leu o banco (ex: a GUI) ficam desatualizados.
+    """
+    problemas = verificar_backup(caminho)
+    if problemas:
+        raise ValueError(f"Backup inválido ({Path(caminho).name}): {problemas[0]}")
+    seguranca = fazer_backup(engine, sufixo=SUFIXO_SEGURANCA)
+
+    config = carregar_config()
+    origem = sqlite3.connect(f"file:{Path(caminho)}?mode=ro", uri=True)
+    banco = sqlite3.connect(_caminho_banco(engine), timeout=int(config['busy_timeout']) / 1000)
+    try:
+        # Passo único: ninguém pode ler um banco restaurado pela metade
+        origem.backup(banco)
+        banco.execute(f"PRAGMA journal_mode={config['journal_mode']}")
+    finally:
+        origem.close()
+        banco.close()
+
+    from database.migracoes import migrar
+    from database.sincronizacao import instalada, novo_no
+    migrar(engine, verbose=False)
+    with engine.connect() as conn:
+        sincroniza = instalada(conn)
+    if sincroniza:
+        # Com o mesmo identificador, as próximas alterações reusariam seqs já vistas pelas
+        # outras estações e seriam ignoradas por elas
+        novo_no(engine)
+    return seguranca
+
+
+def girar_backups(engine: Engine = engine, manter_diarios: int = None, manter_mensais: int = None) -> List[Path]:
+    """
+    Apaga os backups fora da retenção (e sobras .parcial); devolve os apagados.
+    Cópias de segurança de restaurações nunca são apagadas aqui.
+    """
+    config = carregar_config()
+    manter_diarios = int(config['backup_manter_diarios']) if manter_diarios is None else manter_diarios
+    manter_mensais = int(config['backup_manter_mensais']) if manter_mensais is None else manter_mensais
+
+    datados = [(data, caminho) for caminho in listar_backups(engine)
+               if not caminho.stem.endswith(SUFIXO_SEGURANCA)
+               and (data := _data_do_backup(caminho)) is not None]
+    datados.sort(reverse=True)
+    manter = set()
+    for periodo, limite in ((lambda d: d.date(), manter_diarios), (lambda d: (d.year, d.month), manter_mensais)):
+        vistos = set()
+        for data, caminho in datados:
+            chave = periodo(data)
+            if chave not in vistos and len(vistos) < limite:
+                vistos.add(chave)
+                manter.add(caminho)  # o primeiro de cada período é o mais recente
+
+    apagados = [caminho for _, caminho in datados if caminho not in manter]
+    pasta = diretorio_backup(engine)
+    if pasta.is_dir():
+        apagados += list(pasta.glob(f"{PREFIXO}*.parcial"))
+    for caminho in apagados:
+        caminho.unlink(missing_ok=True)
+    return apagados
+
+
+class BackupPeriodico:
+    """Backup + rotação a cada `intervalo_min` minutos numa thread própria"""
+
+    def __init__(self, engine: Engine = engine, intervalo_min: float = None,
+                 ao_concluir: Callable[[Path], None] = None):
+        """ao_concluir(caminho): chamado pela thread do backup após cada cópia"""
+        self.engine = engine
+        self.intervalo_min = (float(carregar_config()['backup_intervalo_min'])
+                              if intervalo_min is None else intervalo_min)
+        self.ao_concluir = ao_concluir
+        self.ultimo_erro: Optional[BaseException] = None
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def iniciar(self) -> None:
+        if self.intervalo_min <= 0 or self._thread is not None:
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._laco, name="backup-periodico", daemon=True)
+        self._thread.start()
+
+    def _laco(self) -> None:
+        while not self._parar.wait(self.intervalo_min * 60):
+            try:
+                caminho = fazer_backup(self.engine, cancelado=self._parar)
+                if caminho is None:
+                    return
+                girar_backups(self.engine)
+                self.ultimo_erro = None
+                if self.ao_concluir:
+                    self.ao_concluir(caminho)
+            except Exception as erro:  # disco cheio, pasta indisponível: tenta no próximo ciclo
+                self.ultimo_erro = erro
+
+    def parar(self) -> None:
+        """Interrompe a espera (ou o backup em andamento, descartando a cópia parcial)"""
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backup online do banco de anestesia")
+    grupo = parser.add_mutually_exclusive_group()
+    grupo.add_argument("--listar", action="store_true", help="lista os backups existentes")
+    grupo.add_argument("--verificar", metavar="ARQUIVO", help="confere a integridade de um backup")
+    grupo.add_argument("--restaurar", metavar="ARQUIVO", help="restaura um backup sobre o banco")
+    parser.add_argument("--destino", help="arquivo do backup (padrão: pasta de backups, sem rotação)")
+    args = parser.parse_args()
+
+    if args.listar:
+        for caminho in listar_backups(engine):
+            print(f"{caminho}  {caminho.stat().st_size / 1024 / 1024:.1f} MB")
+    elif args.verificar:
+        problemas = verificar_backup(args.verificar)
+        print("Backup íntegro." if not problemas else "\n".join(problemas))
+        raise SystemExit(1 if problemas else 0)
+    elif args.restaurar:
+        seguranca = restaurar_backup(args.restaurar, engine)
+        print(f"Banco restaurado. Estado anterior salvo em {seguranca}")
+    else:
+        caminho = fazer_backup(engine, args.destino,
+                               ao_progresso=lambda feitas, total: print(f"\r{feitas}/{total} páginas", end=""))
+        print(f"\nBackup salvo em {caminho}")
+        if args.destino is None:
+            for apagado in girar_backups(engine):
+                print(f"Removido pela rotação: {apagado.name}")
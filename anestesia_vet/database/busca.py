@@ -0,0 +1,144 @@
+"""
+Índice de busca do catálogo de fármacos (FTS5 com tokenizador trigram).
+
+O app grava sem_acentos(nome) e sem_acentos(comentario) em farmaco.nome_busca e
+farmaco.comentario_busca (eventos do modelo, importação e sincronização).
+farmaco_busca (rowid = farmaco.id) copia essas colunas por gatilhos de SQL puro,
+então o banco não depende de funções do app: outra ferramenta (ex: o sqlite3 de
+linha de comando) grava e confere o arquivo normalmente. Linhas gravadas assim
+ficam com nome_busca NULL (o índice usa lower() até preencher_busca() completar).
+
+O prefixo do nome usa o índice de nome_busca. Trigramas exigem palavras com 3
+letras ou mais; termos só com palavras menores são buscados apenas como prefixo
+do nome.
+"""
+from typing import List
+
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+
+from database.engine import engine
+from database.sincronizacao import sem_registro
+from controllers.utils.formatacao import sem_acentos
+
+TABELA = "farmaco_busca"
+LIMITE_PADRAO = 20
+
+# Texto indexado de uma linha (new/old) de farmaco
+_NOME = "coalesce({0}.nome_busca, lower({0}.nome))"
+_COMENTARIO = "coalesce({0}.comentario_busca, lower({0}.comentario))"
+
+_GATILHOS = [
+    f"""CREATE TRIGGER IF NOT EXISTS farmaco_busca_ai AFTER INSERT ON farmaco BEGIN
+        INSERT INTO {TABELA} (rowid, nome, comentario)
+        VALUES (new.id, {_NOME.format("new")}, {_COMENTARIO.format("new")});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS farmaco_busca_ad AFTER DELETE ON farmaco BEGIN
+        DELETE FROM {TABELA} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS farmaco_busca_au
+        AFTER UPDATE OF nome, comentario, nome_busca, comentario_busca ON farmaco BEGIN
+        UPDATE {TABELA} SET nome = {_NOME.format("new")}, comentario = {_COMENTARIO.format("new")}
+        WHERE rowid = new.id;
+    END""",
+]
+
+
+def criar_indice_busca(conn: Connection) -> None:
+    """Cria a tabela FTS5 e os gatilhos e indexa o catálogo atual"""
+    conn.exec_driver_sql(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA} USING fts5(nome, comentario, tokenize='trigram')")
+    for gatilho in _GATILHOS:
+        conn.exec_driver_sql(gatilho)
+    preencher_busca(conn)
+    reindexar(conn)
+
+
+def preencher_busca(conn: Connection) -> int:
+    """Calcula nome_busca/comentario_busca das linhas gravadas sem o app; devolve quantas"""
+    linhas = conn.exec_driver_sql(
+        "SELECT id, nome, comentario FROM farmaco WHERE nome_busca IS NULL").all()
+    if linhas:
+        # Colunas derivadas: não geram alterações para sincronizar
+        with sem_registro(conn):
+            conn.exec_driver_sql(
+                "UPDATE farmaco SET nome_busca = ?, comentario_busca = ? WHERE id = ?",
+                [(sem_acentos(nome), sem_acentos(comentario), farmaco_id)
+                 for farmaco_id, nome, comentario in linhas])
+    return len(linhas)
+
+
+def reindexar(conn: Connection) -> None:
+    conn.exec_driver_sql(f"DELETE FROM {TABELA}")
+    conn.exec_driver_sql(
+        f"INSERT INTO {TABELA} (rowid, nome, comentario) "
+        f"SELECT id, {_NOME.format('farmaco')}, {_COMENTARIO.format('farmaco')} FROM farmaco")
+
+
+def indice_disponivel(conn: Connection) -> bool:
+    return conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (TABELA,)).first() is not None
+
+
+def _por_prefixo(conn: Connection, prefixo: str, limite: int) -> List[int]:
+    """Nomes que começam pelo termo, em ordem alfabética (faixa do índice ix_farmaco_nome_busca)"""
+    linhas = conn.exec_driver_sql(
+        "SELECT id FROM farmaco WHERE nome_busca >= ? AND nome_busca < ? "
+        "ORDER BY nome_busca, id LIMIT ?", (prefixo, prefixo + "\U0010ffff", limite))
+    return [linha[0] for linha in linhas]
+
+
+def _por_trecho(conn: Connection, palavras: List[str], limite: int) -> List[int]:
+    """
+    Fármacos com todas as palavras no nome ou no comentário: as de 3+ letras vão para
+    o MATCH (cada uma como frase), as curtas só filtram. Sem ORDER BY: para no limite.
+    """
+    longas = [p for p in palavras if len(p) >= 3]
+    curtas = [p for p in palavras if len(p) < 3]
+    match = " AND ".join('"' + p.replace('"', '""') + '"' for p in longas)
+    filtros = "".join(" AND instr(nome || ' ' || comentario, ?) > 0" for _ in curtas)
+    linhas = conn.exec_driver_sql(
+        f"SELECT rowid FROM {TABELA} WHERE {TABELA} MATCH ?{filtros} LIMIT ?", (match, *curtas, limite))
+    return [linha[0] for linha in linhas]
+
+
+def buscar_farmacos(termo: str, limite: int = LIMITE_PADRAO, engine: Engine = engine) -> List[int]:
+    """
+    Ids dos fármacos que combinam com o termo, sem diferenciar acentos e maiúsculas:
+    primeiro os nomes que começam pelo termo (em ordem alfabética), depois os que o
+    contêm no nome ou no comentário. No máximo `limite`; termo vazio devolve os
+    primeiros por nome.
+    """
+    palavras = sem_acentos(termo).split()
+    with engine.connect() as conn:
+        if not palavras:
+            linhas = conn.exec_driver_sql("SELECT id FROM farmaco ORDER BY nome, id LIMIT ?", (limite,))
+            return [linha[0] for linha in linhas]
+
+        ids = _por_prefixo(conn, " ".join(palavras), limite)
+        if len(ids) >= limite or all(len(p) < 3 for p in palavras):
+            return ids
+        if indice_disponivel(conn):
+            trechos = _por_trecho(conn, palavras, limite + len(ids))
+        else:
+            # Banco sem o índice (SQLite sem FTS5/trigram): varredura com a mesma regra
+            linhas = conn.exec_driver_sql(
+                "SELECT id FROM farmaco WHERE "
+                + " AND ".join("instr(coalesce(nome_busca, lower(nome)) || ' ' "
+                               "|| coalesce(comentario_busca, lower(comentario), ''), ?) > 0"
+                               for _ in palavras)
+                + " LIMIT ?", (*palavras, limite + len(ids)))
+            trechos = [linha[0] for linha in linhas]
+        vistos = set(ids)
+        ids.extend(i for i in trechos if i not in vistos)
+        return ids[:limite]
+
+
+def criar_indice_se_possivel(conn: Connection) -> bool:
+    """criar_indice_busca(), mas sem falhar em SQLite sem FTS5/trigram (a busca usa varredura)"""
+    try:
+        with conn.begin_nested():
+            criar_indice_busca(conn)
+        return True
+    except OperationalError:
+        return False
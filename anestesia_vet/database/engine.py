@@ -1,14 +1,172 @@
+import json
+import os
+from pathlib import Path
+
 from sqlmodel import SQLModel, create_engine
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from models.animal import Animal
 from models.farmaco import Farmaco
 from models.sessao import SessaoAnestesia, SessaoAvulsaAnestesia
 from models.config_infusao import ConfigInfusao
 from models.protocolo import Protocolo, ProtocoloFarmaco
+from models.diario import DiarioSessao
+from models.consumo import ConsumoDiario
+from controllers.utils.formatacao import sem_acentos
+
+# Configuração padrão do banco. Cada chave pode ser sobrescrita por um arquivo JSON
+# (ANESTESIA_DB_CONFIG ou database/config.json) e depois por variáveis de ambiente
+# ANESTESIA_DB_<CHAVE> (ex: ANESTESIA_DB_ECHO=1, ANESTESIA_DB_URL=sqlite:///outro.db).
+CONFIG_PADRAO = {
+    'url': "sqlite:///database.db",
+    'echo': False,
+    # PRAGMAs aplicados em cada conexão SQLite
+    'journal_mode': "WAL",
+    'synchronous': "NORMAL",
+    'mmap_size': 256 * 1024 * 1024,   # bytes
+    'cache_size': -64_000,            # negativo = KiB (64 MB)
+    'temp_store': "MEMORY",
+    'busy_timeout': 5000,             # ms
+    # Caches de instruções (sqlite3 e SQLAlchemy)
+    'cache_instrucoes': 256,
+    'query_cache_size': 500,
+    # Pool de conexões (só para bancos em arquivo)
+    'pool_size': 5,
+    'max_overflow': 10,
+    'pool_timeout': 30,
+    # Arquivamento de sessões antigas (database/arquivo.py)
+    'arquivar_apos_dias': 730,
+    'diretorio_arquivo': "",          # vazio = pasta "arquivo" ao lado do banco
+    # Cópias de segurança (database/backup.py)
+    'diretorio_backup': "",           # vazio = pasta "backup" ao lado do banco
+    'backup_paginas_por_passo': 256,  # páginas copiadas por passo da API de backup
+    'backup_pausa_ms': 5,             # pausa entre passos (deixa as gravações passarem)
+    'backup_intervalo_min': 240,      # backup automático da GUI (0 = desligado)
+    'backup_manter_diarios': 7,
+    'backup_manter_mensais': 12,
+    # Instantâneo das listas de referência para a abertura da GUI (controllers/cache_referencia.py)
+    'arquivo_cache_referencia': "",   # vazio = cache_referencia.json ao lado do banco
+    # Segredo compartilhado da sincronização por socket (database/sincronizacao.py)
+    'sinc_segredo': "",
+}
+
+CONFIG_ARQUIVO_PADRAO = Path(__file__).parent / "config.json"
+
+
+def _converter(valor: str, padrao):
+    """Converte o texto da variável de ambiente para o tipo do valor padrão"""
+    if isinstance(padrao, bool):
+        return valor.strip().lower() in ("1", "true", "sim", "yes", "on")
+    if isinstance(padrao, int):
+        return int(valor)
+    return valor
+
+
+def carregar_config(caminho: str = None) -> dict:
+    """Configuração do banco: padrão < arquivo JSON < variáveis de ambiente"""
+    config = dict(CONFIG_PADRAO)
+
+    arquivo = Path(caminho or os.environ.get("ANESTESIA_DB_CONFIG") or CONFIG_ARQUIVO_PADRAO)
+    if arquivo.exists():
+        with open(arquivo, encoding="utf-8") as f:
+            config.update(json.load(f))
+
+    for chave, padrao in CONFIG_PADRAO.items():
+        valor = os.environ.get(f"ANESTESIA_DB_{chave.upper()}")
+        if valor is not None:
+            config[chave] = _converter(valor, padrao)
+    return config
+
+
+def _aplicar_pragmas(engine: Engine, config: dict, somente_leitura: bool) -> None:
+    pragmas = [
+        f"PRAGMA busy_timeout={int(config['busy_timeout'])}",
+        f"PRAGMA synchronous={config['synchronous']}",
+        f"PRAGMA mmap_size={int(config['mmap_size'])}",
+        f"PRAGMA cache_size={int(config['cache_size'])}",
+        f"PRAGMA temp_store={config['temp_store']}",
+    ]
+    if somente_leitura:
+        pragmas.append("PRAGMA query_only=ON")
+    else:
+        # journal_mode grava no arquivo; a conexão só de leitura usa o modo já definido
+        pragmas.insert(0, f"PRAGMA journal_mode={config['journal_mode']}")
+
+    @event.listens_for(engine, "connect")
+    def _ao_conectar(dbapi_conn, _registro):
+        cursor = dbapi_conn.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+        # Usada pela migração 7 (busca de fármacos) em bancos que ainda não passaram pela 10
+        dbapi_conn.create_function("sem_acentos", 1, sem_acentos, deterministic=True)
 
-sqlite_url = "sqlite:///database.db"
-engine = create_engine(sqlite_url, echo=True)
 
-# ... código existente ...
+def criar_engine(url: str = None, somente_leitura: bool = False, config: dict = None, **opcoes) -> Engine:
+    """
+    Fábrica única de engines (GUI, controllers de linha de comando e testes).
+
+    - url/opcoes sobrescrevem a configuração carregada (carregar_config()).
+    - somente_leitura=True gera um engine para relatórios: as conexões recebem
+      PRAGMA query_only, então qualquer escrita falha.
+    """
+    config = dict(config or carregar_config())
+    config.update(opcoes)
+    if url is not None:
+        config['url'] = url
+
+    url = config['url']
+    em_memoria = url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
+    argumentos = {
+        'echo': config['echo'],
+        'query_cache_size': config['query_cache_size'],
+        'connect_args': {'cached_statements': config['cache_instrucoes']},
+    }
+    if url.startswith("sqlite") and not em_memoria:
+        # Conexões do pool podem ser usadas por outras threads (ex: workers da GUI)
+        argumentos['connect_args']['check_same_thread'] = False
+        argumentos.update(
+            pool_size=config['pool_size'],
+            max_overflow=config['max_overflow'],
+            pool_timeout=config['pool_timeout'],
+        )
+
+    novo = create_engine(url, **argumentos)
+    if url.startswith("sqlite"):
+        _aplicar_pragmas(novo, config, somente_leitura)
+    return novo
+
+
+engine = criar_engine()
+sqlite_url = str(engine.url)
+
+_engine_leitura = None
+
+
+def obter_engine_leitura() -> Engine:
+    """Engine só de leitura para relatórios, sobre o mesmo banco do engine principal"""
+    global _engine_leitura
+    if _engine_leitura is None:
+        _engine_leitura = criar_engine(sqlite_url, somente_leitura=True)
+    return _engine_leitura
 
 def criar_db_e_tabelas():
-    SQLModel.metadata.create_all(engine)
\ No newline at end of file
+    SQLModel.metadata.create_all(engine)
+    atualizar_esquema()
+
+def atualizar_esquema(engine=engine):
+    """
+    Leva bancos já existentes para a versão atual do esquema
+    (create_all só cria tabelas que ainda não existem). Ver database/migracoes.py.
+    Também completa as colunas de busca de fármacos gravados por fora do app.
+    """
+    from database.busca import preencher_busca
+    from database.migracoes import migrar
+    aplicadas = migrar(engine)
+    with engine.begin() as conn:
+        preencher_busca(conn)
+    return aplicadas
+
+
+# Liga os totais de consumo às gravações de sessões de qualquer código que use o ORM
+import controllers.consumo_controller  # noqa: E402,F401
@@ -0,0 +1,416 @@
+"""
+Migrações versionadas do banco SQLite.
+
+A versão aplicada fica em PRAGMA user_version. Cada migração roda na sua própria
+transação junto com a atualização da versão, então um banco nunca fica "pela metade".
+
+Uso (a partir de anestesia_vet/):
+    python -m database.migracoes           # aplica as pendentes e mostra o plano das consultas
+    python -m database.migracoes --plano   # só o relatório EXPLAIN QUERY PLAN
+"""
+import argparse
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+from sqlmodel import SQLModel
+
+from database.engine import engine
+from models.consumo import ConsumoDiario
+from models.farmaco import Farmaco
+from models.protocolo import ProtocoloFarmaco
+from models.sessao import SessaoAnestesia, SessaoAvulsaAnestesia
+from controllers.utils.formatacao import sem_acentos
+
+
+# Colunas da migração 1 como foi publicada: (tabela, coluna, tipo e padrão). A
+# unidade_concentracao entra sem padrão: NULL = unidade ainda não confirmada.
+_COLUNAS_V1 = (
+    ("animal", "nome", "VARCHAR"),
+    ("animal", "especie", "VARCHAR"),
+    ("animal", "raca", "VARCHAR"),
+    ("animal", "idade", "INTEGER"),
+    ("animal", "peso_kg", "FLOAT"),
+    ("configinfusao", "peso_kg", "FLOAT"),
+    ("configinfusao", "taxa_ml_kg_h", "FLOAT DEFAULT 1.0 NOT NULL"),
+    ("configinfusao", "equipo_tipo", "VARCHAR(10) DEFAULT 'macrogotas' NOT NULL"),
+    ("configinfusao", "volume_bolsa_ml", "FLOAT DEFAULT 20.0 NOT NULL"),
+    ("farmaco", "nome", "VARCHAR"),
+    ("farmaco", "dose", "FLOAT"),
+    ("farmaco", "concentracao", "FLOAT"),
+    ("farmaco", "unidade_dose", "VARCHAR"),
+    ("farmaco", "unidade_concentracao", "VARCHAR"),
+    ("farmaco", "modo_uso", "VARCHAR DEFAULT 'bolus' NOT NULL"),
+    ("farmaco", "volume_seringa", "FLOAT"),
+    ("farmaco", "comentario", "VARCHAR"),
+    ("farmaco", "tipo_infusao", "VARCHAR DEFAULT 'padrao' NOT NULL"),
+    ("farmaco", "doses_variaveis", "VARCHAR DEFAULT ''"),
+    ("protocolo", "nome", "VARCHAR"),
+    ("protocolo", "descricao", "VARCHAR"),
+    ("protocolo", "created_at", "DATETIME"),
+    ("sessaoavulsaanestesia", "especie", "VARCHAR"),
+    ("sessaoavulsaanestesia", "nome_animal", "VARCHAR"),
+    ("sessaoavulsaanestesia", "peso_kg", "FLOAT"),
+    ("sessaoavulsaanestesia", "id_farmaco", "INTEGER"),
+    ("sessaoavulsaanestesia", "dose_utilizada_ml", "FLOAT"),
+    ("sessaoavulsaanestesia", "observacoes", "VARCHAR"),
+    ("sessaoavulsaanestesia", "data", "DATETIME"),
+    ("protocolofarmaco", "ordem", "INTEGER"),
+    ("sessaoanestesia", "id_animal", "INTEGER"),
+    ("sessaoanestesia", "id_farmaco", "INTEGER"),
+    ("sessaoanestesia", "dose_utilizada_ml", "FLOAT"),
+    ("sessaoanestesia", "observacoes", "VARCHAR"),
+    ("sessaoanestesia", "data", "DATETIME"),
+    ("sessaoanestesia", "config_infusao_id", "INTEGER"),
+)
+
+
+def _adicionar_colunas(conn: Connection) -> None:
+    """Adiciona em tabelas já existentes as colunas que vieram depois delas"""
+    inspetor = inspect(conn)
+    existentes: Dict[str, set] = {}
+    for tabela, coluna, tipo in _COLUNAS_V1:
+        if tabela not in existentes:
+            existentes[tabela] = ({c["name"] for c in inspetor.get_columns(tabela)}
+                                  if inspetor.has_table(tabela) else None)
+        if existentes[tabela] is not None and coluna not in existentes[tabela]:
+            conn.exec_driver_sql(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo}")
+
+
+def _unidade_concentracao_a_confirmar(conn: Connection) -> List[str]:
+    """
+    Cadastros anteriores à coluna unidade_concentracao ficam com ela NULL (não
+    confirmada): os cálculos mantêm o resultado de antes e as telas pedem a unidade.
+    Nada é presumido; a migração só avisa quantos são.
+    """
+    if not inspect(conn).has_table("farmaco"):
+        return []
+    pendentes = farmacos_para_revisar(conn)
+    if not pendentes:
+        return []
+    return [f"{len(pendentes)} fármaco(s) com a unidade da concentração a confirmar "
+            "(aba Fármacos, botão Confirmar Unidade)"]
+
+
+def farmacos_para_revisar(conn: Connection) -> List[Tuple[int, str, float, str]]:
+    """(id, nome, concentração, unidade_dose) dos fármacos sem unidade de concentração confirmada"""
+    return [tuple(linha) for linha in conn.exec_driver_sql(
+        "SELECT id, nome, concentracao, unidade_dose FROM farmaco "
+        "WHERE unidade_concentracao IS NULL ORDER BY nome, id"
+    ).all()]
+
+
+# Índices das migrações 3 e 4 como foram publicadas (mudanças nos modelos entram
+# em migrações novas, não alteram estas)
+_INDICES_V3 = (
+    ("sessaoanestesia", "CREATE INDEX IF NOT EXISTS ix_sessaoanestesia_id_animal_data "
+                        "ON sessaoanestesia (id_animal, data)"),
+    ("sessaoanestesia", "CREATE INDEX IF NOT EXISTS ix_sessaoanestesia_id_farmaco ON sessaoanestesia (id_farmaco)"),
+    ("sessaoanestesia", "CREATE INDEX IF NOT EXISTS ix_sessaoanestesia_data ON sessaoanestesia (data)"),
+    ("sessaoavulsaanestesia", "CREATE INDEX IF NOT EXISTS ix_sessaoavulsaanestesia_id_farmaco "
+                              "ON sessaoavulsaanestesia (id_farmaco)"),
+    ("sessaoavulsaanestesia", "CREATE INDEX IF NOT EXISTS ix_sessaoavulsaanestesia_data "
+                              "ON sessaoavulsaanestesia (data)"),
+    ("farmaco", "CREATE INDEX IF NOT EXISTS ix_farmaco_nome ON farmaco (nome)"),
+    ("protocolofarmaco", "CREATE INDEX IF NOT EXISTS ix_protocolofarmaco_protocolo_ordem "
+                         "ON protocolofarmaco (protocolo_id, ordem, farmaco_id)"),
+)
+_INDICES_V4 = (
+    ("farmaco", "CREATE INDEX IF NOT EXISTS ix_farmaco_chave ON farmaco (nome, unidade_dose, modo_uso)"),
+)
+
+
+def _criar(conn: Connection, indices) -> None:
+    """Executa o DDL de cada (tabela, DDL) cuja tabela existe e atualiza as estatísticas"""
+    inspetor = inspect(conn)
+    for tabela, ddl in indices:
+        if inspetor.has_table(tabela):
+            conn.execute(text(ddl))
+    conn.execute(text("ANALYZE"))
+
+
+def _criar_indices(conn: Connection) -> None:
+    """Índices de sessões, fármacos e protocolos"""
+    _criar(conn, _INDICES_V3)
+
+
+def _indice_chave_farmaco(conn: Connection) -> None:
+    """ix_farmaco_chave substitui ix_farmaco_nome (nome é o primeiro campo da chave)"""
+    _criar(conn, _INDICES_V4)
+    conn.execute(text("DROP INDEX IF EXISTS ix_farmaco_nome"))
+
+
+# Tabelas das migrações 5 e 6 como foram publicadas
+_DIARIO_V5 = """CREATE TABLE IF NOT EXISTS diariosessao (
+    nome VARCHAR NOT NULL,
+    seq_confirmado INTEGER NOT NULL,
+    PRIMARY KEY (nome)
+)"""
+_CONSUMO_V6 = """CREATE TABLE IF NOT EXISTS consumodiario (
+    dia DATE NOT NULL,
+    id_farmaco INTEGER NOT NULL,
+    especie VARCHAR NOT NULL,
+    total_ml FLOAT NOT NULL,
+    total_mg FLOAT NOT NULL,
+    sessoes INTEGER NOT NULL,
+    PRIMARY KEY (dia, id_farmaco, especie)
+)"""
+# mg por unidade de massa da concentração (sem unidade confirmada ou em UI: total_mg 0)
+_MG_POR_MASSA_V6 = {"g": 1000.0, "mg": 1.0, "µg": 0.001, "μg": 0.001, "mcg": 0.001, "ug": 0.001, "ng": 1e-6}
+_SESSOES_POR_DIA_V6 = """
+    SELECT date(s.data), s.id_farmaco, coalesce(nullif(trim({especie}), ''), 'não informada'),
+           sum(s.dose_utilizada_ml), count(*)
+    FROM {tabela} s {juncao}
+    GROUP BY 1, 2, 3
+"""
+
+
+def _criar_diario_sessao(conn: Connection) -> None:
+    """Tabela do diário de sessões (bancos criados antes dela)"""
+    conn.exec_driver_sql(_DIARIO_V5)
+
+
+def _criar_consumo_diario(conn: Connection) -> None:
+    """Tabela de consumo por dia/fármaco/espécie, já preenchida com o histórico existente"""
+    conn.exec_driver_sql(_CONSUMO_V6)
+    inspetor = inspect(conn)
+    if not inspetor.has_table("farmaco"):
+        return
+    mg_por_ml = {}
+    for farmaco_id, concentracao, unidade in conn.exec_driver_sql(
+            "SELECT id, concentracao, unidade_concentracao FROM farmaco"):
+        massa = (unidade or "").replace(" ", "").lower().split("/")[0]
+        mg_por_ml[farmaco_id] = concentracao * _MG_POR_MASSA_V6.get(massa, 0.0)
+    totais: Dict[tuple, List] = {}
+    consultas = (("sessaoanestesia", "a.especie", "LEFT JOIN animal a ON a.id = s.id_animal"),
+                 ("sessaoavulsaanestesia", "s.especie", ""))
+    for tabela, especie, juncao in consultas:
+        if not inspetor.has_table(tabela):
+            continue
+        sql = _SESSOES_POR_DIA_V6.format(tabela=tabela, especie=especie, juncao=juncao)
+        for dia, farmaco_id, nome_especie, ml, quantidade in conn.exec_driver_sql(sql):
+            total = totais.setdefault((dia, farmaco_id, nome_especie), [0.0, 0])
+            total[0] += ml
+            total[1] += quantidade
+    conn.exec_driver_sql("DELETE FROM consumodiario")
+    if totais:
+        conn.exec_driver_sql(
+            "INSERT INTO consumodiario (dia, id_farmaco, especie, total_ml, total_mg, sessoes) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(dia, farmaco_id, especie, ml, ml * mg_por_ml.get(farmaco_id, 0.0), quantidade)
+             for (dia, farmaco_id, especie), (ml, quantidade) in totais.items()])
+
+
+# Busca das migrações 7 e 10 como foram publicadas. A 7 dependia da função
+# sem_acentos do app (registrada em cada conexão por database/engine.py); a 10
+# troca tudo por colunas gravadas pelo app e gatilhos de SQL puro.
+_BUSCA_V7 = (
+    "CREATE INDEX IF NOT EXISTS ix_farmaco_nome_busca ON farmaco (sem_acentos(nome))",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS farmaco_busca USING fts5(nome, comentario, tokenize='trigram')",
+    """CREATE TRIGGER IF NOT EXISTS farmaco_busca_ai AFTER INSERT ON farmaco BEGIN
+        INSERT INTO farmaco_busca (rowid, nome, comentario)
+        VALUES (new.id, sem_acentos(new.nome), sem_acentos(new.comentario));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS farmaco_busca_ad AFTER DELETE ON farmaco BEGIN
+        DELETE FROM farmaco_busca WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS farmaco_busca_au AFTER UPDATE OF nome, comentario ON farmaco BEGIN
+        UPDATE farmaco_busca SET nome = sem_acentos(new.nome), comentario = sem_acentos(new.comentario)
+        WHERE rowid = new.id;
+    END""",
+    "DELETE FROM farmaco_busca",
+    "INSERT INTO farmaco_busca (rowid, nome, comentario) "
+    "SELECT id, sem_acentos(nome), sem_acentos(comentario) FROM farmaco",
+)
+_BUSCA_V10 = (
+    "DROP TRIGGER IF EXISTS farmaco_busca_ai",
+    "DROP TRIGGER IF EXISTS farmaco_busca_au",
+    """CREATE TRIGGER farmaco_busca_ai AFTER INSERT ON farmaco BEGIN
+        INSERT INTO farmaco_busca (rowid, nome, comentario)
+        VALUES (new.id, coalesce(new.nome_busca, lower(new.nome)),
+                coalesce(new.comentario_busca, lower(new.comentario)));
+    END""",
+    """CREATE TRIGGER farmaco_busca_au
+        AFTER UPDATE OF nome, comentario, nome_busca, comentario_busca ON farmaco BEGIN
+        UPDATE farmaco_busca SET nome = coalesce(new.nome_busca, lower(new.nome)),
+                                 comentario = coalesce(new.comentario_busca, lower(new.comentario))
+        WHERE rowid = new.id;
+    END""",
+    "DELETE FROM farmaco_busca",
+    "INSERT INTO farmaco_busca (rowid, nome, comentario) "
+    "SELECT id, coalesce(nome_busca, lower(nome)), coalesce(comentario_busca, lower(comentario)) FROM farmaco",
+)
+
+
+def _criar_busca_farmacos(conn: Connection) -> None:
+    """Índice FTS5 de nome/comentário; SQLite sem FTS5 continua com a busca por varredura"""
+    if not inspect(conn).has_table("farmaco"):
+        return
+    try:
+        with conn.begin_nested():
+            for ddl in _BUSCA_V7:
+                conn.exec_driver_sql(ddl)
+    except OperationalError:
+        pass
+
+
+def _instalar_sincronizacao(conn: Connection) -> None:
+    """Registro de alterações para a sincronização entre estações"""
+    from database.sincronizacao import instalar
+    instalar(conn)
+
+
+def _colunas_busca_farmaco(conn: Connection) -> None:
+    """
+    nome_busca/comentario_busca gravados pelo app substituem o índice de expressão
+    e os gatilhos que chamavam sem_acentos (o arquivo volta a abrir em qualquer sqlite3)
+    """
+    inspetor = inspect(conn)
+    if not inspetor.has_table("farmaco"):
+        return
+    existentes = {c["name"] for c in inspetor.get_columns("farmaco")}
+    for coluna in ("nome_busca", "comentario_busca"):
+        if coluna not in existentes:
+            conn.exec_driver_sql(f"ALTER TABLE farmaco ADD COLUMN {coluna} VARCHAR")
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_farmaco_nome_busca")
+    linhas = conn.exec_driver_sql("SELECT id, nome, comentario FROM farmaco").all()
+    # Colunas derivadas: o preenchimento não é alteração a sincronizar (sinc_no.aplicando)
+    sincroniza = inspetor.has_table("sinc_no")
+    if sincroniza:
+        conn.exec_driver_sql("UPDATE sinc_no SET aplicando = 1")
+    if linhas:
+        conn.exec_driver_sql(
+            "UPDATE farmaco SET nome_busca = ?, comentario_busca = ? WHERE id = ?",
+            [(sem_acentos(nome), sem_acentos(comentario), farmaco_id) for farmaco_id, nome, comentario in linhas])
+    if sincroniza:
+        conn.exec_driver_sql("UPDATE sinc_no SET aplicando = 0")
+    conn.exec_driver_sql("CREATE INDEX ix_farmaco_nome_busca ON farmaco (nome_busca)")
+    if inspetor.has_table("farmaco_busca"):
+        for ddl in _BUSCA_V10:
+            conn.exec_driver_sql(ddl)
+
+
+def _confirmacoes_sincronizacao(conn: Connection) -> None:
+    """Seq do registro local que cada estação já confirmou (poda do registro)"""
+    conn.exec_driver_sql("ALTER TABLE sinc_par ADD COLUMN seq_confirmado INTEGER NOT NULL DEFAULT 0")
+
+
+# (versão, descrição, função) em ordem; nunca altere uma migração já publicada, crie outra.
+# A função pode devolver avisos (lista de textos) para quem aplica a migração.
+MIGRACOES: List[Tuple[int, str, Callable[[Connection], Optional[List[str]]]]] = [
+    (1, "colunas novas dos modelos (tipo_infusao, doses_variaveis, unidade_concentracao...)", _adicionar_colunas),
+    (2, "unidade_concentracao dos cadastros antigos", _unidade_concentracao_a_confirmar),
+    (3, "índices de sessões, fármacos e protocolos", _criar_indices),
+    (4, "chave natural do catálogo de fármacos (nome, unidade_dose, modo_uso)", _indice_chave_farmaco),
+    (5, "tabela de controle do diário de sessões (gravação em lote)", _criar_diario_sessao),
+    (6, "totais de consumo por dia, fármaco e espécie", _criar_consumo_diario),
+    (7, "índice de busca (FTS5 trigram) do catálogo de fármacos", _criar_busca_farmacos),
+    (8, "registro de alterações para sincronizar estações", _instalar_sincronizacao),
+    (9, "confirmações de recebimento entre estações", _confirmacoes_sincronizacao),
+    (10, "colunas de busca do catálogo de fármacos (sem funções do app no banco)", _colunas_busca_farmaco),
+]
+
+
+def versao_atual(conn: Connection) -> int:
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def migrar(engine: Engine = engine, verbose: bool = True) -> List[int]:
+    """Aplica as migrações pendentes e devolve as versões aplicadas"""
+    aplicadas = []
+    for versao, descricao, funcao in MIGRACOES:
+        with engine.begin() as conn:
+            if versao_atual(conn) >= versao:
+                continue
+            avisos = funcao(conn) or []
+            conn.exec_driver_sql(f"PRAGMA user_version = {versao}")
+        aplicadas.append(versao)
+        if verbose:
+            print(f"Migração {versao} aplicada: {descricao}")
+            for aviso in avisos:
+                print(f"  {aviso}")
+    return aplicadas
+
+
+# Consultas usadas pelo app e pelos controllers (conferidas no relatório de plano)
+CONSULTAS_CONHECIDAS = {
+    'fármacos por nome': select(Farmaco).order_by(Farmaco.nome),
+    'fármaco pelo nome': select(Farmaco).where(Farmaco.nome == bindparam("nome")),
+    'fármacos do protocolo': (
+        select(Farmaco, ProtocoloFarmaco.ordem)
+        .join(ProtocoloFarmaco, Farmaco.id == ProtocoloFarmaco.farmaco_id)
+        .where(ProtocoloFarmaco.protocolo_id == 0)
+        .order_by(ProtocoloFarmaco.ordem)
+    ),
+    'sessões do animal': (
+        select(SessaoAnestesia).where(SessaoAnestesia.id_animal == 0).order_by(SessaoAnestesia.data.desc())
+    ),
+    'sessões do fármaco': select(SessaoAnestesia).where(SessaoAnestesia.id_farmaco == 0),
+    'sessões por período': (
+        select(SessaoAnestesia).where(SessaoAnestesia.data >= "").order_by(SessaoAnestesia.data)
+    ),
+    'sessões avulsas do fármaco': select(SessaoAvulsaAnestesia).where(SessaoAvulsaAnestesia.id_farmaco == 0),
+    'consumo do período': (
+        select(ConsumoDiario).where(ConsumoDiario.dia >= "", ConsumoDiario.dia <= "")
+    ),
+    'sessões avulsas por período': (
+        select(SessaoAvulsaAnestesia).where(SessaoAvulsaAnestesia.data >= "")
+        .order_by(SessaoAvulsaAnestesia.data)
+    ),
+}
+
+
+def plano_consultas(engine: Engine = engine) -> Dict[str, List[str]]:
+    """EXPLAIN QUERY PLAN de cada consulta conhecida (linhas de 'detail')"""
+    planos = {}
+    with engine.connect() as conn:
+        for nome, consulta in CONSULTAS_CONHECIDAS.items():
+            compilada = consulta.compile(dialect=conn.dialect)
+            parametros = tuple(None for _ in (compilada.positiontup or ()))
+            linhas = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compilada}", parametros).all()
+            planos[nome] = [linha[-1] for linha in linhas]
+    return planos
+
+
+def varreduras(planos: Dict[str, List[str]]) -> List[Tuple[str, str]]:
+    """(consulta, passo) para cada leitura completa de tabela sem índice"""
+    return [
+        (nome, passo)
+        for nome, passos in planos.items()
+        for passo in passos
+        if passo.startswith("SCAN ") and "INDEX" not in passo
+    ]
+
+
+def relatorio_plano(engine: Engine = engine) -> bool:
+    """Imprime o plano das consultas conhecidas; retorna False se houver varredura de tabela"""
+    planos = plano_consultas(engine)
+    for nome, passos in planos.items():
+        print(f"\n{nome}:")
+        for passo in passos:
+            print(f"  {passo}")
+    problemas = varreduras(planos)
+    print()
+    for nome, passo in problemas:
+        print(f"VARREDURA em '{nome}': {passo}")
+    if not problemas:
+        print("Nenhuma varredura completa de tabela nas consultas conhecidas.")
+    return not problemas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrações do banco de anestesia")
+    parser.add_argument("--plano", action="store_true", help="só mostra o EXPLAIN QUERY PLAN")
+    args = parser.parse_args()
+
+    if not args.plano:
+        SQLModel.metadata.create_all(engine)
+        aplicadas = migrar(engine)
+        if not aplicadas:
+            print("Banco já está na versão mais recente.")
+        with engine.connect() as conn:
+            for farmaco_id, nome, concentracao, unidade in farmacos_para_revisar(conn):
+                print(f"Confirmar a unidade: {nome} (id {farmaco_id}) concentração {concentracao}, "
+                      f"dose em {unidade}")
+    relatorio_plano(engine)
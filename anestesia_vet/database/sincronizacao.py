@@ -0,0 +1,620 @@
+"""
+Sincronização incremental entre estações (captura de alterações por gatilhos).
+
+Cada banco ganha um identificador de estação (sinc_no) e um registro de alterações
+(sinc_alteracao) preenchido por gatilhos: toda inserção, edição ou exclusão em
+fármacos, animais, protocolos, configurações de infusão e sessões grava uma linha
+com uma sequência crescente (seq). Sincronizar troca só as alterações posteriores à
+última seq que o outro lado já recebeu (sinc_par), então o custo acompanha o número
+de mudanças e não o tamanho do banco.
+
+- Linhas são identificadas entre estações por uma chave "<estação>:<id de origem>"
+  (sinc_chave); registros anteriores à instalação usam "0:<id>". Por isso a
+  sincronização parte de uma cópia comum do banco: copie o arquivo uma vez e rode
+  `--novo-no` na cópia antes da primeira sincronização.
+- Conflitos: vence a versão maior, comparada como (versao, carimbo, origem). versao
+  é um contador por linha que cada edição local incrementa a partir da maior versão
+  já vista; carimbo (hora UTC) e origem só desempatam edições concorrentes. O
+  resultado não depende da ordem em que as estações sincronizam.
+- Alterações recebidas entram no registro com a versão original, então também são
+  repassadas (A → B → C). Gravações da própria sincronização e do arquivamento de
+  sessões (database/arquivo.py) não disparam os gatilhos (sem_registro()).
+- Itens de protocolo (ProtocoloFarmaco) viajam junto com o protocolo.
+- Cada pacote leva as seqs que a estação de origem já recebeu das outras; com elas
+  o registro apaga as alterações superadas que todas as estações conhecidas já
+  receberam (podar_alteracoes()).
+- O socket escuta só em 127.0.0.1 por padrão e toda mensagem é assinada com HMAC
+  do segredo compartilhado `sinc_segredo` (config.json ou ANESTESIA_DB_SINC_SEGREDO),
+  atrelado a desafios aleatórios da conexão: sem o segredo nada é lido nem gravado.
+
+Uso (a partir de anestesia_vet/):
+    python -m database.sincronizacao --servir 8765 --host 0.0.0.0   # aceita outras máquinas
+    python -m database.sincronizacao --conectar 192.168.0.10:8765
+    python -m database.sincronizacao --pasta //servidor/anestesia/sinc
+    python -m database.sincronizacao --novo-no   # depois de copiar o banco para outra estação
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import socket
+import socketserver
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy.engine import Connection, Engine
+
+from database.engine import carregar_config, engine
+from models.animal import Animal
+from models.config_infusao import ConfigInfusao
+from models.farmaco import Farmaco
+from models.protocolo import Protocolo, ProtocoloFarmaco
+from models.sessao import SessaoAnestesia, SessaoAvulsaAnestesia
+from controllers.consumo_controller import ajustar_consumo, parte_gravada
+from controllers.utils.formatacao import sem_acentos
+
+PORTA_PADRAO = 8765
+
+# Tabelas sincronizadas em ordem de dependência: {tabela: {coluna: tabela referida}}
+_MODELOS = {modelo.__table__.name: modelo for modelo in
+            (Farmaco, Animal, ConfigInfusao, Protocolo, SessaoAnestesia, SessaoAvulsaAnestesia)}
+TABELAS: Dict[str, Dict[str, str]] = {
+    'farmaco': {},
+    'animal': {},
+    'configinfusao': {},
+    'protocolo': {},
+    'sessaoanestesia': {'id_animal': 'animal', 'id_farmaco': 'farmaco', 'config_infusao_id': 'configinfusao'},
+    'sessaoavulsaanestesia': {'id_farmaco': 'farmaco'},
+}
+_ITENS_PROTOCOLO = ProtocoloFarmaco.__table__.name
+
+_TABELAS_CONTROLE = [
+    """CREATE TABLE IF NOT EXISTS sinc_no (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        no TEXT NOT NULL,
+        aplicando INTEGER NOT NULL DEFAULT 0)""",
+    """CREATE TABLE IF NOT EXISTS sinc_chave (
+        tabela TEXT NOT NULL,
+        id_local INTEGER NOT NULL,
+        chave TEXT NOT NULL,
+        PRIMARY KEY (tabela, id_local)) WITHOUT ROWID""",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_sinc_chave_chave ON sinc_chave (tabela, chave)",
+    """CREATE TABLE IF NOT EXISTS sinc_alteracao (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        tabela TEXT NOT NULL,
+        chave TEXT NOT NULL,
+        apagada INTEGER NOT NULL,
+        versao INTEGER NOT NULL,
+        carimbo TEXT NOT NULL,
+        origem TEXT NOT NULL)""",
+    "CREATE INDEX IF NOT EXISTS ix_sinc_alteracao_chave ON sinc_alteracao (tabela, chave, versao)",
+    """CREATE TABLE IF NOT EXISTS sinc_par (
+        no TEXT PRIMARY KEY,
+        seq_recebido INTEGER NOT NULL DEFAULT 0)""",
+]
+
+_ATIVO = "WHEN (SELECT aplicando FROM sinc_no) = 0"
+
+
+def _chave_sql(tabela: str, id_local: str) -> str:
+    return (f"coalesce((SELECT chave FROM sinc_chave WHERE tabela = '{tabela}' AND id_local = {id_local}), "
+            f"'0:' || {id_local})")
+
+
+def _registrar_sql(tabela: str, id_local: str, apagada: int) -> str:
+    """INSERT em sinc_alteracao com versão = maior versão já vista da linha + 1"""
+    return f"""INSERT INTO sinc_alteracao (tabela, chave, apagada, versao, carimbo, origem)
+        SELECT '{tabela}', c.chave, {apagada},
+               coalesce((SELECT max(versao) FROM sinc_alteracao WHERE tabela = '{tabela}' AND chave = c.chave), 0) + 1,
+               strftime('%Y-%m-%dT%H:%M:%f', 'now'), n.no
+        FROM sinc_no AS n, (SELECT {_chave_sql(tabela, id_local)} AS chave) AS c;"""
+
+
+def _gatilhos() -> List[str]:
+    gatilhos = []
+    for tabela in TABELAS:
+        gatilhos += [
+            f"""CREATE TRIGGER IF NOT EXISTS sinc_{tabela}_ai AFTER INSERT ON {tabela} {_ATIVO} BEGIN
+                INSERT OR REPLACE INTO sinc_chave (tabela, id_local, chave)
+                SELECT '{tabela}', new.id, no || ':' || new.id FROM sinc_no;
+                {_registrar_sql(tabela, "new.id", 0)}
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS sinc_{tabela}_au AFTER UPDATE ON {tabela} {_ATIVO} BEGIN
+                {_registrar_sql(tabela, "new.id", 0)}
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS sinc_{tabela}_ad AFTER DELETE ON {tabela} {_ATIVO} BEGIN
+                {_registrar_sql(tabela, "old.id", 1)}
+                DELETE FROM sinc_chave WHERE tabela = '{tabela}' AND id_local = old.id;
+            END""",
+        ]
+    # Itens de protocolo alteram a versão do protocolo
+    for sufixo, evento, linha in (("ai", "INSERT", "new"), ("au", "UPDATE", "new"), ("ad", "DELETE", "old")):
+        gatilhos.append(
+            f"""CREATE TRIGGER IF NOT EXISTS sinc_{_ITENS_PROTOCOLO}_{sufixo} AFTER {evento} ON {_ITENS_PROTOCOLO}
+            {_ATIVO} BEGIN
+                {_registrar_sql("protocolo", f"{linha}.protocolo_id", 0)}
+            END""")
+    return gatilhos
+
+
+def instalar(conn: Connection) -> None:
+    """Cria as tabelas de controle, o identificador da estação e os gatilhos"""
+    for ddl in _TABELAS_CONTROLE:
+        conn.exec_driver_sql(ddl)
+    conn.exec_driver_sql("INSERT OR IGNORE INTO sinc_no (id, no) VALUES (1, ?)", (uuid.uuid4().hex[:12],))
+    for gatilho in _gatilhos():
+        conn.exec_driver_sql(gatilho)
+
+
+def instalada(conn: Connection) -> bool:
+    return conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sinc_no'").first() is not None
+
+
+def no_local(conn: Connection) -> str:
+    return conn.exec_driver_sql("SELECT no FROM sinc_no").scalar()
+
+
+def novo_no(engine: Engine = engine) -> str:
+    """Troca o identificador da estação (obrigatório numa cópia do banco de outra estação)"""
+    with engine.begin() as conn:
+        anterior = no_local(conn)
+        no = uuid.uuid4().hex[:12]
+        conn.exec_driver_sql("UPDATE sinc_no SET no = ?", (no,))
+        # A cópia já tem tudo o que a estação original tinha registrado até aqui
+        conn.exec_driver_sql(
+            "INSERT OR REPLACE INTO sinc_par (no, seq_recebido) "
+            "SELECT ?, coalesce(max(seq), 0) FROM sinc_alteracao", (anterior,))
+        # As confirmações eram do registro da outra estação
+        conn.exec_driver_sql("UPDATE sinc_par SET seq_confirmado = 0")
+    return no
+
+
+@contextmanager
+def sem_registro(conn: Connection) -> Iterator[None]:
+    """Desliga os gatilhos dentro da transação atual (as outras conexões não veem a mudança)"""
+    if not instalada(conn):
+        yield
+        return
+    conn.exec_driver_sql("UPDATE sinc_no SET aplicando = 1")
+    yield
+    conn.exec_driver_sql("UPDATE sinc_no SET aplicando = 0")
+
+
+def seqs_recebidas(conn: Connection) -> Dict[str, int]:
+    """{estação: última seq dela já aplicada aqui}"""
+    return dict(conn.exec_driver_sql("SELECT no, seq_recebido FROM sinc_par").all())
+
+
+def seqs_confirmadas(conn: Connection) -> Dict[str, int]:
+    """{estação: última seq daqui que ela confirmou ter recebido}"""
+    return dict(conn.exec_driver_sql("SELECT no, seq_confirmado FROM sinc_par").all())
+
+
+def podar_alteracoes(conn: Connection) -> int:
+    """
+    Apaga as alterações que todas as estações conhecidas já receberam e que foram
+    superadas por outra mais nova da mesma linha; devolve quantas apagou. A última
+    alteração de cada linha fica: ela guarda a versão usada nos conflitos.
+    """
+    limite = conn.exec_driver_sql("SELECT min(seq_confirmado) FROM sinc_par").scalar()
+    if not limite:
+        return 0
+    cursor = conn.exec_driver_sql(
+        "DELETE FROM sinc_alteracao AS a WHERE a.seq <= ? AND EXISTS ("
+        "  SELECT 1 FROM sinc_alteracao AS b WHERE b.tabela = a.tabela AND b.chave = a.chave AND b.seq > a.seq)",
+        (limite,))
+    return cursor.rowcount
+
+
+# --- Exportação ---------------------------------------------------------------
+
+def _chave_global(conn: Connection, tabela: str, id_local: Optional[int]) -> Optional[str]:
+    if id_local is None:
+        return None
+    chave = conn.exec_driver_sql(
+        "SELECT chave FROM sinc_chave WHERE tabela = ? AND id_local = ?", (tabela, id_local)).scalar()
+    return chave or f"0:{id_local}"
+
+
+def _id_local(conn: Connection, tabela: str, chave: Optional[str]) -> Optional[int]:
+    """Id local da chave global (None se a linha não existe aqui)"""
+    if chave is None:
+        return None
+    id_local = conn.exec_driver_sql(
+        "SELECT id_local FROM sinc_chave WHERE tabela = ? AND chave = ?", (tabela, chave)).scalar()
+    if id_local is not None:
+        return id_local
+    origem, _, numero = chave.partition(":")
+    if origem != "0":
+        return None
+    # Registro anterior à instalação, desde que o id não tenha sido reaproveitado
+    reaproveitado = conn.exec_driver_sql(
+        "SELECT 1 FROM sinc_chave WHERE tabela = ? AND id_local = ?", (tabela, int(numero))).first()
+    return None if reaproveitado else int(numero)
+
+
+def _dados(conn: Connection, tabela: str, id_local: int) -> Optional[dict]:
+    cursor = conn.exec_driver_sql(f"SELECT * FROM {tabela} WHERE id = ?", (id_local,))
+    linha = cursor.first()
+    if linha is None:
+        return None  # ex: sessão já arquivada
+    dados = dict(zip(cursor.keys(), linha))
+    del dados['id']
+    for coluna, referida in TABELAS[tabela].items():
+        dados[coluna] = _chave_global(conn, referida, dados.get(coluna))
+    if tabela == 'protocolo':
+        itens = conn.exec_driver_sql(
+            f"SELECT farmaco_id, ordem FROM {_ITENS_PROTOCOLO} WHERE protocolo_id = ? ORDER BY ordem",
+            (id_local,))
+        dados['farmacos'] = [[_chave_global(conn, 'farmaco', farmaco_id), ordem] for farmaco_id, ordem in itens]
+    return dados
+
+
+def exportar(engine: Engine = engine, desde: int = 0, para: str = None) -> dict:
+    """
+    Pacote com o estado atual de cada linha alterada depois da seq `desde`
+    (uma entrada por linha, mesmo que ela tenha mudado várias vezes). `para` omite
+    as alterações que vieram da própria estação de destino.
+    """
+    with engine.connect() as conn:
+        no = no_local(conn)
+        ate = conn.exec_driver_sql("SELECT coalesce(max(seq), 0) FROM sinc_alteracao").scalar()
+        ultimas = conn.exec_driver_sql(
+            "SELECT a.tabela, a.chave, a.apagada, a.versao, a.carimbo, a.origem FROM sinc_alteracao AS a "
+            "JOIN (SELECT max(seq) AS seq FROM sinc_alteracao WHERE seq > ? AND seq <= ? "
+            "      GROUP BY tabela, chave) AS u ON a.seq = u.seq "
+            "WHERE a.origem != ? ORDER BY a.seq", (desde, ate, para or "")).all()
+        alteracoes = []
+        for tabela, chave, apagada, versao, carimbo, origem in ultimas:
+            dados = None
+            if not apagada:
+                id_local = _id_local(conn, tabela, chave)
+                dados = _dados(conn, tabela, id_local) if id_local is not None else None
+                if dados is None:
+                    continue
+            alteracoes.append({'tabela': tabela, 'chave': chave, 'apagada': bool(apagada),
+                               'versao': [versao, carimbo, origem], 'dados': dados})
+        recebidas = seqs_recebidas(conn)
+    return {'no': no, 'desde': desde, 'ate': ate, 'recebidas': recebidas, 'alteracoes': alteracoes}
+
+
+# --- Aplicação ----------------------------------------------------------------
+
+def _versao_local(conn: Connection, tabela: str, chave: str) -> Optional[Tuple]:
+    linha = conn.exec_driver_sql(
+        "SELECT versao, carimbo, origem FROM sinc_alteracao WHERE tabela = ? AND chave = ? "
+        "ORDER BY versao DESC, carimbo DESC, origem DESC LIMIT 1", (tabela, chave)).first()
+    return tuple(linha) if linha is not None else None
+
+
+def _colunas(conn: Connection, tabela: str) -> set:
+    return {linha[1] for linha in conn.exec_driver_sql(f'PRAGMA table_info("{tabela}")')}
+
+
+def _existe(conn: Connection, tabela: str, id_local: int) -> bool:
+    return conn.exec_driver_sql(f"SELECT 1 FROM {tabela} WHERE id = ?", (id_local,)).first() is not None
+
+
+def _gravar(conn: Connection, tabela: str, chave: str, dados: dict) -> None:
+    existentes = _colunas(conn, tabela)
+    valores = {coluna: valor for coluna, valor in dados.items() if coluna in existentes and coluna != 'id'}
+    for coluna, referida in TABELAS[tabela].items():
+        if coluna in valores:
+            valores[coluna] = _id_local(conn, referida, valores[coluna])
+    if tabela == 'farmaco' and 'nome_busca' in existentes:
+        # Calculadas aqui: a outra estação pode ser anterior a essas colunas
+        valores['nome_busca'] = sem_acentos(dados.get('nome'))
+        valores['comentario_busca'] = sem_acentos(dados.get('comentario'))
+
+    modelo = _MODELOS[tabela]
+    sessao = modelo in (SessaoAnestesia, SessaoAvulsaAnestesia)
+    id_local = _id_local(conn, tabela, chave)
+    antiga = parte_gravada(conn, modelo, id_local) if sessao and id_local is not None else None
+    colunas = list(valores)
+    if id_local is not None and _existe(conn, tabela, id_local):
+        atribuicoes = ", ".join(f"{coluna} = ?" for coluna in colunas)
+        conn.exec_driver_sql(f"UPDATE {tabela} SET {atribuicoes} WHERE id = ?",
+                             (*valores.values(), id_local))
+    else:
+        if id_local is not None:
+            colunas = ["id"] + colunas
+            parametros = (id_local, *valores.values())
+        else:
+            parametros = tuple(valores.values())
+        cursor = conn.exec_driver_sql(
+            f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({', '.join('?' for _ in colunas)})", parametros)
+        if id_local is None:
+            id_local = cursor.lastrowid
+            conn.exec_driver_sql("INSERT OR REPLACE INTO sinc_chave (tabela, id_local, chave) VALUES (?, ?, ?)",
+                                 (tabela, id_local, chave))
+    if sessao:
+        ajustar_consumo(conn, antiga, parte_gravada(conn, modelo, id_local))
+
+    if tabela == 'protocolo':
+        conn.exec_driver_sql(f"DELETE FROM {_ITENS_PROTOCOLO} WHERE protocolo_id = ?", (id_local,))
+        for chave_farmaco, ordem in dados.get('farmacos', []):
+            farmaco_id = _id_local(conn, 'farmaco', chave_farmaco)
+            if farmaco_id is not None:
+                conn.exec_driver_sql(
+                    f"INSERT OR REPLACE INTO {_ITENS_PROTOCOLO} (protocolo_id, farmaco_id, ordem) VALUES (?, ?, ?)",
+                    (id_local, farmaco_id, ordem))
+
+
+def _apagar(conn: Connection, tabela: str, chave: str) -> None:
+    id_local = _id_local(conn, tabela, chave)
+    if id_local is None:
+        return
+    modelo = _MODELOS[tabela]
+    if modelo in (SessaoAnestesia, SessaoAvulsaAnestesia):
+        ajustar_consumo(conn, parte_gravada(conn, modelo, id_local), None)
+    if tabela == 'protocolo':
+        conn.exec_driver_sql(f"DELETE FROM {_ITENS_PROTOCOLO} WHERE protocolo_id = ?", (id_local,))
+    conn.exec_driver_sql(f"DELETE FROM {tabela} WHERE id = ?", (id_local,))
+    conn.exec_driver_sql("DELETE FROM sinc_chave WHERE tabela = ? AND id_local = ?", (tabela, id_local))
+
+
+def _ordem(alteracao: dict) -> Tuple:
+    """Gravações na ordem de dependência das tabelas, depois exclusões na ordem inversa"""
+    posicao = list(TABELAS).index(alteracao['tabela'])
+    return (1, -posicao) if alteracao['apagada'] else (0, posicao)
+
+
+def aplicar(engine: Engine = engine, pacote: dict = None) -> int:
+    """Aplica as alterações de outra estação que vencem as locais; devolve quantas entraram"""
+    aplicadas = 0
+    tabelas = set()
+    with engine.begin() as conn:
+        no = no_local(conn)
+        if pacote['no'] == no:
+            raise ValueError("O pacote é desta mesma estação (banco copiado? rode --novo-no na cópia)")
+        with sem_registro(conn):
+            for alteracao in sorted(pacote['alteracoes'], key=_ordem):
+                tabela, chave = alteracao['tabela'], alteracao['chave']
+                versao = tuple(alteracao['versao'])
+                local = _versao_local(conn, tabela, chave)
+                if local is not None and local >= versao:
+                    continue
+                if alteracao['apagada']:
+                    _apagar(conn, tabela, chave)
+                else:
+                    _gravar(conn, tabela, chave, alteracao['dados'])
+                conn.exec_driver_sql(
+                    "INSERT INTO sinc_alteracao (tabela, chave, apagada, versao, carimbo, origem) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", (tabela, chave, int(alteracao['apagada']), *versao))
+                aplicadas += 1
+                tabelas.add(tabela)
+            conn.exec_driver_sql(
+                "INSERT INTO sinc_par (no, seq_recebido, seq_confirmado) VALUES (?, ?, ?) ON CONFLICT (no) "
+                "DO UPDATE SET seq_recebido = max(seq_recebido, excluded.seq_recebido), "
+                "seq_confirmado = max(seq_confirmado, excluded.seq_confirmado)",
+                (pacote['no'], pacote['ate'], pacote.get('recebidas', {}).get(no, 0)))
+            podar_alteracoes(conn)
+    if tabelas:
+        _invalidar_caches()
+    return aplicadas
+
+
+def _invalidar_caches() -> None:
+    """A aplicação grava por SQL direto (sem eventos do ORM): limpa os caches de referência"""
+    from controllers.cache_referencia import cache_referencia
+    from controllers.calculadora_dose import calculadora_dose
+    from controllers.utils.titulacao import invalidar_grade
+    cache_referencia.limpar()
+    calculadora_dose.limpar()
+    invalidar_grade()
+
+
+# --- Transporte: pasta compartilhada --------------------------------------------
+
+def _gravar_json(caminho: Path, conteudo: dict) -> None:
+    temporario = caminho.with_suffix(".tmp")
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(conteudo, f, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+
+def sincronizar_pasta(engine: Engine = engine, pasta: str = None) -> Tuple[int, int]:
+    """
+    Troca alterações por uma pasta compartilhada: cada estação escreve os seus pacotes
+    em <pasta>/<estação>/<seq final>.json e lê só os pacotes das outras com seq final
+    maior que a última recebida. Devolve (alterações enviadas, alterações aplicadas).
+    """
+    raiz = Path(pasta)
+    with engine.connect() as conn:
+        no = no_local(conn)
+        recebidas = seqs_recebidas(conn)
+
+    aplicadas = 0
+    if raiz.is_dir():
+        for diretorio in sorted(raiz.iterdir()):
+            if not diretorio.is_dir() or diretorio.name == no:
+                continue
+            for caminho in sorted(diretorio.glob("*.json")):
+                if int(caminho.stem) <= recebidas.get(diretorio.name, 0):
+                    continue
+                with open(caminho, encoding="utf-8") as f:
+                    aplicadas += aplicar(engine, json.load(f))
+
+    # Depois de aplicar, para repassar na mesma rodada o que veio das outras
+    proprio = raiz / no
+    proprio.mkdir(parents=True, exist_ok=True)
+    desde = max((int(caminho.stem) for caminho in proprio.glob("*.json")), default=0)
+    pacote = exportar(engine, desde)
+    if pacote['alteracoes']:
+        _gravar_json(proprio / f"{pacote['ate']:012d}.json", pacote)
+    return len(pacote['alteracoes']), aplicadas
+
+
+# --- Transporte: socket local ----------------------------------------------------
+# Uma linha JSON por mensagem. Primeiro cada lado manda um desafio aleatório (sem
+# assinatura); as mensagens seguintes vão como {"corpo", "hmac"}, com o HMAC-SHA256
+# do segredo sobre os dois desafios, o número da mensagem na conexão e o corpo:
+#   cliente  → {"no", "recebidas"}
+#   servidor → {"no", "desde", "pacote"}      (pacote do servidor; desde = seq do cliente já recebida)
+#   cliente  → pacote do cliente
+#   servidor → {"aplicadas"}
+
+class FalhaAutenticacao(Exception):
+    pass
+
+
+def _segredo(segredo: Optional[str]) -> bytes:
+    segredo = segredo or carregar_config()['sinc_segredo']
+    if not segredo:
+        raise ValueError("Defina o segredo compartilhado da sincronização (sinc_segredo)")
+    return segredo.encode("utf-8")
+
+
+class _Canal:
+    """Mensagens JSON assinadas de uma conexão"""
+
+    def __init__(self, leitura, escrita, segredo: bytes):
+        self.leitura = leitura
+        self.escrita = escrita
+        self.segredo = segredo
+        self.desafios = ""
+        self.contador = 0
+
+    def trocar_desafios(self, primeiro: bool) -> None:
+        """primeiro: este lado manda o seu desafio antes de ler o do outro"""
+        proprio = secrets.token_hex(16)
+        if primeiro:
+            self._escrever({'desafio': proprio})
+        outro = self._ler().get('desafio')
+        if not isinstance(outro, str) or not outro:
+            raise FalhaAutenticacao("Desafio ausente")
+        if not primeiro:
+            self._escrever({'desafio': proprio})
+        self.desafios = proprio + outro if primeiro else outro + proprio
+
+    def _assinatura(self, corpo: str) -> str:
+        texto = f"{self.desafios}:{self.contador}:{corpo}".encode("utf-8")
+        return hmac.new(self.segredo, texto, hashlib.sha256).hexdigest()
+
+    def _escrever(self, conteudo: dict) -> None:
+        self.escrita.write(json.dumps(conteudo, ensure_ascii=False).encode("utf-8") + b"\n")
+        self.escrita.flush()
+
+    def _ler(self) -> dict:
+        linha = self.leitura.readline()
+        if not linha:
+            raise ConnectionError("Conexão encerrada pela outra estação")
+        try:
+            return json.loads(linha)
+        except ValueError:
+            raise FalhaAutenticacao("Mensagem ilegível")
+
+    def enviar(self, mensagem: dict) -> None:
+        corpo = json.dumps(mensagem, ensure_ascii=False)
+        self._escrever({'corpo': corpo, 'hmac': self._assinatura(corpo)})
+        self.contador += 1
+
+    def receber(self) -> dict:
+        envelope = self._ler()
+        corpo = envelope.get('corpo')
+        if not isinstance(corpo, str) or not hmac.compare_digest(
+                str(envelope.get('hmac', '')), self._assinatura(corpo)):
+            raise FalhaAutenticacao("Assinatura inválida (segredo de sincronização diferente?)")
+        self.contador += 1
+        mensagem = json.loads(corpo)
+        if "erro" in mensagem:
+            raise RuntimeError(mensagem["erro"])
+        return mensagem
+
+
+class _Atendimento(socketserver.StreamRequestHandler):
+    def handle(self):
+        engine = self.server.engine
+        canal = _Canal(self.rfile, self.wfile, self.server.segredo)
+        try:
+            canal.trocar_desafios(primeiro=False)
+            ola = canal.receber()
+        except (FalhaAutenticacao, ConnectionError):
+            return  # nada é respondido a quem não tem o segredo
+        try:
+            with engine.connect() as conn:
+                no = no_local(conn)
+                desde = seqs_recebidas(conn).get(ola["no"], 0)
+            if ola["no"] == no:
+                raise ValueError("As duas estações têm o mesmo identificador (rode --novo-no na cópia)")
+            canal.enviar({'no': no, 'desde': desde,
+                          'pacote': exportar(engine, ola["recebidas"].get(no, 0), para=ola["no"])})
+            canal.enviar({'aplicadas': aplicar(engine, canal.receber())})
+        except (ValueError, RuntimeError) as erro:
+            canal.enviar({'erro': str(erro)})
+        except (FalhaAutenticacao, ConnectionError):
+            pass
+
+
+def criar_servidor(engine: Engine = engine, host: str = "127.0.0.1", porta: int = PORTA_PADRAO,
+                   segredo: str = None):
+    """
+    Servidor TCP de sincronização (uma estação por vez); use serve_forever()/shutdown().
+    Só aceita conexões da própria máquina, a menos que `host` diga outra interface
+    (ex: "0.0.0.0"). Sem `segredo`, usa sinc_segredo da configuração.
+    """
+    servidor = socketserver.TCPServer((host, porta), _Atendimento)
+    servidor.engine = engine
+    servidor.segredo = _segredo(segredo)
+    return servidor
+
+
+def sincronizar_socket(engine: Engine = engine, host: str = "localhost", porta: int = PORTA_PADRAO,
+                       timeout: float = 60, segredo: str = None) -> Tuple[int, int]:
+    """Sincroniza com uma estação que roda criar_servidor(); devolve (enviadas, aplicadas)"""
+    chave = _segredo(segredo)
+    with engine.connect() as conn:
+        ola = {'no': no_local(conn), 'recebidas': seqs_recebidas(conn)}
+    with socket.create_connection((host, porta), timeout=timeout) as conexao:
+        with conexao.makefile("rwb") as arquivo:
+            canal = _Canal(arquivo, arquivo, chave)
+            canal.trocar_desafios(primeiro=True)
+            canal.enviar(ola)
+            resposta = canal.receber()
+            aplicadas = aplicar(engine, resposta["pacote"])
+            pacote = exportar(engine, resposta["desde"], para=resposta["no"])
+            canal.enviar(pacote)
+            canal.receber()
+    return len(pacote['alteracoes']), aplicadas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sincronização incremental entre estações")
+    grupo = parser.add_mutually_exclusive_group(required=True)
+    grupo.add_argument("--servir", type=int, metavar="PORTA", help="aguarda outras estações nesta porta")
+    grupo.add_argument("--conectar", metavar="HOST:PORTA", help="sincroniza com uma estação servidora")
+    grupo.add_argument("--pasta", help="sincroniza por uma pasta compartilhada")
+    grupo.add_argument("--novo-no", action="store_true", help="novo identificador para um banco copiado")
+    grupo.add_argument("--status", action="store_true", help="mostra a estação e as seqs recebidas")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="interface do --servir (padrão: só esta máquina; 0.0.0.0 = todas)")
+    parser.add_argument("--segredo", help="segredo compartilhado do socket (padrão: sinc_segredo da configuração)")
+    args = parser.parse_args()
+
+    if args.novo_no:
+        print(f"Novo identificador da estação: {novo_no(engine)}")
+    elif args.status:
+        with engine.connect() as conn:
+            print(f"Estação: {no_local(conn)}")
+            confirmadas = seqs_confirmadas(conn)
+            for no, seq in seqs_recebidas(conn).items():
+                print(f"  {no}: recebido até seq {seq}, confirmou até seq {confirmadas[no]}")
+    elif args.servir:
+        with criar_servidor(engine, args.host, args.servir, args.segredo) as servidor:
+            print(f"Aguardando estações em {args.host}:{args.servir} (Ctrl+C encerra)")
+            try:
+                servidor.serve_forever()
+            except KeyboardInterrupt:
+                pass
+    else:
+        if args.pasta:
+            enviadas, aplicadas = sincronizar_pasta(engine, args.pasta)
+        else:
+            host, _, porta = args.conectar.rpartition(":")
+            enviadas, aplicadas = sincronizar_socket(engine, host, int(porta), segredo=args.segredo)
+        print(f"{enviadas} alterações enviadas, {aplicadas} aplicadas.")
@@ -0,0 +1,74 @@
+"""
+Detecção de gravações feitas fora das sessões do ORM deste processo.
+
+Os caches em memória (controllers/cache_referencia.py, controllers/calculadora_dose.py
+e a grade de titulação) são invalidados por eventos do ORM, que só enxergam as
+gravações deste processo. Gravações de outros processos (outra GUI no mesmo arquivo,
+sincronização, importação ou cálculo em lote pela linha de comando, sqlite3) ficam de
+fora. MonitorVersaoDados guarda uma conexão própria ao arquivo e lê PRAGMA
+data_version, que muda sempre que outra conexão conclui uma gravação; os caches
+conferem a geração antes de responder e se descartam quando ela muda.
+
+A conexão do monitor é separada do pool, então as gravações do próprio app também
+mudam a geração: o cache é relido por inteiro depois delas (tabelas pequenas), o
+que é o preço de nunca servir uma concentração desatualizada.
+"""
+import sqlite3
+from threading import Lock
+from typing import Dict, Optional
+
+from sqlalchemy.engine import Engine
+
+
+class MonitorVersaoDados:
+    def __init__(self, caminho: Optional[str]):
+        self.caminho = caminho  # None = banco em memória (só uma conexão, nada a monitorar)
+        self._lock = Lock()
+        self._conexao: Optional[sqlite3.Connection] = None
+        self._versao: Optional[int] = None
+        self._geracao = 0
+
+    def geracao(self) -> int:
+        """Contador que aumenta a cada gravação concluída por outra conexão"""
+        if self.caminho is None:
+            return 0
+        with self._lock:
+            try:
+                if self._conexao is None:
+                    self._conexao = sqlite3.connect(self.caminho, check_same_thread=False)
+                versao = self._conexao.execute("PRAGMA data_version").fetchone()[0]
+            except sqlite3.Error:
+                # Sem como conferir (arquivo trocado, bloqueio...): trata como alterado
+                self._fechar()
+                self._geracao += 1
+                return self._geracao
+            if self._versao is not None and versao != self._versao:
+                self._geracao += 1
+            self._versao = versao
+            return self._geracao
+
+    def _fechar(self) -> None:
+        if self._conexao is not None:
+            self._conexao.close()
+        self._conexao = None
+        self._versao = None
+
+    def fechar(self) -> None:
+        with self._lock:
+            self._fechar()
+
+
+_monitores: Dict[str, MonitorVersaoDados] = {}
+_lock_monitores = Lock()
+
+
+def monitor_do_engine(engine: Engine) -> MonitorVersaoDados:
+    """Monitor compartilhado do arquivo do engine (um por banco)"""
+    banco = engine.url.database
+    em_memoria = not banco or banco == ":memory:" or "mode=memory" in str(engine.url)
+    chave = "" if em_memoria else banco
+    with _lock_monitores:
+        monitor = _monitores.get(chave)
+        if monitor is None:
+            monitor = _monitores[chave] = MonitorVersaoDados(None if em_memoria else banco)
+        return monitor
@@ -1,13 +1,10 @@
-from sqlmodel import SQLModel, create_engine
+from sqlmodel import SQLModel
 from models.animal import Animal
 from models.farmaco import Farmaco
 from models.sessao import SessaoAnestesia, SessaoAvulsaAnestesia
 from models.config_infusao import ConfigInfusao
 from models.protocolo import Protocolo, ProtocoloFarmaco  # Importar explicitamente
-
-# Configuração do banco de dados
-DATABASE_URL = "sqlite:///database.db"
-engine = create_engine(DATABASE_URL, echo=True)
+from database.engine import engine, atualizar_esquema
 
 def create_db_and_tables():
     print("Criando tabelas no banco de dados...")
@@ -22,6 +19,7 @@ def create_db_and_tables():
         SessaoAnestesia.__table__,
         SessaoAvulsaAnestesia.__table__,
     ])
+    atualizar_esquema(engine)
     
     print("Tabelas criadas com sucesso!")
 
@@ -0,0 +1,81 @@
+import time
+from typing import Callable, Dict, Optional
+
+from tkinter import ttk
+
+
+class Aba:
+    def __init__(self, nome: str, quadro, construir: Callable, carregar: Optional[Callable]):
+        self.nome = nome
+        self.quadro = quadro
+        self.construir = construir
+        self.carregar = carregar
+        self.criada = False
+
+
+class AbasSobDemanda:
+    """
+    Abas de um ttk.Notebook criadas só quando selecionadas pela primeira vez.
+
+    adicionar() põe no notebook um quadro vazio com o título; no primeiro
+    <<NotebookTabChanged>> que seleciona a aba, construir(quadro) monta os widgets e
+    carregar() (se houver) é agendado com after_idle, depois que a aba já foi
+    desenhada. Código que atualiza widgets de outras abas deve consultar criada():
+    uma aba ainda não criada carrega os dados atuais quando for aberta.
+    ao_criar(nome, fase, segundos) recebe o tempo de 'construir' e de 'carregar'.
+    """
+
+    def __init__(self, notebook, ao_criar: Callable[[str, str, float], None] = None,
+                 criar_quadro: Callable[[], object] = None):
+        self.notebook = notebook
+        self.ao_criar = ao_criar
+        self._criar_quadro = criar_quadro or (lambda: ttk.Frame(notebook))
+        self._abas: Dict[str, Aba] = {}
+        self._por_quadro: Dict[str, Aba] = {}
+        notebook.bind("<<NotebookTabChanged>>", self._ao_trocar, add="+")
+
+    def adicionar(self, nome: str, titulo: str, construir: Callable, carregar: Callable = None):
+        quadro = self._criar_quadro()
+        self.notebook.add(quadro, text=titulo)
+        aba = Aba(nome, quadro, construir, carregar)
+        self._abas[nome] = aba
+        self._por_quadro[str(quadro)] = aba
+        return quadro
+
+    def criada(self, nome: str) -> bool:
+        aba = self._abas.get(nome)
+        return aba is not None and aba.criada
+
+    def selecionada(self) -> Optional[str]:
+        aba = self._por_quadro.get(str(self.notebook.select()))
+        return aba.nome if aba else None
+
+    def _ao_trocar(self, event=None) -> None:
+        nome = self.selecionada()
+        if nome:
+            self.criar(nome)
+
+    def criar(self, nome: str, ao_carregar: Callable[[], None] = None) -> bool:
+        """Cria a aba se ainda não existe; devolve True se criou agora"""
+        aba = self._abas[nome]
+        if aba.criada:
+            return False
+        aba.criada = True
+        inicio = time.perf_counter()
+        aba.construir(aba.quadro)
+        self._medir(nome, "construir", inicio)
+
+        def carregar():
+            inicio = time.perf_counter()
+            if aba.carregar:
+                aba.carregar()
+            self._medir(nome, "carregar", inicio)
+            if ao_carregar:
+                ao_carregar()
+
+        self.notebook.after_idle(carregar)
+        return True
+
+    def _medir(self, nome: str, fase: str, inicio: float) -> None:
+        if self.ao_criar:
+            self.ao_criar(nome, fase, time.perf_counter() - inicio)
@@ -0,0 +1,162 @@
+from bisect import bisect_left
+from typing import Callable, Dict, Hashable, Iterable, List, Set
+
+
+def _estaveis(posicoes: List[int]) -> Set[int]:
+    """Índices da maior subsequência crescente: os itens que podem ficar onde estão"""
+    caudas: List[int] = []
+    indices: List[int] = []
+    anterior = [-1] * len(posicoes)
+    for i, posicao in enumerate(posicoes):
+        j = bisect_left(caudas, posicao)
+        if j == len(caudas):
+            caudas.append(posicao)
+            indices.append(i)
+        else:
+            caudas[j] = posicao
+            indices[j] = i
+        anterior[i] = indices[j - 1] if j else -1
+
+    resultado = set()
+    i = indices[-1] if indices else -1
+    while i >= 0:
+        resultado.add(i)
+        i = anterior[i]
+    return resultado
+
+
+class ArvoreVinculada:
+    """
+    Liga uma lista de objetos a um ttk.Treeview sem apagar e reinserir tudo.
+
+    Cada objeto vira o item de iid str(chave(objeto)) com os valores de valores(objeto).
+    atualizar() compara a lista nova com o que está na árvore e aplica só a diferença:
+    remove os itens que saíram, reescreve os que mudaram e insere/move o mínimo de
+    itens para chegar à ordem nova (os demais ficam parados, com seleção e rolagem).
+    Inserções e movimentos acima de `tamanho_fatia` são aplicados em fatias com
+    root.after, então uma carga grande não congela a interface; um atualizar() novo
+    descarta as fatias pendentes do anterior.
+    """
+
+    def __init__(self, root, arvore, valores: Callable[[object], tuple],
+                 chave: Callable[[object], Hashable] = lambda objeto: objeto.id,
+                 tamanho_fatia: int = 500, intervalo_ms: int = 1):
+        self.root = root
+        self.arvore = arvore
+        self.valores = valores
+        self.chave = chave
+        self.tamanho_fatia = tamanho_fatia
+        self.intervalo_ms = intervalo_ms
+        self._valores: Dict[str, tuple] = {}  # o que está na árvore agora
+        self._lotes: List[list] = []  # [operações, aplicar, ao_concluir, próxima posição]
+        self._agendado = False
+
+    @property
+    def pendente(self) -> bool:
+        """True enquanto houver fatias esperando o próximo after()"""
+        return bool(self._lotes)
+
+    def _linhas(self, objetos: Iterable) -> Dict[str, tuple]:
+        linhas: Dict[str, tuple] = {}
+        for objeto in objetos:
+            linhas.setdefault(str(self.chave(objeto)), tuple(self.valores(objeto)))
+        return linhas
+
+    def atualizar(self, objetos: Iterable, ao_concluir: Callable[[], None] = None) -> Dict[str, int]:
+        """
+        Deixa a árvore igual a `objetos` (na ordem dada); devolve quantos itens foram
+        inseridos, alterados, movidos e removidos. ao_concluir() roda após a última fatia.
+        """
+        linhas = self._linhas(objetos)
+        ordem = list(linhas)
+        atuais = self.arvore.get_children()
+
+        removidos = [iid for iid in atuais if iid not in linhas]
+        if removidos:
+            self.arvore.delete(*removidos)
+            for iid in removidos:
+                self._valores.pop(iid, None)
+
+        restantes = [iid for iid in atuais if iid in linhas]
+        alterados = [iid for iid in restantes if self._valores.get(iid) != linhas[iid]]
+        posicao = {iid: i for i, iid in enumerate(ordem)}
+        estaveis = {restantes[i] for i in _estaveis([posicao[iid] for iid in restantes])}
+        ultimo_estavel = max((posicao[iid] for iid in estaveis), default=-1)
+
+        operacoes = [(None, iid) for iid in alterados]
+        operacoes += [(i, iid) for i, iid in enumerate(ordem) if iid not in estaveis]
+        contagem = {'inseridos': len(ordem) - len(restantes), 'alterados': len(alterados),
+                    'movidos': len(restantes) - len(estaveis), 'removidos': len(removidos)}
+
+        def aplicar(operacao):
+            i, iid = operacao
+            if i is None:
+                self.arvore.item(iid, values=linhas[iid])
+                self._valores[iid] = linhas[iid]
+                return
+            # Depois de todos os estáveis basta ir para o fim; antes, logo após o anterior
+            # na ordem nova (que já está no lugar: é estável ou foi colocado antes)
+            if i > ultimo_estavel:
+                indice = 'end'
+            else:
+                indice = 0 if i == 0 else self.arvore.index(ordem[i - 1]) + 1
+            if iid in self._valores:
+                self.arvore.move(iid, '', indice)
+            else:
+                self.arvore.insert('', indice, iid=iid, values=linhas[iid])
+                self._valores[iid] = linhas[iid]
+
+        self._aplicar_em_fatias(operacoes, aplicar, ao_concluir, substituir=True)
+        return contagem
+
+    def acrescentar(self, objetos: Iterable, ao_concluir: Callable[[], None] = None) -> int:
+        """Insere no fim (ex: próxima página); itens já presentes só são atualizados"""
+        linhas = self._linhas(objetos)
+
+        def aplicar(iid):
+            if iid in self._valores:
+                if self._valores[iid] != linhas[iid]:
+                    self.arvore.item(iid, values=linhas[iid])
+            else:
+                self.arvore.insert('', 'end', iid=iid, values=linhas[iid])
+            self._valores[iid] = linhas[iid]
+
+        # Entra na fila depois das fatias de um atualizar() em andamento
+        self._aplicar_em_fatias(list(linhas), aplicar, ao_concluir)
+        return len(linhas)
+
+    def limpar(self) -> None:
+        self._lotes.clear()
+        self.arvore.delete(*self.arvore.get_children())
+        self._valores.clear()
+
+    def _aplicar_em_fatias(self, operacoes: list, aplicar: Callable, ao_concluir: Callable[[], None],
+                           substituir: bool = False) -> None:
+        if substituir:
+            self._lotes.clear()
+        self._lotes.append([operacoes, aplicar, ao_concluir, 0])
+        if not self._agendado:
+            self._processar()
+
+    def _processar(self) -> None:
+        """Aplica até `tamanho_fatia` operações e agenda o resto para o próximo after()"""
+        restantes = self.tamanho_fatia
+        while self._lotes:
+            lote = self._lotes[0]
+            operacoes, aplicar, ao_concluir, inicio = lote
+            fim = min(len(operacoes), inicio + restantes)
+            for operacao in operacoes[inicio:fim]:
+                aplicar(operacao)
+            restantes -= fim - inicio
+            lote[3] = fim
+            if fim < len(operacoes):
+                self._agendado = True
+                self.root.after(self.intervalo_ms, self._proxima_fatia)
+                return
+            self._lotes.pop(0)
+            if ao_concluir:
+                ao_concluir()
+
+    def _proxima_fatia(self) -> None:
+        self._agendado = False
+        self._processar()
@@ -0,0 +1,48 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+
+def relatorio_ativado() -> bool:
+    """Relatório de inicialização só quando pedido (ANESTESIA_TEMPOS=1)"""
+    return os.environ.get("ANESTESIA_TEMPOS", "").strip().lower() in ("1", "true", "sim", "yes", "on")
+
+
+class TemposInicializacao:
+    """
+    Tempos da abertura da GUI: duração de cada fase e o instante (desde `inicio`)
+    dos marcos 'primeira pintura' (janela desenhada) e 'interativa' (aba inicial
+    com os dados carregados).
+    """
+
+    def __init__(self, inicio: float = None):
+        self.inicio = time.perf_counter() if inicio is None else inicio
+        self.fases: List[Tuple[str, float]] = []
+        self.marcos: Dict[str, float] = {}
+
+    @contextmanager
+    def fase(self, nome: str):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(nome, time.perf_counter() - inicio)
+
+    def registrar(self, nome: str, segundos: float) -> None:
+        self.fases.append((nome, segundos))
+
+    def marcar(self, marco: str) -> bool:
+        """Registra o marco na primeira vez; devolve False se já existia"""
+        if marco in self.marcos:
+            return False
+        self.marcos[marco] = time.perf_counter() - self.inicio
+        return True
+
+    def relatorio(self) -> str:
+        largura = max((len(nome) for nome in [*dict(self.fases), *self.marcos]), default=0)
+        linhas = ["Inicialização (ms):"]
+        linhas += [f"  {nome:<{largura}}  {segundos * 1000:8.1f}" for nome, segundos in self.fases]
+        linhas += [f"  {marco:<{largura}}  {segundos * 1000:8.1f}  (desde o início)"
+                   for marco, segundos in self.marcos.items()]
+        return "\n".join(linhas)
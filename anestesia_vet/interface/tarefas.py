@@ -0,0 +1,148 @@
+import queue
+import threading
+import traceback
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+
+class Tarefa:
+    """Trabalho enviado ao executor; cancelar() evita o retorno para a interface"""
+
+    def __init__(self, descricao: str, cancelavel: bool):
+        self.descricao = descricao
+        self.cancelavel = cancelavel
+        self.evento_cancelamento = threading.Event()
+        self.future: Optional[Future] = None
+
+    @property
+    def cancelada(self) -> bool:
+        return self.evento_cancelamento.is_set()
+
+    def cancelar(self) -> None:
+        """
+        Marca a tarefa como cancelada: se ainda não começou, não roda; se já está
+        rodando, o trabalho pode consultar o evento 'cancelado' e parar. O retorno
+        (ao_concluir/ao_erro) nunca é chamado para uma tarefa cancelada.
+        """
+        self.evento_cancelamento.set()
+        if self.future is not None:
+            self.future.cancel()
+
+
+class ExecutorTarefas:
+    """
+    Roda acesso a banco e arquivos fora da thread do Tk.
+
+    - executar() envia o trabalho para um pool de threads; o resultado volta por uma
+      fila que é esvaziada na thread da interface com root.after, onde ao_concluir
+      (ou ao_erro) é chamado. O trabalho em si nunca deve tocar em widgets.
+    - na_interface() agenda chamadas na thread do Tk a partir do trabalho ou de
+      qualquer outra thread (ex: progresso de uma importação, gravação do diário).
+    - Um retorno que lança exceção vai para ao_erro(None, erro) e não impede os
+      seguintes.
+    - ao_mudar_estado(ativas) é chamado na thread do Tk sempre que a lista de
+      tarefas em andamento muda (indicador de ocupado).
+    """
+
+    def __init__(self, root, max_workers: int = 2, intervalo_ms: int = 50,
+                 ao_mudar_estado: Callable[[List[Tarefa]], None] = None,
+                 ao_erro: Callable[[Tarefa, BaseException], None] = None):
+        self.root = root
+        self.intervalo_ms = intervalo_ms
+        self.ao_mudar_estado = ao_mudar_estado
+        self.ao_erro = ao_erro
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="anestesia-db")
+        self._fila: "queue.Queue[Callable[[], None]]" = queue.Queue()
+        self._ativas: List[Tarefa] = []
+        self._agendado = False
+        self._lock_agenda = threading.Lock()  # _agendar() também é chamado pelas threads do pool
+
+    @property
+    def ativas(self) -> List[Tarefa]:
+        return list(self._ativas)
+
+    @property
+    def ocupado(self) -> bool:
+        return bool(self._ativas)
+
+    def executar(self, trabalho: Callable, *args, ao_concluir: Callable = None,
+                 ao_erro: Callable[[BaseException], None] = None, descricao: str = "",
+                 cancelavel: bool = False, **kwargs) -> Tarefa:
+        """
+        Roda trabalho(*args, **kwargs) numa thread do pool. Com cancelavel=True o
+        trabalho recebe também cancelado=<threading.Event>.
+        Deve ser chamado da thread do Tk.
+        """
+        tarefa = Tarefa(descricao, cancelavel)
+        if cancelavel:
+            kwargs['cancelado'] = tarefa.evento_cancelamento
+        tarefa.future = self._pool.submit(trabalho, *args, **kwargs)
+        self._ativas.append(tarefa)
+        self._notificar()
+        tarefa.future.add_done_callback(
+            lambda future: self._fila.put(lambda: self._finalizar(tarefa, ao_concluir, ao_erro)))
+        self._agendar()
+        return tarefa
+
+    def na_interface(self, funcao: Callable, *args) -> None:
+        """Agenda funcao(*args) na thread do Tk (pode ser chamado de qualquer thread)"""
+        self._fila.put(lambda: funcao(*args))
+        self._agendar(0)
+
+    def cancelar_todas(self) -> None:
+        for tarefa in self._ativas:
+            if tarefa.cancelavel:
+                tarefa.cancelar()
+
+    def encerrar(self) -> None:
+        """Cancela o que puder e espera as tarefas em andamento (ao fechar a janela)"""
+        for tarefa in self._ativas:
+            tarefa.cancelar()
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    # --- Thread do Tk ---
+    def _agendar(self, atraso_ms: int = None) -> None:
+        with self._lock_agenda:
+            if self._agendado:
+                return
+            self._agendado = True
+        self.root.after(self.intervalo_ms if atraso_ms is None else atraso_ms, self.drenar)
+
+    def drenar(self) -> None:
+        """Executa os retornos pendentes; continua agendado enquanto houver tarefas"""
+        with self._lock_agenda:
+            self._agendado = False
+        while True:
+            try:
+                retorno = self._fila.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                retorno()
+            except Exception as erro:
+                if self.ao_erro is not None:
+                    self.ao_erro(None, erro)
+                else:
+                    traceback.print_exc()
+        if self._ativas or not self._fila.empty():
+            self._agendar()
+
+    def _finalizar(self, tarefa: Tarefa, ao_concluir: Callable, ao_erro: Callable) -> None:
+        self._ativas.remove(tarefa)
+        self._notificar()
+        if tarefa.cancelada:
+            return
+        try:
+            resultado = tarefa.future.result()
+        except CancelledError:
+            return
+        except Exception as erro:
+            tratador = ao_erro or (lambda e: self.ao_erro and self.ao_erro(tarefa, e))
+            tratador(erro)
+            return
+        if ao_concluir is not None:
+            ao_concluir(resultado)
+
+    def _notificar(self) -> None:
+        if self.ao_mudar_estado is not None:
+            self.ao_mudar_estado(self.ativas)
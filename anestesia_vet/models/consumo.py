@@ -0,0 +1,13 @@
+from datetime import date
+
+from sqlmodel import SQLModel, Field
+
+class ConsumoDiario(SQLModel, table=True):
+    # Totais por (dia, fármaco, espécie), mantidos pelos eventos de controllers/consumo_controller.py.
+    # A chave começa pelo dia: relatórios de um período leem só a faixa do índice.
+    dia: date = Field(primary_key=True)
+    id_farmaco: int = Field(primary_key=True)
+    especie: str = Field(primary_key=True)
+    total_ml: float = 0.0
+    total_mg: float = 0.0  # 0 para fármacos em UI
+    sessoes: int = 0
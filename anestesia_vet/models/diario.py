@@ -0,0 +1,7 @@
+from sqlmodel import SQLModel, Field
+
+class DiarioSessao(SQLModel, table=True):
+    # Último registro do diário de sessões já gravado no banco. Atualizado na mesma
+    # transação das sessões, então a recuperação nunca grava um registro duas vezes.
+    nome: str = Field(primary_key=True)
+    seq_confirmado: int = 0
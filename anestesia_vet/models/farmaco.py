@@ -1,15 +1,77 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index, event
 from typing import Optional
+from controllers.utils.formatacao import sem_acentos
+from controllers.utils.unidades import Unidade, conferir_unidades, fator_concentracao_ug_ml, interpretar_unidade
 
 class Farmaco(SQLModel, table=True):
+    # Chave natural do catálogo (upsert da importação); também serve à ordenação por nome
+    __table_args__ = (Index("ix_farmaco_chave", "nome", "unidade_dose", "modo_uso"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     nome: str
     dose: float
     concentracao: float
     unidade_dose: str
+    # mg/ml, µg/ml, UI/ml; None = não confirmada (cadastros anteriores à coluna e
+    # CSVs sem ela): os cálculos mantêm o resultado antigo e as telas sinalizam
+    unidade_concentracao: Optional[str] = None
     modo_uso: str = "bolus"
     volume_seringa: Optional[float] = None
     comentario: Optional[str] = None
     tipo_infusao: str = "padrao"  # padrao, especifica, vasoativo
-    doses_variaveis: Optional[str] = Field(default="", nullable=True) 
+    doses_variaveis: Optional[str] = Field(default="", nullable=True)
+    # sem_acentos(nome/comentario), gravados pelo app para a busca (database/busca.py)
+    nome_busca: Optional[str] = Field(default=None, index=True)
+    comentario_busca: Optional[str] = None
+
+    # Unidades interpretadas (instâncias únicas em cache, ver controllers/utils/unidades.py)
+    @property
+    def unidade(self) -> Unidade:
+        return interpretar_unidade(self.unidade_dose)
+
+    @property
+    def unidade_conc(self) -> Optional[Unidade]:
+        """Unidade da concentração; None se não confirmada (ou gravada inválida por fora do app)"""
+        if self.unidade_concentracao is None:
+            return None
+        try:
+            return interpretar_unidade(self.unidade_concentracao)
+        except ValueError:
+            return None
+
+    @property
+    def unidade_confirmada(self) -> bool:
+        return self.unidade_conc is not None
+
+    @property
+    def dose_ug_kg_h(self) -> float:
+        """Dose padrão em µg/kg/h (µg/kg no bolus)"""
+        return self.dose * self.unidade.fator_ug_kg_h
+
+    @property
+    def texto_concentracao(self) -> str:
+        """Concentração com a unidade cadastrada (ex: "50.0 µg/ml"), para telas e prescrições"""
+        if not self.unidade_confirmada:
+            return f"{self.concentracao} (unidade a confirmar)"
+        return f"{self.concentracao} {self.unidade_concentracao}"
+
+    @property
+    def concentracao_ug_ml(self) -> float:
+        """Concentração em µg/ml (sem unidade confirmada: mg/ml, como o cálculo de infusão antigo)"""
+        unidade = self.unidade_conc
+        return self.concentracao * (unidade.fator_ug_ml if unidade else fator_concentracao_ug_ml(None))
+
+
+@event.listens_for(Farmaco, "before_insert")
+@event.listens_for(Farmaco, "before_update")
+def _conferir_unidades(_mapper, _conexao, farmaco: Farmaco) -> None:
+    # Unidades conferidas na gravação: as propriedades acima não levantam erro
+    conferir_unidades(farmaco.unidade_dose, farmaco.unidade_concentracao)
+
 
+@event.listens_for(Farmaco, "before_insert")
+@event.listens_for(Farmaco, "before_update")
+def _preencher_busca(_mapper, _conexao, farmaco: Farmaco) -> None:
+    farmaco.nome_busca = sem_acentos(farmaco.nome)
+    farmaco.comentario_busca = sem_acentos(farmaco.comentario)
@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from typing import List, Optional
 from datetime import datetime
 
@@ -17,5 +18,8 @@ class ProtocoloFarmacoBase(SQLModel):
     ordem: int  # Para ordenar os fármacos no protocolo
 
 class ProtocoloFarmaco(ProtocoloFarmacoBase, table=True):
+    # Cobre a listagem ordenada do protocolo sem ler a tabela (inclui farmaco_id do join)
+    __table_args__ = (Index("ix_protocolofarmaco_protocolo_ordem", "protocolo_id", "ordem", "farmaco_id"),)
+
     protocolo: "Protocolo" = Relationship(back_populates="farmacos")
     farmaco: "Farmaco" = Relationship()  # Relacionamento com Farmaco
\ No newline at end of file
@@ -1,15 +1,19 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from typing import Optional
 from datetime import datetime
 
 class SessaoAnestesia(SQLModel, table=True):
+    # Sessões por animal em ordem de data (histórico do paciente)
+    __table_args__ = (Index("ix_sessaoanestesia_id_animal_data", "id_animal", "data"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     id_animal: Optional[int] = Field(default=None, foreign_key="animal.id")
-    id_farmaco: int = Field(foreign_key="farmaco.id")
+    id_farmaco: int = Field(foreign_key="farmaco.id", index=True)
     dose_utilizada_ml: float = Field(gt=0)  # Dose > 0
     observacoes: Optional[str] = None
     # Adicionar data também para sessões normais
-    data: datetime = Field(default_factory=datetime.now)
+    data: datetime = Field(default_factory=datetime.now, index=True)
     config_infusao_id: Optional[int] = Field(
         default=None,
         foreign_key="configinfusao.id",
@@ -27,8 +31,8 @@ class SessaoAvulsaAnestesia(SQLModel, table=True):
     especie: str
     nome_animal: str
     peso_kg: float
-    id_farmaco: int
+    id_farmaco: int = Field(index=True)
     dose_utilizada_ml: float
     observacoes: Optional[str] = None
-    data: datetime = Field(default_factory=datetime.now)
+    data: datetime = Field(default_factory=datetime.now, index=True)
     
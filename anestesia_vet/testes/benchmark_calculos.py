@@ -0,0 +1,273 @@
+"""
+Micro-benchmark das funções de dose e infusão (chamadas/s e memória alocada por chamada).
+
+As entradas são geradas a partir de farmacos_completo.csv (doses, concentrações e
+unidades reais) com pesos, bolsas e equipos sorteados em faixas clínicas.
+Os resultados são comparados com testes/benchmark_baseline.json; o script termina
+com código 1 se alguma função piorar mais que o limite.
+
+Uso (a partir de anestesia_vet/):
+    python testes/benchmark_calculos.py                  # compara com a baseline
+    python testes/benchmark_calculos.py --atualizar      # grava nova baseline
+    python testes/benchmark_calculos.py --limite 0.4     # tolera até 40% de piora
+    python testes/benchmark_calculos.py --rodadas 9      # mediana de 9 rodadas completas
+(o limite também pode vir da variável de ambiente BENCHMARK_LIMITE)
+
+Uma rodada isolada oscila bastante (troca de contexto, frequência da CPU), então a
+comparação usa a mediana de várias rodadas completas, cada uma com a sua referência.
+"""
+import argparse
+import csv
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from controllers.config_infusao_controller import (
+    calcular_infusao_continua,
+    calcular_infusao_especifica,
+    calcular_infusao_planilha,
+    calcular_dose_total,
+    calcular_volume_farmaco,
+)
+from controllers.utils.formatacao import formatar_duracao
+
+RAIZ = Path(__file__).parent.parent
+CSV_FARMACOS = RAIZ / "farmacos_completo.csv"
+BASELINE = Path(__file__).parent / "benchmark_baseline.json"
+LIMITE_PADRAO = float(os.environ.get("BENCHMARK_LIMITE", "0.30"))
+RODADAS_PADRAO = 5
+
+# Faixas clínicas usadas para sortear o paciente e o material
+PESOS = (0.8, 45.0)                 # kg (filhotes de gato a cães grandes)
+VOLUMES = (10, 20, 50, 100, 250, 500)  # ml (seringas e bolsas)
+EQUIPOS = ("macrogotas", "microgotas")
+TAXAS_FLUIDO = (2.0, 10.0)          # ml/kg/h
+DURACOES = (0.25, 12.0)             # h
+
+
+def carregar_farmacos(caminho: Path = CSV_FARMACOS) -> list:
+    with open(caminho, encoding="utf-8") as f:
+        farmacos = []
+        for row in csv.DictReader(f):
+            farmacos.append({
+                'dose': float(row['dose']),
+                'concentracao': float(row['concentracao']),
+                'unidade_dose': row['unidade_dose'].strip(),
+                'unidade_concentracao': (row.get('unidade_concentracao') or 'mg/ml').strip(),
+                'continua': row['modo_uso'].strip() != "bolus",
+            })
+    return farmacos
+
+
+def gerar_entradas(farmacos: list, n: int, semente: int = 0) -> dict:
+    """Argumentos (tuplas) de cada função, sorteados sobre os fármacos do CSV"""
+    rng = random.Random(semente)
+    continuos = [f for f in farmacos if f['continua']]
+    mg_continuos = [f for f in continuos if f['unidade_dose'].startswith("mg")] or continuos
+
+    def paciente():
+        return round(rng.uniform(*PESOS), 1), float(rng.choice(VOLUMES)), rng.choice(EQUIPOS)
+
+    entradas = {nome: [] for nome in FUNCOES}
+    for _ in range(n):
+        f = rng.choice(continuos)
+        peso, volume, equipo = paciente()
+        entradas['calcular_infusao_continua'].append(
+            (peso, f['dose'], f['unidade_dose'], f['concentracao'], volume, equipo,
+             rng.choice(("taxa", "solucao")), f['unidade_concentracao']))
+
+        f = rng.choice(mg_continuos)
+        peso, volume, equipo = paciente()
+        entradas['calcular_infusao_especifica'].append(
+            (peso, f['dose'] / 60, f['concentracao'], volume, equipo, rng.choice(("peso", "volume"))))
+
+        f = rng.choice(continuos)
+        peso, volume, equipo = paciente()
+        entradas['calcular_infusao_planilha'].append(
+            (peso, round(rng.uniform(*TAXAS_FLUIDO), 1), volume, equipo,
+             f['dose'], f['unidade_dose'], f['concentracao'], f['unidade_concentracao']))
+
+        f = rng.choice(continuos)
+        duracao = rng.uniform(*DURACOES)
+        entradas['calcular_dose_total'].append((f['dose'], f['unidade_dose'], paciente()[0], duracao))
+        entradas['calcular_volume_farmaco'].append(
+            (calcular_dose_total(f['dose'], f['unidade_dose'], paciente()[0], duracao),
+             f['concentracao'], f['unidade_concentracao']))
+
+        entradas['formatar_duracao'].append((rng.uniform(*DURACOES),))
+    return entradas
+
+
+FUNCOES = {
+    'calcular_infusao_continua': calcular_infusao_continua,
+    'calcular_infusao_especifica': calcular_infusao_especifica,
+    'calcular_infusao_planilha': calcular_infusao_planilha,
+    'calcular_dose_total': calcular_dose_total,
+    'calcular_volume_farmaco': calcular_volume_farmaco,
+    'formatar_duracao': formatar_duracao,
+}
+
+
+def medir_chamadas_s(funcao, argumentos: list, repeticoes: int) -> float:
+    """Melhor taxa (chamadas/s) entre as repetições, com o GC desligado para reduzir ruído"""
+    melhor = float("inf")
+    gc_ativo = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            for args in argumentos:
+                funcao(*args)
+            melhor = min(melhor, time.perf_counter() - inicio)
+    finally:
+        if gc_ativo:
+            gc.enable()
+    return len(argumentos) / melhor
+
+
+def _referencia(n: int = 20_000) -> float:
+    """Carga fixa em Python puro para normalizar a velocidade da máquina"""
+    total = 0.0
+    for i in range(n):
+        total += (i * 1.5) / (i + 1)
+    return total
+
+
+def medir_referencia(repeticoes: int, chamadas: int = 20) -> float:
+    """
+    Velocidade da carga de referência (chamadas/s): melhor de `repeticoes` rodadas
+    de `chamadas` chamadas (~40 ms cada, em vez de uma chamada de ~2 ms).
+    """
+    return medir_chamadas_s(_referencia, [()] * chamadas, repeticoes)
+
+
+def medir_alocacao(funcao, argumentos: list) -> float:
+    """Média de bytes alocados (pico do tracemalloc) por chamada"""
+    tracemalloc.start()
+    try:
+        total = 0
+        for args in argumentos:
+            antes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            funcao(*args)
+            total += tracemalloc.get_traced_memory()[1] - antes
+    finally:
+        tracemalloc.stop()
+    return total / len(argumentos)
+
+
+def executar(n: int = 20_000, repeticoes: int = 9, semente: int = 0) -> dict:
+    """
+    Mede cada função. 'relativo' é chamadas/s dividido pela velocidade da carga de
+    referência, o que tira boa parte da variação da máquina (CPU, carga, frequência)
+    da comparação com a baseline. A referência é medida antes de cada função e no
+    fim; todas usam a mediana dessas medidas, então um pico isolado não desloca
+    o resultado de uma função só.
+    """
+    entradas = gerar_entradas(carregar_farmacos(), n, semente)
+    referencias = []
+    medidas = {}
+    for nome, funcao in FUNCOES.items():
+        argumentos = entradas[nome]
+        for args in argumentos[:100]:  # aquecimento (caches de unidade, etc.)
+            funcao(*args)
+        referencias.append(medir_referencia(repeticoes))
+        medidas[nome] = (medir_chamadas_s(funcao, argumentos, repeticoes),
+                         medir_alocacao(funcao, argumentos[:2_000]))
+    referencias.append(medir_referencia(repeticoes))
+    referencia = statistics.median(referencias)
+    return {
+        nome: {
+            'chamadas_s': round(chamadas_s, 1),
+            'relativo': round(chamadas_s / referencia, 2),
+            'bytes_por_chamada': round(bytes_por_chamada, 1),
+        }
+        for nome, (chamadas_s, bytes_por_chamada) in medidas.items()
+    }
+
+
+def executar_rodadas(rodadas: int = RODADAS_PADRAO, n: int = 20_000, repeticoes: int = 9,
+                     semente: int = 0) -> dict:
+    """Mediana, métrica a métrica, de `rodadas` execuções completas de executar()"""
+    resultados = [executar(n, repeticoes, semente) for _ in range(max(1, rodadas))]
+    casas = {'chamadas_s': 1, 'relativo': 2, 'bytes_por_chamada': 1}
+    return {
+        nome: {metrica: round(statistics.median(r[nome][metrica] for r in resultados), digitos)
+               for metrica, digitos in casas.items()}
+        for nome in resultados[0]
+    }
+
+
+def comparar(atual: dict, baseline: dict, limite: float) -> list:
+    """Lista de regressões (função, métrica, baseline, atual) acima do limite"""
+    regressoes = []
+    for nome, medida in atual.items():
+        base = baseline.get(nome)
+        if not base:
+            continue
+        if medida['relativo'] < base['relativo'] * (1 - limite):
+            regressoes.append((nome, 'relativo', base['relativo'], medida['relativo']))
+        # Folga absoluta de 64 bytes: pequenas variações do interpretador não contam
+        if medida['bytes_por_chamada'] > base['bytes_por_chamada'] * (1 + limite) + 64:
+            regressoes.append((nome, 'bytes_por_chamada', base['bytes_por_chamada'], medida['bytes_por_chamada']))
+    return regressoes
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmark dos cálculos de dose/infusão")
+    parser.add_argument("--chamadas", type=int, default=20_000, help="entradas por função")
+    parser.add_argument("--repeticoes", type=int, default=9)
+    parser.add_argument("--rodadas", type=int, default=RODADAS_PADRAO,
+                        help="rodadas completas; compara a mediana delas")
+    parser.add_argument("--limite", type=float, default=LIMITE_PADRAO,
+                        help="piora máxima tolerada (fração, ex: 0.2 = 20%%)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--atualizar", action="store_true", help="grava os resultados como nova baseline")
+    args = parser.parse_args(argv)
+
+    resultados = executar_rodadas(args.rodadas, args.chamadas, args.repeticoes)
+
+    baseline = {}
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8")).get('funcoes', {})
+
+    print(f"{'função':<30} {'chamadas/s':>12} {'relativo':>9} {'baseline':>9} "
+          f"{'bytes/chamada':>14} {'baseline':>9}")
+    for nome, medida in resultados.items():
+        base = baseline.get(nome, {})
+        print(f"{nome:<30} {medida['chamadas_s']:>12,.0f} {medida['relativo']:>9.2f} "
+              f"{base.get('relativo', 0):>9.2f} {medida['bytes_por_chamada']:>14.1f} "
+              f"{base.get('bytes_por_chamada', 0):>9.1f}")
+
+    if args.atualizar or not baseline:
+        args.baseline.write_text(json.dumps({
+            'python': platform.python_version(),
+            'maquina': platform.machine(),
+            'chamadas': args.chamadas,
+            'rodadas': args.rodadas,
+            'funcoes': resultados,
+        }, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"\nBaseline gravada em {args.baseline}")
+        return 0
+
+    regressoes = comparar(resultados, baseline, args.limite)
+    for nome, metrica, antes, depois in regressoes:
+        print(f"REGRESSÃO {nome}: {metrica} {antes} -> {depois} (limite {args.limite:.0%})")
+    if regressoes:
+        return 1
+    print(f"\nSem regressões acima de {args.limite:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Benchmark: cálculos de infusão escalares (loop Python) x versão em lote (NumPy).
+
+Uso (a partir de anestesia_vet/):
+    python testes/benchmark_calculos_lote.py [--tamanhos 1000 100000 1000000]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from controllers.config_infusao_controller import (
+    calcular_infusao_continua,
+    calcular_infusao_especifica,
+    calcular_infusao_planilha,
+)
+from controllers.utils.calculos import (
+    calcular_infusao_continua_lote,
+    calcular_infusao_especifica_lote,
+    calcular_infusao_planilha_lote,
+)
+
+
+def gerar_entradas(n: int, semente: int = 0) -> dict:
+    rng = np.random.default_rng(semente)
+    return {
+        'peso': np.round(rng.uniform(0.5, 60, n), 1),
+        'dose': np.round(rng.uniform(0.01, 10, n), 3),
+        'concentracao': rng.choice([0.5, 1, 2, 5, 10, 20, 50, 100], n).astype(float),
+        'volume': rng.choice([10, 20, 50, 100, 250, 500], n).astype(float),
+        'taxa': np.round(rng.uniform(0.5, 10, n), 1),
+        'unidade': rng.choice(["mg/kg/h", "mg/kg/min", "µg/kg/h", "µg/kg/min"], n),
+        'equipo': rng.choice(["macrogotas", "microgotas"], n),
+    }
+
+
+def _cronometrar(funcao) -> float:
+    inicio = time.perf_counter()
+    funcao()
+    return time.perf_counter() - inicio
+
+
+def casos(e: dict):
+    """Pares (nome, loop escalar, chamada em lote) sobre as mesmas entradas"""
+    # Listas Python para o loop escalar (evita o custo de indexar arrays NumPy)
+    p, d, c, v, t = (e[k].tolist() for k in ('peso', 'dose', 'concentracao', 'volume', 'taxa'))
+    u, q = e['unidade'].tolist(), e['equipo'].tolist()
+    n = len(p)
+
+    yield (
+        "calcular_infusao_continua",
+        lambda: [calcular_infusao_continua(p[i], d[i], u[i], c[i], v[i], q[i], "solucao") for i in range(n)],
+        lambda: calcular_infusao_continua_lote(
+            e['peso'], e['dose'], e['unidade'], e['concentracao'], e['volume'], e['equipo'], "solucao"),
+    )
+    yield (
+        "calcular_infusao_especifica",
+        lambda: [calcular_infusao_especifica(p[i], d[i], c[i], v[i], q[i]) for i in range(n)],
+        lambda: calcular_infusao_especifica_lote(
+            e['peso'], e['dose'], e['concentracao'], e['volume'], e['equipo']),
+    )
+    yield (
+        "calcular_infusao_planilha",
+        lambda: [calcular_infusao_planilha(p[i], t[i], v[i], q[i], d[i], u[i], c[i]) for i in range(n)],
+        lambda: calcular_infusao_planilha_lote(
+            e['peso'], e['taxa'], e['volume'], e['equipo'], e['dose'], e['unidade'], e['concentracao']),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos cálculos de infusão em lote")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'função':<30} {'linhas':>10} {'escalar (s)':>12} {'lote (s)':>10} {'ganho':>8}")
+    for n in args.tamanhos:
+        entradas = gerar_entradas(n)
+        for nome, escalar, lote in casos(entradas):
+            t_escalar = _cronometrar(escalar)
+            t_lote = _cronometrar(lote)
+            print(f"{nome:<30} {n:>10} {t_escalar:>12.4f} {t_lote:>10.4f} {t_escalar / t_lote:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
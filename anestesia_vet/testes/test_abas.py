@@ -0,0 +1,87 @@
+import os
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from interface.abas import AbasSobDemanda
+from interface.inicializacao import TemposInicializacao, relatorio_ativado
+
+
+class NotebookFalso:
+    """Substitui o ttk.Notebook: seleção, evento de troca e fila do after_idle"""
+
+    def __init__(self):
+        self.quadros = []
+        self.atual = None
+        self.ociosos = []
+        self.ao_trocar = None
+
+    def bind(self, _evento, funcao, add=None):
+        self.ao_trocar = funcao
+
+    def add(self, quadro, text):
+        self.quadros.append(quadro)
+        if self.atual is None:
+            self.atual = quadro
+
+    def select(self, quadro=None):
+        if quadro is None:
+            return self.atual
+        self.atual = quadro
+        self.ao_trocar(None)
+
+    def after_idle(self, funcao):
+        self.ociosos.append(funcao)
+
+    def ocioso(self):
+        while self.ociosos:
+            self.ociosos.pop(0)()
+
+
+class TestAbasSobDemanda(unittest.TestCase):
+    def test_aba_criada_e_carregada_so_quando_aberta(self):
+        notebook = NotebookFalso()
+        eventos = []
+        tempos = TemposInicializacao()
+        abas = AbasSobDemanda(notebook, ao_criar=lambda nome, fase, s: tempos.registrar(f"{nome}: {fase}", s),
+                              criar_quadro=lambda: f".quadro{len(notebook.quadros)}")
+        for nome in ("animais", "farmacos", "sessoes"):
+            abas.adicionar(nome, nome.title(),
+                           construir=lambda quadro, nome=nome: eventos.append(("construir", nome, quadro)),
+                           carregar=lambda nome=nome: eventos.append(("carregar", nome)))
+
+        self.assertEqual(eventos, [])
+        self.assertTrue(abas.criar(abas.selecionada(), ao_carregar=lambda: tempos.marcar("interativa")))
+        # Os dados só são lidos depois que a aba foi desenhada (ciclo ocioso)
+        self.assertEqual(eventos, [("construir", "animais", ".quadro0")])
+        notebook.ocioso()
+        self.assertEqual(eventos[-1], ("carregar", "animais"))
+        self.assertIn("interativa", tempos.marcos)
+
+        notebook.select(".quadro2")
+        notebook.select(".quadro0")
+        notebook.select(".quadro2")
+        notebook.ocioso()
+        self.assertEqual([e for e in eventos if e[0] == "construir"],
+                         [("construir", "animais", ".quadro0"), ("construir", "sessoes", ".quadro2")])
+        self.assertTrue(abas.criada("sessoes"))
+        self.assertFalse(abas.criada("farmacos"))
+        self.assertFalse(abas.criar("animais"))
+
+        relatorio = tempos.relatorio()
+        for linha in ("animais: construir", "animais: carregar", "sessoes: carregar", "interativa"):
+            self.assertIn(linha, relatorio)
+
+    def test_relatorio_so_quando_pedido(self):
+        with mock.patch.dict(os.environ, {}, clear=True):
+            self.assertFalse(relatorio_ativado())
+        with mock.patch.dict(os.environ, {"ANESTESIA_TEMPOS": "1"}):
+            self.assertTrue(relatorio_ativado())
+
+
+if __name__ == "__main__":
+    unittest.main()
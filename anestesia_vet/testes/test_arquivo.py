@@ -0,0 +1,113 @@
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlmodel import SQLModel, Session, select
+
+from database.arquivo import arquivar_sessoes, arquivos_existentes, obter_sessao
+from database.engine import criar_engine
+from models.animal import Animal
+from models.config_infusao import ConfigInfusao
+from models.consumo import ConsumoDiario
+from models.farmaco import Farmaco
+from models.sessao import SessaoAnestesia, SessaoAvulsaAnestesia
+from controllers.consumo_controller import reconstruir_consumo
+from controllers.exportacao_controller import iterar_lotes
+from controllers.sessao_controller import (
+    cursor_da_linha, gravar_sessoes, listar_sessoes_arquivadas_pagina, listar_sessoes_pagina)
+
+AGORA = datetime(2024, 6, 1, 12)
+
+
+class TestArquivo(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.engine = criar_engine(f"sqlite:///{Path(self.dir.name) / 'quente.db'}")
+        SQLModel.metadata.create_all(self.engine)
+        with Session(self.engine) as session:
+            farmaco = Farmaco(nome="Propofol", dose=4, concentracao=10, unidade_dose="mg/kg")
+            animal = Animal(nome="Rex", especie="Cão", peso_kg=20)
+            session.add_all([farmaco, animal])
+            session.commit()
+            registros = []
+            for data in [datetime(2021, 3, 1), datetime(2021, 9, 1), datetime(2022, 1, 10),
+                         datetime(2024, 5, 1), datetime(2024, 5, 20)]:
+                sessao = SessaoAnestesia(id_animal=animal.id, id_farmaco=farmaco.id,
+                                         dose_utilizada_ml=2.0, data=data)
+                config = ConfigInfusao(peso_kg=20, taxa_ml_kg_h=2, volume_bolsa_ml=500) \
+                    if data.year == 2021 else None
+                registros.append((sessao, config))
+            self.ids = gravar_sessoes(session, registros)
+            session.add_all([
+                SessaoAvulsaAnestesia(especie="Gato", nome_animal="Mia", peso_kg=4, id_farmaco=farmaco.id,
+                                      dose_utilizada_ml=0.5, data=datetime(2022, 2, 1)),
+                SessaoAvulsaAnestesia(especie="Gato", nome_animal="Tom", peso_kg=5, id_farmaco=farmaco.id,
+                                      dose_utilizada_ml=0.6, data=datetime(2024, 5, 2)),
+            ])
+            session.commit()
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.dir.cleanup()
+
+    def _contar(self, modelo):
+        with Session(self.engine) as session:
+            return len(session.exec(select(modelo)).all())
+
+    def _lista_completa(self, limite=2):
+        """Percorre a lista como a GUI: sessões recentes e depois os arquivos"""
+        linhas, cursor = [], None
+        with Session(self.engine) as session:
+            while True:
+                pagina, cursor = listar_sessoes_pagina(session, cursor, limite)
+                linhas += pagina
+                if cursor is None:
+                    break
+        cursor = cursor_da_linha(linhas[-1])
+        while True:
+            pagina, cursor = listar_sessoes_arquivadas_pagina(cursor, limite, engine=self.engine)
+            linhas += pagina
+            if cursor is None:
+                return [(origem, sessao_id) for origem, sessao_id, *_ in linhas]
+
+    def test_arquivar_e_consultar(self):
+        antes = self._lista_completa()
+        consumo_antes = self._contar(ConsumoDiario)
+
+        self.assertEqual(arquivar_sessoes(self.engine, idade_dias=365, agora=AGORA), {2021: 2, 2022: 2})
+        self.assertEqual(sorted(arquivos_existentes(self.engine)), [2021, 2022])
+        self.assertEqual(self._contar(SessaoAnestesia), 2)
+        self.assertEqual(self._contar(SessaoAvulsaAnestesia), 1)
+        self.assertEqual(self._contar(ConfigInfusao), 1)  # a de maior id fica (cópia no arquivo)
+
+        # Lista, busca por id e exportação enxergam os arquivos
+        self.assertEqual(self._lista_completa(), antes)
+        with Session(self.engine) as session:
+            antiga = obter_sessao(session, SessaoAnestesia, self.ids[0])
+            self.assertEqual(antiga.data, datetime(2021, 3, 1))
+            config = obter_sessao(session, ConfigInfusao, antiga.config_infusao_id)
+            self.assertEqual(config.volume_bolsa_ml, 500)
+            self.assertIsNone(obter_sessao(session, SessaoAnestesia, 999))
+        exportadas = [linha for lote in iterar_lotes(self.engine) for linha in lote]
+        self.assertEqual(len(exportadas), 7)
+
+        # Totais de consumo não mudam, nem ao reconstruir a partir dos arquivos
+        self.assertEqual(self._contar(ConsumoDiario), consumo_antes)
+        self.assertEqual(reconstruir_consumo(self.engine), consumo_antes)
+
+    def test_ids_novos_maiores_que_arquivados(self):
+        arquivar_sessoes(self.engine, idade_dias=0, agora=AGORA, vacuum=False)
+        self.assertEqual(self._contar(SessaoAnestesia), 1)  # a de maior id fica
+        self.assertEqual(arquivar_sessoes(self.engine, idade_dias=0, agora=AGORA), {})
+        with Session(self.engine) as session:
+            nova_id = gravar_sessoes(session, [(SessaoAnestesia(id_farmaco=1, dose_utilizada_ml=1.0), None)])[0]
+        self.assertGreater(nova_id, max(self.ids))
+
+
+if __name__ == "__main__":
+    unittest.main()
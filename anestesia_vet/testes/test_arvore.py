@@ -0,0 +1,141 @@
+import random
+import sys
+import unittest
+from collections import Counter
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from interface.arvore import ArvoreVinculada
+
+
+class RaizFalsa:
+    """Substitui o Tk: guarda os callbacks de after() para o teste executá-los"""
+
+    def __init__(self):
+        self.agendados = []
+
+    def after(self, _ms, funcao):
+        self.agendados.append(funcao)
+
+    def rodar(self):
+        fatias = 0
+        while self.agendados:
+            self.agendados.pop(0)()
+            fatias += 1
+        return fatias
+
+
+class ArvoreFalsa:
+    """Treeview de um nível só, com a semântica de índices do ttk e contagem de chamadas"""
+
+    def __init__(self):
+        self.filhos = []
+        self.valores = {}
+        self.chamadas = Counter()
+
+    def get_children(self, _item=''):
+        return tuple(self.filhos)
+
+    def index(self, iid):
+        return self.filhos.index(iid)
+
+    def insert(self, _pai, indice, iid, values):
+        self.chamadas['insert'] += 1
+        assert iid not in self.valores, iid
+        self.valores[iid] = values
+        self.filhos.insert(len(self.filhos) if indice == 'end' else indice, iid)
+
+    def item(self, iid, values):
+        self.chamadas['item'] += 1
+        self.valores[iid] = values
+
+    def move(self, iid, _pai, indice):
+        # Como no ttk: o irmão anterior é localizado antes de retirar o item
+        self.chamadas['move'] += 1
+        indice = len(self.filhos) if indice == 'end' else indice
+        irmao = self.filhos[min(indice, len(self.filhos)) - 1] if indice > 0 else None
+        if irmao == iid:
+            return
+        self.filhos.remove(iid)
+        self.filhos.insert(self.filhos.index(irmao) + 1 if irmao is not None else 0, iid)
+
+    def delete(self, *iids):
+        self.chamadas['delete'] += len(iids)
+        for iid in iids:
+            self.filhos.remove(iid)
+            del self.valores[iid]
+
+
+class TestArvoreVinculada(unittest.TestCase):
+    def setUp(self):
+        self.raiz = RaizFalsa()
+        self.arvore = ArvoreFalsa()
+        self.vinculo = ArvoreVinculada(self.raiz, self.arvore, valores=lambda linha: (linha[0], linha[1]),
+                                       chave=lambda linha: linha[0], tamanho_fatia=500)
+
+    def _conferir(self, linhas):
+        self.assertEqual(self.arvore.filhos, [str(chave) for chave, _ in linhas])
+        self.assertEqual([self.arvore.valores[str(chave)] for chave, _ in linhas], linhas)
+
+    def test_catalogo_grande_em_fatias_e_edicao_de_uma_linha(self):
+        linhas = [(i, f"Fármaco {i:05d}") for i in range(20000)]
+        contagem = self.vinculo.atualizar(linhas)
+        self.assertEqual(contagem['inseridos'], 20000)
+        self.assertEqual(len(self.arvore.filhos), 500)  # só a primeira fatia, o resto em after()
+        self.assertEqual(self.raiz.rodar(), 39)
+        self._conferir(linhas)
+
+        # Edição de um fármaco: exatamente uma linha tocada, sem fatias
+        self.arvore.chamadas.clear()
+        linhas[1234] = (1234, "Fármaco 01234 (editado)")
+        self.vinculo.atualizar(linhas)
+        self.assertEqual(self.arvore.chamadas, Counter(item=1))
+        self.assertFalse(self.raiz.agendados)
+
+        # Renomear muda a posição na lista ordenada: uma atualização e um movimento
+        self.arvore.chamadas.clear()
+        linhas.insert(10, linhas.pop(1234))
+        contagem = self.vinculo.atualizar(linhas)
+        self.assertEqual((contagem['alterados'], contagem['movidos']), (0, 1))
+        self.assertEqual(self.arvore.chamadas, Counter(move=1))
+        self._conferir(linhas)
+
+        # Nada mudou: nenhuma chamada
+        self.arvore.chamadas.clear()
+        self.vinculo.atualizar(linhas)
+        self.assertEqual(self.arvore.chamadas, Counter())
+
+    def test_diferencas_aleatorias(self):
+        aleatorio = random.Random(7)
+        linhas = [(i, str(i)) for i in range(300)]
+        self.vinculo.atualizar(linhas)
+        proximo = 300
+        for _ in range(50):
+            linhas = [linha for linha in linhas if aleatorio.random() > 0.1]
+            for _ in range(aleatorio.randint(0, 20)):
+                linhas.insert(aleatorio.randint(0, len(linhas)), (proximo, str(proximo)))
+                proximo += 1
+            for _ in range(aleatorio.randint(0, 5)):
+                linhas.insert(aleatorio.randint(0, len(linhas) - 1), linhas.pop(aleatorio.randrange(len(linhas))))
+            i = aleatorio.randrange(len(linhas))
+            linhas[i] = (linhas[i][0], linhas[i][1] + "*")
+            self.vinculo.atualizar(linhas)
+            self.raiz.rodar()
+            self._conferir(linhas)
+
+    def test_atualizacao_nova_descarta_fatias_pendentes(self):
+        self.vinculo.atualizar([(i, "a") for i in range(2000)])
+        self.assertTrue(self.vinculo.pendente)
+        # Chega a primeira página de outra listagem antes do fim da anterior
+        primeira = [(i, "b") for i in range(1999, 1799, -1)]
+        self.vinculo.atualizar(primeira)
+        self.vinculo.acrescentar([(i, "c") for i in range(100)])
+        self.raiz.rodar()
+        self.assertFalse(self.vinculo.pendente)
+        self._conferir(primeira + [(i, "c") for i in range(100)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import sys
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlmodel import SQLModel, Session, func, select
+
+from database.backup import (
+    diretorio_backup, fazer_backup, girar_backups, listar_backups, restaurar_backup, verificar_backup)
+from database.engine import criar_engine
+from database.migracoes import migrar
+from database.sincronizacao import no_local, seqs_recebidas
+from models.farmaco import Farmaco
+
+
+class TestBackup(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.engine = criar_engine(f"sqlite:///{Path(self.dir.name) / 'clinica.db'}")
+        SQLModel.metadata.create_all(self.engine)
+        migrar(self.engine, verbose=False)
+        self._adicionar(500)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.dir.cleanup()
+
+    def _adicionar(self, quantidade, nome="Fármaco"):
+        with Session(self.engine) as session:
+            session.add_all([Farmaco(nome=f"{nome} {i}", dose=1, concentracao=10, unidade_dose="mg/kg",
+                                     comentario="x" * 200) for i in range(quantidade)])
+            session.commit()
+
+    def _contar(self):
+        with Session(self.engine) as session:
+            return session.exec(select(func.count()).select_from(Farmaco)).one()
+
+    def test_backup_em_passos_com_gravacoes_concorrentes(self):
+        passos = []
+
+        def progresso(feitas, total):
+            passos.append((feitas, total))
+            if len(passos) == 2:
+                # Gravação de outra conexão no meio do backup: não bloqueia nem reinicia a cópia
+                thread = threading.Thread(target=self._adicionar, args=(1, "Durante"))
+                thread.start()
+                thread.join()
+
+        caminho = fazer_backup(self.engine, paginas=4, pausa_ms=0, ao_progresso=progresso)
+        self.assertGreater(len(passos), 2)
+        self.assertEqual(passos[-1][0], passos[-1][1])
+        self.assertEqual(verificar_backup(caminho), [])
+        self.assertEqual(listar_backups(self.engine), [caminho])
+        self.assertEqual(self._contar(), 501)
+
+        # A cópia é o instantâneo do início do backup
+        self._adicionar(10, "Depois")
+        seguranca = restaurar_backup(caminho, self.engine)
+        self.assertEqual(self._contar(), 500)
+        self.assertEqual(verificar_backup(seguranca), [])
+        self.assertEqual(len(listar_backups(self.engine)), 2)
+
+    def test_cancelamento_e_backup_invalido(self):
+        cancelado = threading.Event()
+        cancelado.set()
+        self.assertIsNone(fazer_backup(self.engine, paginas=4, cancelado=cancelado))
+        self.assertEqual(list(diretorio_backup(self.engine).iterdir()), [])
+
+        corrompido = Path(self.dir.name) / "corrompido.db"
+        corrompido.write_bytes(b"nao sou um banco" * 100)
+        self.assertNotEqual(verificar_backup(corrompido), [])
+        with self.assertRaises(ValueError):
+            restaurar_backup(corrompido, self.engine)
+        self.assertEqual(self._contar(), 500)
+
+    def test_rotacao(self):
+        datas = [datetime(2024, 3, 31, 20), datetime(2024, 4, 30, 9), datetime(2024, 4, 30, 18),
+                 datetime(2024, 5, 1, 8), datetime(2024, 5, 2, 8), datetime(2024, 5, 2, 19)]
+        caminhos = {data: fazer_backup(self.engine, agora=data) for data in datas}
+        apagados = girar_backups(self.engine, manter_diarios=2, manter_mensais=2)
+        # 2 dias: 02/05 19h e 01/05; 2 meses: maio (02/05 19h) e abril (30/04 18h)
+        self.assertEqual(sorted(apagados), sorted(caminhos[d] for d in (datas[0], datas[1], datas[4])))
+        self.assertEqual(len(listar_backups(self.engine)), 3)
+
+    def test_rotacao_preserva_seguranca_da_restauracao(self):
+        antigo = fazer_backup(self.engine, agora=datetime(2024, 5, 1, 8))
+        with self.engine.connect() as conn:
+            no_antes = no_local(conn)
+        seguranca = restaurar_backup(antigo, self.engine)
+        for dia in range(2, 6):
+            fazer_backup(self.engine, agora=datetime(2024, 5, dia, 8))
+        apagados = girar_backups(self.engine, manter_diarios=1, manter_mensais=1)
+        self.assertNotIn(seguranca, apagados)
+        self.assertTrue(seguranca.is_file())
+
+        # O registro de alterações voltou atrás: a estação passa a ter outro identificador
+        with self.engine.connect() as conn:
+            self.assertNotEqual(no_local(conn), no_antes)
+            self.assertIn(no_antes, seqs_recebidas(conn))
+
+
+if __name__ == "__main__":
+    unittest.main()
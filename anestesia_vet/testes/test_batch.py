@@ -0,0 +1,111 @@
+import io
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlmodel import SQLModel, Session
+
+import database.engine  # registra todos os modelos
+from database.engine import criar_engine
+from database.migracoes import migrar
+from models.animal import Animal
+from models.farmaco import Farmaco
+from models.protocolo import Protocolo, ProtocoloFarmaco
+from batch import calcular_registros, gravar_registros, ler_linhas
+
+ENTRADA_CSV = """animal,peso_kg,especie,protocolo,farmaco,dose,doses,equipo,duracao_h
+Rex,,,Indução,,,Fentanil=10,,
+,12,Felino,,propofol,2,,,
+,12,Felino,,2,,,microgotas,3
+,12,,,Dipirona,,,,
+Rex,0,,,Propofol,,,,
+,12,,Indução,,,Dipirona=1,,
+"""
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.url = f"sqlite:///{Path(self.dir.name) / 'clinica.db'}"
+        engine = criar_engine(self.url)
+        SQLModel.metadata.create_all(engine)
+        migrar(engine, verbose=False)
+        with Session(engine) as session:
+            propofol = Farmaco(nome="Propofol", dose=4, concentracao=10, unidade_dose="mg/kg", modo_uso="bolus")
+            fentanil = Farmaco(nome="Fentanil", dose=5, concentracao=50, unidade_dose="µg/kg/h",
+                               unidade_concentracao="µg/ml", modo_uso="infusão contínua")
+            protocolo = Protocolo(nome="Indução")
+            session.add_all([propofol, fentanil, protocolo,
+                             Animal(nome="Rex", especie="Canino", peso_kg=20)])
+            session.commit()
+            session.add_all([ProtocoloFarmaco(protocolo_id=protocolo.id, farmaco_id=propofol.id, ordem=1),
+                             ProtocoloFarmaco(protocolo_id=protocolo.id, farmaco_id=fentanil.id, ordem=2)])
+            session.commit()
+        engine.dispose()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def _calcular(self, texto, formato="csv", **opcoes):
+        return list(calcular_registros(ler_linhas(io.StringIO(texto), formato), self.url, **opcoes))
+
+    def test_protocolo_farmaco_e_erros(self):
+        registros = self._calcular(ENTRADA_CSV)
+        por_linha = {}
+        for registro in registros:
+            por_linha.setdefault(registro["linha"], []).append(registro)
+
+        # Animal do cadastro (20 kg); Fentanil com a dose substituída: 20 × 10 / 50 = 4 ml/h
+        propofol, fentanil = por_linha[1]
+        self.assertEqual((propofol["especie"], propofol["ordem"], propofol["volume_ml"]), ("Canino", 1, 8.0))
+        self.assertEqual((fentanil["dose"], fentanil["taxa_ml_h"], fentanil["gotas_min"]), (10.0, 4.0, 1.33))
+        # Fármaco por nome (sem diferenciar maiúsculas) e por id, com dose própria, microgotas e duração
+        self.assertEqual(por_linha[2][0]["volume_ml"], 2.4)
+        self.assertEqual([por_linha[3][0][c] for c in ("taxa_ml_h", "gotas_min", "volume_ml")], [1.2, 1.2, 3.6])
+
+        self.assertIn("não encontrado", por_linha[4][0]["erro"])
+        self.assertIn("peso_kg", por_linha[5][0]["erro"])
+        self.assertIn("fora do protocolo", por_linha[6][0]["erro"])
+
+    def test_varios_processos_mesma_saida(self):
+        texto = ENTRADA_CSV + "".join(ENTRADA_CSV.splitlines(keepends=True)[1:]) * 20
+        sozinho = self._calcular(texto)
+        self.assertEqual(self._calcular(texto, processos=2, tamanho_lote=7), sozinho)
+        self.assertEqual(sozinho[-1]["linha"], 126)
+
+    def test_jsonl(self):
+        entrada = "\n".join([
+            json.dumps({"peso_kg": 10, "protocolo": "Indução", "doses": {"propofol": 1}}),
+            "{quebrado",
+            "",
+            json.dumps({"peso_kg": "10,0", "farmaco": "Fentanil"}),
+        ])
+        saida = io.StringIO()
+        contagem = gravar_registros(calcular_registros(ler_linhas(io.StringIO(entrada), "jsonl"), self.url),
+                                    saida, "jsonl")
+        registros = [json.loads(linha) for linha in saida.getvalue().splitlines()]
+        self.assertEqual(contagem, {"registros": 4, "erros": 1})
+        self.assertEqual(registros[0]["volume_ml"], 1.0)
+        self.assertIn("JSON inválido", registros[2]["erro"])
+        self.assertEqual((registros[3]["linha"], registros[3]["taxa_ml_h"]), (3, 1.0))
+
+        saida = io.StringIO()
+        gravar_registros(iter(registros), saida, "csv")
+        self.assertTrue(saida.getvalue().startswith("linha,animal,especie,peso_kg"))
+
+    def test_banco_desatualizado_recusado(self):
+        url = f"sqlite:///{Path(self.dir.name) / 'antigo.db'}"
+        engine = criar_engine(url)
+        SQLModel.metadata.create_all(engine)
+        engine.dispose()
+        with self.assertRaisesRegex(ValueError, "migrações"):
+            calcular_registros(iter([]), url)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import csv
+import sqlite3
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlmodel import SQLModel, Session
+
+from database.busca import buscar_farmacos, criar_indice_busca, preencher_busca
+from database.engine import criar_engine
+from models.farmaco import Farmaco
+from controllers.importacao_controller import importar_catalogo_csv
+from controllers.utils.formatacao import sem_acentos
+
+
+class TestBuscaFarmacos(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.engine = criar_engine(f"sqlite:///{Path(self.dir.name) / 'busca.db'}")
+        SQLModel.metadata.create_all(self.engine)
+        with Session(self.engine) as session:
+            for nome, comentario in [("Lidocaína", "anestésico local"), ("Cetamina", None),
+                                     ("Fentanil", "opioide"), ("Lidocaína sem vasoconstritor", None),
+                                     ("Remifentanil", "opioide de ação ultracurta")]:
+                session.add(Farmaco(nome=nome, dose=1, concentracao=10, unidade_dose="mg/kg",
+                                    comentario=comentario))
+            session.commit()
+        with self.engine.begin() as conn:
+            criar_indice_busca(conn)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.dir.cleanup()
+
+    def _nomes(self, termo, **opcoes):
+        with Session(self.engine) as session:
+            return [session.get(Farmaco, i).nome for i in buscar_farmacos(termo, engine=self.engine, **opcoes)]
+
+    def test_sem_acentos(self):
+        self.assertEqual(sem_acentos("Lidocaína Ação"), "lidocaina acao")
+        self.assertEqual(sem_acentos(None), "")
+
+    def test_busca_sem_acentos_e_prefixo_primeiro(self):
+        self.assertEqual(self._nomes("lidocaina"), ["Lidocaína", "Lidocaína sem vasoconstritor"])
+        self.assertEqual(self._nomes("FENTA"), ["Fentanil", "Remifentanil"])  # prefixo antes do trecho
+        self.assertEqual(self._nomes("li"), ["Lidocaína", "Lidocaína sem vasoconstritor"])
+        self.assertEqual(self._nomes("acao"), ["Remifentanil"])  # comentário
+        self.assertEqual(self._nomes("opioide ultra"), ["Remifentanil"])
+        self.assertEqual(self._nomes("xyz"), [])
+        self.assertEqual(len(self._nomes("", limite=3)), 3)
+
+    def test_gatilhos_mantem_indice(self):
+        with Session(self.engine) as session:
+            cetamina = session.get(Farmaco, buscar_farmacos("cetamina", engine=self.engine)[0])
+            cetamina.nome = "Cetamina S+"
+            cetamina.comentario = "dissociativo"
+            session.add(cetamina)
+            session.add(Farmaco(nome="Dexmedetomidina", dose=1, concentracao=0.5, unidade_dose="µg/kg"))
+            fentanil = session.get(Farmaco, buscar_farmacos("fentanil", engine=self.engine)[0])
+            session.delete(fentanil)
+            session.commit()
+        self.assertEqual(self._nomes("dissoc"), ["Cetamina S+"])
+        self.assertEqual(self._nomes("dexmed"), ["Dexmedetomidina"])
+        self.assertEqual(self._nomes("fentanil"), ["Remifentanil"])
+
+    def test_importacao_por_sql_direto(self):
+        caminho = Path(self.dir.name) / "catalogo.csv"
+        with open(caminho, "w", newline="", encoding="utf-8") as arquivo:
+            escritor = csv.writer(arquivo)
+            escritor.writerow(["nome", "dose", "concentracao", "unidade_dose", "modo_uso", "comentario"])
+            escritor.writerow(["Atropina", "0,04", "0,5", "mg/kg", "bolus", "anticolinérgico"])
+            escritor.writerow(["Cetamina", "5", "50", "mg/kg", "bolus", "dissociativo"])
+        importar_catalogo_csv(str(caminho), engine=self.engine)
+        self.assertEqual(self._nomes("anticolinergico"), ["Atropina"])
+        self.assertEqual(self._nomes("dissociativo"), ["Cetamina"])
+
+    def test_gravacao_fora_do_app(self):
+        with sqlite3.connect(self.engine.url.database) as conn:
+            conn.execute("INSERT INTO farmaco (nome, dose, concentracao, unidade_dose, unidade_concentracao, "
+                         "modo_uso, tipo_infusao, comentario) "
+                         "VALUES ('Metadona', 0.3, 10, 'mg/kg', 'mg/ml', 'bolus', 'padrao', 'opióide')")
+        # Sem nome_busca: o trecho já é achado (lower), o prefixo só depois de preencher
+        self.assertEqual(self._nomes("metadona"), ["Metadona"])
+        self.assertEqual(self._nomes("me"), [])
+        with self.engine.begin() as conn:
+            self.assertEqual(preencher_busca(conn), 1)
+        self.assertEqual(self._nomes("me"), ["Metadona"])
+        self.assertEqual(sorted(self._nomes("opioide")), ["Fentanil", "Metadona", "Remifentanil"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,241 @@
+import json
+import sqlite3
+import sys
+import tempfile
+import unittest
+from contextlib import closing
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import event
+from sqlmodel import SQLModel, Session, select
+
+from models.animal import Animal
+from models.farmaco import Farmaco
+from models.protocolo import Protocolo
+import database.engine  # registra todos os modelos
+from database.engine import criar_engine
+from database.migracoes import migrar
+from database.versao_dados import monitor_do_engine
+from controllers.cache_referencia import CacheReferencia, cache_referencia
+from controllers.calculadora_dose import CalculadoraDose
+from controllers.utils.titulacao import grade_em_cache, invalidar_grade, obter_grade
+
+
+class TestCacheReferencia(unittest.TestCase):
+    def setUp(self):
+        self.engine = criar_engine("sqlite://")
+        SQLModel.metadata.create_all(self.engine)
+        self.consultas = []
+        event.listen(self.engine, "before_cursor_execute",
+                     lambda *args: self.consultas.append(args[2]))
+
+        with Session(self.engine) as session:
+            self.propofol = Farmaco(nome="Propofol", dose=4, concentracao=10,
+                                    unidade_dose="mg/kg", modo_uso="bolus")
+            self.cetamina = Farmaco(nome="Cetamina", dose=10, concentracao=100,
+                                    unidade_dose="µg/kg/min", modo_uso="infusão contínua")
+            rex = Animal(nome="Rex", especie="Cão", peso_kg=12)
+            session.add_all([self.propofol, self.cetamina, rex, Protocolo(nome="Indução")])
+            session.commit()
+            self.ids = (self.propofol.id, self.cetamina.id)
+            self.rex_id = rex.id
+
+        cache_referencia.limpar()
+        cache_referencia.engine = self.engine
+        self.consultas.clear()
+
+    def tearDown(self):
+        cache_referencia.limpar()
+        cache_referencia.engine = database.engine.engine
+
+    def _editar(self, farmaco_id, **valores):
+        with Session(self.engine) as session:
+            farmaco = session.get(Farmaco, farmaco_id)
+            for campo, valor in valores.items():
+                setattr(farmaco, campo, valor)
+            session.add(farmaco)
+            session.commit()
+
+    def test_selecao_sem_consultar_banco(self):
+        propofol, cetamina = self.ids
+        self.assertEqual([f.nome for f in cache_referencia.listar(Farmaco)], ["Cetamina", "Propofol"])
+        self.assertEqual(len(self.consultas), 1)
+        self.assertEqual(cache_referencia.obter(Farmaco, propofol).dose, 4)
+        self.assertEqual(cache_referencia.obter(Farmaco, cetamina).modo_uso, "infusão contínua")
+        self.assertEqual([f.id for f in cache_referencia.por_nome(Farmaco, "propofol")], [propofol])
+        self.assertIsNone(cache_referencia.obter(Farmaco, 999))
+        self.assertEqual(len(self.consultas), 1)
+
+    def test_atualizacao_relida_por_id(self):
+        propofol = self.ids[0]
+        cache_referencia.listar(Farmaco)
+        self._editar(propofol, nome="Propofol 1%", concentracao=20)
+        self.consultas.clear()
+
+        self.assertEqual(cache_referencia.obter(Farmaco, propofol).concentracao, 20)
+        self.assertEqual(len(self.consultas), 1)
+        self.assertIn("IN", self.consultas[0])  # só o registro alterado
+        self.assertEqual(cache_referencia.por_nome(Farmaco, "Propofol"), [])
+        self.assertEqual(len(cache_referencia.por_nome(Farmaco, "propofol 1%")), 1)
+
+    def test_insercao_e_exclusao(self):
+        propofol = self.ids[0]
+        cache_referencia.listar(Farmaco)
+        cache_referencia.listar(Animal)
+        with Session(self.engine) as session:
+            session.add(Farmaco(nome="Atropina", dose=0.04, concentracao=0.5,
+                                unidade_dose="mg/kg", modo_uso="bolus"))
+            session.delete(session.get(Farmaco, propofol))
+            session.add(Animal(nome="Mimi", especie="Gato", peso_kg=4))
+            session.commit()
+
+        self.assertEqual([f.nome for f in cache_referencia.listar(Farmaco)], ["Atropina", "Cetamina"])
+        self.assertIsNone(cache_referencia.obter(Farmaco, propofol))
+        self.assertEqual([a.nome for a in cache_referencia.listar(Animal)], ["Mimi", "Rex"])
+
+    def test_rollback_nao_deixa_valor_antigo(self):
+        propofol = self.ids[0]
+        cache_referencia.listar(Farmaco)
+        with Session(self.engine) as session:
+            farmaco = session.get(Farmaco, propofol)
+            farmaco.dose = 99
+            session.add(farmaco)
+            session.flush()
+            session.rollback()
+        self.assertEqual(cache_referencia.obter(Farmaco, propofol).dose, 4)
+
+    def test_protocolo_e_animal(self):
+        self.assertEqual(cache_referencia.obter(Animal, self.rex_id).peso_kg, 12)
+        self.assertEqual([p.nome for p in cache_referencia.listar(Protocolo)], ["Indução"])
+
+
+class TestInstantaneo(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.engine = criar_engine(f"sqlite:///{Path(self.dir.name) / 'clinica.db'}")
+        SQLModel.metadata.create_all(self.engine)
+        migrar(self.engine, verbose=False)  # registro de alterações
+        self.caminho = Path(self.dir.name) / "cache_referencia.json"
+        with Session(self.engine) as session:
+            session.add_all([Farmaco(nome=f"F{i:03d}", dose=i, concentracao=10, unidade_dose="mg/kg")
+                             for i in range(1, 301)])
+            session.add(Protocolo(nome="MPA"))
+            session.commit()
+
+        # Primeira abertura: sem arquivo, carrega do banco e salva ao fechar
+        cache = CacheReferencia(self.engine)
+        self.assertEqual(cache.restaurar_instantaneo(self.caminho), [])
+        cache.listar(Farmaco)
+        cache.listar(Protocolo)
+        self.assertEqual(cache.salvar_instantaneo(self.caminho), 2)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.dir.cleanup()
+
+    def _contar_consultas(self):
+        consultas = []
+        event.listen(self.engine, "before_cursor_execute", lambda *args: consultas.append(args[2]))
+        return consultas
+
+    def test_restaura_sem_banco_e_concilia_so_o_que_mudou(self):
+        with Session(self.engine) as session:
+            alterado = session.exec(select(Farmaco).where(Farmaco.nome == "F010")).one()
+            alterado.dose = 99
+            session.add(alterado)
+            session.delete(session.exec(select(Farmaco).where(Farmaco.nome == "F020")).one())
+            session.add(Farmaco(nome="Novo", dose=1, concentracao=1, unidade_dose="mg/kg"))
+            session.commit()
+
+        consultas = self._contar_consultas()
+        cache = CacheReferencia(self.engine)
+        self.assertEqual(sorted(cache.restaurar_instantaneo(self.caminho)), ["farmaco", "protocolo"])
+        self.assertEqual(len(cache.listar(Farmaco)), 300)
+        self.assertEqual([p.nome for p in cache.listar(Protocolo)], ["MPA"])
+        self.assertEqual(consultas, [])  # listas disponíveis antes de tocar no banco
+
+        # Grades de titulação montadas com o instantâneo (F010 ainda com a dose antiga)
+        por_nome = {f.nome: f for f in cache.listar(Farmaco)}
+        invalidar_grade()
+        self.addCleanup(invalidar_grade)
+        for nome in ("F010", "F030"):
+            obter_grade(por_nome[nome])
+
+        self.assertEqual(cache.conciliar(), {'farmaco': 3, 'protocolo': 0})
+        self.assertIsNone(grade_em_cache(por_nome["F010"].id))
+        self.assertIsNotNone(grade_em_cache(por_nome["F030"].id))
+        # Só as linhas alteradas/novas são lidas inteiras
+        linhas_lidas = [c for c in consultas if "farmaco.nome" in c]
+        self.assertEqual(len(linhas_lidas), 1)
+        self.assertIn("IN", linhas_lidas[0])
+
+        with Session(self.engine) as session:
+            esperado = sorted((f.nome, f.dose) for f in session.exec(select(Farmaco)))
+        self.assertEqual(sorted((f.nome, f.dose) for f in cache.listar(Farmaco)), esperado)
+
+        # O instantâneo salvo de novo parte das marcas conciliadas
+        cache.salvar_instantaneo(self.caminho)
+        outro = CacheReferencia(self.engine)
+        outro.restaurar_instantaneo(self.caminho)
+        self.assertEqual(outro.conciliar(), {'farmaco': 0, 'protocolo': 0})
+
+    def test_instantaneo_de_outro_banco_ou_esquema_e_ignorado(self):
+        conteudo = json.loads(self.caminho.read_text(encoding="utf-8"))
+        for campo, valor in (("banco", "/outro/database.db"), ("esquema", 1)):
+            alterado = dict(conteudo, **{campo: valor})
+            self.caminho.write_text(json.dumps(alterado), encoding="utf-8")
+            self.assertEqual(CacheReferencia(self.engine).restaurar_instantaneo(self.caminho), [])
+
+        # Registro de alterações reiniciado (ex: banco restaurado de backup): relê tudo
+        conteudo["tabelas"]["farmaco"]["seq"] = 10**9
+        conteudo["tabelas"]["farmaco"]["linhas"] = conteudo["tabelas"]["farmaco"]["linhas"][:5]
+        self.caminho.write_text(json.dumps(conteudo), encoding="utf-8")
+        cache = CacheReferencia(self.engine)
+        cache.restaurar_instantaneo(self.caminho)
+        self.assertEqual(len(cache.listar(Farmaco)), 5)
+        self.assertEqual(cache.conciliar()['farmaco'], 295)
+        self.assertEqual(len(cache.listar(Farmaco)), 300)
+
+
+class TestGravacaoExterna(unittest.TestCase):
+    """Gravações de outra conexão (outro processo, sqlite3, linha de comando) não geram eventos do ORM"""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.caminho = Path(self.dir.name) / "clinica.db"
+        self.engine = criar_engine(f"sqlite:///{self.caminho}")
+        SQLModel.metadata.create_all(self.engine)
+        with Session(self.engine) as session:
+            farmaco = Farmaco(nome="Fentanil", dose=5, concentracao=50, unidade_dose="µg/kg/h",
+                              unidade_concentracao="µg/ml", modo_uso="infusão contínua", doses_variaveis="5,10")
+            session.add(farmaco)
+            session.commit()
+            self.farmaco_id = farmaco.id
+
+    def tearDown(self):
+        monitor_do_engine(self.engine).fechar()
+        self.engine.dispose()
+        self.dir.cleanup()
+
+    def test_caches_descartados_quando_outra_conexao_grava(self):
+        cache = CacheReferencia(self.engine)
+        calculadora = CalculadoraDose(self.engine)
+        farmaco = cache.obter(Farmaco, self.farmaco_id)
+        obter_grade(farmaco)
+        self.assertAlmostEqual(calculadora.calcular(self.farmaco_id, 10), 1.0)
+
+        with closing(sqlite3.connect(self.caminho)) as outra:
+            outra.execute("UPDATE farmaco SET concentracao = 25 WHERE id = ?", (self.farmaco_id,))
+            outra.commit()
+
+        self.assertEqual(cache.obter(Farmaco, self.farmaco_id).concentracao, 25)
+        self.assertIsNone(grade_em_cache(self.farmaco_id))
+        self.assertAlmostEqual(calculadora.calcular(self.farmaco_id, 10), 2.0)
+        self.assertFalse(cache.conferir_banco())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,190 @@
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import event
+from sqlmodel import SQLModel, Session, select
+
+from models.farmaco import Farmaco
+from models.protocolo import Protocolo, ProtocoloFarmaco
+import database.engine  # registra todos os modelos
+from database.engine import criar_engine
+from database.migracoes import migrar
+from controllers.calculadora_dose import CalculadoraDose, calculadora_dose
+
+
+def formula_antiga(farmaco: Farmaco, peso_kg: float) -> float:
+    """Cálculo de antes das unidades de concentração (prescrições, protocolos e CLI)"""
+    if farmaco.modo_uso == "bolus":
+        return peso_kg * farmaco.dose / farmaco.concentracao
+    mult = 60 if "min" in farmaco.unidade_dose else 1
+    return peso_kg * farmaco.dose * mult / farmaco.concentracao
+
+
+class TestCalculadoraDose(unittest.TestCase):
+    def setUp(self):
+        self.engine = criar_engine("sqlite://")
+        SQLModel.metadata.create_all(self.engine)
+        self.consultas = []
+        event.listen(self.engine, "before_cursor_execute",
+                     lambda *args: self.consultas.append(args[2]))
+
+        with Session(self.engine) as session:
+            self.propofol = Farmaco(nome="Propofol", dose=4, concentracao=10,
+                                    unidade_dose="mg/kg", modo_uso="bolus")
+            self.fentanil = Farmaco(nome="Fentanil", dose=5, concentracao=50,
+                                    unidade_dose="mcg/kg/h", unidade_concentracao="µg/ml",
+                                    modo_uso="infusão contínua")
+            self.cetamina = Farmaco(nome="Cetamina", dose=10, concentracao=100, unidade_dose="µg/kg/min",
+                                    unidade_concentracao="mg/ml", modo_uso="infusão contínua")
+            session.add_all([self.propofol, self.fentanil, self.cetamina])
+            session.commit()
+            protocolo = Protocolo(nome="Indução")
+            session.add(protocolo)
+            session.commit()
+            session.add_all([
+                ProtocoloFarmaco(protocolo_id=protocolo.id, farmaco_id=self.propofol.id, ordem=1),
+                ProtocoloFarmaco(protocolo_id=protocolo.id, farmaco_id=self.fentanil.id, ordem=2),
+            ])
+            session.commit()
+            self.protocolo_id = protocolo.id
+            self.ids = (self.propofol.id, self.fentanil.id, self.cetamina.id)
+
+        self.calculadora = CalculadoraDose(self.engine)
+        self.consultas.clear()
+
+    def test_formulas(self):
+        propofol, fentanil, cetamina = self.ids
+        # Bolus: 12 kg × 4 mg/kg / 10 mg/ml
+        self.assertAlmostEqual(self.calculadora.calcular(propofol, 12), 4.8)
+        # CRI na mesma massa: 12 kg × 5 µg/kg/h / 50 µg/ml
+        self.assertAlmostEqual(self.calculadora.calcular(fentanil, 12), 1.2)
+        # CRI µg/kg/min com concentração em mg/ml: 12 × 10 × 60 / 100 000
+        self.assertAlmostEqual(self.calculadora.calcular(cetamina, 12), 0.072)
+        # Dose de titulação no lugar da dose padrão
+        self.assertAlmostEqual(self.calculadora.calcular(propofol, 12, dose=2), 2.4)
+
+    def test_cache_sem_consultar_banco(self):
+        propofol = self.ids[0]
+        self.calculadora.calcular(propofol, 12)
+        self.assertEqual(len(self.consultas), 1)
+        self.calculadora.calcular(propofol, 12)
+        self.calculadora.calcular(propofol, 30)  # peso novo: fórmula já compilada
+        self.assertEqual(len(self.consultas), 1)
+
+    def test_invalida_ao_editar_farmaco(self):
+        propofol = self.ids[0]
+        calculadora_dose.limpar()
+        calculadora_dose.engine = self.engine
+        try:
+            self.assertAlmostEqual(calculadora_dose.calcular(propofol, 10), 4.0)
+            with Session(self.engine) as session:
+                farmaco = session.get(Farmaco, propofol)
+                farmaco.concentracao = 20
+                session.add(farmaco)
+                session.commit()
+            self.assertAlmostEqual(calculadora_dose.calcular(propofol, 10), 2.0)
+        finally:
+            calculadora_dose.limpar()
+            calculadora_dose.engine = database.engine.engine
+
+    def test_leitura_entre_flush_e_commit(self):
+        propofol = self.ids[0]
+        with tempfile.TemporaryDirectory() as pasta:
+            engine = criar_engine(f"sqlite:///{Path(pasta) / 'calc.db'}")
+            SQLModel.metadata.create_all(engine)
+            with Session(engine) as session:
+                session.add(Farmaco(id=propofol, nome="Propofol", dose=4, concentracao=10, unidade_dose="mg/kg"))
+                session.commit()
+            calculadora_dose.limpar()
+            calculadora_dose.engine = engine
+            try:
+                with Session(engine) as session:
+                    farmaco = session.get(Farmaco, propofol)
+                    farmaco.concentracao = 20
+                    session.add(farmaco)
+                    session.flush()
+                    # Outra conexão ainda vê 10 mg/ml e põe no cache
+                    self.assertAlmostEqual(calculadora_dose.calcular(propofol, 10), 4.0)
+                    session.commit()
+                self.assertAlmostEqual(calculadora_dose.calcular(propofol, 10), 2.0)
+            finally:
+                calculadora_dose.limpar()
+                calculadora_dose.engine = database.engine.engine
+                engine.dispose()
+
+    def test_limpar_nao_reusa_versoes(self):
+        propofol = self.ids[0]
+        antes = self.calculadora._versao(propofol)
+        self.calculadora.limpar()
+        self.assertNotEqual(self.calculadora._versao(propofol), antes)
+
+    def test_protocolo_em_cache(self):
+        itens = self.calculadora.calcular_protocolo(self.protocolo_id, 12)
+        self.assertEqual([(f.nome, o) for f, o, _ in itens], [("Propofol", 1), ("Fentanil", 2)])
+        self.assertAlmostEqual(itens[1][2], 1.2)
+        self.consultas.clear()
+        self.calculadora.calcular_protocolo(self.protocolo_id, 12)
+        self.calculadora.calcular_protocolo(self.protocolo_id, 25)
+        self.assertEqual(self.consultas, [])
+
+    def test_cadastro_antigo_sem_unidade_confirmada(self):
+        # Linhas como as do database.db distribuído: unidade_concentracao NULL
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql(
+                "INSERT INTO farmaco (id, nome, dose, concentracao, unidade_dose, modo_uso, tipo_infusao) VALUES "
+                "(15, 'Fentanil', 5, 50, 'µg/kg', 'bolus', 'padrao'), "
+                "(9, 'Remifentanil', 1, 50, 'µg/kg', 'bolus', 'padrao'), "
+                "(22, 'Dexmedetomidina', 1, 500, 'µg/kg/h', 'infusão contínua', 'padrao'), "
+                "(29, 'Dopamina', 10, 5000, 'µg/kg/min', 'infusão contínua', 'padrao')")
+        # Mesmo resultado de antes da unidade existir: concentração na massa da dose
+        for farmaco_id, esperado in ((15, 1.0), (9, 0.2), (22, 0.02), (29, 1.2)):
+            self.assertAlmostEqual(self.calculadora.calcular(farmaco_id, 10.0), esperado)
+        farmaco = self.calculadora.obter_farmaco(15)
+        self.assertFalse(farmaco.unidade_confirmada)
+        self.assertEqual(farmaco.texto_concentracao, "50.0 (unidade a confirmar)")
+
+    def test_banco_distribuido_igual_a_formula_antiga(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            copia = Path(pasta) / "database.db"
+            shutil.copy(Path(__file__).parent.parent / "database.db", copia)
+            engine = criar_engine(f"sqlite:///{copia}")
+            try:
+                SQLModel.metadata.create_all(engine)
+                migrar(engine, verbose=False)
+                with Session(engine) as session:
+                    farmacos = session.exec(select(Farmaco)).all()
+                    protocolos = session.exec(select(Protocolo.id)).all()
+                calculadora = CalculadoraDose(engine)
+                for farmaco in farmacos:
+                    esperado = formula_antiga(farmaco, 10.0)
+                    self.assertAlmostEqual(calculadora.calcular(farmaco.id, 10.0), esperado, msg=farmaco.nome)
+                    self.assertAlmostEqual(calculadora.calcular_farmaco(farmaco, 10.0), esperado)
+                for protocolo_id in protocolos:
+                    for farmaco, _ordem, dose_ml in calculadora.calcular_protocolo(protocolo_id, 10.0):
+                        self.assertAlmostEqual(dose_ml, formula_antiga(farmaco, 10.0))
+            finally:
+                engine.dispose()
+
+    def test_ui_com_massa_recusado(self):
+        heparina = Farmaco(nome="Heparina", dose=100, concentracao=5, unidade_dose="UI/kg",
+                           unidade_concentracao="mg/ml")
+        with self.assertRaises(ValueError):
+            self.calculadora.calcular_farmaco(heparina, 10)
+        with Session(self.engine) as session:
+            session.add(heparina)
+            with self.assertRaises(ValueError):
+                session.commit()
+
+    def test_farmaco_nao_salvo(self):
+        farmaco = Farmaco(nome="Teste", dose=1, concentracao=2, unidade_dose="mg/kg")
+        self.assertAlmostEqual(self.calculadora.calcular_farmaco(farmaco, 10), 5.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import sys
+import unittest
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from controllers.config_infusao_controller import (
+    calcular_infusao_continua,
+    calcular_infusao_especifica,
+    calcular_infusao_planilha,
+)
+from controllers.utils.calculos import (
+    calcular_infusao_continua_lote,
+    calcular_infusao_especifica_lote,
+    calcular_infusao_planilha_lote,
+)
+
+UNIDADES = ["mg/kg/h", "mg/kg/min", "µg/kg/h", "µg/kg/min", "mcg/kg/min"]
+EQUIPOS = ["macrogotas", "microgotas"]
+
+
+def duracao_str(duracao_h: float) -> str:
+    """Mesma formatação usada pelas funções escalares"""
+    horas = int(duracao_h)
+    minutos = int((duracao_h - horas) * 60)
+    return f"{horas}h {minutos}min" if minutos > 0 else f"{horas}h"
+
+
+class TestCalculosLote(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(42)
+        n = 500
+        cls.peso = np.round(rng.uniform(0.5, 60, n), 1)
+        cls.dose = np.round(rng.uniform(0.01, 10, n), 3)
+        cls.concentracao = rng.choice([0.5, 1, 2, 5, 10, 20, 50, 100, 1000], n).astype(float)
+        cls.volume = rng.choice([10, 20, 50, 100, 250, 500, 1000], n).astype(float)
+        cls.taxa = np.round(rng.uniform(0.5, 10, n), 1)
+        cls.unidade = rng.choice(UNIDADES, n)
+        cls.equipo = rng.choice(EQUIPOS, n)
+
+    def test_infusao_continua_taxa(self):
+        lote = calcular_infusao_continua_lote(
+            self.peso, self.dose, self.unidade, self.concentracao,
+            equipo_tipo=self.equipo, modo="taxa"
+        )
+        for i in range(len(lote)):
+            esperado = calcular_infusao_continua(
+                self.peso[i], self.dose[i], str(self.unidade[i]), self.concentracao[i],
+                equipo_tipo=str(self.equipo[i]), modo="taxa"
+            )
+            self.assertEqual(round(lote['taxa_ml_h'][i], 2), esperado['taxa_ml_h'])
+            self.assertEqual(round(lote['gotas_min'][i], 2), esperado['gotas_min'])
+
+    def test_infusao_continua_solucao(self):
+        lote = calcular_infusao_continua_lote(
+            self.peso, self.dose, self.unidade, self.concentracao,
+            volume_bolsa_ml=self.volume, equipo_tipo=self.equipo, modo="solucao"
+        )
+        for i in range(len(lote)):
+            esperado = calcular_infusao_continua(
+                self.peso[i], self.dose[i], str(self.unidade[i]), self.concentracao[i],
+                volume_bolsa_ml=self.volume[i], equipo_tipo=str(self.equipo[i]), modo="solucao"
+            )
+            self.assertEqual(round(lote['volume_farmaco_ml'][i], 2), esperado['volume_farmaco_ml'])
+            self.assertEqual(round(lote['volume_dilente_ml'][i], 2), esperado['volume_dilente_ml'])
+            self.assertEqual(duracao_str(lote['duracao_h'][i]), esperado['duracao_h'])
+
+    def test_infusao_especifica(self):
+        for modo in ("peso", "volume"):
+            lote = calcular_infusao_especifica_lote(
+                self.peso, self.dose, self.concentracao, self.volume, self.equipo, modo
+            )
+            for i in range(len(lote)):
+                esperado = calcular_infusao_especifica(
+                    self.peso[i], self.dose[i], self.concentracao[i],
+                    self.volume[i], str(self.equipo[i]), modo
+                )
+                self.assertEqual(round(lote['taxa_ml_h'][i], 2), esperado['taxa_ml_h'])
+                self.assertEqual(round(lote['gotas_min'][i], 2), esperado['gotas_min'])
+                self.assertEqual(round(lote['volume_farmaco_ml'][i], 2), esperado['volume_farmaco_ml'])
+                self.assertEqual(round(lote['volume_dilente_ml'][i], 2), esperado['volume_dilente_ml'])
+                self.assertEqual(duracao_str(lote['duracao_h'][i]), esperado['duracao_h'])
+
+    def test_infusao_planilha(self):
+        lote = calcular_infusao_planilha_lote(
+            self.peso, self.taxa, self.volume, self.equipo,
+            self.dose, self.unidade, self.concentracao
+        )
+        for i in range(len(lote)):
+            esperado = calcular_infusao_planilha(
+                self.peso[i], self.taxa[i], self.volume[i], str(self.equipo[i]),
+                self.dose[i], str(self.unidade[i]), self.concentracao[i]
+            )
+            self.assertEqual(round(lote['taxa_ml_h'][i], 2), esperado['vazao_ml_h'])
+            self.assertEqual(round(lote['gotas_min'][i], 2), esperado['gotas_min'])
+            self.assertEqual(round(lote['dose_total_ug'][i], 2), esperado['dose_total_ug'])
+            self.assertEqual(round(lote['volume_farmaco_ml'][i], 4), esperado['volume_farmaco_ml'])
+            self.assertEqual(duracao_str(lote['duracao_h'][i]), esperado['duracao_h'])
+
+    def test_escalares_e_modo_solucao_sem_volume(self):
+        lote = calcular_infusao_continua_lote(10.0, 0.3, "mg/kg/min", 10.0)
+        self.assertEqual(len(lote), 1)
+        self.assertAlmostEqual(lote['taxa_ml_h'][0], 18.0)
+        with self.assertRaises(ValueError):
+            calcular_infusao_continua_lote(self.peso, self.dose, "mg/kg/h", 10.0, modo="solucao")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,165 @@
+import subprocess
+import sys
+import unittest
+from datetime import date, datetime
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import event
+from sqlmodel import SQLModel, Session, select
+
+from database.engine import criar_engine
+from models.animal import Animal
+from models.consumo import ConsumoDiario
+from models.farmaco import Farmaco
+from models.sessao import SessaoAnestesia, SessaoAvulsaAnestesia
+from controllers.consumo_controller import consumo_mensal, reconstruir_consumo
+
+
+class TestConsumo(unittest.TestCase):
+    def setUp(self):
+        self.engine = criar_engine("sqlite://")
+        SQLModel.metadata.create_all(self.engine)
+        with Session(self.engine) as session:
+            propofol = Farmaco(nome="Propofol", dose=4, concentracao=10, unidade_dose="mg/kg",
+                               unidade_concentracao="mg/ml")
+            fentanil = Farmaco(nome="Fentanil", dose=5, concentracao=50, unidade_dose="µg/kg/h",
+                               unidade_concentracao="µg/ml", modo_uso="infusão contínua")
+            heparina = Farmaco(nome="Heparina", dose=100, concentracao=5000, unidade_dose="UI/kg",
+                               unidade_concentracao="UI/ml")
+            cao = Animal(nome="Rex", especie="Cão", peso_kg=20)
+            gato = Animal(nome="Mia", especie="Gato", peso_kg=4)
+            session.add_all([propofol, fentanil, heparina, cao, gato])
+            session.commit()
+            self.ids = {o.nome: o.id for o in (propofol, fentanil, heparina, cao, gato)}
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def _sessao(self, farmaco, animal, ml, dia=1):
+        return SessaoAnestesia(id_animal=self.ids[animal], id_farmaco=self.ids[farmaco],
+                               dose_utilizada_ml=ml, data=datetime(2024, 5, dia, 9))
+
+    def _totais(self):
+        with Session(self.engine) as session:
+            return sorted((c.dia, c.id_farmaco, c.especie, round(c.total_ml, 6), round(c.total_mg, 6), c.sessoes)
+                          for c in session.exec(select(ConsumoDiario)))
+
+    def test_insercao_edicao_e_exclusao(self):
+        with Session(self.engine) as session:
+            a = self._sessao("Propofol", "Rex", 2.0)
+            b = self._sessao("Propofol", "Rex", 3.0)
+            c = self._sessao("Fentanil", "Mia", 1.0, dia=2)
+            session.add_all([a, b, c])
+            session.commit()
+            propofol, fentanil = self.ids["Propofol"], self.ids["Fentanil"]
+            self.assertEqual(self._totais(), [
+                (date(2024, 5, 1), propofol, "Cão", 5.0, 50.0, 2),
+                (date(2024, 5, 2), fentanil, "Gato", 1.0, 0.05, 1),
+            ])
+
+            # Edição muda dose e animal: sai de um total e entra em outro
+            b.dose_utilizada_ml = 4.0
+            b.id_animal = self.ids["Mia"]
+            session.add(b)
+            session.delete(c)
+            session.commit()
+            self.assertEqual(self._totais(), [
+                (date(2024, 5, 1), propofol, "Cão", 2.0, 20.0, 1),
+                (date(2024, 5, 1), propofol, "Gato", 4.0, 40.0, 1),
+            ])
+
+    def test_usa_objetos_carregados_na_sessao(self):
+        consultas = []
+        event.listen(self.engine, "before_cursor_execute",
+                     lambda _c, _cur, sql, *args: consultas.append(sql) if sql.startswith("SELECT") else None)
+        with Session(self.engine) as session:
+            # Referências mantidas: o mapa de identidade da sessão é fraco
+            propofol = session.get(Farmaco, self.ids["Propofol"])
+            rex = session.get(Animal, self.ids["Rex"])
+            del consultas[:]
+            session.add_all([SessaoAnestesia(id_animal=rex.id, id_farmaco=propofol.id, dose_utilizada_ml=ml,
+                                             data=datetime(2024, 5, 1, 9)) for ml in (1.0, 2.0, 3.0)])
+            session.commit()
+        self.assertEqual(consultas, [])
+        self.assertEqual(self._totais(), [(date(2024, 5, 1), self.ids["Propofol"], "Cão", 6.0, 60.0, 3)])
+
+    def test_rollback_nao_altera_totais(self):
+        with Session(self.engine) as session:
+            session.add(self._sessao("Propofol", "Rex", 2.0))
+            session.flush()
+            session.rollback()
+        self.assertEqual(self._totais(), [])
+
+    def test_reconstruir_igual_ao_incremental(self):
+        with Session(self.engine) as session:
+            session.add_all([self._sessao("Propofol", "Rex", 1.5, dia=d) for d in (1, 1, 3)])
+            session.add(SessaoAvulsaAnestesia(especie="Cão", nome_animal="Bob", peso_kg=10,
+                                              id_farmaco=self.ids["Propofol"], dose_utilizada_ml=1.0,
+                                              data=datetime(2024, 5, 1, 22)))
+            session.add(SessaoAnestesia(id_farmaco=self.ids["Heparina"], dose_utilizada_ml=0.2,
+                                        data=datetime(2024, 5, 4)))
+            session.commit()
+        incremental = self._totais()
+        self.assertEqual(reconstruir_consumo(self.engine), len(incremental))
+        self.assertEqual(self._totais(), incremental)
+
+    def test_relatorio_mensal(self):
+        with Session(self.engine) as session:
+            session.add_all([self._sessao("Propofol", "Rex", 2.0), self._sessao("Propofol", "Mia", 1.0),
+                             SessaoAnestesia(id_farmaco=self.ids["Heparina"], dose_utilizada_ml=0.2,
+                                             data=datetime(2024, 5, 4))])
+            session.add(SessaoAnestesia(id_animal=self.ids["Rex"], id_farmaco=self.ids["Propofol"],
+                                        dose_utilizada_ml=9.0, data=datetime(2024, 6, 1)))
+            session.commit()
+
+            linhas = consumo_mensal(session, 2024, 5, por_especie=False)
+            self.assertEqual([(l.farmaco, l.sessoes, l.total_ml, l.total_mg) for l in linhas],
+                             [("Heparina", 1, 0.2, None), ("Propofol", 2, 3.0, 30.0)])
+            por_especie = consumo_mensal(session, 2024, 5)
+            self.assertEqual([(l.farmaco, l.especie) for l in por_especie],
+                             [("Heparina", "não informada"), ("Propofol", "Cão"), ("Propofol", "Gato")])
+
+    def test_unidade_a_confirmar_sem_total_em_mg(self):
+        with Session(self.engine) as session:
+            cetamina = Farmaco(nome="Cetamina", dose=5, concentracao=100, unidade_dose="mg/kg")
+            session.add(cetamina)
+            session.commit()
+            session.add(SessaoAnestesia(id_animal=self.ids["Rex"], id_farmaco=cetamina.id,
+                                        dose_utilizada_ml=0.5, data=datetime(2024, 5, 1, 9)))
+            session.commit()
+            self.assertEqual([(l.farmaco, l.total_ml, l.total_mg) for l in consumo_mensal(session, 2024, 5)],
+                             [("Cetamina", 0.5, None)])
+
+            # Confirmar a unidade recalcula os mg já registrados
+            cetamina.unidade_concentracao = "mg/ml"
+            session.add(cetamina)
+            session.commit()
+            self.assertEqual([(l.farmaco, l.total_ml, l.total_mg) for l in consumo_mensal(session, 2024, 5)],
+                             [("Cetamina", 0.5, 50.0)])
+
+    def test_eventos_ligados_ao_importar_o_banco(self):
+        # Sem chamar nada além de importar database.engine, outro processo já mantém os totais
+        codigo = (
+            "from datetime import datetime\n"
+            "from sqlmodel import SQLModel, Session, select\n"
+            "from database.engine import criar_engine\n"
+            "from models.consumo import ConsumoDiario\n"
+            "from models.sessao import SessaoAvulsaAnestesia\n"
+            "engine = criar_engine('sqlite://')\n"
+            "SQLModel.metadata.create_all(engine)\n"
+            "with Session(engine) as s:\n"
+            "    s.add(SessaoAvulsaAnestesia(especie='Cão', nome_animal='Rex', peso_kg=10, id_farmaco=1,\n"
+            "                                dose_utilizada_ml=2.0, data=datetime(2024, 5, 1)))\n"
+            "    s.commit()\n"
+            "    print(s.exec(select(ConsumoDiario.total_ml)).one())\n"
+        )
+        saida = subprocess.run([sys.executable, "-c", codigo], cwd=Path(__file__).parent.parent,
+                               capture_output=True, text=True, check=True).stdout
+        self.assertEqual(saida.strip(), "2.0")
+
+
+if __name__ == "__main__":
+    unittest.main()
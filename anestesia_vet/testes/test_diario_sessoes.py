@@ -0,0 +1,158 @@
+import sys
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import event
+from sqlmodel import SQLModel, Session, select
+
+from database.engine import criar_engine
+from models.config_infusao import ConfigInfusao
+from models.diario import DiarioSessao
+from models.farmaco import Farmaco
+from models.sessao import SessaoAnestesia
+from controllers.diario_sessoes import DiarioSessoes, ler_diario
+from controllers.sessao_controller import gravar_sessoes
+
+
+class TestDiarioSessoes(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.engine = criar_engine(f"sqlite:///{Path(self.dir.name) / 'plantao.db'}")
+        SQLModel.metadata.create_all(self.engine)
+        with Session(self.engine) as session:
+            farmaco = Farmaco(nome="Fentanil", dose=5, concentracao=50, unidade_dose="µg/kg/h",
+                              unidade_concentracao="µg/ml", modo_uso="infusão contínua")
+            session.add(farmaco)
+            session.commit()
+            self.farmaco_id = farmaco.id
+        self.caminho = str(Path(self.dir.name) / "diario.jsonl")
+        self.commits = []
+        event.listen(self.engine, "commit", lambda conn: self.commits.append(1))
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.dir.cleanup()
+
+    def _registro(self, dose=1.5, com_config=True):
+        sessao = SessaoAnestesia(id_farmaco=self.farmaco_id, dose_utilizada_ml=dose,
+                                 data=datetime(2024, 5, 1, 10, 30))
+        config = ConfigInfusao(peso_kg=12, taxa_ml_kg_h=2, volume_bolsa_ml=250) if com_config else None
+        return sessao, config
+
+    def _sessoes(self):
+        with Session(self.engine) as session:
+            return [(s.dose_utilizada_ml, s.config_infusao_id is not None)
+                    for s in session.exec(select(SessaoAnestesia).order_by(SessaoAnestesia.id))]
+
+    def _diario(self, **opcoes):
+        return DiarioSessoes(self.caminho, self.engine, sincronizar=False, **opcoes)
+
+    def test_sessao_e_config_numa_transacao(self):
+        self.commits.clear()
+        with Session(self.engine) as session:
+            ids = gravar_sessoes(session, [self._registro(1.0), self._registro(2.0, com_config=False)])
+        self.assertEqual(len(self.commits), 1)
+        self.assertEqual(len(ids), 2)
+        self.assertEqual(self._sessoes(), [(1.0, True), (2.0, False)])
+
+    def test_group_commit(self):
+        diario = self._diario(tamanho_lote=100)
+        diario.abrir(iniciar_thread=False)
+        for i in range(10):
+            diario.registrar(*self._registro(dose=i + 1))
+        self.assertEqual(self._sessoes(), [])  # ainda só no diário
+        self.assertEqual(len(ler_diario(self.caminho)), 10)
+
+        self.commits.clear()
+        self.assertEqual(diario.gravar_pendentes(), 10)
+        self.assertEqual(len(self.commits), 1)  # um commit para o lote
+        self.assertEqual(len(self._sessoes()), 10)
+        self.assertEqual(ler_diario(self.caminho), [])  # confirmado: arquivo truncado
+        diario.fechar()
+
+    def test_recupera_apos_queda(self):
+        diario = self._diario()
+        diario.abrir(iniciar_thread=False)
+        diario.registrar(*self._registro(1.0))
+        diario.gravar_pendentes()
+        diario.registrar(*self._registro(2.0))
+        diario.registrar(*self._registro(3.0, com_config=False))
+        diario._arquivo.close()  # "queda": sem fechar() nem gravar os pendentes
+        with open(self.caminho, "a", encoding="utf-8") as arquivo:
+            arquivo.write('{"seq": 4, "sessao": {"id_far')  # linha cortada no meio
+
+        novo = self._diario()
+        self.assertEqual(novo.abrir(iniciar_thread=False), 2)
+        self.assertEqual(self._sessoes(), [(1.0, True), (2.0, True), (3.0, False)])
+        with Session(self.engine) as session:
+            self.assertEqual(session.get(DiarioSessao, novo.nome).seq_confirmado, 3)
+
+        # Reabrir de novo não duplica nada e a sequência continua
+        novo.fechar()
+        outro = self._diario()
+        self.assertEqual(outro.abrir(iniciar_thread=False), 0)
+        self.assertEqual(outro.registrar(*self._registro(4.0)), 4)
+        outro.fechar()
+        self.assertEqual(len(self._sessoes()), 4)
+
+    def test_thread_grava_por_tamanho_de_lote(self):
+        gravados = []
+        diario = self._diario(tamanho_lote=3, intervalo_s=30, ao_gravar=gravados.append)
+        diario.abrir()
+        for i in range(3):
+            diario.registrar(*self._registro(dose=i + 1))
+        limite = time.monotonic() + 5
+        while sum(gravados) < 3 and time.monotonic() < limite:
+            time.sleep(0.01)
+        self.assertEqual(sum(gravados), 3)  # lote cheio: gravado sem esperar o intervalo
+        self.assertEqual(len(self._sessoes()), 3)
+        diario.fechar()
+
+    def test_linha_cortada_no_meio_do_arquivo(self):
+        diario = self._diario()
+        diario.abrir(iniciar_thread=False)
+        diario.registrar(*self._registro(1.0))
+        diario._arquivo.write('{"seq": 9, "sessao": {"id_far\n')  # linha de uma escrita interrompida
+        diario.registrar(*self._registro(3.0))
+        diario._arquivo.close()
+        self.assertEqual([e["seq"] for e in ler_diario(self.caminho)], [1, 2])
+
+    def test_abre_na_hora_e_avisa_falha_uma_vez(self):
+        diario = self._diario()
+        diario.abrir(iniciar_thread=False)
+        diario.registrar(*self._registro(1.0))
+        diario._arquivo.close()  # queda com um registro pendente
+
+        erros, gravados = [], []
+        novo = self._diario(intervalo_s=0.05, ao_erro=erros.append, ao_gravar=gravados.append)
+        falhar = [True]
+
+        def recusar(conn, cursor, instrucao, *args):
+            if falhar[0] and instrucao.startswith("INSERT"):
+                raise RuntimeError("banco bloqueado")
+        event.listen(self.engine, "before_cursor_execute", recusar)
+        self.assertEqual(novo.abrir(), 1)
+        novo.registrar(*self._registro(2.0))  # aceito antes de a recuperação ir ao banco
+        limite = time.monotonic() + 5
+        while novo.ultimo_erro is None and time.monotonic() < limite:
+            time.sleep(0.01)
+        time.sleep(0.2)  # várias tentativas falham
+        self.assertEqual(len(erros), 1)
+        self.assertEqual(novo.pendentes, 2)
+
+        falhar[0] = False
+        while sum(gravados) < 2 and time.monotonic() < limite:
+            time.sleep(0.01)
+        self.assertIsNone(novo.ultimo_erro)
+        novo.fechar()
+        self.assertEqual([dose for dose, _ in self._sessoes()], [1.0, 2.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
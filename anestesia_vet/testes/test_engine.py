@@ -0,0 +1,61 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from database.engine import carregar_config, criar_engine
+
+
+class TestEngine(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.url = f"sqlite:///{Path(self.dir.name) / 'teste.db'}"
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_pragmas_aplicados(self):
+        engine = criar_engine(self.url, cache_size=-2000)
+        with engine.connect() as conn:
+            self.assertEqual(conn.execute(text("PRAGMA journal_mode")).scalar(), "wal")
+            self.assertEqual(conn.execute(text("PRAGMA synchronous")).scalar(), 1)  # NORMAL
+            self.assertEqual(conn.execute(text("PRAGMA cache_size")).scalar(), -2000)
+            self.assertEqual(conn.execute(text("PRAGMA temp_store")).scalar(), 2)  # MEMORY
+        self.assertFalse(engine.echo)
+        engine.dispose()
+
+    def test_somente_leitura(self):
+        escrita = criar_engine(self.url)
+        with escrita.begin() as conn:
+            conn.execute(text("CREATE TABLE t (x INTEGER)"))
+            conn.execute(text("INSERT INTO t VALUES (1)"))
+        leitura = criar_engine(self.url, somente_leitura=True)
+        with leitura.connect() as conn:
+            self.assertEqual(conn.execute(text("SELECT x FROM t")).scalar(), 1)
+            with self.assertRaises(OperationalError):
+                conn.execute(text("INSERT INTO t VALUES (2)"))
+        escrita.dispose()
+        leitura.dispose()
+
+    def test_config_arquivo_e_ambiente(self):
+        arquivo = Path(self.dir.name) / "config.json"
+        arquivo.write_text('{"echo": true, "pool_size": 2}', encoding="utf-8")
+        os.environ["ANESTESIA_DB_POOL_SIZE"] = "7"
+        try:
+            config = carregar_config(str(arquivo))
+        finally:
+            del os.environ["ANESTESIA_DB_POOL_SIZE"]
+        self.assertTrue(config['echo'])
+        self.assertEqual(config['pool_size'], 7)
+        self.assertEqual(config['synchronous'], "NORMAL")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import csv
+import json
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from sqlmodel import SQLModel, Session
+
+from database.engine import criar_engine
+from database.migracoes import migrar
+from models.animal import Animal
+from models.config_infusao import ConfigInfusao
+from models.farmaco import Farmaco
+from models.sessao import SessaoAnestesia, SessaoAvulsaAnestesia
+from controllers.exportacao_controller import _consultas, carregar_colunar, exportar_sessoes
+
+INICIO = datetime(2025, 1, 1, 8, 0)
+
+
+class TestExportacao(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.engine = criar_engine(f"sqlite:///{Path(self.dir.name) / 'historico.db'}")
+        SQLModel.metadata.create_all(self.engine)
+        migrar(self.engine, verbose=False)
+        with Session(self.engine) as session:
+            session.add(Animal(nome="Rex", especie="Canino", peso_kg=12))
+            session.add(Farmaco(nome="Fentanil", dose=5, concentracao=50, unidade_dose="µg/kg/h",
+                                unidade_concentracao="µg/ml", modo_uso="infusão contínua"))
+            session.add(ConfigInfusao(peso_kg=12, taxa_ml_kg_h=2, volume_bolsa_ml=250))
+            session.commit()
+            for i in range(10):
+                session.add(SessaoAnestesia(id_animal=1, id_farmaco=1, dose_utilizada_ml=1 + i,
+                                            config_infusao_id=1 if i % 2 else None,
+                                            data=INICIO + timedelta(days=i), observacoes=f"obs {i}"))
+            for i in range(4):
+                session.add(SessaoAvulsaAnestesia(especie="Felino", nome_animal="Mia", peso_kg=3.5,
+                                                  id_farmaco=1, dose_utilizada_ml=0.5,
+                                                  data=INICIO + timedelta(days=i)))
+            session.commit()
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.dir.cleanup()
+
+    def _caminho(self, nome):
+        return str(Path(self.dir.name) / nome)
+
+    def test_csv_e_jsonl(self):
+        self.assertEqual(exportar_sessoes(self._caminho("h.csv"), self.engine, tamanho_lote=3), 14)
+        with open(self._caminho("h.csv"), encoding="utf-8") as f:
+            linhas = list(csv.DictReader(f))
+        self.assertEqual(len(linhas), 14)
+        self.assertEqual(linhas[1]["equipo_tipo"], "macrogotas")
+        self.assertEqual(linhas[1]["taxa_ml_kg_h"], "2.0")
+
+        exportar_sessoes(self._caminho("h.jsonl"), self.engine)
+        with open(self._caminho("h.jsonl"), encoding="utf-8") as f:
+            registros = [json.loads(l) for l in f]
+        avulsa = registros[-1]
+        self.assertEqual((avulsa["animal"], avulsa["origem"], avulsa["farmaco"]), ("Mia", 0, "Fentanil"))
+
+    def test_colunar_memmap(self):
+        exportar_sessoes(self._caminho("h.npcol"), self.engine, tamanho_lote=4)
+        tabela = carregar_colunar(self._caminho("h.npcol"))
+        self.assertEqual(len(tabela), 14)
+        self.assertIsInstance(tabela["dose_utilizada_ml"], np.memmap)
+        self.assertAlmostEqual(float(tabela["dose_utilizada_ml"][:10].sum()), 55.0)
+        self.assertEqual(tabela.texto("animal")[:1] + tabela.texto("animal")[-1:], ["Rex", "Mia"])
+        self.assertTrue(np.isnan(tabela["taxa_ml_kg_h"][0]))
+        self.assertEqual(tabela["data"][0], np.datetime64(INICIO, "us"))
+        for coluna in tabela.colunas.values():
+            self.assertEqual(coluna.offset % 64, 0)
+
+    def test_filtro_por_data(self):
+        total = exportar_sessoes(self._caminho("h.csv"), self.engine,
+                                 inicio=INICIO + timedelta(days=2), fim=INICIO + timedelta(days=5))
+        self.assertEqual(total, 3 + 2)
+        with self.engine.connect() as conn:
+            for stmt in _consultas(INICIO, INICIO + timedelta(days=1)):
+                compilada = stmt.compile(dialect=conn.dialect)
+                plano = " ".join(l[-1] for l in conn.exec_driver_sql(
+                    f"EXPLAIN QUERY PLAN {compilada}",
+                    tuple(compilada.params[p] for p in compilada.positiontup)).all())
+                self.assertIn("INDEX ix_sessao", plano)
+                self.assertNotIn("TEMP B-TREE", plano)
+
+    def test_formato_invalido(self):
+        with self.assertRaises(ValueError):
+            exportar_sessoes(self._caminho("h.xlsx"), self.engine)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlmodel import SQLModel, Session, select
+
+from database.engine import criar_engine
+from models.farmaco import Farmaco
+from controllers.importacao_controller import importar_catalogo_csv
+
+CABECALHO = "nome,dose,concentracao,unidade_dose,unidade_concentracao,modo_uso,volume_seringa,comentario\n"
+
+
+class TestImportacao(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.engine = criar_engine(f"sqlite:///{Path(self.dir.name) / 'catalogo.db'}")
+        SQLModel.metadata.create_all(self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.dir.cleanup()
+
+    def _csv(self, conteudo: str, nome: str = "catalogo.csv") -> str:
+        caminho = Path(self.dir.name) / nome
+        caminho.write_text(conteudo, encoding="utf-8")
+        return str(caminho)
+
+    def _farmacos(self):
+        with Session(self.engine) as session:
+            return session.exec(select(Farmaco).order_by(Farmaco.id)).all()
+
+    def test_reimportar_nao_duplica(self):
+        caminho = self._csv(CABECALHO +
+                            "Propofol,4,10,mg/kg,mg/ml,bolus,,Indutor\n"
+                            "Fentanil,5,50,µg/kg/h,µg/ml,infusão contínua,20,\n")
+        primeiro = importar_catalogo_csv(caminho, self.engine, tamanho_lote=1)
+        segundo = importar_catalogo_csv(caminho, self.engine, tamanho_lote=1)
+        self.assertEqual((primeiro.inseridos, primeiro.atualizados, primeiro.ignorados), (2, 0, 0))
+        self.assertEqual((segundo.inseridos, segundo.atualizados, segundo.ignorados), (0, 0, 2))
+        self.assertEqual(len(self._farmacos()), 2)
+
+    def test_upsert_atualiza_e_conta(self):
+        importar_catalogo_csv(self._csv(CABECALHO + "Propofol,4,10,mg/kg,mg/ml,bolus,,\n"), self.engine)
+        resultado = importar_catalogo_csv(self._csv(
+            CABECALHO +
+            "Propofol,\"5,5\",10,mg/kg,mg/ml,Bolus,,Nova dose\n"   # atualiza (vírgula decimal)
+            "Cetamina,2,100,mg/kg,mg/ml,bolus,,\n"                # novo
+            "Cetamina,3,100,mg/kg,mg/ml,bolus,,\n"                # repetido: última vence
+            "Xilazina,abc,20,mg/kg,mg/ml,bolus,,\n"               # inválido
+            "Outro,1,10,colher/kg,mg/ml,bolus,,\n", "segundo.csv"),  # unidade inválida
+            self.engine)
+        self.assertEqual((resultado.inseridos, resultado.atualizados, resultado.ignorados,
+                          resultado.invalidos), (1, 1, 1, 2))
+        self.assertEqual(len(resultado.erros), 2)
+        farmacos = {f.nome: f for f in self._farmacos()}
+        self.assertEqual(farmacos["Propofol"].dose, 5.5)
+        self.assertEqual(farmacos["Propofol"].comentario, "Nova dose")
+        self.assertEqual(farmacos["Cetamina"].dose, 3)
+
+    def test_colunas_ausentes_nao_sobrescrevem(self):
+        with Session(self.engine) as session:
+            session.add(Farmaco(nome="Noradrenalina", dose=0.1, concentracao=1000, unidade_dose="µg/kg/min",
+                                unidade_concentracao="µg/ml", modo_uso="infusão contínua",
+                                tipo_infusao="vasoativo", doses_variaveis="0.1,0.2"))
+            session.commit()
+        importar_catalogo_csv(self._csv(
+            CABECALHO + "Noradrenalina,0.2,1000,µg/kg/min,µg/ml,infusão contínua,,\n"), self.engine)
+        farmaco = self._farmacos()[0]
+        self.assertEqual(farmaco.dose, 0.2)
+        self.assertEqual((farmaco.tipo_infusao, farmaco.doses_variaveis), ("vasoativo", "0.1,0.2"))
+
+    def test_simular_nao_grava(self):
+        resultado = importar_catalogo_csv(self._csv(CABECALHO + "Propofol,4,10,mg/kg,mg/ml,bolus,,\n"),
+                                          self.engine, simular=True)
+        self.assertEqual((resultado.validos, resultado.inseridos), (1, 0))
+        self.assertEqual(self._farmacos(), [])
+
+    def test_cancelar_entre_lotes(self):
+        cancelado = threading.Event()
+        linhas = "".join(f"Farmaco {i},1,10,mg/kg,mg/ml,bolus,,\n" for i in range(10))
+        # Cancela depois do primeiro lote: ele fica gravado, o resto não
+        resultado = importar_catalogo_csv(self._csv(CABECALHO + linhas), self.engine, tamanho_lote=4,
+                                          ao_progresso=lambda _: cancelado.set(), cancelado=cancelado)
+        self.assertTrue(resultado.cancelado)
+        self.assertEqual(resultado.inseridos, 4)
+        self.assertEqual(len(self._farmacos()), 4)
+
+    def test_campos_obrigatorios(self):
+        with self.assertRaises(ValueError):
+            importar_catalogo_csv(self._csv("nome,dose\nPropofol,4\n"), self.engine)
+
+
+if __name__ == "__main__":
+    unittest.main()
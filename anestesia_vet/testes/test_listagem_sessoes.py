@@ -0,0 +1,72 @@
+import sys
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import event
+from sqlmodel import SQLModel, Session
+
+from database.engine import criar_engine
+from models.animal import Animal
+from models.farmaco import Farmaco
+from models.sessao import SessaoAnestesia, SessaoAvulsaAnestesia
+from controllers.sessao_controller import ORIGEM_AVULSA, ORIGEM_NORMAL, listar_sessoes_pagina
+
+
+class TestListagemSessoes(unittest.TestCase):
+    def setUp(self):
+        self.engine = criar_engine("sqlite://")
+        SQLModel.metadata.create_all(self.engine)
+        inicio = datetime(2025, 3, 1, 8, 0)
+        with Session(self.engine) as session:
+            session.add(Animal(nome="Rex", especie="Canino", peso_kg=12))
+            session.add(Farmaco(nome="Propofol", dose=4, concentracao=10, unidade_dose="mg/kg"))
+            session.commit()
+            # Datas repetidas entre as duas tabelas para testar o desempate do cursor
+            for i in range(25):
+                session.add(SessaoAnestesia(id_animal=1, id_farmaco=1, dose_utilizada_ml=1.5,
+                                            data=inicio + timedelta(hours=i // 2)))
+                session.add(SessaoAvulsaAnestesia(especie="Felino", nome_animal="Mia", peso_kg=3,
+                                                  id_farmaco=1, dose_utilizada_ml=0.5,
+                                                  data=inicio + timedelta(hours=i // 3)))
+            session.commit()
+
+    def _todas(self, limite):
+        linhas, cursor, paginas = [], None, 0
+        with Session(self.engine) as session:
+            while True:
+                pagina, cursor = listar_sessoes_pagina(session, cursor, limite)
+                linhas += pagina
+                paginas += 1
+                if cursor is None:
+                    return linhas, paginas
+
+    def test_paginas_cobrem_tudo_em_ordem(self):
+        linhas, paginas = self._todas(limite=7)
+        self.assertEqual(len(linhas), 50)
+        self.assertEqual(len({(l[0], l[1]) for l in linhas}), 50)
+        chaves = [(l[5], l[0], l[1]) for l in linhas]
+        self.assertEqual(chaves, sorted(chaves, reverse=True))
+        self.assertEqual(paginas, 8)
+
+    def test_linhas_simples_com_nomes(self):
+        with Session(self.engine) as session:
+            linhas, _ = listar_sessoes_pagina(session, limite=50)
+        normal = next(l for l in linhas if l[0] == ORIGEM_NORMAL)
+        avulsa = next(l for l in linhas if l[0] == ORIGEM_AVULSA)
+        self.assertEqual(normal[2:4], ("Rex", "Propofol"))
+        self.assertEqual(avulsa[2:4], ("Mia (Avulso)", "Propofol"))
+
+    def test_uma_consulta_por_pagina(self):
+        consultas = []
+        event.listen(self.engine, "before_cursor_execute", lambda *args: consultas.append(args[2]))
+        with Session(self.engine) as session:
+            listar_sessoes_pagina(session, limite=20)
+        self.assertEqual(len(consultas), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
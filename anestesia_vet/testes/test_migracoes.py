@@ -0,0 +1,88 @@
+import sqlite3
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import inspect, text
+from sqlmodel import SQLModel
+
+from database.engine import criar_engine
+from database.migracoes import MIGRACOES, farmacos_para_revisar, migrar, plano_consultas, varreduras, versao_atual
+
+
+class TestMigracoes(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.engine = criar_engine(f"sqlite:///{Path(self.dir.name) / 'antigo.db'}")
+        # Banco no formato antigo: sem colunas novas nem índices
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE farmaco (id INTEGER PRIMARY KEY, nome VARCHAR NOT NULL, dose FLOAT NOT NULL, "
+                "concentracao FLOAT NOT NULL, unidade_dose VARCHAR NOT NULL, modo_uso VARCHAR NOT NULL, "
+                "volume_seringa FLOAT, comentario VARCHAR)"))
+            conn.execute(text(
+                "INSERT INTO farmaco (nome, dose, concentracao, unidade_dose, modo_uso) VALUES "
+                "('Dexmedetomidina', 1, 500, 'µg/kg/h', 'infusão contínua'), "
+                "('Propofol', 4, 10, 'mg/kg', 'bolus'), "
+                "('Heparina', 100, 5000, 'IU/kg', 'bolus')"))
+        SQLModel.metadata.create_all(self.engine)  # cria as tabelas que faltam
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.dir.cleanup()
+
+    def test_evolui_banco_existente(self):
+        self.assertEqual(migrar(self.engine, verbose=False), [v for v, _, _ in MIGRACOES])
+        inspetor = inspect(self.engine)
+        colunas = {c["name"] for c in inspetor.get_columns("farmaco")}
+        self.assertTrue({"tipo_infusao", "doses_variaveis", "unidade_concentracao"} <= colunas)
+        self.assertIn("ix_farmaco_chave", {i["name"] for i in inspetor.get_indexes("farmaco")})
+
+        with self.engine.connect() as conn:
+            self.assertEqual(versao_atual(conn), MIGRACOES[-1][0])
+            unidades = dict(conn.execute(text("SELECT nome, unidade_concentracao FROM farmaco")).all())
+            suspeitos = [nome for _, nome, _, _ in farmacos_para_revisar(conn)]
+        # Nada é presumido: a unidade fica a confirmar e todos são listados
+        self.assertEqual(unidades, {"Dexmedetomidina": None, "Propofol": None, "Heparina": None})
+        self.assertEqual(suspeitos, ["Dexmedetomidina", "Heparina", "Propofol"])
+        self.assertNotIn("ix_farmaco_nome", {i["name"] for i in inspetor.get_indexes("farmaco")})
+
+        # Segunda execução não faz nada
+        self.assertEqual(migrar(self.engine, verbose=False), [])
+
+    def test_banco_sem_funcoes_do_app(self):
+        migrar(self.engine, verbose=False)
+        # sqlite3 puro (sem sem_acentos registrada) grava e confere o arquivo
+        with sqlite3.connect(self.engine.url.database) as conn:
+            esquema = " ".join(sql for sql, in conn.execute("SELECT sql FROM sqlite_master WHERE sql IS NOT NULL"))
+            self.assertNotIn("sem_acentos", esquema)
+            conn.execute("INSERT INTO farmaco (nome, dose, concentracao, unidade_dose, modo_uso) "
+                         "VALUES ('Atropina', 0.04, 0.5, 'mg/kg', 'bolus')")
+            self.assertEqual(conn.execute("PRAGMA integrity_check").fetchone(), ("ok",))
+            busca = dict(conn.execute("SELECT nome, nome_busca FROM farmaco").fetchall())
+        self.assertEqual(busca["Dexmedetomidina"], "dexmedetomidina")
+        self.assertIsNone(busca["Atropina"])
+
+    def test_consumo_do_historico_sem_unidade_confirmada(self):
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO sessaoavulsaanestesia (especie, nome_animal, peso_kg, id_farmaco, dose_utilizada_ml, data) "
+                "VALUES ('Cão', 'Rex', 10, 2, 4, '2024-03-01 10:00:00'), ('Cão', 'Bob', 8, 2, 3, '2024-03-01 15:00:00')"))
+        migrar(self.engine, verbose=False)
+        with self.engine.connect() as conn:
+            linhas = conn.execute(text("SELECT dia, id_farmaco, especie, total_ml, total_mg, sessoes "
+                                       "FROM consumodiario")).all()
+        # Sem unidade confirmada a massa não é estimada
+        self.assertEqual([tuple(l) for l in linhas], [("2024-03-01", 2, "Cão", 7.0, 0.0, 2)])
+
+    def test_consultas_sem_varredura(self):
+        migrar(self.engine, verbose=False)
+        self.assertEqual(varreduras(plano_consultas(self.engine)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
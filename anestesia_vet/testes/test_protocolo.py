@@ -0,0 +1,103 @@
+import sys
+import unittest
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import event
+from sqlmodel import SQLModel, Session, select
+
+from database.engine import criar_engine
+from models.farmaco import Farmaco
+from models.protocolo import Protocolo, ProtocoloFarmaco
+from controllers.calculadora_dose import calculadora_dose
+from controllers.protocolo_controller import (
+    adicionar_farmaco_a_protocolo, criar_protocolo, deletar_protocolo, mover_farmaco_no_protocolo,
+    obter_farmacos_do_protocolo, remover_farmaco_de_protocolo, reordenar_protocolo, vizinhos_no_protocolo)
+
+
+class TestProtocolo(unittest.TestCase):
+    def setUp(self):
+        self.engine = criar_engine("sqlite://")
+        SQLModel.metadata.create_all(self.engine)
+        calculadora_dose.limpar()
+        with Session(self.engine) as session:
+            farmacos = [Farmaco(nome=f"F{i:03d}", dose=1, concentracao=10, unidade_dose="mg/kg")
+                        for i in range(300)]
+            session.add_all(farmacos)
+            session.commit()
+            self.ids = [f.id for f in farmacos]
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def _nomes(self, session, protocolo_id):
+        return [f.nome for f, _ in obter_farmacos_do_protocolo(session, protocolo_id)]
+
+    def _instrucoes(self, funcao):
+        """Número de instruções SQL executadas por funcao()"""
+        contador = []
+        ouvinte = lambda *args: contador.append(1)
+        event.listen(self.engine, "before_cursor_execute", ouvinte)
+        try:
+            funcao()
+        finally:
+            event.remove(self.engine, "before_cursor_execute", ouvinte)
+        return len(contador)
+
+    def test_criar_em_lote(self):
+        with Session(self.engine) as session:
+            a, b, c = self.ids[:3]
+            protocolo = criar_protocolo(session, "MPA", farmaco_ids=[b, 9999, a, b, c])
+            self.assertEqual(self._nomes(session, protocolo.id), ["F001", "F000", "F002"])
+
+    def test_inserir_e_mover(self):
+        with Session(self.engine) as session:
+            a, b, c, d = self.ids[:4]
+            protocolo = criar_protocolo(session, "P", farmaco_ids=[a, b, c])
+            adicionar_farmaco_a_protocolo(session, protocolo.id, d, antes_de=b)
+            self.assertEqual(self._nomes(session, protocolo.id), ["F000", "F003", "F001", "F002"])
+            mover_farmaco_no_protocolo(session, protocolo.id, a)  # para o fim
+            mover_farmaco_no_protocolo(session, protocolo.id, c, antes_de=d)
+            self.assertEqual(self._nomes(session, protocolo.id), ["F002", "F003", "F001", "F000"])
+            self.assertEqual(vizinhos_no_protocolo(session, protocolo.id, d), (c, b))
+
+            # Movimentos repetidos no mesmo intervalo esgotam o espaço e renumeram o protocolo
+            for _ in range(15):
+                mover_farmaco_no_protocolo(session, protocolo.id, a, antes_de=b)
+                mover_farmaco_no_protocolo(session, protocolo.id, b, antes_de=a)
+            self.assertEqual(self._nomes(session, protocolo.id), ["F002", "F003", "F001", "F000"])
+
+            reordenar_protocolo(session, protocolo.id, [a, b, c, d])
+            self.assertEqual(self._nomes(session, protocolo.id), ["F000", "F001", "F002", "F003"])
+
+    def test_custo_constante_e_cache(self):
+        with Session(self.engine) as session:
+            pequeno = criar_protocolo(session, "Pequeno", farmaco_ids=self.ids[:5]).id
+            grande = criar_protocolo(session, "Grande", farmaco_ids=self.ids).id
+            self.assertEqual(len(calculadora_dose.farmacos_do_protocolo(grande, session)), 300)
+
+            custos = []
+            for protocolo_id, ids in ((pequeno, self.ids[:5]), (grande, self.ids)):
+                custos.append(self._instrucoes(
+                    lambda: mover_farmaco_no_protocolo(session, protocolo_id, ids[-1], antes_de=ids[1])))
+            self.assertEqual(custos[0], custos[1])
+
+            # A composição em cache acompanha as gravações por SQL direto
+            self.assertEqual(calculadora_dose.farmacos_do_protocolo(grande, session)[1][0].nome, "F299")
+            remover_farmaco_de_protocolo(session, grande, self.ids[-1])
+            self.assertEqual(len(calculadora_dose.farmacos_do_protocolo(grande, session)), 299)
+
+    def test_excluir_em_cascata(self):
+        with Session(self.engine) as session:
+            protocolo_id = criar_protocolo(session, "P", farmaco_ids=self.ids[:50]).id
+            outro_id = criar_protocolo(session, "Outro", farmaco_ids=self.ids[:2]).id
+            deletar_protocolo(session, protocolo_id)
+            self.assertIsNone(session.get(Protocolo, protocolo_id))
+            restantes = session.exec(select(ProtocoloFarmaco.protocolo_id)).all()
+            self.assertEqual(set(restantes), {outro_id})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import sys
+import unittest
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from models.farmaco import Farmaco
+from controllers.utils.recalculo import criar_calculo_infusao
+from controllers.utils.titulacao import invalidar_grade
+
+
+class TestRecalculoInfusao(unittest.TestCase):
+    def setUp(self):
+        invalidar_grade()
+        self.fentanil = Farmaco(id=1, nome="Fentanil", dose=5, concentracao=50, unidade_dose="µg/kg/h",
+                                unidade_concentracao="µg/ml", modo_uso="infusão contínua",
+                                doses_variaveis="2.5,5,10")
+        self.grafo = criar_calculo_infusao()
+        for nome, valor in (("texto_peso", "10"), ("texto_taxa", "2"), ("texto_volume", "20"),
+                            ("texto_equipo", "Macrogotas (20 gts/ml)"), ("farmaco", self.fentanil),
+                            ("texto_dose", "5")):
+            self.grafo.definir(nome, valor)
+        self.inicial = self.grafo.recalcular()
+
+    def tearDown(self):
+        invalidar_grade()
+
+    def _recalcular(self, **entradas):
+        self.grafo.execucoes.clear()
+        for nome, valor in entradas.items():
+            self.grafo.definir(nome, valor)
+        return self.grafo.recalcular()
+
+    def test_resultados(self):
+        # 10 kg × 2 ml/kg/h = 20 ml/h; bolsa de 20 ml dura 1 h; 5 µg/kg/h × 10 kg × 1 h = 50 µg = 1 ml
+        self.assertEqual(self.inicial["texto_vazao"], "20.00 ml/h")
+        self.assertEqual(self.inicial["texto_gotas"], "6.67 gts/min")
+        self.assertEqual(self.inicial["texto_duracao"], "1h")
+        self.assertEqual(self.inicial["texto_dose_total"], "50.00 mcg")
+        self.assertEqual(self.inicial["texto_volume_farmaco"], "1.0000 ml")
+        self.assertEqual([linha["dose"] for linha in self.inicial["titulacao"]], [2.5, 5.0, 10.0])
+
+    def test_so_o_que_depende_da_entrada(self):
+        # Trocar o equipo não refaz vazão, duração, dose nem volume do fármaco
+        alterados = self._recalcular(texto_equipo="Microgotas (60 gts/ml)")
+        self.assertEqual(set(alterados), {"equipo", "fator_equipo", "gotas_min", "texto_gotas", "titulacao"})
+        self.assertNotIn("vazao_ml_h", self.grafo.execucoes)
+
+        # Passo de titulação: a grade não é refeita
+        alterados = self._recalcular(texto_dose="10")
+        self.assertEqual(alterados["texto_volume_farmaco"], "2.0000 ml")
+        self.assertNotIn("titulacao", self.grafo.execucoes)
+        self.assertNotIn("texto_vazao", alterados)
+
+        # "10" → "10.0": o peso é o mesmo, nada depois dele é recalculado
+        alterados = self._recalcular(texto_peso="10.0")
+        self.assertEqual(list(alterados), [])
+        self.assertEqual(set(self.grafo.execucoes), {"peso"})
+
+        # Mesmo texto: nem o peso é relido
+        self.assertEqual(self._recalcular(texto_peso="10.0"), {})
+        self.assertEqual(sum(self.grafo.execucoes.values()), 0)
+
+    def test_entrada_invalida_limpa_os_dependentes(self):
+        alterados = self._recalcular(texto_peso="1a")
+        for nome in ("texto_vazao", "texto_duracao", "texto_dose_total", "texto_volume_farmaco", "titulacao"):
+            self.assertIsNone(alterados[nome])
+        self.assertEqual(self.grafo.valor("texto_farmaco"), "Fentanil")
+        # Peso zero também é inválido: continua tudo em branco, sem recalcular nada depois do peso
+        self.assertEqual(self._recalcular(texto_peso="0"), {})
+        self.assertEqual(set(self.grafo.execucoes), {"peso"})
+
+        alterados = self._recalcular(farmaco=None)
+        self.assertIsNone(alterados["texto_farmaco"])
+
+
+if __name__ == "__main__":
+    unittest.main()
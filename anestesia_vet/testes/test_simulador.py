@@ -0,0 +1,108 @@
+import sys
+import unittest
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from sqlmodel import SQLModel, Session
+
+from database.engine import criar_engine  # também registra todos os modelos
+from models.config_infusao import ConfigInfusao
+from models.farmaco import Farmaco
+from models.sessao import SessaoAnestesia
+from controllers.sessao_controller import auditar_sessoes_infusao
+from controllers.utils.simulador import (
+    EventoInfusao, LoteEventos, simular_sessao, simular_lote, resumo_lote, totais_taxa_constante,
+    EVENTO_TAXA, EVENTO_TROCA_BOLSA, EVENTO_BOLUS,
+)
+
+
+class TestSimulador(unittest.TestCase):
+    def test_taxa_constante_ate_esvaziar(self):
+        # 100 ml a 50 ml/h, 10 µg/ml, 10 kg → 2 h, 100 µg/kg
+        estados = list(simular_sessao(10, 10, 100, 50))
+        self.assertAlmostEqual(estados[0].tempo_ate_esvaziar_min, 120)
+        self.assertAlmostEqual(estados[-1].tempo_min, 120)
+        self.assertAlmostEqual(estados[-1].volume_restante_ml, 0)
+        self.assertAlmostEqual(estados[-1].dose_acumulada_ug_kg, 100)
+
+    def test_eventos(self):
+        eventos = [
+            EventoInfusao(30, EVENTO_TAXA, 20),
+            EventoInfusao(60, EVENTO_BOLUS, 5),
+            EventoInfusao(90, EVENTO_TROCA_BOLSA, 100),
+        ]
+        ultimo = list(simular_sessao(10, 10, 100, 60, eventos, duracao_min=120))[-1]
+        # 30 ml + 10 ml + bolus 5 ml + 10 ml + 10 ml = 65 ml infundidos; 100 - 10 ml após a troca
+        self.assertAlmostEqual(ultimo.volume_infundido_ml, 65)
+        self.assertAlmostEqual(ultimo.volume_restante_ml, 90)
+        self.assertAlmostEqual(ultimo.dose_acumulada_ug_kg, 65)
+
+    def test_bomba_parada_sem_duracao_termina(self):
+        estados = list(simular_sessao(10, 10, 100, 0))
+        self.assertEqual(len(estados), 1)
+        # Taxa zerada por evento: para no passo do evento, com a bolsa ainda cheia pela metade
+        ultimo = list(simular_sessao(10, 10, 100, 60, [EventoInfusao(50, EVENTO_TAXA, 0)]))[-1]
+        self.assertAlmostEqual(ultimo.tempo_min, 51)
+        self.assertAlmostEqual(ultimo.volume_restante_ml, 50)
+
+    def test_forma_fechada_igual_ao_lote(self):
+        pesos, conc = [5, 10, 20, 8], [10, 20, 5, 7]
+        volumes, taxas = [100, 250, 50, 80], [50, 20, 0, 30]
+        fechada = totais_taxa_constante(pesos, conc, volumes, taxas, duracao_min=200)
+        passos = resumo_lote(pesos, conc, volumes, taxas, duracao_min=200)
+        for chave in ("volume_infundido_ml", "volume_restante_ml", "dose_acumulada_ug_kg"):
+            np.testing.assert_allclose(fechada[chave], passos[chave])
+        ate_esvaziar = totais_taxa_constante(pesos, conc, volumes, taxas)
+        np.testing.assert_allclose(ate_esvaziar['duracao_min'], [120, 750, 0, 160])
+        np.testing.assert_allclose(ate_esvaziar['volume_restante_ml'], [0, 0, 50, 0])
+
+    def test_lote_igual_ao_gerador(self):
+        rng = np.random.default_rng(1)
+        n = 50
+        pesos = rng.uniform(2, 40, n)
+        conc = rng.uniform(1, 100, n)
+        volumes = rng.choice([20, 50, 100, 250], n).astype(float)
+        taxas = rng.uniform(1, 60, n)
+        eventos = [[EventoInfusao(float(rng.integers(1, 180)), EVENTO_TAXA, float(rng.uniform(1, 30))),
+                    EventoInfusao(float(rng.integers(1, 180)), EVENTO_BOLUS, 2.0)] for _ in range(n)]
+
+        final = resumo_lote(pesos, conc, volumes, taxas, duracao_min=240,
+                            eventos=LoteEventos.de_listas(eventos))
+        for i in range(n):
+            ultimo = list(simular_sessao(pesos[i], conc[i], volumes[i], taxas[i], eventos[i], duracao_min=240))[-1]
+            self.assertAlmostEqual(final['dose_acumulada_ug_kg'][i], ultimo.dose_acumulada_ug_kg)
+            self.assertAlmostEqual(final['volume_restante_ml'][i], ultimo.volume_restante_ml)
+
+    def test_lote_e_gerador(self):
+        passos = simular_lote([10, 20], 10, 100, [50, 0], duracao_min=10, passo_s=1)
+        self.assertEqual(sum(1 for _ in passos), 601)
+
+    def test_auditoria_do_historico(self):
+        engine = criar_engine("sqlite://")
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as session:
+            farmaco = Farmaco(nome="Lidocaína", dose=1.5, concentracao=20, unidade_dose="mg/kg/h",
+                              modo_uso="infusão contínua")
+            session.add(farmaco)
+            session.flush()
+            for peso in (5.0, 10.0, 20.0):
+                config = ConfigInfusao(peso_kg=peso, taxa_ml_kg_h=2, volume_bolsa_ml=250)
+                session.add(config)
+                session.flush()
+                session.add(SessaoAnestesia(id_farmaco=farmaco.id, dose_utilizada_ml=1,
+                                            config_infusao_id=config.id))
+            session.commit()
+
+            resultados = list(auditar_sessoes_infusao(session, tamanho_lote=2))
+        self.assertEqual(len(resultados), 3)
+        for r, peso in zip(resultados, (5.0, 10.0, 20.0)):
+            duracao_h = 250 / (peso * 2)
+            self.assertAlmostEqual(r['duracao_h'], duracao_h)
+            self.assertAlmostEqual(r['dose_acumulada_ug_kg'], 1500 * duracao_h)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
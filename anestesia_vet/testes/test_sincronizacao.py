@@ -0,0 +1,193 @@
+import sys
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlmodel import SQLModel, Session, select
+
+from database.engine import criar_engine
+from database.migracoes import migrar
+from database.sincronizacao import (
+    criar_servidor, exportar, seqs_confirmadas, sincronizar_pasta, sincronizar_socket)
+from models.animal import Animal
+from models.consumo import ConsumoDiario
+from models.farmaco import Farmaco
+from models.protocolo import Protocolo, ProtocoloFarmaco
+from models.sessao import SessaoAnestesia
+
+
+class TestSincronizacao(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.pasta = str(Path(self.dir.name) / "sinc")
+        self.engines = {}
+        for nome in ("a", "b"):
+            engine = criar_engine(f"sqlite:///{Path(self.dir.name) / nome}.db")
+            SQLModel.metadata.create_all(engine)
+            with Session(engine) as session:
+                # Cadastro comum, anterior à instalação (cópia do mesmo banco)
+                session.add(Farmaco(nome="Cetamina", dose=5, concentracao=50, unidade_dose="mg/kg"))
+                session.commit()
+            migrar(engine, verbose=False)
+            self.engines[nome] = engine
+
+    def tearDown(self):
+        for engine in self.engines.values():
+            engine.dispose()
+        self.dir.cleanup()
+
+    def _sincronizar(self):
+        sincronizar_pasta(self.engines["a"], self.pasta)
+        sincronizar_pasta(self.engines["b"], self.pasta)
+        sincronizar_pasta(self.engines["a"], self.pasta)
+
+    def _farmacos(self, nome):
+        with Session(self.engines[nome]) as session:
+            return sorted((f.nome, f.dose) for f in session.exec(select(Farmaco)))
+
+    def test_insercoes_com_referencias_e_consumo(self):
+        with Session(self.engines["a"]) as session:
+            farmaco = Farmaco(nome="Propofol", dose=4, concentracao=10, unidade_dose="mg/kg",
+                              unidade_concentracao="mg/ml")
+            animal = Animal(nome="Rex", especie="Cão", peso_kg=20)
+            session.add_all([farmaco, animal])
+            session.commit()
+            session.add(SessaoAnestesia(id_animal=animal.id, id_farmaco=farmaco.id,
+                                        dose_utilizada_ml=2.0, data=datetime(2024, 5, 1)))
+            session.commit()
+        with Session(self.engines["b"]) as session:
+            # Mesmo id local em B, outra linha
+            session.add(Animal(nome="Mia", especie="Gato", peso_kg=4))
+            session.commit()
+
+        self._sincronizar()
+        for nome in ("a", "b"):
+            with Session(self.engines[nome]) as session:
+                self.assertEqual(sorted(a.nome for a in session.exec(select(Animal))), ["Mia", "Rex"])
+                sessao = session.exec(select(SessaoAnestesia)).one()
+                self.assertEqual(session.get(Animal, sessao.id_animal).nome, "Rex")
+                self.assertEqual(session.get(Farmaco, sessao.id_farmaco).nome, "Propofol")
+                consumo = session.exec(select(ConsumoDiario)).one()
+                self.assertEqual((consumo.especie, consumo.total_mg), ("Cão", 20.0))
+
+        # Nada mudou: a próxima rodada não envia nem aplica nada
+        self.assertEqual(sincronizar_pasta(self.engines["a"], self.pasta), (0, 0))
+        self.assertEqual(sincronizar_pasta(self.engines["b"], self.pasta), (0, 0))
+
+    def test_conflito_deterministico(self):
+        for nome, dose in (("a", 6), ("b", 7)):
+            with Session(self.engines[nome]) as session:
+                cetamina = session.exec(select(Farmaco)).one()
+                cetamina.dose = dose
+                session.add(cetamina)
+                session.commit()
+        self._sincronizar()
+        self.assertEqual(self._farmacos("a"), self._farmacos("b"))
+
+        # Edição feita depois de receber a outra versão sempre vence
+        with Session(self.engines["a"]) as session:
+            cetamina = session.exec(select(Farmaco)).one()
+            cetamina.dose = 10
+            session.add(cetamina)
+            session.commit()
+        self._sincronizar()
+        self.assertEqual(self._farmacos("b"), [("Cetamina", 10)])
+
+    def test_exclusao_e_protocolo(self):
+        with Session(self.engines["a"]) as session:
+            fentanil = Farmaco(nome="Fentanil", dose=5, concentracao=50, unidade_dose="µg/kg")
+            protocolo = Protocolo(nome="MPA")
+            session.add_all([fentanil, protocolo])
+            session.commit()
+            cetamina = session.exec(select(Farmaco).where(Farmaco.nome == "Cetamina")).one()
+            session.add_all([ProtocoloFarmaco(protocolo_id=protocolo.id, farmaco_id=fentanil.id, ordem=1),
+                             ProtocoloFarmaco(protocolo_id=protocolo.id, farmaco_id=cetamina.id, ordem=2)])
+            session.commit()
+        self._sincronizar()
+        with Session(self.engines["b"]) as session:
+            protocolo = session.exec(select(Protocolo)).one()
+            itens = sorted((i.ordem, session.get(Farmaco, i.farmaco_id).nome) for i in protocolo.farmacos)
+            self.assertEqual(itens, [(1, "Fentanil"), (2, "Cetamina")])
+            session.delete(protocolo.farmacos[0])
+            session.commit()
+            cetamina = session.exec(select(Farmaco).where(Farmaco.nome == "Cetamina")).one()
+            session.delete(cetamina)
+            session.commit()
+        self._sincronizar()
+        self.assertEqual(self._farmacos("a"), [("Fentanil", 5)])
+        with Session(self.engines["a"]) as session:
+            self.assertEqual(len(session.exec(select(ProtocoloFarmaco)).all()), 1)
+
+    def test_socket(self):
+        with Session(self.engines["b"]) as session:
+            session.add(Farmaco(nome="Atropina", dose=0.04, concentracao=0.5, unidade_dose="mg/kg"))
+            session.commit()
+        with Session(self.engines["a"]) as session:
+            session.add(Farmaco(nome="Lidocaína", dose=2, concentracao=20, unidade_dose="mg/kg"))
+            session.commit()
+
+        with self.assertRaisesRegex(ValueError, "sinc_segredo"):
+            criar_servidor(self.engines["b"], porta=0, segredo="")
+        servidor = criar_servidor(self.engines["b"], porta=0, segredo="abc")
+        self.assertEqual(servidor.server_address[0], "127.0.0.1")
+        thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+        thread.start()
+        try:
+            porta = servidor.server_address[1]
+            # Segredo errado: o servidor não responde nem grava nada
+            with self.assertRaises(ConnectionError):
+                sincronizar_socket(self.engines["a"], "127.0.0.1", porta, segredo="xyz")
+            self.assertEqual(len(self._farmacos("b")), 2)
+
+            self.assertEqual(sincronizar_socket(self.engines["a"], "127.0.0.1", porta, segredo="abc"), (1, 1))
+            self.assertEqual(sincronizar_socket(self.engines["a"], "127.0.0.1", porta, segredo="abc"), (0, 0))
+        finally:
+            servidor.shutdown()
+            servidor.server_close()
+        self.assertEqual(self._farmacos("a"), self._farmacos("b"))
+        self.assertEqual(len(self._farmacos("a")), 3)
+        self.assertEqual(exportar(self.engines["b"], desde=10**9)["alteracoes"], [])
+
+    def _registro(self, nome):
+        with self.engines[nome].connect() as conn:
+            return conn.exec_driver_sql("SELECT tabela, chave, versao FROM sinc_alteracao ORDER BY seq").all()
+
+    def test_poda_do_registro(self):
+        with Session(self.engines["a"]) as session:
+            cetamina = session.exec(select(Farmaco)).one()
+            for dose in (6, 7, 8):
+                cetamina.dose = dose
+                session.add(cetamina)
+                session.commit()
+        self.assertEqual(len(self._registro("a")), 3)
+
+        # B recebe as três edições; A só sabe disso quando B manda um pacote
+        self._sincronizar()
+        self.assertEqual(self._farmacos("b"), [("Cetamina", 8)])
+        with Session(self.engines["b"]) as session:
+            session.add(Farmaco(nome="Atropina", dose=0.04, concentracao=0.5, unidade_dose="mg/kg"))
+            session.commit()
+        self._sincronizar()
+        with self.engines["a"].connect() as conn:
+            self.assertGreaterEqual(list(seqs_confirmadas(conn).values())[0], 3)
+        # Fica só a última alteração de cada linha (com a versão para os conflitos)
+        registro = self._registro("a")
+        self.assertEqual(len(registro), 2)
+        self.assertEqual(registro[0], ("farmaco", "0:1", 3))
+
+        with Session(self.engines["b"]) as session:
+            cetamina = session.exec(select(Farmaco).where(Farmaco.nome == "Cetamina")).one()
+            cetamina.dose = 9
+            session.add(cetamina)
+            session.commit()
+        self._sincronizar()
+        self.assertEqual(self._farmacos("a"), [("Atropina", 0.04), ("Cetamina", 9)])
+
+
+if __name__ == "__main__":
+    unittest.main()
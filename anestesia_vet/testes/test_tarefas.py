@@ -0,0 +1,127 @@
+import sys
+import threading
+import time
+import unittest
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from interface.tarefas import ExecutorTarefas
+
+
+class RaizFalsa:
+    """Substitui o Tk: guarda os callbacks de after() para o teste executá-los"""
+
+    def __init__(self):
+        self.agendados = []
+        self.thread = threading.current_thread()
+
+    def after(self, _ms, funcao):
+        self.agendados.append(funcao)
+
+    def rodar(self, executor, limite_s=5.0):
+        fim = time.monotonic() + limite_s
+        while (executor.ocupado or self.agendados) and time.monotonic() < fim:
+            agendados, self.agendados = self.agendados, []
+            for funcao in agendados:
+                funcao()
+            time.sleep(0.005)
+
+
+class TestExecutorTarefas(unittest.TestCase):
+    def setUp(self):
+        self.raiz = RaizFalsa()
+        self.estados = []
+        self.erros = []
+        self.executor = ExecutorTarefas(
+            self.raiz, ao_mudar_estado=lambda ativas: self.estados.append(len(ativas)),
+            ao_erro=lambda tarefa, erro: self.erros.append((tarefa.descricao, erro)))
+
+    def tearDown(self):
+        self.executor.encerrar()
+
+    def test_resultado_volta_na_thread_da_interface(self):
+        threads = {}
+
+        def trabalho(a, b):
+            threads['trabalho'] = threading.current_thread()
+            return a + b
+
+        def concluido(resultado):
+            threads['retorno'] = threading.current_thread()
+            threads['resultado'] = resultado
+
+        self.executor.executar(trabalho, 2, 3, ao_concluir=concluido, descricao="soma")
+        self.assertTrue(self.executor.ocupado)
+        self.raiz.rodar(self.executor)
+
+        self.assertEqual(threads['resultado'], 5)
+        self.assertIsNot(threads['trabalho'], self.raiz.thread)
+        self.assertIs(threads['retorno'], self.raiz.thread)
+        self.assertEqual(self.estados, [1, 0])  # indicador liga e desliga
+
+    def test_erro(self):
+        def falha():
+            raise ValueError("disco cheio")
+
+        recebidos = []
+        self.executor.executar(falha, ao_erro=recebidos.append)
+        self.executor.executar(falha, descricao="padrão")
+        self.raiz.rodar(self.executor)
+        self.assertEqual(str(recebidos[0]), "disco cheio")
+        self.assertEqual([d for d, _ in self.erros], ["padrão"])
+
+    def test_cancelamento(self):
+        iniciou = threading.Event()
+        concluidos = []
+
+        def longo(cancelado):
+            iniciou.set()
+            while not cancelado.wait(0.01):
+                pass
+            return "parou"
+
+        tarefa = self.executor.executar(longo, ao_concluir=concluidos.append, cancelavel=True)
+        iniciou.wait(2)
+        self.executor.cancelar_todas()
+        self.raiz.rodar(self.executor)
+
+        self.assertTrue(tarefa.cancelada)
+        self.assertEqual(concluidos, [])
+        self.assertFalse(self.executor.ocupado)
+
+    def test_na_interface(self):
+        chamadas = []
+
+        def trabalho():
+            self.executor.na_interface(lambda n: chamadas.append((n, threading.current_thread())), 7)
+
+        self.executor.executar(trabalho)
+        self.raiz.rodar(self.executor)
+        self.assertEqual(chamadas, [(7, self.raiz.thread)])
+
+    def test_na_interface_sem_tarefa_ativa(self):
+        # Ex: o diário gravando numa thread própria, com o executor ocioso
+        chamadas = []
+        thread = threading.Thread(target=self.executor.na_interface, args=(chamadas.append, "lista"))
+        thread.start()
+        thread.join()
+        self.assertEqual(len(self.raiz.agendados), 1)
+        self.raiz.rodar(self.executor)
+        self.assertEqual(chamadas, ["lista"])
+
+    def test_retorno_com_erro_nao_trava_a_fila(self):
+        erros, chamadas = [], []
+        executor = ExecutorTarefas(self.raiz, ao_erro=lambda tarefa, erro: erros.append((tarefa, erro)))
+        executor.na_interface(lambda: 1 / 0)
+        executor.na_interface(chamadas.append, "depois")
+        self.raiz.rodar(executor)
+        executor.encerrar()
+        self.assertEqual(chamadas, ["depois"])
+        self.assertIsNone(erros[0][0])
+        self.assertIsInstance(erros[0][1], ZeroDivisionError)
+
+
+if __name__ == "__main__":
+    unittest.main()
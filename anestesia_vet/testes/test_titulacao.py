@@ -0,0 +1,62 @@
+import sys
+import unittest
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlmodel import SQLModel, Session
+
+from models.farmaco import Farmaco
+from database.engine import criar_engine  # também registra todos os modelos
+from controllers.config_infusao_controller import calcular_infusao_continua
+from controllers.utils.titulacao import obter_grade, grade_em_cache, doses_variaveis_lista
+
+
+class TestTitulacao(unittest.TestCase):
+    def setUp(self):
+        self.engine = criar_engine("sqlite://")
+        SQLModel.metadata.create_all(self.engine)
+        with Session(self.engine) as session:
+            farmaco = Farmaco(nome="Noradrenalina", dose=0.1, concentracao=1000,
+                              unidade_dose="mcg/kg/min", unidade_concentracao="µg/ml",
+                              modo_uso="infusão contínua", tipo_infusao="vasoativo",
+                              doses_variaveis="0.1, 0.2,0.5,abc")
+            session.add(farmaco)
+            session.commit()
+            session.refresh(farmaco)
+            self.farmaco = farmaco
+
+    def test_doses_variaveis(self):
+        self.assertEqual(doses_variaveis_lista("0.1, 0.2,0.5,abc"), [0.1, 0.2, 0.5])
+        self.assertEqual(doses_variaveis_lista(None), [])
+        # Com ";" a vírgula é decimal
+        self.assertEqual(doses_variaveis_lista("0,1; 0,25;1 ;x"), [0.1, 0.25, 1.0])
+        self.assertEqual(doses_variaveis_lista("0,5;1.5"), [0.5, 1.5])
+
+    def test_grade_igual_ao_calculo_escalar(self):
+        grade = obter_grade(self.farmaco)
+        for peso in (4.0, 12.5, 33.3):  # 33.3 kg não está na grade
+            for linha in grade.consultar(peso, 250, "microgotas"):
+                esperado = calcular_infusao_continua(
+                    peso, linha['dose'], "mcg/kg/min", 1000, 250, "microgotas", "solucao",
+                    unidade_concentracao="µg/ml"
+                )
+                self.assertEqual(linha['taxa_ml_h'], esperado['taxa_ml_h'])
+                self.assertEqual(linha['gotas_min'], esperado['gotas_min'])
+                self.assertEqual(linha['volume_farmaco_ml'], esperado['volume_farmaco_ml'])
+
+    def test_memorizada_e_invalidada_ao_alterar(self):
+        grade = obter_grade(self.farmaco)
+        self.assertIs(obter_grade(self.farmaco), grade)
+        with Session(self.engine) as session:
+            farmaco = session.get(Farmaco, self.farmaco.id)
+            farmaco.doses_variaveis = "0.1,0.3"
+            session.add(farmaco)
+            session.commit()
+            self.assertIsNone(grade_em_cache(farmaco.id))
+            self.assertEqual(list(obter_grade(farmaco).doses), [0.1, 0.3])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
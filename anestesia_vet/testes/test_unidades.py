@@ -0,0 +1,71 @@
+import sys
+import unittest
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from controllers.utils.unidades import (
+    UNIDADES_CONCENTRACAO, conferir_massas, conferir_unidades, fator_concentracao_ug_ml, interpretar_unidade)
+from controllers.config_infusao_controller import calcular_infusao_continua
+from models.farmaco import Farmaco
+import database.engine  # noqa: F401 (registra todos os modelos)
+
+
+class TestUnidades(unittest.TestCase):
+    def test_fatores_de_dose(self):
+        self.assertEqual(interpretar_unidade("mg/kg/min").fator_ug_kg_h, 60000.0)
+        self.assertEqual(interpretar_unidade("mg/kg/h").fator_ug_kg_h, 1000.0)
+        self.assertEqual(interpretar_unidade("µg/kg/min").fator_ug_kg_h, 60.0)
+        self.assertEqual(interpretar_unidade("µg/kg").fator_ug_kg_h, 1.0)
+        self.assertFalse(interpretar_unidade("mg/kg").continua)
+
+    def test_sinonimos_sao_a_mesma_instancia(self):
+        self.assertIs(interpretar_unidade("mcg/kg/min"), interpretar_unidade("µg/kg/min"))
+        self.assertIs(interpretar_unidade("ug/kg/min"), interpretar_unidade("µg/kg/min"))
+
+    def test_concentracao(self):
+        self.assertEqual(fator_concentracao_ug_ml("mg/ml"), 1000.0)
+        self.assertEqual(fator_concentracao_ug_ml("µg/ml"), 1.0)
+        self.assertEqual(fator_concentracao_ug_ml(None), 1000.0)
+
+    def test_unidade_invalida(self):
+        with self.assertRaises(ValueError):
+            interpretar_unidade("xyz/kg")
+
+    def test_concentracao_em_ug_ml_no_calculo(self):
+        # Remifentanil 5 µg/kg/h, 50 µg/ml, 10 kg → 1 ml/h
+        resultado = calcular_infusao_continua(10, 5, "µg/kg/h", 50, unidade_concentracao="µg/ml")
+        self.assertEqual(resultado['taxa_ml_h'], 1.0)
+
+    def test_farmaco(self):
+        farmaco = Farmaco(nome="Remifentanil", dose=5, concentracao=50,
+                          unidade_dose="µg/kg/h", unidade_concentracao="µg/ml")
+        self.assertEqual(farmaco.dose_ug_kg_h, 5.0)
+        self.assertEqual(farmaco.concentracao_ug_ml, 50.0)
+        self.assertEqual(farmaco.texto_concentracao, "50 µg/ml")
+
+    def test_misturas_de_ui_e_massa(self):
+        conferir_massas("UI/kg", "UI/ml")
+        conferir_massas("µg/kg/h", "mg/ml")
+        for dose, concentracao in (("UI/kg", "mg/ml"), ("mg/kg", "UI/ml"), ("UI/kg", None)):
+            with self.assertRaises(ValueError):
+                conferir_massas(dose, concentracao)
+        with self.assertRaises(ValueError):
+            conferir_unidades("mg/kg", "mg/kg")
+        conferir_unidades("UI/kg", None)  # não confirmada: aceita na gravação
+
+    def test_unidade_invalida_nao_quebra_as_propriedades(self):
+        # Gravada por fora do app: as telas mostram "a confirmar" em vez de erro
+        farmaco = Farmaco(nome="X", dose=1, concentracao=2, unidade_dose="mg/kg", unidade_concentracao="xyz")
+        self.assertIsNone(farmaco.unidade_conc)
+        self.assertEqual(farmaco.texto_concentracao, "2 (unidade a confirmar)")
+        self.assertEqual(farmaco.concentracao_ug_ml, 2000.0)
+
+    def test_unidades_do_cadastro(self):
+        for texto in UNIDADES_CONCENTRACAO:
+            self.assertTrue(interpretar_unidade(texto).por_ml)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)